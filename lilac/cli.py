@@ -163,6 +163,13 @@ def hf_docker_start_command() -> None:
   is_flag=True,
   default=False,
 )
+@click.option(
+  '--warm_up_on_space',
+  help='When True, the space opens the datasets when it starts, so its first visitors do not wait '
+  'for them.',
+  is_flag=True,
+  default=False,
+)
 @click.option(
   '--hf_space_storage',
   help='If defined, sets the HuggingFace space persistent storage type. '
@@ -188,6 +195,7 @@ def deploy_project_command(
   deploy_at_head: bool,
   create_space: bool,
   load_on_space: bool,
+  warm_up_on_space: bool,
   hf_space_storage: Optional[Union[Literal['small'], Literal['medium'], Literal['large']]],
   hf_token: Optional[str],
 ) -> None:
@@ -220,6 +228,7 @@ def deploy_project_command(
     skip_concept_upload=skip_concept_upload,
     create_space=create_space,
     load_on_space=load_on_space,
+    warm_up_on_space=warm_up_on_space,
     hf_space_storage=hf_space_storage,
     hf_token=hf_token,
   )
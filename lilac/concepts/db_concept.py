@@ -198,6 +198,15 @@ class ConceptModelDB(abc.ABC):
       raise ValueError(f'Concept "{model.namespace}/{model.concept_name}" does not exist.')
     return concept.version == model.version
 
+  def concept_version(
+    self, namespace: str, concept_name: str, user: Optional[UserInfo] = None
+  ) -> int:
+    """Return the latest version of the concept, that the models are synced to."""
+    concept = self._concept_db.get(namespace, concept_name, user=user)
+    if not concept:
+      raise ValueError(f'Concept "{namespace}/{concept_name}" does not exist.')
+    return concept.version
+
   def sync(
     self,
     namespace: str,
@@ -18,6 +18,7 @@ from .dataset import (
   SortOrder,
   UnaryOp,
 )
+from .profiling import QueryProfile, profile_queries
 
 __all__ = [
   'DatasetManifest',
@@ -38,4 +39,6 @@ __all__ = [
   'FilterLike',
   'SortOrder',
   'GroupsSortBy',
+  'QueryProfile',
+  'profile_queries',
 ]
@@ -0,0 +1,122 @@
+"""Cancellation and timeouts for long-running dataset queries."""
+import contextlib
+import threading
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+# How often `cancellable_iter` checks for cancellation, in number of items.
+CANCELLATION_CHECK_INTERVAL = 256
+
+
+class QueryCancelledError(Exception):
+  """Raised when a query is cancelled, or exceeds its timeout."""
+
+
+class CancellationToken:
+  """A token to cancel the dataset queries of a request.
+
+  Cancelling the token interrupts the DuckDB queries that are running with it, and stops the signal
+  UDFs of `select_rows` between batches. When `timeout_sec` is set, the token cancels itself after
+  that many seconds.
+  """
+
+  def __init__(self, timeout_sec: Optional[float] = None) -> None:
+    self._lock = threading.Lock()
+    self._reason: Optional[str] = None
+    self._callbacks: dict[int, Callable[[], None]] = {}
+    self._next_callback_id = 0
+    self._timer: Optional[threading.Timer] = None
+    if timeout_sec:
+      self._timer = threading.Timer(
+        timeout_sec, self.cancel, kwargs={'reason': f'The query timed out after {timeout_sec}s.'}
+      )
+      self._timer.daemon = True
+      self._timer.start()
+
+  @property
+  def cancelled(self) -> bool:
+    """Whether the token was cancelled."""
+    return self._reason is not None
+
+  def cancel(self, reason: str = 'The query was cancelled.') -> None:
+    """Cancel the token, and interrupt the queries running with it."""
+    with self._lock:
+      if self._reason is not None:
+        return
+      self._reason = reason
+      callbacks = list(self._callbacks.values())
+    for callback in callbacks:
+      callback()
+
+  def raise_if_cancelled(self) -> None:
+    """Raises a `QueryCancelledError` if the token was cancelled."""
+    if self._reason is not None:
+      raise QueryCancelledError(self._reason)
+
+  @contextlib.contextmanager
+  def on_cancel(self, callback: Callable[[], None]) -> Iterator[None]:
+    """Calls `callback` when the token is cancelled while the block runs."""
+    with self._lock:
+      self.raise_if_cancelled()
+      callback_id = self._next_callback_id
+      self._next_callback_id += 1
+      self._callbacks[callback_id] = callback
+    try:
+      yield
+    finally:
+      with self._lock:
+        del self._callbacks[callback_id]
+
+  def close(self) -> None:
+    """Stops the timeout timer. Call this when the request is done."""
+    if self._timer:
+      self._timer.cancel()
+
+
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar(
+  'lilac_cancellation_token', default=None
+)
+
+
+@contextlib.contextmanager
+def cancellable(token: CancellationToken) -> Iterator[CancellationToken]:
+  """Runs the dataset queries in the block with a cancellation token.
+
+  ```py
+    token = CancellationToken(timeout_sec=30)
+    with cancellable(token):
+      dataset.select_rows(...)
+  ```
+  """
+  reset_token = _current_token.set(token)
+  try:
+    yield token
+  finally:
+    _current_token.reset(reset_token)
+
+
+def current_cancellation_token() -> Optional[CancellationToken]:
+  """Returns the cancellation token of the running query, if any."""
+  return _current_token.get()
+
+
+def raise_if_cancelled() -> None:
+  """Raises a `QueryCancelledError` if the running query was cancelled."""
+  token = _current_token.get()
+  if token:
+    token.raise_if_cancelled()
+
+
+Tin = TypeVar('Tin')
+
+
+def cancellable_iter(input: Iterable[Tin]) -> Iterator[Tin]:
+  """Wraps an iterable to stop with a `QueryCancelledError` when the running query is cancelled."""
+  token = _current_token.get()
+  if not token:
+    yield from input
+    return
+  for i, item in enumerate(input):
+    if i % CANCELLATION_CHECK_INTERVAL == 0:
+      token.raise_if_cancelled()
+    yield item
@@ -10,6 +10,7 @@ from typing import Any, Callable, Iterable, Iterator, Literal, Optional, Sequenc
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 from datasets import Dataset as HuggingFaceDataset
 from pydantic import (
   BaseModel,
@@ -78,10 +79,15 @@ DELETED_LABEL_NAME = '__deleted__'
 class SelectRowsResult:
   """The result of a select rows query."""
 
-  def __init__(self, df: pd.DataFrame, total_num_rows: int) -> None:
+  def __init__(
+    self, df: pd.DataFrame, total_num_rows: int, next_cursor: Optional[str] = None
+  ) -> None:
     """Initialize the result."""
     self._df = df
     self.total_num_rows = total_num_rows
+    # An opaque cursor to fetch the page after this one. None when there are no more rows, or when
+    # the query does not support cursors.
+    self.next_cursor = next_cursor
     self._next_iter: Optional[Iterator] = None
 
   def __iter__(self) -> Iterator:
@@ -121,6 +127,10 @@ class StatsResult(BaseModel):
   # Defined for text features.
   avg_text_length: Optional[float] = None
 
+  # Whether the distinct count and the average text length are estimated from fewer values than
+  # `stats()` samples, like the stats of a sparse leaf that are computed together with other leafs.
+  approximate: bool = False
+
   def __eq__(self, other: object) -> bool:
     if not isinstance(other, StatsResult):
       return NotImplemented
@@ -279,6 +289,10 @@ class SelectGroupsResult(BaseModel):
   too_many_distinct: bool
   counts: list[tuple[Optional[FeatureValue], int]]
   bins: Optional[list[Bin]] = None
+  # Whether the counts are estimated from a sample of the rows.
+  approximate: bool = False
+  # The 95% confidence intervals of the estimated counts, in the order of `counts`.
+  count_intervals: Optional[list[tuple[int, int]]] = None
 
 
 class PivotResultOuterGroup(BaseModel):
@@ -287,6 +301,9 @@ class PivotResultOuterGroup(BaseModel):
   value: Optional[str]
   count: int
   inner: list[tuple[Optional[str], int]]
+  # The 95% confidence intervals of the estimated counts, when the pivot is approximate.
+  count_interval: Optional[tuple[int, int]] = None
+  inner_intervals: Optional[list[tuple[int, int]]] = None
 
 
 class PivotResult(BaseModel):
@@ -294,6 +311,8 @@ class PivotResult(BaseModel):
 
   outer_groups: list[PivotResultOuterGroup]
   too_many_distinct: bool = False
+  # Whether the counts are estimated from a sample of the rows.
+  approximate: bool = False
 
 
 class Filter(BaseModel):
@@ -389,6 +408,20 @@ class Dataset(abc.ABC):
     """Deletes the dataset."""
     pass
 
+  def close(self) -> None:
+    """Releases the connections and caches of the dataset. They are reopened on first use."""
+    pass
+
+  def warm_up(self) -> None:
+    """Opens the dataset ahead of its first queries, so users do not wait for it.
+
+    Builds the views over the dataset files and computes the stats of the media fields, which the
+    dataset overview shows.
+    """
+    self.manifest()
+    for media_path in self.settings().ui.media_paths:
+      self.stats(media_path)
+
   @abc.abstractmethod
   def manifest(self) -> DatasetManifest:
     """Return the manifest for the dataset."""
@@ -635,6 +668,29 @@ class Dataset(abc.ABC):
     """
     pass
 
+  @abc.abstractmethod
+  def compute_keyword_index(self, path: Path, overwrite: bool = False) -> None:
+    """Compute a keyword index over a text field, to speed up keyword searches.
+
+    The index narrows down the rows that a keyword search scans for the query, so the search
+    finds the same rows, and highlights the same matches, as without the index. The rows are ranked
+    by BM25 when no other sort is given. The index is ignored once the data of the field changes.
+
+    Args:
+      path: The path of the text field to index.
+      overwrite: Whether to rebuild an existing index that is up to date.
+    """
+    pass
+
+  @abc.abstractmethod
+  def delete_keyword_index(self, path: Path) -> None:
+    """Delete the keyword index of a text field.
+
+    Args:
+      path: The path of the indexed text field.
+    """
+    pass
+
   @abc.abstractmethod
   def select_groups(
     self,
@@ -646,6 +702,7 @@ class Dataset(abc.ABC):
     bins: Optional[Union[Sequence[Bin], Sequence[float]]] = None,
     include_deleted: bool = False,
     searches: Optional[Sequence[Search]] = None,
+    approximate: bool = False,
   ) -> SelectGroupsResult:
     """Select grouped columns to power a histogram.
 
@@ -659,6 +716,9 @@ class Dataset(abc.ABC):
       bins: The bins to use when bucketizing a float column.
       include_deleted: Whether to include deleted rows in the query.
       searches: The searches to apply to the query.
+      approximate: Whether to estimate the counts from a persistent sample of the rows, for
+        interactive histograms on large datasets. The estimated counts come with confidence
+        intervals. Request the exact counts again with `approximate=False`.
 
     Returns:
       A `SelectGroupsResult` iterator where each row is a group.
@@ -674,6 +734,7 @@ class Dataset(abc.ABC):
     filters: Optional[Sequence[FilterLike]] = None,
     sort_by: Optional[GroupsSortBy] = GroupsSortBy.COUNT,
     sort_order: Optional[SortOrder] = SortOrder.DESC,
+    approximate: bool = False,
   ) -> PivotResult:
     """Generate a pivot table with counts over two fields (outer and inner).
 
@@ -694,6 +755,9 @@ class Dataset(abc.ABC):
       },
     ]
     ```
+
+    With `approximate=True`, the counts are estimated from a persistent sample of the rows, like in
+    `select_groups`.
     """
     raise NotImplementedError
 
@@ -712,6 +776,7 @@ class Dataset(abc.ABC):
     include_deleted: bool = False,
     exclude_signals: bool = False,
     user: Optional[UserInfo] = None,
+    cursor: Optional[str] = None,
   ) -> SelectRowsResult:
     """Select a set of rows that match the provided filters, analogous to SQL SELECT.
 
@@ -738,12 +803,89 @@ class Dataset(abc.ABC):
       exclude_signals: Whether to exclude fields produced by signals.
       user: The authenticated user, if auth is enabled and the user is logged in. This is used to
         apply ACL to the query, especially for concepts.
+      cursor: The `next_cursor` of the previous page of the same query. The page starts right after
+        the last row of the previous page, without scanning the skipped rows, and reuses the total
+        number of rows of the previous page. `offset` is relative to the cursor. Cursors are not
+        supported when sorting by, or filtering on, a signal UDF.
 
     Returns:
       A `SelectRowsResult` iterator with rows of `Item`s.
     """
     pass
 
+  @abc.abstractmethod
+  def select_rows_arrow(
+    self,
+    columns: Optional[Sequence[ColumnId]] = None,
+    searches: Optional[Sequence[Search]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    sort_by: Optional[Sequence[Path]] = None,
+    sort_order: Optional[SortOrder] = SortOrder.DESC,
+    limit: Optional[int] = 100,
+    offset: Optional[int] = 0,
+    resolve_span: bool = False,
+    combine_columns: bool = False,
+    include_deleted: bool = False,
+    exclude_signals: bool = False,
+    user: Optional[UserInfo] = None,
+    cursor: Optional[str] = None,
+  ) -> pa.Table:
+    """Select the rows of a `select_rows` query as an Arrow table.
+
+    The arguments are the same as `select_rows`. The rows are converted to Arrow without going
+    through Python objects, except for the inputs and outputs of signal UDFs.
+
+    Returns:
+      A `pyarrow.Table` with the rows, with `total_num_rows` and `next_cursor` in its schema
+      metadata. `next_cursor` is empty when there are no more rows.
+
+    Raises:
+      pyarrow.ArrowException: When the rows don't fit Arrow types, e.g. when merged columns have
+        incompatible types.
+    """
+    pass
+
+  @abc.abstractmethod
+  def select_rows_batches(
+    self,
+    columns: Optional[Sequence[ColumnId]] = None,
+    searches: Optional[Sequence[Search]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    sort_by: Optional[Sequence[Path]] = None,
+    sort_order: Optional[SortOrder] = SortOrder.DESC,
+    limit: Optional[int] = None,
+    offset: Optional[int] = 0,
+    resolve_span: bool = False,
+    include_deleted: bool = False,
+    exclude_signals: bool = False,
+    user: Optional[UserInfo] = None,
+    batch_size: int = 10_000,
+  ) -> Iterator[pa.RecordBatch]:
+    """Stream the rows of a `select_rows` query as Arrow record batches.
+
+    Unlike `select_rows`, the rows are streamed, so at most `batch_size` rows are held in memory
+    at a time. Columns are always combined into a single object per row, as with
+    `combine_columns=True`.
+
+    Args:
+      columns: The columns to select. See `select_rows`.
+      searches: The searches to apply to the query.
+      filters: The filters to apply to the query.
+      sort_by: An ordered list of what to sort by. See `select_rows`.
+      sort_order: The sort order.
+      limit: The maximum number of rows to return. When None, all rows are returned.
+      offset: The offset to start returning rows from.
+      resolve_span: Whether to resolve the span of the row.
+      include_deleted: Whether to include deleted rows in the query.
+      exclude_signals: Whether to exclude fields produced by signals.
+      user: The authenticated user, if auth is enabled and the user is logged in.
+      batch_size: The maximum number of rows in a record batch.
+
+    Returns:
+      An iterator of `pyarrow.RecordBatch`es with the schema of `select_rows_schema`.
+    """
+    pass
+
   @abc.abstractmethod
   def select_rows_schema(
     self,
@@ -886,6 +1028,23 @@ class Dataset(abc.ABC):
     """
     pass
 
+  def stats_many(
+    self, leaf_paths: Sequence[Path], include_deleted: bool = False
+  ) -> list[StatsResult]:
+    """Compute stats for many leaf paths at once.
+
+    Implementations can override this to compute the stats for all the leafs in a single pass over
+    the data.
+
+    Args:
+      leaf_paths: The leaf paths to compute stats for.
+      include_deleted: Whether to include deleted rows in the stats.
+
+    Returns:
+      A StatsResult for each leaf path, in the same order as `leaf_paths`.
+    """
+    return [self.stats(leaf_path, include_deleted=include_deleted) for leaf_path in leaf_paths]
+
   @abc.abstractmethod
   def media(self, item_id: str, leaf_path: Path) -> MediaResult:
     """Return the media for a leaf path.
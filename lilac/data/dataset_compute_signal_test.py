@@ -1,9 +1,12 @@
 """Tests for dataset.compute_signal()."""
 
+import glob
+import os
 import re
 from typing import ClassVar, Iterable, Iterator, Optional, Union, cast
 
 import numpy as np
+import pyarrow.parquet as pq
 import pytest
 from pytest_mock import MockerFixture
 from typing_extensions import override
@@ -28,6 +31,7 @@ from ..signals.concept_scorer import ConceptSignal
 from ..source import clear_source_registry, register_source
 from . import dataset_utils as dataset_utils_module
 from .dataset import Column, DatasetManifest, GroupsSortBy, SortOrder
+from .dataset_duckdb import SIGNAL_COMPUTE_SECONDS, SIGNAL_ITEMS, SIGNAL_ITEMS_PER_SECOND
 from .dataset_test_utils import (
   TEST_DATASET_NAME,
   TEST_NAMESPACE,
@@ -248,6 +252,41 @@ def test_sparse_signal(make_test_data: TestDataMaker) -> None:
   ]
 
 
+def test_signal_output_clustered_by_value(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(
+    [{'text': 'hello'}, {'text': 'hello world'}, {'text': 'hi'}, {'text': 'abc'}]
+  )
+
+  dataset.compute_signal(TestSparseSignal(), 'text')
+
+  # The output file is sorted by the value of the signal, so filters can skip row groups.
+  [parquet_file] = glob.glob(
+    os.path.join(dataset.dataset_path, 'text', 'test_sparse_signal', '*.parquet')
+  )
+  rows = pq.read_table(parquet_file).to_pylist()
+  assert [row['text']['test_sparse_signal'] for row in rows] == [2, 3, 11, None]
+
+  result = dataset.select_rows(
+    ['text'], filters=[(('text', 'test_sparse_signal'), 'greater', 2)], combine_columns=True
+  )
+  assert list(result) == [
+    {'text': enriched_item('hello world', {'test_sparse_signal': 11})},
+    {'text': enriched_item('abc', {'test_sparse_signal': 3})},
+  ]
+
+
+def test_signal_throughput_metrics(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'text': 'hello'}, {'text': 'hello world'}, {'text': 'hi'}])
+  num_items = SIGNAL_ITEMS.value(signal='test_sparse_signal')
+  num_computes = SIGNAL_COMPUTE_SECONDS.count(signal='test_sparse_signal')
+
+  dataset.compute_signal(TestSparseSignal(), 'text')
+
+  assert SIGNAL_ITEMS.value(signal='test_sparse_signal') == num_items + 3
+  assert SIGNAL_COMPUTE_SECONDS.count(signal='test_sparse_signal') == num_computes + 1
+  assert SIGNAL_ITEMS_PER_SECOND.value(signal='test_sparse_signal') > 0
+
+
 def test_sparse_rich_signal(make_test_data: TestDataMaker) -> None:
   dataset = make_test_data([{'text': 'hello'}, {'text': 'hello world'}])
 
@@ -1,31 +1,55 @@
 """The DuckDB implementation of the dataset database."""
+import base64
+import binascii
+import contextlib
+import contextvars
 import copy
 import csv
-import functools
 import gc
 import glob
+import hashlib
 import inspect
 import itertools
 import json
 import math
 import os
 import pathlib
+import pickle
+import random
 import re
 import shutil
 import sqlite3
 import tempfile
 import threading
-from collections import defaultdict
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
+from dataclasses import dataclass
 from datetime import datetime
 from importlib import metadata
-from typing import Any, Callable, Iterable, Iterator, Literal, Optional, Sequence, Union, cast
+from typing import (
+  Any,
+  Callable,
+  Iterable,
+  Iterator,
+  Literal,
+  Optional,
+  Sequence,
+  TypeVar,
+  Union,
+  cast,
+)
 
 import duckdb
 import joblib
 import numpy as np
 import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import yaml
 from datasets import Dataset as HuggingFaceDataset
 from pandas.api.types import is_object_dtype
@@ -46,6 +70,7 @@ from ..dataset_format import DatasetFormatInputSelector, infer_formats
 from ..db_manager import remove_dataset_from_cache
 from ..embeddings.vector_store import VectorDBIndex
 from ..env import env
+from ..metrics import counter, gauge, histogram, record_cache_lookups
 from ..parquet_writer import ParquetWriter
 from ..project import (
   add_project_dataset_config,
@@ -70,6 +95,7 @@ from ..schema import (
   TIMESTAMP,
   VALUE_KEY,
   Bin,
+  DataType,
   EmbeddingInfo,
   Field,
   Item,
@@ -90,6 +116,7 @@ from ..schema import (
   is_temporal,
   merge_schemas,
   normalize_path,
+  schema_to_arrow_schema,
   signal_type_supports_dtype,
 )
 from ..schema_duckdb import duckdb_schema, escape_col_name, escape_string_literal
@@ -100,6 +127,7 @@ from ..signal import (
   VectorSignal,
   get_signal_by_type,
   resolve_signal,
+  warm_signal,
 )
 from ..signals.concept_labels import ConceptLabelsSignal
 from ..signals.concept_scorer import ConceptSignal
@@ -113,7 +141,10 @@ from ..tasks import (
   get_progress_bar,
 )
 from ..utils import (
+  GCS_PROTOCOL,
   DebugTimer,
+  ReadWriteLock,
+  SingleFlight,
   chunks,
   delete_file,
   get_dataset_output_dir,
@@ -125,6 +156,12 @@ from . import (
   cluster_titling,
   dataset,  # Imported top-level so they can be mocked.
 )
+from .cancellation import (
+  QueryCancelledError,
+  cancellable_iter,
+  current_cancellation_token,
+  raise_if_cancelled,
+)
 from .clustering import cluster_impl
 from .dataset import (
   BINARY_OPS,
@@ -177,16 +214,82 @@ from .dataset_utils import (
   wrap_in_dicts,
   write_embeddings_to_disk,
 )
+from .profiling import current_query_profile, profile_phase
+from .udf_cache import UDFCache
 
 SIGNAL_MANIFEST_FILENAME = 'signal_manifest.json'
+STATS_CACHE_FILENAME = 'stats.pkl'
+# The keys of the string maps in each parquet file, so they are not re-computed with the manifest.
+MAP_KEYS_CACHE_FILENAME = 'map_keys.pkl'
 MAP_MANIFEST_SUFFIX = 'map_manifest.json'
+# Sketches of the leafs written by a signal or a map. They are stored next to the manifest.
+SKETCHES_SUFFIX = 'sketches.pkl'
+# The files of a keyword index over a text field. They are stored in the directory of the field.
+KEYWORD_INDEX_MANIFEST_FILENAME = 'keyword_index.json'
+KEYWORD_INDEX_POSTINGS_FILENAME = 'keyword_index.postings.parquet'
+KEYWORD_INDEX_DOCS_FILENAME = 'keyword_index.docs.parquet'
 LABELS_SQLITE_SUFFIX = '.labels.sqlite'
+LABELS_PARQUET_SUFFIX = '.labels.parquet'
+# The number of labels that are written to sqlite in a single `executemany`.
+LABELS_SQLITE_BATCH_SIZE = 10_000
+# The number of rows in a row group of the parquet files of signal and map outputs. Smaller row
+# groups let DuckDB skip more of the file with the min/max statistics of selective filters.
+DEFAULT_PARQUET_ROW_GROUP_SIZE = 32_768
+# Labels are mirrored in native DuckDB tables, which are joined instead of the label files.
+LABEL_TABLE_PREFIX = '__labels_'
 DATASET_SETTINGS_FILENAME = 'settings.json'
 SOURCE_VIEW_NAME = 'source'
+# The joint view without the label columns. Queries that read no label column use it, since they
+# filter on labels by probing the label tables for the rowids, instead of joining the labels.
+DATA_VIEW_NAME = '__data_t'
 
 SQLITE_LABEL_COLNAME = 'label'
 SQLITE_CREATED_COLNAME = 'created'
 MAX_AUTO_BINS = 15
+# The number of values sampled for computing histogram bins of ordinal leafs.
+NUM_VALUE_SAMPLES = 100
+# The maximum number of groups stored in a leaf sketch.
+SKETCH_MAX_GROUPS = 1_000
+# Keyword indices split text into runs of letters and digits, like `_KEYWORD_WORD_REGEX` does for
+# queries.
+KEYWORD_TOKEN_REGEX = r'[\p{L}\p{N}]+'
+_KEYWORD_WORD_REGEX = re.compile(r'[^\W_]+')
+# The term frequency saturation and the length normalization of BM25 ranking.
+BM25_K1 = 1.2
+BM25_B = 0.75
+KEYWORD_SCORE_COLUMN = '__keyword_score__'
+# The position of a row in a batch, when merging the batches of a UDF sort.
+POSITION_COLUMN = '__position__'
+
+# Preview signals whose UDF outputs are cached by rowid across `select_rows` queries.
+CACHED_UDF_SIGNALS = (ConceptSignal, ConceptLabelsSignal, SemanticSimilaritySignal)
+# The default number of UDF outputs that are cached in memory per dataset.
+DEFAULT_UDF_CACHE_SIZE = 100_000
+# The directory in the lilac cache dir where UDF outputs that are evicted from memory are written.
+UDF_CACHE_SPILL_DIR = 'udf_cache_spill'
+
+# Rowid `in` filters with more values than this are semi-joined against a table of the rowids,
+# instead of inlining the rowids in the SQL.
+DEFAULT_ROWID_TABLE_THRESHOLD = 1_000
+ROWID_TABLE_PREFIX = '__rowids_'
+# The number of rowid tables that are kept around for repeated queries, like paging top-k results.
+# Tables that are used by a running query are not dropped, so there can briefly be more.
+MAX_ROWID_TABLES = 16
+# The dataset of the current `_pin_rowid_tables` context, and the names of the rowid tables that
+# its queries use.
+_pinned_rowid_tables: contextvars.ContextVar[
+  Optional[tuple['DatasetDuckDB', list[str]]]
+] = contextvars.ContextVar('lilac_pinned_rowid_tables', default=None)
+
+# The default number of rows in the persistent row sample that approximate `select_groups` and
+# `pivot` queries scan. Datasets with fewer rows are always scanned in full.
+DEFAULT_APPROXIMATE_SAMPLE_SIZE = 100_000
+SAMPLE_TABLE_NAME = '__sample_t'
+SAMPLE_VIEW_NAME = '__sample'
+# The seed of the row sample, so the sample is the same across rebuilds of the same data.
+SAMPLE_SEED = 42
+# The z-score of the confidence intervals of approximate counts.
+APPROXIMATE_COUNT_Z = 1.96
 
 BINARY_OP_TO_SQL: dict[BinaryOp, str] = {
   'equals': '=',
@@ -198,6 +301,69 @@ BINARY_OP_TO_SQL: dict[BinaryOp, str] = {
 }
 
 DUCKDB_CACHE_FILE = 'duckdb_cache.db'
+# The number of rows in each batch when streaming the results of `select_rows`.
+SELECT_ROWS_BATCH_SIZE = 10_000
+
+# The maximum number of idle cursors kept by the connection pool of a dataset.
+DUCKDB_POOL_MAX_IDLE_CURSORS = 16
+
+# The dtypes that can be exported with a native DuckDB `COPY`. Exports with other dtypes fall back
+# to writing the rows in Python. JSON and CSV are restricted to the dtypes DuckDB formats like the
+# Python exporters, e.g. DuckDB writes timestamps to JSON without the ISO "T" separator, and
+# booleans to CSV as "true" while Python writes "True".
+COPY_DTYPES = {
+  'string',
+  'string_span',
+  'boolean',
+  'int8',
+  'int16',
+  'int32',
+  'int64',
+  'uint8',
+  'uint16',
+  'uint32',
+  'uint64',
+  'float16',
+  'float32',
+  'float64',
+  'time',
+  'date',
+  'timestamp',
+  'interval',
+  'binary',
+}
+COPY_JSON_DTYPES = COPY_DTYPES - {'time', 'date', 'timestamp', 'interval', 'binary'}
+COPY_CSV_DTYPES = COPY_DTYPES - {'string_span', 'boolean', 'interval', 'binary'}
+# The prefix of the temporary columns holding the sort keys of a row for keyset pagination.
+CURSOR_COLUMN_PREFIX = '__cursor_key__'
+
+# Metrics of the hot paths, exposed at `/metrics`.
+DATASET_QUERY_SECONDS = histogram(
+  'lilac_dataset_query_seconds', 'The latency of dataset queries.', ['operation']
+)
+VECTOR_TOPK_SECONDS = histogram(
+  'lilac_vector_topk_seconds', 'The latency of vector top-k searches.', ['vector_store']
+)
+UDF_COMPUTE_SECONDS = histogram(
+  'lilac_udf_compute_seconds', 'The latency of computing a signal UDF of a query.', ['signal']
+)
+UDF_ROWS = counter(
+  'lilac_udf_rows_total', 'The number of rows that signal UDFs were computed on.', ['signal']
+)
+SIGNAL_COMPUTE_SECONDS = histogram(
+  'lilac_signal_compute_seconds',
+  'The duration of computing a signal or an embedding over a dataset.',
+  ['signal'],
+  buckets=(1, 10, 60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 24 * 3600),
+)
+SIGNAL_ITEMS = counter(
+  'lilac_signal_items_total', 'The number of items a signal or an embedding computed.', ['signal']
+)
+SIGNAL_ITEMS_PER_SECOND = gauge(
+  'lilac_signal_items_per_second',
+  'The throughput of the last computation of a signal or an embedding.',
+  ['signal'],
+)
 
 
 class MapFnJobRequest(BaseModel):
@@ -270,22 +436,234 @@ class MapManifest(BaseModel):
   py_version: Optional[str] = None
 
 
+class KeywordIndexManifest(BaseModel):
+  """The manifest of a keyword index over a text field."""
+
+  path: PathTuple
+  num_docs: int
+  avg_doc_length: float
+  # The data files of the field, relative to the dataset, with their size and modification time
+  # when the index was computed. The index is ignored when they change.
+  data_files: list[str]
+  data_fingerprint: dict[str, tuple[int, int]]
+
+
+class LeafSketch(BaseModel):
+  """A summary of a leaf, computed when the leaf is written, to answer queries without a scan."""
+
+  # The stats over all the rows, including deleted rows.
+  stats: StatsResult
+  # The default bins of numeric leafs, i.e. the bins of the field or the auto bins.
+  bins: Optional[list[Bin]] = None
+  # The group counts of `select_groups` with the default bins, sorted by count descending.
+  group_counts: list[tuple[Optional[Any], int]] = []
+  # False when the group counts only contain the most frequent groups.
+  group_counts_complete: bool = True
+
+
+class MapKeysCacheEntry(BaseModel):
+  """The keys of the string maps in a parquet file."""
+
+  # The size and modification time of the file when the keys were computed.
+  fingerprint: tuple[int, int]
+  # Maps the SQL select of a map in the joint view to its keys in the file.
+  keys: dict[str, list[str]]
+
+
+class DuckDBConnectionPool:
+  """A pool of cursors over a single DuckDB connection, with read/write separation.
+
+  Each query runs on its own checked-out cursor, so reads run in parallel. Statements run through
+  `execute` hold the read lock, and rebuilds of the views hold the write lock, so a query is never
+  bound against a half-rebuilt set of views. Replacing the connection waits until every
+  checked-out cursor is returned, so it never closes the connection under an in-flight query, and
+  holds new checkouts back meanwhile. The connection is opened when the first cursor is checked out.
+  """
+
+  def __init__(
+    self,
+    connect: Callable[[], duckdb.DuckDBPyConnection],
+    max_idle_cursors: int = DUCKDB_POOL_MAX_IDLE_CURSORS,
+  ) -> None:
+    self._connect = connect
+    self._con: Optional[duckdb.DuckDBPyConnection] = None
+    self._lock = ReadWriteLock()
+    # Guards the idle cursors, the number of checked-out cursors and the connection itself.
+    self._cursors_cond = threading.Condition()
+    self._idle_cursors: list[duckdb.DuckDBPyConnection] = []
+    self._num_checked_out = 0
+    self._max_idle_cursors = max_idle_cursors
+    # The number of cursors checked out by the current thread.
+    self._thread_cursors = threading.local()
+    # The callbacks of a reconnect that waits for the checked-out cursors to be returned.
+    self._pending_reconnect: Optional[list[Callable[[], None]]] = None
+    # Changes whenever the connection is closed, so views built on a closed connection are rebuilt.
+    self.connection_id = 0
+
+  def _num_thread_cursors(self) -> int:
+    return getattr(self._thread_cursors, 'count', 0)
+
+  def _checkout(self) -> duckdb.DuckDBPyConnection:
+    with self._cursors_cond:
+      if not self._num_thread_cursors():
+        # A pending reconnect goes first. Threads that hold cursors are not held back, since the
+        # reconnect waits for them to return their cursors.
+        self._cursors_cond.wait_for(lambda: self._pending_reconnect is None)
+      self._num_checked_out += 1
+      self._thread_cursors.count = self._num_thread_cursors() + 1
+      if self._idle_cursors:
+        return self._idle_cursors.pop()
+      if self._con is None:
+        self._con = self._connect()
+      return self._con.cursor()
+
+  def _checkin(self, cursor: duckdb.DuckDBPyConnection, reuse: bool = True) -> None:
+    with self._cursors_cond:
+      self._num_checked_out -= 1
+      self._thread_cursors.count = self._num_thread_cursors() - 1
+      if reuse and len(self._idle_cursors) < self._max_idle_cursors:
+        self._idle_cursors.append(cursor)
+      else:
+        cursor.close()
+      if self._pending_reconnect is not None and self._num_checked_out == 0:
+        self._run_pending_reconnect()
+      self._cursors_cond.notify_all()
+
+  @contextlib.contextmanager
+  def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+    """Check out a cursor. The cursor is returned to the pool when the block exits.
+
+    When the block runs with a cancellation token, cancelling the token interrupts the query running
+    on the cursor, and raises a `QueryCancelledError`.
+    """
+    token = current_cancellation_token()
+    cursor = self._checkout()
+    try:
+      if not token:
+        yield cursor
+        return
+      with token.on_cancel(cursor.interrupt):
+        yield cursor
+    except duckdb.Error:
+      # DuckDB raises an `InterruptException`, or a generic error when interrupted mid-fetch.
+      if token:
+        token.raise_if_cancelled()
+      raise
+    finally:
+      # An interrupted cursor is not reused.
+      self._checkin(cursor, reuse=not (token and token.cancelled))
+
+  def execute(
+    self, cursor: duckdb.DuckDBPyConnection, query: str, params: Optional[list[Any]] = None
+  ) -> duckdb.DuckDBPyConnection:
+    """Execute a statement on a checked-out cursor, holding the read lock while it is bound.
+
+    The results can be fetched after the lock is released, since the query is already bound to the
+    views that existed when it was executed.
+    """
+    # An interrupt that arrives between statements is lost, so check the token before each one.
+    raise_if_cancelled()
+    with self._lock.read():
+      profile = current_query_profile()
+      if profile:
+        return profile.execute(cursor, query, params)
+      return cursor.execute(query, params)
+
+  @contextlib.contextmanager
+  def write(self) -> Iterator[duckdb.DuckDBPyConnection]:
+    """Check out a cursor that holds the write lock, to rebuild the views exclusively."""
+    # The cursor is checked out first, so a writer never holds the write lock while it waits for a
+    # pending reconnect, which waits for the readers that wait for the write lock.
+    with self.cursor() as cursor, self._lock.write():
+      yield cursor
+
+  def reconnect(self, before_connect: Optional[Callable[[], None]] = None) -> None:
+    """Close the connection once all checked-out cursors are returned. It is reopened on next use.
+
+    New checkouts wait until the connection is closed, except on the threads that hold cursors.
+    When the calling thread holds cursors, the connection is closed when the last cursor is
+    returned, instead of waiting for the cursors of the calling thread.
+
+    Args:
+      before_connect: Called after the connection is closed, before a new one is opened.
+    """
+    with self._cursors_cond:
+      if self._pending_reconnect is None:
+        self._pending_reconnect = []
+      if before_connect:
+        self._pending_reconnect.append(before_connect)
+      if self._num_checked_out == 0:
+        self._run_pending_reconnect()
+      elif not self._num_thread_cursors():
+        self._cursors_cond.wait_for(lambda: self._pending_reconnect is None)
+
+  def _run_pending_reconnect(self) -> None:
+    callbacks = self._pending_reconnect or []
+    self._close_connection()
+    for callback in callbacks:
+      callback()
+    self._pending_reconnect = None
+    self._cursors_cond.notify_all()
+
+  def close(self) -> None:
+    """Close the connection and all the idle cursors right away. It is reopened on next use.
+
+    Use `reconnect` to close the connection once the checked-out cursors are returned.
+    """
+    with self._cursors_cond:
+      self._close_connection()
+
+  def _close_connection(self) -> None:
+    for cursor in self._idle_cursors:
+      cursor.close()
+    self._idle_cursors = []
+    if self._con is not None:
+      self._con.close()
+      self._con = None
+    self.connection_id += 1
+
+
 class DuckDBMapOutput:
   """The output of a map computation."""
 
-  def __init__(self, con: duckdb.DuckDBPyConnection, query: str, output_path: PathTuple):
-    self.con = con
+  def __init__(self, pool: DuckDBConnectionPool, query: str, output_path: PathTuple):
+    self.pool = pool
     self.query = query
     self.output_path = output_path
 
   def __iter__(self) -> Iterator[Item]:
-    cursor = self.con.cursor()
-    pyarrow_reader = cursor.execute(self.query).fetch_record_batch(rows_per_batch=10_000)
-    for batch in pyarrow_reader:
-      for row in batch.to_pylist():
-        yield row['value']
-
-    pyarrow_reader.close()
+    with self.pool.cursor() as cursor:
+      pyarrow_reader = self.pool.execute(cursor, self.query).fetch_record_batch(
+        rows_per_batch=10_000
+      )
+      for batch in pyarrow_reader:
+        for row in batch.to_pylist():
+          yield row['value']
+
+      pyarrow_reader.close()
+
+
+@dataclass
+class DuckDBSelectRowsPlan:
+  """A `select_rows` query compiled to DuckDB, and what is needed to post-process its rows."""
+
+  query: str
+  params: list[Any]
+  total_num_rows: int
+  manifest: DatasetManifest
+  udf_columns: list[Column]
+  # Maps a final column name to the temporary column names that need to be merged.
+  columns_to_merge: dict[str, dict[str, Column]]
+  temp_column_to_offset_column: dict[str, tuple[str, Field]]
+  temp_rowid_selected: bool
+  combine_columns: bool
+  # Filters and sorts on UDF outputs. These are applied after the UDFs are computed on all rows.
+  udf_filters: list[Filter]
+  sort_sql_after_udf: list[str]
+  sort_order: SortOrder
+  offset: int
+  # The temporary columns with the sort key of every row, for keyset pagination.
+  cursor_columns: list[str]
 
 
 class DuckDBQueryParams(BaseModel):
@@ -319,7 +697,23 @@ def _consume_iterator(iterator: Iterator[Any]) -> None:
     pass
 
 
-PivotCacheKey = tuple[PathTuple, PathTuple, GroupsSortBy, SortOrder]
+def _record_signal_throughput(signal_name: str, items: Iterator[Item]) -> Iterator[Item]:
+  """Records the number of items a signal computed, and its throughput, once `items` is done."""
+  start = time.perf_counter()
+  num_items = 0
+  for item in items:
+    num_items += 1
+    yield item
+  duration = time.perf_counter() - start
+  SIGNAL_COMPUTE_SECONDS.observe(duration, signal=signal_name)
+  SIGNAL_ITEMS.inc(num_items, signal=signal_name)
+  if duration > 0:
+    SIGNAL_ITEMS_PER_SECOND.set(num_items / duration, signal=signal_name)
+
+
+PivotCacheKey = tuple[PathTuple, PathTuple, GroupsSortBy, SortOrder, bool]
+
+Tout = TypeVar('Tout')
 
 
 class DatasetDuckDB(Dataset):
@@ -340,14 +734,23 @@ class DatasetDuckDB(Dataset):
     self._signal_manifests: list[SignalManifest] = []
     self._map_manifests: list[MapManifest] = []
     self._label_schemas: dict[str, Schema] = {}
-    if env('LILAC_USE_TABLE_INDEX', default=False):
-      self.con = duckdb.connect(database=os.path.join(self.dataset_path, DUCKDB_CACHE_FILE))
-    else:
-      self.con = duckdb.connect(database=':memory:')
+    self._leaf_sketches: dict[PathTuple, LeafSketch] = {}
+    self._keyword_indices: dict[PathTuple, KeywordIndexManifest] = {}
+    # Maps a top-level column of the source or of a map to its data files.
+    self._column_data_files: dict[str, list[str]] = {}
+    self._pool = DuckDBConnectionPool(self._connect)
 
     # Maps a path and embedding to the vector index. This is lazily generated as needed.
     self._vector_indices: dict[tuple[PathKey, str], VectorDBIndex] = {}
     self.vector_store = vector_store
+    # Lock order, outermost first:
+    #   `_label_file_lock[path]` -> a pool cursor -> `_manifest_lock` -> the pool's write lock.
+    # A label file lock is only taken without a checked-out cursor, since updating the label table
+    # checks out a cursor and takes the pool's write lock under it. A cursor is checked out before
+    # `_manifest_lock`, since a checkout waits for a pending reconnect, which waits for the cursors
+    # of the threads that wait for the manifest lock. The pool's read lock is only held while a
+    # statement is bound, and nothing is acquired under it. `_vector_index_lock` is a leaf: it is
+    # taken with or without a checked-out cursor, and no cursor or pool lock is acquired under it.
     self._manifest_lock = threading.Lock()
     self._config_lock = threading.Lock()
     self._vector_index_lock = threading.Lock()
@@ -355,24 +758,94 @@ class DatasetDuckDB(Dataset):
 
     # Cache pivot results.
     self._pivot_cache: dict[PivotCacheKey, PivotResult] = {}
+    # Cache stats results, keyed by the leaf path and whether deleted rows are included.
+    self._stats_cache: dict[tuple[PathTuple, bool], StatsResult] = {}
+    # The manifest of the joint views, and the key of the files and the connection it was built
+    # for. The views are rebuilt when the key changes.
+    self._joint_table_key: Optional[tuple[int, tuple[str, ...], int]] = None
+    self._joint_table_manifest: Optional[DatasetManifest] = None
+
+    # A key that changes whenever any file in the dataset, including labels, changes.
+    self._generation = ''
+    # Cache `stats_many` results for the dataset generation. These are persisted to a sidecar file.
+    self._stats_many_cache: dict[tuple[PathTuple, bool], StatsResult] = {}
+    self._stats_many_generation: Optional[str] = None
+    self._stats_many_lock = threading.Lock()
+    # Coalesces identical concurrent `stats` and `select_groups` queries.
+    self._flights = SingleFlight[Any]()
+    # The latest modification time of the dataset files, excluding labels.
+    self._data_generation = 0
+    # The modification time of the label files when they were mirrored to DuckDB tables, and the id
+    # of the connection the tables were created on.
+    self._label_table_mtimes: dict[str, tuple[float, int]] = {}
+    # The id of the connection the views were built on.
+    self._views_connection_id: Optional[int] = None
+    # Maps the names of the tables of large rowid `in` filters to the id of the connection they
+    # were created on, in least recently used order.
+    self._rowid_tables: OrderedDict[str, int] = OrderedDict()
+    # The number of queries that use each rowid table. Tables are only dropped when unused.
+    self._rowid_table_users: Counter[str] = Counter()
+    self._rowid_tables_lock = threading.Lock()
+    # The data generation and sampling rate of the persistent row sample of approximate queries,
+    # and the id of the connection it was created on.
+    self._sample_key: Optional[tuple[int, float, int]] = None
+    self._sample_lock = threading.Lock()
+    # The selects of the label columns of the joint view, to join the labels to the row sample.
+    self._label_column_selects: list[str] = []
+    # Caches the outputs of preview signal UDFs by rowid.
+    self._udf_cache: Optional[UDFCache] = None
+    udf_cache_size = int(env('LILAC_UDF_CACHE_SIZE', DEFAULT_UDF_CACHE_SIZE))
+    if udf_cache_size > 0:
+      spill_dir = None
+      if env('LILAC_UDF_CACHE_SPILL', False):
+        # Each instance spills to its own directory, so instances never read each other's values.
+        spill_dir = os.path.join(
+          get_udf_cache_spill_dir(self.project_dir), namespace, dataset_name, uuid.uuid4().hex
+        )
+      self._udf_cache = UDFCache(udf_cache_size, spill_dir)
 
-    # Create a join table from all the parquet files.
-    self.manifest()
+    # The views over the parquet files and the project config are set up lazily by the first call
+    # to `manifest()`, so constructing a dataset is cheap.
+    self._project_config_synced = False
+    self._project_config_lock = threading.RLock()
 
-    # NOTE: This block is only for backwards compatibility.
-    # Make sure the project reflects the dataset.
-    project_config = read_project_config(self.project_dir)
-    existing_dataset_config = get_dataset_config(project_config, self.namespace, self.dataset_name)
-    if not existing_dataset_config:
-      dataset_config = config_from_dataset(self)
-      # Check if the old config file exists so we remember settings.
-      old_config_filepath = os.path.join(self.dataset_path, OLD_CONFIG_FILENAME)
-      if os.path.exists(old_config_filepath):
-        with open(old_config_filepath) as f:
-          old_config = DatasetConfig(**yaml.safe_load(f))
-        dataset_config.settings = old_config.settings
-
-      add_project_dataset_config(dataset_config, self.project_dir)
+  def _sync_project_config(self) -> None:
+    """Makes sure the project reflects the dataset."""
+    if self._project_config_synced:
+      return
+    # The lock is re-entrant since computing the dataset config calls `manifest()`.
+    with self._project_config_lock:
+      if self._project_config_synced:
+        return
+      self._project_config_synced = True
+      # NOTE: This block is only for backwards compatibility.
+      project_config = read_project_config(self.project_dir)
+      existing_dataset_config = get_dataset_config(
+        project_config, self.namespace, self.dataset_name
+      )
+      if not existing_dataset_config:
+        dataset_config = config_from_dataset(self)
+        # Check if the old config file exists so we remember settings.
+        old_config_filepath = os.path.join(self.dataset_path, OLD_CONFIG_FILENAME)
+        if os.path.exists(old_config_filepath):
+          with open(old_config_filepath) as f:
+            old_config = DatasetConfig(**yaml.safe_load(f))
+          dataset_config.settings = old_config.settings
+
+        add_project_dataset_config(dataset_config, self.project_dir)
+
+  def _connect(self) -> duckdb.DuckDBPyConnection:
+    if env('LILAC_USE_TABLE_INDEX', default=False):
+      con = duckdb.connect(database=os.path.join(self.dataset_path, DUCKDB_CACHE_FILE))
+      # The database file outlives the process, so drop the rowid tables of previous connections.
+      stale_tables = con.execute(
+        'SELECT table_name FROM duckdb_tables() WHERE starts_with(table_name, ?)',
+        [ROWID_TABLE_PREFIX],
+      ).fetchall()
+      for (table_name,) in stale_tables:
+        con.execute(f'DROP TABLE IF EXISTS {table_name}')
+      return con
+    return duckdb.connect(database=':memory:')
 
   def __getstate__(self) -> dict[str, Any]:
     """Return the state to pickle. This is necessary so we can pickle the dataset when using dask.
@@ -390,41 +863,75 @@ class DatasetDuckDB(Dataset):
     """Unpickle the dataset. We go through the constructor."""
     self.__init__(**state)  # type: ignore
 
+  @override
+  def close(self) -> None:
+    """Closes the DuckDB connection once the running queries finish, and drops the caches.
+
+    New queries wait until the connection is closed. When the calling thread runs a query itself,
+    the connection is closed when that query finishes. The dataset can still be used after it is
+    closed. The connection and the views are reopened on first use.
+    """
+    # The views, the label tables, the row sample and the rowid tables are tied to the id of the
+    # connection, so they are rebuilt on the new connection without being reset here.
+    self._pool.reconnect()
+    with self._vector_index_lock:
+      self._vector_indices.clear()
+    with self._stats_many_lock:
+      self._stats_many_cache = {}
+      self._stats_many_generation = None
+    self._stats_cache.clear()
+    self._pivot_cache.clear()
+    if self._udf_cache:
+      self._udf_cache.clear()
+
+  @override
+  def warm_up(self) -> None:
+    """Builds the views, and computes the stats and loads the vector indices of the media fields.
+
+    Only the vector indices of the preferred embedding are loaded, since search uses it by default.
+    """
+    self.manifest()
+    settings = self.settings()
+    embedding = settings.preferred_embedding
+    for media_path in settings.ui.media_paths:
+      self.stats(media_path)
+      has_vector_index = any(
+        m.vector_store
+        and m.signal.name == embedding
+        and schema_contains_path(m.data_schema, media_path)
+        for m in self._signal_manifests
+      )
+      if embedding and has_vector_index:
+        self._get_vector_db_index(embedding, media_path)
+
   @override
   def delete(self) -> None:
     """Deletes the dataset."""
-    self.con.close()
+    self._pool.close()
     shutil.rmtree(self.dataset_path, ignore_errors=True)
     delete_project_dataset_config(self.namespace, self.dataset_name, self.project_dir)
     remove_dataset_from_cache(self.namespace, self.dataset_name)
 
   def _create_view(
-    self, view_name: str, files: list[str], type: Literal['parquet', 'sqlite']
+    self,
+    con: duckdb.DuckDBPyConnection,
+    view_name: str,
+    files: list[str],
+    type: Literal['parquet'],
   ) -> None:
     inner_select: str
     if type == 'parquet':
       inner_select = f'SELECT * FROM read_parquet({files})'
-    elif type == 'sqlite':
-      if len(files) > 1:
-        raise ValueError('Only one sqlite file is supported.')
-      inner_select = f"""
-        SELECT * FROM sqlite_scan('{files[0]}', '{view_name}')
-      """
     else:
       raise ValueError(f'Unknown type: {type}')
 
-    self.con.execute(
+    con.execute(
       f"""
       CREATE OR REPLACE VIEW {escape_col_name(view_name)} AS ({inner_select});
     """
     )
 
-  # NOTE: This is cached, but when the latest mtime of any file in the dataset directory changes
-  # the results are invalidated.
-  @functools.lru_cache(maxsize=1)
-  def _recompute_joint_table(
-    self, latest_mtime_micro_sec: int, sqlite_files: tuple[str]
-  ) -> DatasetManifest:
+  def _recompute_joint_table(self, latest_mtime_micro_sec: int) -> DatasetManifest:
     """Recomputes tables and/or views providing a unified view over the dataset.
 
     High level strategy: create views for each major class of data, then merge all the views.
@@ -448,10 +955,10 @@ class DatasetDuckDB(Dataset):
     table as a cache and index over Sources, Signals, and Maps (excluding labels). We invalidate
     this cache if the underlying data is updated. Labels are excluded from the cache because users
     expect labeling to be a milliseconds-long operations, but recomputing the entire DuckDB table
-    can take a second for a 100k row table. Luckily, labels are stored as a indexed sqlite table, so
-    we can join them in at query time. The only time this logic is invalid is if an entire label
-    type is deleted or created. Therefore the sqlite files are added to the function signature for
-    cache busting reasons.
+    can take a second for a 100k row table. Luckily, labels are mirrored in small native DuckDB
+    tables that are updated in place, so we can join them in at query time. The only time this
+    logic is invalid is if an entire label type is deleted or created. Therefore the label files
+    are part of the key that the result is cached with, see `_sync_views`.
 
     CREATE TABLE cached_t AS (
       SELECT sources.*, signals.*, maps.*
@@ -470,22 +977,65 @@ class DatasetDuckDB(Dataset):
     for a variety of reasons (bugs, lilac version migrations, DuckDB version bumps.)
     The solution is to nuke and recompute the entire cache if anything fails.
     """
-    del sqlite_files  # Unused.
-
     self._pivot_cache.clear()
-    self.stats.cache_clear()
+    self._stats_cache.clear()
 
-    merged_schema = self._source_manifest.data_schema.model_copy(deep=True)
     self._signal_manifests = []
     self._label_schemas = {}
     self._map_manifests = []
-    # Make a joined view of all the column groups.
-    self._create_view(
-      SOURCE_VIEW_NAME,
-      [os.path.join(self.dataset_path, f) for f in self._source_manifest.files],
-      type='parquet',
+    self._leaf_sketches = {}
+    self._keyword_indices = {}
+    self._column_data_files = {}
+    # Rebuild the views exclusively, so no query is bound against a half-rebuilt set of views.
+    with self._pool.write() as con:
+      merged_schema = self._create_joint_views(con, latest_mtime_micro_sec)
+      self._views_connection_id = self._pool.connection_id
+
+    # Get the total size of the table. Every row of the joint view is a row of the source, so this
+    # is read from the parquet metadata.
+    size_query = f'SELECT COUNT() as count FROM {SOURCE_VIEW_NAME}'
+    size_query_result = cast(Any, self._query(size_query)[0])
+    num_items = cast(int, size_query_result[0])
+
+    map_keys_cache = self._read_map_keys_cache_file()
+    updated_map_keys_cache: dict[str, MapKeysCacheEntry] = {}
+    for path, field in merged_schema.leafs.items():
+      if field.dtype and field.dtype.type == 'map':
+        map_dtype = cast(MapType, field.dtype)
+        if map_dtype.key_type == STRING:
+          # Find all the keys for this map and add them to the schema.
+          self._add_map_keys_to_schema(
+            path, field, merged_schema, map_keys_cache, updated_map_keys_cache
+          )
+    if updated_map_keys_cache != map_keys_cache:
+      self._write_map_keys_cache_file(updated_map_keys_cache)
+
+    dataset_formats = infer_formats(merged_schema)
+    # Choose the first dataset format as the format.
+    dataset_format_cls = dataset_formats[0] if dataset_formats else None
+    dataset_format = dataset_format_cls() if dataset_format_cls else None
+
+    return DatasetManifest(
+      namespace=self.namespace,
+      dataset_name=self.dataset_name,
+      data_schema=merged_schema,
+      num_items=num_items,
+      source=self._source_manifest.source,
+      dataset_format=dataset_format,
     )
 
+  def _create_joint_views(
+    self, con: duckdb.DuckDBPyConnection, latest_mtime_micro_sec: int
+  ) -> Schema:
+    """Creates the views over all the files of the dataset, and returns the merged schema."""
+    # Make a joined view of all the column groups.
+    source_files = [os.path.join(self.dataset_path, f) for f in self._source_manifest.files]
+    self._create_view(con, SOURCE_VIEW_NAME, source_files, type='parquet')
+    for column in self._source_manifest.data_schema.fields.keys():
+      self._column_data_files[column] = source_files
+
+    keyword_index_dirs: list[str] = []
+
     # Walk dataset directory and create views for each data type
     for root, _, files in os.walk(self.dataset_path):
       for file in files:
@@ -495,10 +1045,10 @@ class DatasetDuckDB(Dataset):
           self._signal_manifests.append(signal_manifest)
           signal_files = [os.path.join(root, f) for f in signal_manifest.files]
           if signal_files:
-            self._create_view(signal_manifest.parquet_id, signal_files, type='parquet')
-        elif file.endswith(LABELS_SQLITE_SUFFIX):
-          label_name = file[0 : -len(LABELS_SQLITE_SUFFIX)]
-          self._create_view(label_name, [os.path.join(root, file)], type='sqlite')
+            self._create_view(con, signal_manifest.parquet_id, signal_files, type='parquet')
+        elif file.endswith((LABELS_SQLITE_SUFFIX, LABELS_PARQUET_SUFFIX)):
+          label_name = _label_name(file)
+          self._create_label_table(con, label_name, os.path.join(root, file))
           # This mirrors the structure in DuckDBDatasetLabel.
           self._label_schemas[label_name] = Schema(
             fields={
@@ -515,9 +1065,17 @@ class DatasetDuckDB(Dataset):
           with open_file(os.path.join(root, file)) as f:
             map_manifest = MapManifest.model_validate_json(f.read())
           map_files = [os.path.join(root, f) for f in map_manifest.files]
-          self._create_view(map_manifest.parquet_id, map_files, type='parquet')
+          self._create_view(con, map_manifest.parquet_id, map_files, type='parquet')
           if map_files:
             self._map_manifests.append(map_manifest)
+            self._column_data_files[_root_column(map_manifest)] = map_files
+        elif file.endswith(SKETCHES_SUFFIX):
+          self._leaf_sketches.update(_read_sketches_file(os.path.join(root, file)))
+        elif file == KEYWORD_INDEX_MANIFEST_FILENAME:
+          keyword_index_dirs.append(root)
+
+    for index_dir in keyword_index_dirs:
+      self._create_keyword_index_views(con, index_dir)
 
     merged_schema = merge_schemas(
       [self._source_manifest.data_schema]
@@ -563,14 +1121,15 @@ class DatasetDuckDB(Dataset):
         }} END) as {col_name}
       """
       )
+    self._label_column_selects = label_column_selects
 
     if env('LILAC_USE_TABLE_INDEX', default=False):
-      self.con.execute(
+      con.execute(
         """CREATE TABLE IF NOT EXISTS mtime_cache AS
          (SELECT CAST(0 AS bigint) AS mtime);"""
       )
-      db_mtime = self.con.execute('SELECT mtime FROM mtime_cache').fetchone()[0]  # type: ignore
-      table_exists = self.con.execute(
+      db_mtime = con.execute('SELECT mtime FROM mtime_cache').fetchone()[0]  # type: ignore
+      table_exists = con.execute(
         "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 't'"
       ).fetchone()[0]  # type: ignore
       if db_mtime != latest_mtime_micro_sec or not table_exists:
@@ -591,126 +1150,392 @@ class DatasetDuckDB(Dataset):
           ]
         )
         with DebugTimer(f'Recomputing table+index for {self.dataset_name}...'):
-          self.con.execute('UPDATE mtime_cache SET mtime = ?', (latest_mtime_micro_sec,))
-          self.con.execute(
+          con.execute('UPDATE mtime_cache SET mtime = ?', (latest_mtime_micro_sec,))
+          con.execute(
             f'CREATE OR REPLACE TABLE cache_t AS (SELECT {table_select_sql} FROM {table_join_sql})'
           )
-          self.con.execute(f'CREATE INDEX row_idx ON cache_t ({ROWID})')
+          con.execute(f'CREATE INDEX row_idx ON cache_t ({ROWID})')
           # If not checkpointed, the index will sometimes not be flushed to disk and be recomputed.
-          self.con.execute('CHECKPOINT')
-      view_select_sql = ', '.join(['cache_t.*'] + label_column_selects)
-      view_join_sql = ' '.join(
-        ['cache_t']
-        + [
-          f'LEFT JOIN {escape_col_name(label_name)} USING ({ROWID})'
-          for label_name in self._label_schemas.keys()
-        ]
-      )
-      self.con.execute(
-        f'CREATE OR REPLACE VIEW t AS (SELECT {view_select_sql} FROM {view_join_sql})'
-      )
+          # Readers can still be fetching results on other cursors, which blocks the checkpoint.
+          # Then the index is flushed at a later checkpoint, or recomputed on the next connect.
+          try:
+            con.execute('CHECKPOINT')
+          except duckdb.TransactionException:
+            log(f'Skipped checkpointing the table+index of {self.dataset_name}: queries in flight.')
+      con.execute(f'CREATE OR REPLACE VIEW {DATA_VIEW_NAME} AS (SELECT * FROM cache_t)')
 
     else:
-      select_sql = ', '.join(
-        [f'{SOURCE_VIEW_NAME}.*']
-        + signal_column_selects
-        + map_column_selects
-        + label_column_selects
-      )
+      select_sql = ', '.join([f'{SOURCE_VIEW_NAME}.*'] + signal_column_selects + map_column_selects)
 
-      # Get parquet ids for signals, maps, and labels.
+      # Get parquet ids for signals and maps.
       parquet_ids = [
         manifest.parquet_id
         for manifest in self._signal_manifests + self._map_manifests
         if manifest.files
-      ] + list(self._label_schemas.keys())
+      ]
       join_sql = ' '.join(
         [SOURCE_VIEW_NAME]
         + [f'LEFT JOIN {escape_col_name(parquet_id)} USING ({ROWID})' for parquet_id in parquet_ids]
       )
       sql_cmd = f"""
-        CREATE OR REPLACE VIEW t AS (SELECT {select_sql} FROM {join_sql})
+        CREATE OR REPLACE VIEW {DATA_VIEW_NAME} AS (SELECT {select_sql} FROM {join_sql})
       """
-      self.con.execute(sql_cmd)
-    # Get the total size of the table.
-    size_query = 'SELECT COUNT() as count FROM t'
-    size_query_result = cast(Any, self._query(size_query)[0])
-    num_items = cast(int, size_query_result[0])
+      con.execute(sql_cmd)
+
+    view_select_sql = ', '.join([f'{DATA_VIEW_NAME}.*'] + label_column_selects)
+    view_join_sql = ' '.join(
+      [DATA_VIEW_NAME]
+      + [
+        f'LEFT JOIN {escape_col_name(label_name)} USING ({ROWID})'
+        for label_name in self._label_schemas.keys()
+      ]
+    )
+    con.execute(f'CREATE OR REPLACE VIEW t AS (SELECT {view_select_sql} FROM {view_join_sql})')
+
+    if (
+      self._sample_key
+      and self._sample_key[0] == latest_mtime_micro_sec
+      and self._sample_key[2] == self._pool.connection_id
+    ):
+      # The row sample is still valid, but the labels may have changed.
+      self._create_sample_view(con)
+    else:
+      self._sample_key = None
+    return merged_schema
 
-    for path, field in merged_schema.leafs.items():
-      if field.dtype and field.dtype.type == 'map':
-        map_dtype = cast(MapType, field.dtype)
-        if map_dtype.key_type == STRING:
-          # Find all the keys for this map and add them to the schema.
-          self._add_map_keys_to_schema(path, field, merged_schema)
+  def _sample_rate(self, manifest: DatasetManifest) -> Optional[float]:
+    """Returns the sampling rate of the persistent row sample, and creates the sample if needed.
 
-    dataset_formats = infer_formats(merged_schema)
-    # Choose the first dataset format as the format.
-    dataset_format_cls = dataset_formats[0] if dataset_formats else None
-    dataset_format = dataset_format_cls() if dataset_format_cls else None
+    Returns None when the dataset is small enough to be scanned in full.
+    """
+    sample_size = int(env('LILAC_APPROXIMATE_SAMPLE_SIZE', DEFAULT_APPROXIMATE_SAMPLE_SIZE))
+    if manifest.num_items <= sample_size:
+      return None
+    rate = sample_size / manifest.num_items
+    with self._sample_lock:
+      sample_key = (self._data_generation, rate)
+      if self._sample_key != (*sample_key, self._pool.connection_id):
+        with self._pool.write() as con:
+          self._create_sample(con, sample_key)
+    return rate
+
+  def _filters_fixed_rowids(
+    self, filters: Optional[Sequence[FilterLike]], manifest: DatasetManifest
+  ) -> bool:
+    """Returns whether the filters select a fixed set of rowids, like the top-k results."""
+    rowid_filters, _ = self._normalize_filters(
+      filters, col_aliases={}, udf_aliases={}, manifest=manifest
+    )
+    return any(f.path == (ROWID,) and f.op in ('equals', 'in') for f in rowid_filters)
 
-    return DatasetManifest(
-      namespace=self.namespace,
-      dataset_name=self.dataset_name,
-      data_schema=merged_schema,
-      num_items=num_items,
-      source=self._source_manifest.source,
-      dataset_format=dataset_format,
+  def _create_sample(self, con: duckdb.DuckDBPyConnection, sample_key: tuple[int, float]) -> None:
+    """Creates the row sample of the data, unless the sample in the database is still valid.
+
+    The sample excludes the labels, which are joined in by the sample view so label edits are
+    reflected without sampling again.
+    """
+    data_generation, rate = sample_key
+    con.execute(
+      """CREATE TABLE IF NOT EXISTS sample_cache AS
+         (SELECT CAST(0 AS bigint) AS mtime, CAST(0 AS double) AS rate);"""
+    )
+    db_key = con.execute('SELECT mtime, rate FROM sample_cache').fetchone()
+    table_exists = con.execute(
+      'SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?', [SAMPLE_TABLE_NAME]
+    ).fetchone()[0]  # type: ignore
+    if db_key != sample_key or not table_exists:
+      with DebugTimer(f'Sampling {rate:.2%} of the rows of {self.dataset_name}...'):
+        con.execute(
+          f"""CREATE OR REPLACE TABLE {SAMPLE_TABLE_NAME} AS (
+            SELECT * FROM {DATA_VIEW_NAME}
+            USING SAMPLE {rate * 100:.10f} PERCENT (bernoulli, {SAMPLE_SEED})
+          )"""
+        )
+        con.execute('UPDATE sample_cache SET mtime = ?, rate = ?', sample_key)
+    self._create_sample_view(con)
+    self._sample_key = (*sample_key, self._pool.connection_id)
+
+  def _create_sample_view(self, con: duckdb.DuckDBPyConnection) -> None:
+    """Creates the view that joins the labels to the row sample, like the joint view `t`."""
+    select_sql = ', '.join([f'{SAMPLE_TABLE_NAME}.*'] + self._label_column_selects)
+    join_sql = ' '.join(
+      [SAMPLE_TABLE_NAME]
+      + [
+        f'LEFT JOIN {escape_col_name(label_name)} USING ({ROWID})'
+        for label_name in self._label_schemas.keys()
+      ]
+    )
+    con.execute(
+      f'CREATE OR REPLACE VIEW {SAMPLE_VIEW_NAME} AS (SELECT {select_sql} FROM {join_sql})'
     )
 
+  def _create_label_table(
+    self, con: duckdb.DuckDBPyConnection, label_name: str, labels_filepath: str
+  ) -> None:
+    """Mirrors a label file to a DuckDB table, and creates the label view over the table."""
+    # Read the modification time first, so a concurrent write is picked up by the next sync.
+    mtime = os.path.getmtime(labels_filepath)
+    if labels_filepath.endswith(LABELS_PARQUET_SUFFIX):
+      labels = _read_parquet_labels(labels_filepath)
+    else:
+      labels = _read_sqlite_labels(labels_filepath, label_name)
+    label_table = escape_col_name(f'{LABEL_TABLE_PREFIX}{label_name}')
+    con.register('labels_arrow', labels)
+    con.execute(f'CREATE OR REPLACE TABLE {label_table} AS SELECT * FROM labels_arrow')
+    con.unregister('labels_arrow')
+    con.execute(
+      f'CREATE OR REPLACE VIEW {escape_col_name(label_name)} AS (SELECT * FROM {label_table})'
+    )
+    self._label_table_mtimes[label_name] = (mtime, self._pool.connection_id)
+
+  def _sync_label_tables(self, label_files: Iterable[str]) -> None:
+    """Reloads the label tables whose files were changed outside of this dataset instance."""
+    for labels_filepath in label_files:
+      label_name = _label_name(os.path.basename(labels_filepath))
+      if label_name not in self._label_schemas:
+        continue
+      try:
+        mtime = os.path.getmtime(labels_filepath)
+      except OSError:
+        continue
+      if self._label_table_mtimes.get(label_name) != (mtime, self._pool.connection_id):
+        with self._pool.write() as con:
+          self._create_label_table(con, label_name, labels_filepath)
+
+  def _update_label_table(
+    self,
+    label_name: str,
+    labels_filepath: str,
+    upsert: Optional[pa.Table] = None,
+    remove: Optional[list[str]] = None,
+  ) -> None:
+    """Applies a label write to the mirrored label table, instead of reloading the label file.
+
+    Labels that are not mirrored yet are loaded when the manifest is next computed.
+    """
+    label_table = escape_col_name(f'{LABEL_TABLE_PREFIX}{label_name}')
+    with self._pool.write() as con:
+      mirrored = self._label_table_mtimes.get(label_name)
+      if not mirrored or mirrored[1] != self._pool.connection_id:
+        return
+      if upsert is not None:
+        con.register('labels_arrow', upsert)
+        # Rows that are labeled again keep their created time, like the label files.
+        con.execute(
+          f"""
+          UPDATE {label_table} SET {SQLITE_LABEL_COLNAME} = labels_arrow.{SQLITE_LABEL_COLNAME}
+          FROM labels_arrow WHERE {label_table}.{ROWID} = labels_arrow.{ROWID}
+        """
+        )
+        con.execute(
+          f"""
+          INSERT INTO {label_table} SELECT * FROM labels_arrow
+          WHERE {ROWID} NOT IN (SELECT {ROWID} FROM {label_table})
+        """
+        )
+        con.unregister('labels_arrow')
+      if remove:
+        con.register('rowids_arrow', pa.table({ROWID: pa.array(remove, type=pa.string())}))
+        con.execute(
+          f'DELETE FROM {label_table} WHERE {ROWID} IN (SELECT {ROWID} FROM rowids_arrow)'
+        )
+        con.unregister('rowids_arrow')
+      self._label_table_mtimes[label_name] = (
+        os.path.getmtime(labels_filepath),
+        self._pool.connection_id,
+      )
+
+  def _create_keyword_index_views(self, con: duckdb.DuckDBPyConnection, index_dir: str) -> None:
+    """Creates the views of a keyword index, unless the data of its field changed since."""
+    with open_file(os.path.join(index_dir, KEYWORD_INDEX_MANIFEST_FILENAME)) as f:
+      index_manifest = KeywordIndexManifest.model_validate_json(f.read())
+    try:
+      fingerprint = _files_fingerprint(
+        os.path.join(self.dataset_path, f) for f in index_manifest.data_files
+      )
+    except OSError:
+      fingerprint = {}
+    if fingerprint != index_manifest.data_fingerprint:
+      log(
+        f'Ignoring the stale keyword index of "{index_manifest.path}". '
+        'Recompute it with `dataset.compute_keyword_index()`.'
+      )
+      return
+    for kind, filename in [
+      ('postings', KEYWORD_INDEX_POSTINGS_FILENAME),
+      ('docs', KEYWORD_INDEX_DOCS_FILENAME),
+    ]:
+      view_name = _keyword_index_view(index_manifest.path, kind)
+      self._create_view(con, view_name, [os.path.join(index_dir, filename)], type='parquet')
+    self._keyword_indices[index_manifest.path] = index_manifest
+
   def _clear_joint_table_cache(self) -> None:
     """Clears the cache for the joint table."""
-    self._recompute_joint_table.cache_clear()
+    self._joint_table_key = None
+    self._joint_table_manifest = None
     self._pivot_cache.clear()
-    self.stats.cache_clear()
+    self._stats_cache.clear()
     if env('LILAC_USE_TABLE_INDEX', default=False):
-      self.con.close()
-      pathlib.Path(os.path.join(self.dataset_path, DUCKDB_CACHE_FILE)).unlink(missing_ok=True)
-      pathlib.Path(os.path.join(self.dataset_path, DUCKDB_CACHE_FILE + '.wal')).unlink(
-        missing_ok=True
-      )
-      self.con = duckdb.connect(database=os.path.join(self.dataset_path, DUCKDB_CACHE_FILE))
+      # The rowid tables and the row sample in the deleted database are recreated, since they are
+      # tied to the id of the closed connection.
+      self._pool.reconnect(before_connect=self._delete_table_index_files)
+
+  def _delete_table_index_files(self) -> None:
+    pathlib.Path(os.path.join(self.dataset_path, DUCKDB_CACHE_FILE)).unlink(missing_ok=True)
+    pathlib.Path(os.path.join(self.dataset_path, DUCKDB_CACHE_FILE + '.wal')).unlink(
+      missing_ok=True
+    )
 
-  def _add_map_keys_to_schema(self, path: PathTuple, field: Field, merged_schema: Schema) -> None:
-    """Adds the keys of a map to the schema."""
+  def _add_map_keys_to_schema(
+    self,
+    path: PathTuple,
+    field: Field,
+    merged_schema: Schema,
+    map_keys_cache: dict[str, MapKeysCacheEntry],
+    updated_map_keys_cache: dict[str, MapKeysCacheEntry],
+  ) -> None:
+    """Adds the keys of a map to the schema.
+
+    The keys are read from the cache of each parquet file, and only the files that changed since
+    their keys were cached are scanned. The entries of the files are added to
+    `updated_map_keys_cache`, so the entries of deleted files are dropped from the cache.
+    """
     value_column = 'key'
     duckdb_path = self._leaf_path_to_duckdb_path(path, merged_schema)
     inner_select = self._select_sql(
       duckdb_path, flatten=False, unnest=True, path=path, schema=merged_schema
     )
-    query = f"""
-      SELECT DISTINCT unnest(map_keys({inner_select})) AS {value_column} FROM t
-    """
-    df = self._query_df(query)
-    keys: list[str] = sorted(df[value_column])
+    files, column_select = self._column_files(duckdb_path[0])
+    keys: set[str] = set()
+    for filepath in files:
+      cache_key = os.path.relpath(filepath, self.dataset_path)
+      file_stat = os.stat(filepath)
+      fingerprint = (file_stat.st_size, file_stat.st_mtime_ns)
+      entry = updated_map_keys_cache.get(cache_key) or map_keys_cache.get(cache_key)
+      if not entry or entry.fingerprint != fingerprint:
+        entry = MapKeysCacheEntry(fingerprint=fingerprint, keys={})
+      if inner_select not in entry.keys:
+        query = f"""
+          SELECT DISTINCT unnest(map_keys({inner_select})) AS {value_column}
+          FROM ({column_select} FROM read_parquet({[filepath]}))
+        """
+        df = self._query_df(query)
+        entry = MapKeysCacheEntry(
+          fingerprint=fingerprint, keys={**entry.keys, inner_select: list(df[value_column])}
+        )
+      updated_map_keys_cache[cache_key] = entry
+      keys.update(entry.keys[inner_select])
 
     map_dtype = cast(MapType, field.dtype)
     field.fields = field.fields or {}
-    for key in keys:
+    for key in sorted(keys):
       field.fields[key] = map_dtype.value_field
 
+  def _column_files(self, column: str) -> tuple[list[str], str]:
+    """Returns the data files of a column of the joint view, and the select of the column.
+
+    The select renames the root column of a signal or a map to the column of the joint view.
+    """
+    for manifest in self._signal_manifests + self._map_manifests:
+      if manifest.parquet_id == column and manifest.files:
+        files = [os.path.join(self.dataset_path, f) for f in manifest.files]
+        return (
+          files,
+          f'SELECT {escape_col_name(_root_column(manifest))} AS {escape_col_name(column)}',
+        )
+    files = [os.path.join(self.dataset_path, f) for f in self._source_manifest.files]
+    return files, f'SELECT {escape_col_name(column)}'
+
+  def _map_keys_cache_filepath(self) -> str:
+    return os.path.join(
+      get_lilac_cache_dir(self.project_dir),
+      self.namespace,
+      self.dataset_name,
+      MAP_KEYS_CACHE_FILENAME,
+    )
+
+  def _read_map_keys_cache_file(self) -> dict[str, MapKeysCacheEntry]:
+    """Reads the map keys sidecar file. Returns an empty cache when it is unreadable."""
+    map_keys_cache_filepath = self._map_keys_cache_filepath()
+    if not os.path.exists(map_keys_cache_filepath):
+      return {}
+    with open_file(map_keys_cache_filepath, 'rb') as f:
+      try:
+        return pickle.load(f)
+      except BaseException:
+        # Pickle serialization failed. We fallback to re-computing the keys.
+        return {}
+
+  def _write_map_keys_cache_file(self, map_keys_cache: dict[str, MapKeysCacheEntry]) -> None:
+    map_keys_cache_filepath = self._map_keys_cache_filepath()
+    tmp_filepath = f'{map_keys_cache_filepath}.tmp'
+    with open_file(tmp_filepath, 'wb') as f:
+      pickle.dump(map_keys_cache, f)
+    os.replace(tmp_filepath, map_keys_cache_filepath)
+
   @override
+  @profile_phase('manifest')
   def manifest(self) -> DatasetManifest:
     # Use the latest modification time of all files under the dataset path as the cache key for
     # re-computing the manifest and the joined view.
-    with self._manifest_lock:
-      all_dataset_files = glob.iglob(os.path.join(self.dataset_path, '**'), recursive=True)
-      all_dataset_files = (f for f in all_dataset_files if DUCKDB_CACHE_FILE not in f)
-      all_dataset_files = (f for f in all_dataset_files if os.path.isfile(f))
-      rapid_change, slow_change = itertools.tee(all_dataset_files)
-      rapid_change = (f for f in rapid_change if f.endswith(LABELS_SQLITE_SUFFIX))
-      slow_change = (f for f in slow_change if not f.endswith(LABELS_SQLITE_SUFFIX))
-      latest_mtime = max(map(os.path.getmtime, slow_change))
-      latest_mtime_micro_sec = int(latest_mtime * 1e6)
-      try:
-        return self._recompute_joint_table(latest_mtime_micro_sec, tuple(sorted(rapid_change)))
-      except Exception as e:
-        log(e)
-        log('Exception encountered while updating joint table cache; recomputing from scratch.')
-        self._clear_joint_table_cache()
-        return self._recompute_joint_table(latest_mtime_micro_sec, tuple(sorted(rapid_change)))
+    # The files are scanned outside of the lock so concurrent manifest checks run in parallel. Only
+    # recomputing the joint table is serialized.
+    all_dataset_files = glob.iglob(os.path.join(self.dataset_path, '**'), recursive=True)
+    all_dataset_files = (f for f in all_dataset_files if DUCKDB_CACHE_FILE not in f)
+    all_dataset_files = (f for f in all_dataset_files if os.path.isfile(f))
+    rapid_change, slow_change = itertools.tee(all_dataset_files)
+    label_suffixes = (LABELS_SQLITE_SUFFIX, LABELS_PARQUET_SUFFIX)
+    label_files = tuple(sorted(f for f in rapid_change if f.endswith(label_suffixes)))
+    slow_change = (f for f in slow_change if not f.endswith(label_suffixes))
+    latest_mtime = max(map(os.path.getmtime, slow_change))
+    latest_mtime_micro_sec = int(latest_mtime * 1e6)
+    latest_label_mtime = max(map(os.path.getmtime, label_files), default=0)
+    generation = f'{latest_mtime_micro_sec}-{int(latest_label_mtime * 1e6)}-{len(label_files)}'
+    try:
+      manifest = self._sync_views(latest_mtime_micro_sec, generation, label_files)
+    except Exception as e:
+      log(e)
+      log('Exception encountered while updating joint table cache; recomputing from scratch.')
+      # Cleared without a checked-out cursor, so the database of the table index is replaced
+      # before the views are built again.
+      self._clear_joint_table_cache()
+      manifest = self._sync_views(latest_mtime_micro_sec, generation, label_files)
+    self._sync_project_config()
+    return manifest
+
+  def _sync_views(
+    self, latest_mtime_micro_sec: int, generation: str, label_files: tuple[str, ...]
+  ) -> DatasetManifest:
+    """Rebuilds the views and the label tables when the files or the connection changed."""
+    # The cursor is checked out before the manifest lock is taken, since a checkout can wait for a
+    # reconnect, which waits for the threads that wait for the manifest lock. The cursor also keeps
+    # the connection open until the views are built.
+    with self._pool.cursor(), self._manifest_lock:
+      self._data_generation = latest_mtime_micro_sec
+      self._generation = generation
+      # The views are cached until a file in the dataset directory or the connection changes.
+      key = (latest_mtime_micro_sec, label_files, self._pool.connection_id)
+      if self._joint_table_manifest is None or self._joint_table_key != key:
+        self._joint_table_manifest = self._recompute_joint_table(latest_mtime_micro_sec)
+        self._joint_table_key = key
+      manifest = self._joint_table_manifest
+      self._sync_label_tables(label_files)
+    return manifest
+
+  @contextlib.contextmanager
+  def _cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+    """Checks out a cursor, rebuilding the views when the connection was replaced.
+
+    Queries usually call `manifest()` before they check out a cursor, so the connection can be
+    closed in between, and the new connection does not have the views yet.
+    """
+    with self._pool.cursor() as con:
+      if self._views_connection_id != self._pool.connection_id:
+        self.manifest()
+      yield con
 
   @override
+  @DATASET_QUERY_SECONDS.time(operation='count')
   def count(
     self,
     filters: Optional[Sequence[FilterLike]] = None,
@@ -720,11 +1545,11 @@ class DatasetDuckDB(Dataset):
     manifest = self.manifest()
     filters, _ = self._normalize_filters(filters, col_aliases={}, udf_aliases={}, manifest=manifest)
     query_options = DuckDBQueryParams(filters=filters, limit=limit, include_deleted=include_deleted)
-    option_sql = self._compile_select_options(query_options)
-    return cast(
-      tuple,
-      self.con.execute(f'SELECT COUNT(*) FROM (SELECT {ROWID} from t {option_sql})').fetchone(),
-    )[0]
+    with self._pin_rowid_tables(), self._cursor() as con:
+      option_sql = self._compile_select_options(query_options)
+      from_table = self._joint_view(filters=filters)
+      query = f'SELECT COUNT(*) FROM (SELECT {ROWID} from {from_table} {option_sql})'
+      return cast(tuple, self._pool.execute(con, query).fetchone())[0]
 
   def _get_vector_db_index(self, embedding: str, path: PathTuple) -> VectorDBIndex:
     # Refresh the manifest to make sure we have the latest signal manifests.
@@ -838,73 +1663,71 @@ class DatasetDuckDB(Dataset):
       if select_sqls:
         select_queries.append(', '.join(select_sqls))
 
-    options_clause = self._compile_select_options(query_options)
-
     # Fetch the data from DuckDB.
-    con = self.con.cursor()
-
-    select_sql = ', '.join(select_queries)
-
-    # Anti-join removes input rows that are already in the cache so they do not get passed to the
-    # map function.
-    anti_join = ''
-    cache_view = 't_cache_view'
-
-    if os.path.exists(jsonl_cache_filepath):
-      with open_file(jsonl_cache_filepath, 'r') as f:
-        # Read the first line of the file
-        first_line = f.readline()
-      if first_line.strip():
-        con.execute(
-          f"""
-          CREATE OR REPLACE VIEW {cache_view} as (
-            SELECT {ROWID} FROM read_json_auto(
-              '{jsonl_cache_filepath}',
-              IGNORE_ERRORS=true,
-              hive_partitioning=false,
-              format='newline_delimited')
-          );
-        """
-        )
-        anti_join = f'ANTI JOIN {cache_view} USING({ROWID})'
-
-    result = con.execute(
-      f"""
-      SELECT {ROWID}, {select_sql} FROM t
-      {anti_join}
-      {options_clause}
-    """
-    )
-
-    while True:
-      df_chunk = result.fetch_df_chunk()
-      if df_chunk.empty:
-        break
+    with self._pin_rowid_tables(), self._cursor() as con:
+      options_clause = self._compile_select_options(query_options)
+      select_sql = ', '.join(select_queries)
+
+      # Anti-join removes input rows that are already in the cache so they do not get passed to the
+      # map function.
+      anti_join = ''
+      cache_view = 't_cache_view'
+
+      if os.path.exists(jsonl_cache_filepath):
+        with open_file(jsonl_cache_filepath, 'r') as f:
+          # Read the first line of the file
+          first_line = f.readline()
+        if first_line.strip():
+          self._pool.execute(
+            con,
+            f"""
+            CREATE OR REPLACE VIEW {cache_view} as (
+              SELECT {ROWID} FROM read_json_auto(
+                '{jsonl_cache_filepath}',
+                IGNORE_ERRORS=true,
+                hive_partitioning=false,
+                format='newline_delimited')
+            );
+          """,
+          )
+          anti_join = f'ANTI JOIN {cache_view} USING({ROWID})'
 
-      for final_col_name, temp_columns in columns_to_merge.items():
-        for temp_col_name, column in temp_columns.items():
-          # If the temp col name is the same as the final name, we can skip merging. This happens
-          # when we select a source leaf column.
-          if temp_col_name == final_col_name:
-            continue
+      result = self._pool.execute(
+        con,
+        f"""
+        SELECT {ROWID}, {select_sql} FROM t
+        {anti_join}
+        {options_clause}
+      """,
+      )
 
-          if final_col_name not in df_chunk:
-            df_chunk[final_col_name] = df_chunk[temp_col_name]
-          else:
-            df_chunk[final_col_name] = merge_series(
-              df_chunk[final_col_name], df_chunk[temp_col_name]
-            )
-          del df_chunk[temp_col_name]
+      while True:
+        df_chunk = result.fetch_df_chunk()
+        if df_chunk.empty:
+          break
 
-      row_ids = df_chunk[ROWID].tolist()
-      if select_path and final_col_name:
-        values = df_chunk[final_col_name].tolist()
-      else:
-        values = df_chunk.to_dict('records')
+        for final_col_name, temp_columns in columns_to_merge.items():
+          for temp_col_name, column in temp_columns.items():
+            # If the temp col name is the same as the final name, we can skip merging. This happens
+            # when we select a source leaf column.
+            if temp_col_name == final_col_name:
+              continue
+
+            if final_col_name not in df_chunk:
+              df_chunk[final_col_name] = df_chunk[temp_col_name]
+            else:
+              df_chunk[final_col_name] = merge_series(
+                df_chunk[final_col_name], df_chunk[temp_col_name]
+              )
+            del df_chunk[temp_col_name]
 
-      yield from zip(row_ids, values)
+        row_ids = df_chunk[ROWID].tolist()
+        if select_path and final_col_name:
+          values = df_chunk[final_col_name].tolist()
+        else:
+          values = df_chunk.to_dict('records')
 
-    con.close()
+        yield from zip(row_ids, values)
 
   def _dispatch_workers(
     self,
@@ -1045,8 +1868,6 @@ class DatasetDuckDB(Dataset):
     """
     # Merge all the shard outputs.
     jsonl_view_name = 'tmp_output'
-    con = self.con.cursor()
-
     if schema:
       schema = schema.model_copy(deep=True)
       if ROWID not in schema.fields:
@@ -1065,34 +1886,40 @@ class DatasetDuckDB(Dataset):
         )
       """
 
-    con.execute(f'CREATE OR REPLACE VIEW "{jsonl_view_name}" as ({get_json_query("*")});')
-
-    if not schema:
-      reader = con.execute(f'SELECT * from {jsonl_view_name}').fetch_record_batch(
-        rows_per_batch=10_000
-      )
-      schema = arrow_schema_to_schema(reader.schema)
-      reader.close()
-
-    parquet_filepath: Optional[str] = None
-    if not is_tmp_output:
-      parquet_filepath = _get_parquet_filepath(
-        dataset_path=self.dataset_path,
-        output_path=output_path,
-        parquet_filename_prefix=parquet_filename_prefix,
-      )
-      if overwrite and os.path.exists(parquet_filepath):
-        # Delete the parquet file if it exists.
-        delete_file(parquet_filepath)
-
-      os.makedirs(os.path.dirname(parquet_filepath), exist_ok=True)
-
-      con.execute(
-        f"""COPY (SELECT * FROM '{jsonl_view_name}')
-          TO {escape_string_literal(parquet_filepath)} (FORMAT PARQUET);"""
+    with self._cursor() as con:
+      self._pool.execute(
+        con, f'CREATE OR REPLACE VIEW "{jsonl_view_name}" as ({get_json_query("*")});'
       )
 
-      con.close()
+      if not schema:
+        reader = self._pool.execute(con, f'SELECT * from {jsonl_view_name}').fetch_record_batch(
+          rows_per_batch=10_000
+        )
+        schema = arrow_schema_to_schema(reader.schema)
+        reader.close()
+
+      parquet_filepath: Optional[str] = None
+      if not is_tmp_output:
+        parquet_filepath = _get_parquet_filepath(
+          dataset_path=self.dataset_path,
+          output_path=output_path,
+          parquet_filename_prefix=parquet_filename_prefix,
+        )
+        if overwrite and os.path.exists(parquet_filepath):
+          # Delete the parquet file if it exists.
+          delete_file(parquet_filepath)
+
+        os.makedirs(os.path.dirname(parquet_filepath), exist_ok=True)
+
+        # Cluster the rows by the value of the output when it has a single primitive leaf, so
+        # filters like `score > 0.9` or `lang = 'en'` skip most row groups.
+        cluster_key_sql = _cluster_key_sql(schema)
+        order_by = f'{cluster_key_sql} NULLS LAST, {ROWID}' if cluster_key_sql else ROWID
+        self._pool.execute(
+          con,
+          f"""COPY (SELECT * FROM '{jsonl_view_name}' ORDER BY {order_by})
+            TO {escape_string_literal(parquet_filepath)} ({_parquet_copy_options()});""",
+        )
 
     if ROWID in schema.fields:
       del schema.fields[ROWID]
@@ -1202,16 +2029,19 @@ class DatasetDuckDB(Dataset):
     batch_size = -1 if use_garden else signal.local_batch_size
     _consume_iterator(
       progress_bar(
-        self._dispatch_workers(
-          joblib.Parallel(n_jobs=n_jobs, prefer=prefer, return_as='generator'),
-          compute_fn,
-          output_path,
-          jsonl_cache_filepath,
-          batch_size=batch_size,
-          select_path=input_path,
-          overwrite=overwrite,
-          query_options=query_params,
-          embedding=signal.embedding if isinstance(signal, VectorSignal) else None,
+        _record_signal_throughput(
+          signal.name,
+          self._dispatch_workers(
+            joblib.Parallel(n_jobs=n_jobs, prefer=prefer, return_as='generator'),
+            compute_fn,
+            output_path,
+            jsonl_cache_filepath,
+            batch_size=batch_size,
+            select_path=input_path,
+            overwrite=overwrite,
+            query_options=query_params,
+            embedding=signal.embedding if isinstance(signal, VectorSignal) else None,
+          ),
         )
       )
     )
@@ -1246,8 +2076,10 @@ class DatasetDuckDB(Dataset):
       py_version=metadata.version('lilac'),
       use_garden=use_garden,
     )
-    with open_file(signal_manifest_filepath, 'w') as f:
-      f.write(signal_manifest.model_dump_json(exclude_none=True, indent=2))
+    _write_manifest(
+      signal_manifest_filepath, signal_manifest.model_dump_json(exclude_none=True, indent=2)
+    )
+    self._write_sketches(output_path, signal_manifest_filepath, [parquet_filepath])
 
     log(f'Wrote signal output to {output_dir}')
 
@@ -1326,23 +2158,26 @@ class DatasetDuckDB(Dataset):
     batch_size = -1 if use_garden else signal.local_batch_size
 
     output_items = progress_bar(
-      self._dispatch_workers(
-        joblib.Parallel(n_jobs=n_jobs, prefer=prefer, return_as='generator'),
-        compute_fn,
-        output_path,
-        jsonl_cache_filepath,
-        batch_size=batch_size,
-        select_path=input_path,
-        overwrite=overwrite,
-        query_options=query_params,
-        checkpoint_progress=False,
-      )
-    )
-
-    vector_index = self._get_vector_db_index(embedding, input_path)
-    write_embeddings_to_disk(
-      vector_index=vector_index,
-      signal_items=output_items,
+      _record_signal_throughput(
+        signal.name,
+        self._dispatch_workers(
+          joblib.Parallel(n_jobs=n_jobs, prefer=prefer, return_as='generator'),
+          compute_fn,
+          output_path,
+          jsonl_cache_filepath,
+          batch_size=batch_size,
+          select_path=input_path,
+          overwrite=overwrite,
+          query_options=query_params,
+          checkpoint_progress=False,
+        ),
+      )
+    )
+
+    vector_index = self._get_vector_db_index(embedding, input_path)
+    write_embeddings_to_disk(
+      vector_index=vector_index,
+      signal_items=output_items,
       output_dir=output_dir,
     )
 
@@ -1368,8 +2203,9 @@ class DatasetDuckDB(Dataset):
       use_garden=use_garden,
     )
 
-    with open_file(signal_manifest_filepath, 'w') as f:
-      f.write(signal_manifest.model_dump_json(exclude_none=True, indent=2))
+    _write_manifest(
+      signal_manifest_filepath, signal_manifest.model_dump_json(exclude_none=True, indent=2)
+    )
 
     log(f'Wrote embedding index to {output_dir}')
 
@@ -1393,6 +2229,103 @@ class DatasetDuckDB(Dataset):
       # Recreate all the views, otherwise this could be stale and point to a non existent file.
       self._clear_joint_table_cache()
 
+  @override
+  def compute_keyword_index(self, path: Path, overwrite: bool = False) -> None:
+    path = normalize_path(path)
+    manifest = self.manifest()
+    index_path = _keyword_index_path(path)
+    if index_path in self._keyword_indices and not overwrite:
+      return
+
+    leaf = manifest.data_schema.get_field(path)
+    # Find the inner-most leaf in case this field is repeated.
+    while leaf.repeated_field:
+      leaf = leaf.repeated_field
+      path = (*path, PATH_WILDCARD)
+    if leaf.dtype != STRING:
+      raise ValueError(f'Keyword indices can only be computed on string fields. Got "{path}".')
+    data_files = self._column_data_files.get(str(path[0]))
+    if not data_files:
+      raise ValueError(
+        'Keyword indices can only be computed on fields of the source, or of a map. '
+        f'Got "{path}".'
+      )
+    data_fingerprint = _files_fingerprint(data_files)
+
+    value_select = self._select_sql(
+      self._leaf_path_to_duckdb_path(path, manifest.data_schema),
+      flatten=True,
+      unnest=True,
+      path=path,
+      schema=manifest.data_schema,
+      span_from=self._resolve_span(path, manifest),
+    )
+    terms_query = f"""
+      SELECT {ROWID}, unnest(regexp_extract_all(lower(val), '{KEYWORD_TOKEN_REGEX}')) AS term
+      FROM (SELECT {ROWID}, {value_select} AS val FROM t)
+    """
+    output_dir = os.path.join(self.dataset_path, _signal_dir(path))
+    os.makedirs(output_dir, exist_ok=True)
+    postings_filepath = os.path.join(output_dir, KEYWORD_INDEX_POSTINGS_FILENAME)
+    docs_filepath = os.path.join(output_dir, KEYWORD_INDEX_DOCS_FILENAME)
+    with DebugTimer(f'Computing the keyword index of "{path}"'), self._cursor() as con:
+      # The postings are sorted by term, so a lookup only reads the row groups of its terms.
+      self._pool.execute(
+        con,
+        f"""COPY (
+          SELECT term, {ROWID}, count(*)::INTEGER AS tf FROM ({terms_query})
+          GROUP BY term, {ROWID} ORDER BY term
+        ) TO {escape_string_literal(postings_filepath)} (FORMAT PARQUET)""",
+      )
+      self._pool.execute(
+        con,
+        f"""COPY (
+          SELECT {ROWID}, count(*)::INTEGER AS length FROM ({terms_query}) GROUP BY {ROWID}
+        ) TO {escape_string_literal(docs_filepath)} (FORMAT PARQUET)""",
+      )
+      total_length = self._pool.execute(
+        con, f'SELECT sum(length) FROM read_parquet({escape_string_literal(docs_filepath)})'
+      ).fetchone()[0]  # type: ignore
+
+    index_manifest = KeywordIndexManifest(
+      path=index_path,
+      num_docs=manifest.num_items,
+      avg_doc_length=(total_length or 0) / max(manifest.num_items, 1),
+      data_files=[os.path.relpath(f, self.dataset_path) for f in data_files],
+      data_fingerprint=data_fingerprint,
+    )
+    # The manifest is written last, so a partially written index is never used.
+    _write_manifest(
+      os.path.join(output_dir, KEYWORD_INDEX_MANIFEST_FILENAME),
+      index_manifest.model_dump_json(indent=2),
+    )
+    log(f'Wrote keyword index to {output_dir}')
+    self._clear_joint_table_cache()
+
+  @override
+  def delete_keyword_index(self, path: Path) -> None:
+    output_dir = os.path.join(self.dataset_path, _signal_dir(normalize_path(path)))
+    manifest_filepath = os.path.join(output_dir, KEYWORD_INDEX_MANIFEST_FILENAME)
+    if not os.path.exists(manifest_filepath):
+      raise ValueError(f'There is no keyword index for "{path}".')
+    delete_file(manifest_filepath)
+    for filename in [KEYWORD_INDEX_POSTINGS_FILENAME, KEYWORD_INDEX_DOCS_FILENAME]:
+      if os.path.exists(os.path.join(output_dir, filename)):
+        delete_file(os.path.join(output_dir, filename))
+    self._clear_joint_table_cache()
+
+  def _keyword_index_search(
+    self, search: Search
+  ) -> Optional[tuple[KeywordIndexManifest, list[str]]]:
+    """Returns the keyword index of a keyword search, and the conditions on its terms."""
+    if search.type != 'keyword':
+      return None
+    index_manifest = self._keyword_indices.get(_keyword_index_path(normalize_path(search.path)))
+    term_conditions = _keyword_term_conditions(str(search.query))
+    if not index_manifest or not term_conditions:
+      return None
+    return index_manifest, term_conditions
+
   @override
   def load_embedding(
     self,
@@ -1521,8 +2454,9 @@ class DatasetDuckDB(Dataset):
       use_garden=False,
     )
 
-    with open_file(signal_manifest_filepath, 'w') as f:
-      f.write(signal_manifest.model_dump_json(exclude_none=True, indent=2))
+    _write_manifest(
+      signal_manifest_filepath, signal_manifest.model_dump_json(exclude_none=True, indent=2)
+    )
 
     log(f'Wrote embedding index to {output_dir}')
 
@@ -1558,6 +2492,9 @@ class DatasetDuckDB(Dataset):
     prefix = '.'.join(path)
     map_manifest_filepath = os.path.join(parquet_dir, f'{prefix}.{MAP_MANIFEST_SUFFIX}')
     delete_file(map_manifest_filepath)
+    sketches_filepath = _sketches_filepath(map_manifest_filepath)
+    if os.path.exists(sketches_filepath):
+      delete_file(sketches_filepath)
     self._clear_joint_table_cache()
 
   @override
@@ -1746,28 +2683,43 @@ class DatasetDuckDB(Dataset):
     if not current_field.dtype:
       raise ValueError(f'Unable to sort by path {path}. The field has no value.')
 
+  # NOTE: This is cached per instance since we ask on every dataset page refresh. The cache is
+  # cleared when the views are rebuilt, on a reconnect, and when rows are deleted.
   @override
-  @functools.cache  # Cache stats for leaf paths since we ask on every dataset page refresh.
+  @DATASET_QUERY_SECONDS.time(operation='stats')
+  @profile_phase('compile')
   def stats(self, leaf_path: Path, include_deleted: bool = False) -> StatsResult:
-    if not leaf_path:
-      raise ValueError('leaf_path must be provided')
-    path = normalize_path(leaf_path)
     manifest = self.manifest()
-    leaf = manifest.data_schema.get_field(path)
-    # Find the inner-most leaf in case this field is repeated.
-    while leaf.repeated_field:
-      leaf = leaf.repeated_field
-      path = (*path, PATH_WILDCARD)
-
-    if not leaf.dtype:
-      raise ValueError(f'Leaf "{path}" not found in dataset')
-
-    if leaf.dtype.type == 'map':
-      raise ValueError(
-        f'Cannot compute stats on a map field "{path}". '
-        'Provide a path to a key in that map instead.'
+    path, leaf = self._resolve_stats_leaf(leaf_path, manifest)
+    assert leaf.dtype is not None
+    cache_key = (path, include_deleted)
+    cached_stats = self._stats_cache.get(cache_key)
+    if cached_stats is not None:
+      return cached_stats
+
+    sketch = self._get_leaf_sketch(path, manifest, include_deleted)
+    record_cache_lookups('stats_sketch', hits=int(bool(sketch)), misses=int(not sketch))
+    if sketch:
+      result = sketch.stats.model_copy(deep=True)
+    else:
+      result = self._single_flight(
+        ('stats', path, include_deleted),
+        lambda: self._compute_stats(path, leaf, manifest, include_deleted),
       )
+    self._stats_cache[cache_key] = result
+    return result
 
+  def _compute_stats(
+    self,
+    path: PathTuple,
+    leaf: Field,
+    manifest: DatasetManifest,
+    include_deleted: bool,
+    from_sample: bool = False,
+  ) -> StatsResult:
+    """Computes the stats for a leaf by querying the data, or the row sample."""
+    from_table = self._joint_view([path], from_sample=from_sample)
+    assert leaf.dtype is not None
     duckdb_path = self._leaf_path_to_duckdb_path(path, manifest.data_schema)
     inner_select = self._select_sql(
       duckdb_path,
@@ -1779,7 +2731,7 @@ class DatasetDuckDB(Dataset):
     )
 
     if manifest.data_schema.has_field((DELETED_LABEL_NAME,)) and not include_deleted:
-      where_clause = f'WHERE {DELETED_LABEL_NAME} IS NULL'
+      where_clause = f'WHERE {self._not_deleted_sql()}'
     else:
       where_clause = ''
 
@@ -1788,7 +2740,7 @@ class DatasetDuckDB(Dataset):
     if leaf.dtype in (STRING, STRING_SPAN):
       avg_length_query = f"""
         SELECT avg(length(CAST(val AS VARCHAR)))
-        FROM (SELECT {inner_select} AS val FROM t {where_clause})
+        FROM (SELECT {inner_select} AS val FROM {from_table} {where_clause})
         USING SAMPLE {SAMPLE_AVG_TEXT_LENGTH};
       """
       row = self._query(avg_length_query)[0]
@@ -1796,7 +2748,7 @@ class DatasetDuckDB(Dataset):
         avg_text_length = int(row[0])
 
     total_count_query = (
-      f'SELECT count(val) FROM (SELECT {inner_select} as val FROM t {where_clause})'
+      f'SELECT count(val) FROM (SELECT {inner_select} as val FROM {from_table} {where_clause})'
     )
     total_count = int(self._query(total_count_query)[0][0])
 
@@ -1810,7 +2762,8 @@ class DatasetDuckDB(Dataset):
       sample_size = TOO_MANY_DISTINCT
       approx_count_query = f"""
         SELECT approx_count_distinct(val) as approxCountDistinct
-        FROM (SELECT {inner_select} AS val FROM t {where_clause}) USING SAMPLE {sample_size};
+        FROM (SELECT {inner_select} AS val FROM {from_table} {where_clause})
+        USING SAMPLE {sample_size};
       """
       row = self._query(approx_count_query)[0]
       approx_count_distinct = int(row[0])
@@ -1830,7 +2783,7 @@ class DatasetDuckDB(Dataset):
     if is_ordinal(leaf.dtype):
       min_max_query = f"""
         SELECT MIN(val) AS minVal, MAX(val) AS maxVal,
-        FROM (SELECT {inner_select} as val FROM t {where_clause})
+        FROM (SELECT {inner_select} as val FROM {from_table} {where_clause})
         {'WHERE NOT isnan(val)' if is_float(leaf.dtype) else ''}
       """
       row = self._query(min_max_query)[0]
@@ -1843,7 +2796,7 @@ class DatasetDuckDB(Dataset):
         )
       sample_query = f"""
         SELECT COALESCE(ARRAY_AGG(val), [])
-        FROM (SELECT {inner_select} as val FROM t {where_clause})
+        FROM (SELECT {inner_select} as val FROM {from_table} {where_clause})
         {sample_where_clause}
         USING SAMPLE 100;
       """
@@ -1851,7 +2804,281 @@ class DatasetDuckDB(Dataset):
 
     return result
 
+  def _single_flight(self, key: tuple, fn: Callable[[], Tout]) -> Tout:
+    """Runs `fn`, sharing its result with identical concurrent calls for the dataset generation.
+
+    The key should hold the normalized arguments of the call. Callers must call `manifest()` first,
+    so the generation is up to date.
+    """
+    while True:
+      try:
+        return self._flights.do((*_hashable(key), self._generation), fn, check=raise_if_cancelled)
+      except QueryCancelledError:
+        # The request that ran the query was cancelled. Run it again, unless this request was also
+        # cancelled.
+        raise_if_cancelled()
+
+  def _resolve_stats_leaf(
+    self, leaf_path: Path, manifest: DatasetManifest
+  ) -> tuple[PathTuple, Field]:
+    """Returns the inner-most leaf path and field that stats are computed over."""
+    if not leaf_path:
+      raise ValueError('leaf_path must be provided')
+    path = normalize_path(leaf_path)
+    leaf = manifest.data_schema.get_field(path)
+    # Find the inner-most leaf in case this field is repeated.
+    while leaf.repeated_field:
+      leaf = leaf.repeated_field
+      path = (*path, PATH_WILDCARD)
+
+    if not leaf.dtype:
+      raise ValueError(f'Leaf "{path}" not found in dataset')
+
+    if leaf.dtype.type == 'map':
+      raise ValueError(
+        f'Cannot compute stats on a map field "{path}". '
+        'Provide a path to a key in that map instead.'
+      )
+    return path, leaf
+
   @override
+  @DATASET_QUERY_SECONDS.time(operation='stats_many')
+  def stats_many(
+    self, leaf_paths: Sequence[Path], include_deleted: bool = False
+  ) -> list[StatsResult]:
+    manifest = self.manifest()
+    leafs = [self._resolve_stats_leaf(leaf_path, manifest) for leaf_path in leaf_paths]
+
+    with self._stats_many_lock:
+      if self._stats_many_generation != self._generation:
+        self._stats_many_cache = self._read_stats_cache_file()
+        self._stats_many_generation = self._generation
+
+      for path, _ in leafs:
+        sketch = self._get_leaf_sketch(path, manifest, include_deleted)
+        if sketch and (path, include_deleted) not in self._stats_many_cache:
+          self._stats_many_cache[(path, include_deleted)] = sketch.stats.model_copy(deep=True)
+
+      missing_leafs = list(
+        {
+          path: (path, leaf)
+          for path, leaf in leafs
+          if (path, include_deleted) not in self._stats_many_cache
+        }.values()
+      )
+      if missing_leafs:
+        with DebugTimer(f'Computing stats for {len(missing_leafs)} leafs of {self.dataset_name}'):
+          results = self._compute_stats_many(missing_leafs, include_deleted, manifest)
+        for (path, _), result in zip(missing_leafs, results):
+          self._stats_many_cache[(path, include_deleted)] = result
+        self._write_stats_cache_file()
+
+      return [self._stats_many_cache[(path, include_deleted)] for path, _ in leafs]
+
+  def _compute_stats_many(
+    self, leafs: list[tuple[PathTuple, Field]], include_deleted: bool, manifest: DatasetManifest
+  ) -> list[StatsResult]:
+    """Computes the stats for many leafs with one full scan and one sampled scan of the data.
+
+    Every leaf is unnested in the same select. DuckDB pads shorter lists with NULLs, which the
+    aggregates ignore, so leafs with different cardinalities can be aggregated side by side.
+    """
+    schema = manifest.data_schema
+    value_selects: list[str] = []
+    for i, (path, _) in enumerate(leafs):
+      duckdb_path = self._leaf_path_to_duckdb_path(path, schema)
+      value_select = self._select_sql(
+        duckdb_path,
+        flatten=True,
+        unnest=False,
+        path=path,
+        schema=schema,
+        span_from=self._resolve_span(path, manifest),
+      )
+      if self._select_nesting_level(duckdb_path, path, schema) == 0:
+        # Wrap primitives in a list so they are unnested, and padded, together with the lists.
+        value_select = f'[{value_select}]'
+      value_selects.append(f'unnest({value_select}) AS v{i}')
+
+    if schema.has_field((DELETED_LABEL_NAME,)) and not include_deleted:
+      where_clause = f'WHERE {self._not_deleted_sql()}'
+    else:
+      where_clause = ''
+    from_table = self._joint_view([path for path, _ in leafs])
+    values_query = f'SELECT {", ".join(value_selects)} FROM {from_table} {where_clause}'
+
+    # Full scan: counts and min/max values.
+    full_aggs: list[str] = ['count(*)']
+    for i, (_, leaf) in enumerate(leafs):
+      dtype = cast(DataType, leaf.dtype)
+      full_aggs.append(f'count(v{i})')
+      if is_ordinal(dtype):
+        nan_filter = f' FILTER (WHERE NOT isnan(v{i}))' if is_float(dtype) else ''
+        full_aggs.append(f'min(v{i}){nan_filter}')
+        full_aggs.append(f'max(v{i}){nan_filter}')
+    full_row = self._query(f'SELECT {", ".join(full_aggs)} FROM ({values_query})')[0]
+
+    # The number of unnested rows, which is more than the number of values of the sparse leafs.
+    num_rows = int(full_row[0])
+    results: list[StatsResult] = []
+    total_counts: list[int] = []
+    col_index = 1
+    for path, leaf in leafs:
+      dtype = cast(DataType, leaf.dtype)
+      total_count = int(full_row[col_index])
+      col_index += 1
+      result = StatsResult(path=path, total_count=total_count, approx_count_distinct=0)
+      if is_ordinal(dtype):
+        result.min_val, result.max_val = full_row[col_index], full_row[col_index + 1]
+        col_index += 2
+      results.append(result)
+      total_counts.append(total_count)
+
+    # Sampled scan: text lengths, distinct counts and value samples for histogram bins. The sample
+    # holds rows of all the leafs, so it holds only a fraction of the values of the sparse leafs.
+    sample_size = TOO_MANY_DISTINCT
+    sample_rate = min(1.0, sample_size / max(1, num_rows))
+    sample_aggs: list[str] = []
+    for i, (_, leaf) in enumerate(leafs):
+      dtype = cast(DataType, leaf.dtype)
+      sample_aggs.append(f'count(v{i})')
+      sample_aggs.append(f'approx_count_distinct(v{i})')
+      sample_aggs.append(
+        f'avg(length(CAST(v{i} AS VARCHAR)))' if dtype in (STRING, STRING_SPAN) else 'NULL'
+      )
+      if is_ordinal(dtype):
+        # Keep each value with a probability that yields a bit more than the desired sample size,
+        # given the expected number of values of the leaf in the sample.
+        expected_sample_count = total_counts[i] * sample_rate
+        keep_prob = min(1.0, 2 * NUM_VALUE_SAMPLES / max(1, expected_sample_count))
+        sample_filter = f'random() < {keep_prob}'
+        if not is_temporal(dtype):
+          sample_filter += f" AND v{i} != 0 {f'AND NOT isnan(v{i})' if is_float(dtype) else ''}"
+        sample_aggs.append(f'COALESCE(list(v{i}) FILTER (WHERE {sample_filter}), [])')
+      else:
+        sample_aggs.append('NULL')
+    sample_row = self._query(
+      f'SELECT {", ".join(sample_aggs)} FROM ({values_query}) USING SAMPLE {sample_size}'
+    )[0]
+
+    for i, ((_, leaf), result) in enumerate(zip(leafs, results)):
+      sample_count, approx_count_distinct, avg_text_length, value_samples = sample_row[
+        4 * i : 4 * i + 4
+      ]
+      if avg_text_length is not None:
+        result.avg_text_length = int(avg_text_length)
+      # The stats of a single leaf sample up to `sample_size` of its values, so the stats are
+      # approximate when the shared sample holds fewer of them, as for sparse leafs.
+      result.approximate = int(sample_count) < min(result.total_count, sample_size)
+
+      if result.avg_text_length and result.avg_text_length > MAX_TEXT_LEN_DISTINCT_COUNT:
+        # Assume that every text field is unique.
+        result.approx_count_distinct = manifest.num_items
+      elif leaf.dtype == BOOLEAN:
+        result.approx_count_distinct = 2
+      else:
+        # Adjust the counts for the number of values of the leaf in the sample.
+        factor = max(1, result.total_count / max(1, int(sample_count)))
+        result.approx_count_distinct = round(int(approx_count_distinct) * factor)
+
+      if value_samples is not None:
+        value_samples = list(value_samples)
+        if len(value_samples) > NUM_VALUE_SAMPLES:
+          value_samples = random.sample(value_samples, NUM_VALUE_SAMPLES)
+        result.value_samples = value_samples
+
+    return results
+
+  def _stats_cache_filepath(self) -> str:
+    return os.path.join(
+      get_lilac_cache_dir(self.project_dir),
+      self.namespace,
+      self.dataset_name,
+      STATS_CACHE_FILENAME,
+    )
+
+  def _read_stats_cache_file(self) -> dict[tuple[PathTuple, bool], StatsResult]:
+    """Reads the stats sidecar file. Returns an empty cache when it is stale or unreadable."""
+    stats_cache_filepath = self._stats_cache_filepath()
+    if not os.path.exists(stats_cache_filepath):
+      return {}
+    with open_file(stats_cache_filepath, 'rb') as f:
+      try:
+        stats_cache = pickle.load(f)
+      except BaseException:
+        # Pickle serialization failed. We fallback to re-computing the stats.
+        return {}
+    if stats_cache.get('generation') != self._generation:
+      return {}
+    return stats_cache['stats']
+
+  def _write_stats_cache_file(self) -> None:
+    stats_cache_filepath = self._stats_cache_filepath()
+    tmp_filepath = f'{stats_cache_filepath}.tmp'
+    with open_file(tmp_filepath, 'wb') as f:
+      pickle.dump({'generation': self._generation, 'stats': self._stats_many_cache}, f)
+    os.replace(tmp_filepath, stats_cache_filepath)
+
+  def _get_leaf_sketch(
+    self, path: PathTuple, manifest: DatasetManifest, include_deleted: bool
+  ) -> Optional[LeafSketch]:
+    """Returns the sketch of a leaf, if it describes the rows visible to the query."""
+    if not include_deleted and manifest.data_schema.has_field((DELETED_LABEL_NAME,)):
+      # Sketches are computed over all the rows, so they are stale once rows are deleted.
+      return None
+    return self._leaf_sketches.get(path)
+
+  def _write_sketches(
+    self, output_path: PathTuple, manifest_filepath: str, parquet_filepaths: list[str]
+  ) -> None:
+    """Computes the sketches of the leafs under `output_path` and writes them next to a manifest.
+
+    The sketches store the parquet files they were computed from, and are ignored when these files
+    change without the sketches being re-computed.
+    """
+    try:
+      manifest = self.manifest()
+      leafs = [
+        (path, leaf)
+        for path, leaf in manifest.data_schema.leafs.items()
+        if _path_contains(output_path, path)
+        and leaf.dtype
+        and leaf.dtype.type not in ('map', 'embedding', 'binary', 'null')
+      ]
+      sketches: dict[PathTuple, LeafSketch] = {}
+      if leafs:
+        with DebugTimer(f'Computing sketches for {len(leafs)} leafs of "{output_path}"'):
+          stats_results = self._compute_stats_many(leafs, include_deleted=True, manifest=manifest)
+          for (path, leaf), stats in zip(leafs, stats_results):
+            bins = _normalize_bins(leaf.bins)
+            if bins is None and _is_auto_binned(leaf):
+              bins = _auto_bins(stats)
+            groups = self._select_groups(
+              path,
+              leaf,
+              stats,
+              manifest,
+              named_bins=bins,
+              limit=SKETCH_MAX_GROUPS + 1,
+              include_deleted=True,
+            )
+            sketches[path] = LeafSketch(
+              stats=stats,
+              bins=bins,
+              group_counts=groups.counts[:SKETCH_MAX_GROUPS],
+              group_counts_complete=not groups.too_many_distinct
+              and len(groups.counts) <= SKETCH_MAX_GROUPS,
+            )
+
+      with open_file(_sketches_filepath(manifest_filepath), 'wb') as f:
+        pickle.dump({'files': _files_fingerprint(parquet_filepaths), 'sketches': sketches}, f)
+    except Exception as e:
+      # Sketches are an optimization. Queries fall back to scanning the data.
+      log(f'Failed to compute sketches for "{output_path}": {e}')
+
+  @override
+  @DATASET_QUERY_SECONDS.time(operation='select_groups')
+  @profile_phase('compile')
   def select_groups(
     self,
     leaf_path: Path,
@@ -1862,6 +3089,7 @@ class DatasetDuckDB(Dataset):
     bins: Optional[Union[Sequence[Bin], Sequence[float]]] = None,
     include_deleted: bool = False,
     searches: Optional[Sequence[Search]] = None,
+    approximate: bool = False,
   ) -> SelectGroupsResult:
     if not leaf_path:
       raise ValueError('leaf_path must be provided')
@@ -1884,17 +3112,83 @@ class DatasetDuckDB(Dataset):
         'Provide a path to a key in that map instead.'
       )
 
-    inner_val = 'inner_val'
-    outer_select = inner_val
     # Normalize the bins to be `list[Bin]`.
     named_bins = _normalize_bins(bins or leaf.bins)
-    stats = self.stats(leaf_path, include_deleted=include_deleted)
+
+    sketch = self._get_leaf_sketch(path, manifest, include_deleted)
+    if sketch and not bins and not filters and not searches:
+      result = _select_groups_from_sketch(sketch, sort_by, sort_order, limit)
+      if result:
+        return result
+
+    sample_rate: Optional[float] = None
+    # A fixed set of rowids, like top-k results, is cheap to scan, and only a few of the rowids are
+    # in the sample, so those queries are exact.
+    if approximate and not self._filters_fixed_rowids(filters, manifest):
+      sample_rate = self._sample_rate(manifest)
+    # Approximate groups derive the distinct values and the bins from the sample instead, which
+    # avoids computing the stats over all the rows.
+    stats = None if sample_rate else self.stats(leaf_path, include_deleted=include_deleted)
+    flight_key = (
+      'select_groups',
+      path,
+      named_bins,
+      filters,
+      sort_by,
+      sort_order,
+      limit,
+      include_deleted,
+      searches,
+      sample_rate,
+    )
+    return self._single_flight(
+      flight_key,
+      lambda: self._select_groups(
+        path,
+        leaf,
+        stats,
+        manifest,
+        named_bins=named_bins,
+        filters=filters,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        include_deleted=include_deleted,
+        searches=searches,
+        sample_rate=sample_rate,
+      ),
+    )
+
+  def _select_groups(
+    self,
+    path: PathTuple,
+    leaf: Field,
+    stats: Optional[StatsResult],
+    manifest: DatasetManifest,
+    named_bins: Optional[list[Bin]],
+    filters: Optional[Sequence[FilterLike]] = None,
+    sort_by: GroupsSortBy = GroupsSortBy.COUNT,
+    sort_order: SortOrder = SortOrder.DESC,
+    limit: Optional[int] = None,
+    include_deleted: bool = False,
+    searches: Optional[Sequence[Search]] = None,
+    sample_rate: Optional[float] = None,
+  ) -> SelectGroupsResult:
+    """Computes the groups of a resolved leaf by scanning the data, or the row sample.
+
+    `stats` are only required for exact groups. Groups of the sample are binned by the stats of the
+    sample instead.
+    """
+    assert leaf.dtype is not None
+    inner_val = 'inner_val'
+    outer_select = inner_val
 
     leaf_is_float = is_float(leaf.dtype)
-    leaf_is_integer = is_integer(leaf.dtype)
-    if not leaf.categorical and (leaf_is_float or leaf_is_integer):
+    if _is_auto_binned(leaf):
       if named_bins is None:
         # Auto-bin.
+        if stats is None:
+          stats = self._compute_stats(path, leaf, manifest, include_deleted, from_sample=True)
         named_bins = _auto_bins(stats)
 
       sql_bounds = []
@@ -1917,14 +3211,14 @@ class DatasetDuckDB(Dataset):
         ) WHERE {is_nan_filter}
            {inner_val}::DOUBLE >= {bin_min_col} AND {inner_val}::DOUBLE < {bin_max_col}
       )"""
-    else:
-      if stats.approx_count_distinct >= dataset.TOO_MANY_DISTINCT:
-        return SelectGroupsResult(too_many_distinct=True, counts=[], bins=named_bins)
+    elif stats and stats.approx_count_distinct >= dataset.TOO_MANY_DISTINCT:
+      return SelectGroupsResult(too_many_distinct=True, counts=[], bins=named_bins)
 
     count_column = GroupsSortBy.COUNT.value
     value_column = GroupsSortBy.VALUE.value
 
-    limit_query = f'LIMIT {limit}' if limit else ''
+    # Without stats, the distinct values are counted in the result, so the limit is applied after.
+    limit_query = f'LIMIT {limit}' if limit and stats else ''
     duckdb_path = self._leaf_path_to_duckdb_path(path, manifest.data_schema)
     inner_select = self._select_sql(
       duckdb_path,
@@ -1941,28 +3235,46 @@ class DatasetDuckDB(Dataset):
 
     filters = self._add_searches_to_filters(searches or [], filters)
 
-    filter_queries = self._create_where(manifest, filters)
+    with self._pin_rowid_tables():
+      filter_queries = self._create_where(manifest, filters)
 
-    where_query = ''
-    if filter_queries:
-      where_query = f"WHERE {' AND '.join(filter_queries)}"
+      where_query = ''
+      if filter_queries:
+        where_query = f"WHERE {' AND '.join(filter_queries)}"
 
-    query = f"""
-      SELECT {outer_select} AS {value_column}, COUNT() AS {count_column}
-      FROM (SELECT {inner_select} AS {inner_val} FROM t {where_query})
-      GROUP BY {value_column}
-      ORDER BY {sort_by.value} {sort_order.value}, {value_column}
-      {limit_query}
-    """
-    df = self._query_df(query)
+      from_table = self._joint_view([path], filters, from_sample=bool(sample_rate))
+      query = f"""
+        SELECT {outer_select} AS {value_column}, COUNT() AS {count_column}
+        FROM (SELECT {inner_select} AS {inner_val} FROM {from_table} {where_query})
+        GROUP BY {value_column}
+        ORDER BY {sort_by.value} {sort_order.value}, {value_column}
+        {limit_query}
+      """
+      df = self._query_df(query)
     counts = list(df.itertuples(index=False, name=None))
     if is_temporal(leaf.dtype):
       # Replace any NaT with None and pd.Timestamp to native datetime objects.
       counts = [(None if pd.isnull(val) else val.to_pydatetime(), count) for val, count in counts]
 
-    return SelectGroupsResult(too_many_distinct=False, counts=counts, bins=named_bins)
+    if not sample_rate:
+      return SelectGroupsResult(too_many_distinct=False, counts=counts, bins=named_bins)
+    if not stats and not _is_auto_binned(leaf) and len(counts) >= dataset.TOO_MANY_DISTINCT:
+      return SelectGroupsResult(
+        too_many_distinct=True, counts=[], bins=named_bins, approximate=True
+      )
+    counts = counts[:limit] if limit else counts
+    estimates = [_estimate_count(count, sample_rate) for _, count in counts]
+    return SelectGroupsResult(
+      too_many_distinct=False,
+      counts=[(val, estimate) for (val, _), (estimate, _) in zip(counts, estimates)],
+      bins=named_bins,
+      approximate=True,
+      count_intervals=[interval for _, interval in estimates],
+    )
 
   @override
+  @DATASET_QUERY_SECONDS.time(operation='pivot')
+  @profile_phase('compile')
   def pivot(
     self,
     outer_path: Path,
@@ -1971,6 +3283,7 @@ class DatasetDuckDB(Dataset):
     filters: Optional[Sequence[FilterLike]] = None,
     sort_by: Optional[GroupsSortBy] = GroupsSortBy.COUNT,
     sort_order: Optional[SortOrder] = SortOrder.DESC,
+    approximate: bool = False,
   ) -> PivotResult:
     if not inner_path or not outer_path:
       raise ValueError('both `outer_path` and `inner_path` must be provided')
@@ -1979,10 +3292,13 @@ class DatasetDuckDB(Dataset):
     inner_path = normalize_path(inner_path)
     outer_path = normalize_path(outer_path)
 
-    pivot_key = (outer_path, inner_path, sort_by, sort_order)
+    pivot_key = (outer_path, inner_path, sort_by, sort_order, approximate)
     use_cache = not filters and not searches
-    if use_cache and pivot_key in self._pivot_cache:
-      return self._pivot_cache[pivot_key]
+    if use_cache:
+      cache_hit = pivot_key in self._pivot_cache
+      record_cache_lookups('pivot', hits=int(cache_hit), misses=int(not cache_hit))
+      if cache_hit:
+        return self._pivot_cache[pivot_key]
 
     manifest = self.manifest()
     inner_leaf = manifest.data_schema.get_field(inner_path)
@@ -2012,10 +3328,16 @@ class DatasetDuckDB(Dataset):
     if is_ordinal(outer_leaf.dtype):
       raise ValueError(f'Cannot compute pivot on an ordinal field "{outer_path}".')
 
-    if self.stats(inner_path).approx_count_distinct >= dataset.TOO_MANY_DISTINCT:
-      return PivotResult(too_many_distinct=True, outer_groups=[])
-    if self.stats(outer_path).approx_count_distinct >= dataset.TOO_MANY_DISTINCT:
-      return PivotResult(too_many_distinct=True, outer_groups=[])
+    sample_rate: Optional[float] = None
+    if approximate and not self._filters_fixed_rowids(filters, manifest):
+      sample_rate = self._sample_rate(manifest)
+    # Approximate pivots count the distinct values in the sample instead, which avoids computing
+    # the stats of both fields over all the rows.
+    if not sample_rate:
+      if self.stats(inner_path).approx_count_distinct >= dataset.TOO_MANY_DISTINCT:
+        return PivotResult(too_many_distinct=True, outer_groups=[])
+      if self.stats(outer_path).approx_count_distinct >= dataset.TOO_MANY_DISTINCT:
+        return PivotResult(too_many_distinct=True, outer_groups=[])
 
     count_column = GroupsSortBy.COUNT.value
     value_column = GroupsSortBy.VALUE.value
@@ -2045,36 +3367,40 @@ class DatasetDuckDB(Dataset):
     # Add search where queries.
     filters = self._add_searches_to_filters(searches or [], filters)
 
-    where_query = self._compile_select_options(
-      DuckDBQueryParams(filters=filters, include_deleted=False)
-    )
-
-    query = f"""
-      WITH tuples AS (
-        SELECT {outer_select} AS out_val, {inner_select} AS in_val
-        FROM t
-        {where_query}
-      ),
-      tuple_counts AS (
-        SELECT out_val, in_val, count() AS c FROM tuples
-        GROUP BY out_val, in_val
+    with self._pin_rowid_tables():
+      where_query = self._compile_select_options(
+        DuckDBQueryParams(filters=filters, include_deleted=False)
       )
-      SELECT
-        out_val AS {value_column},
-        SUM(c) AS {count_column},
-        list({{'{value_column}': in_val, '{count_column}': c}} ORDER BY c DESC) AS {inner_column}
-      FROM tuple_counts
-      GROUP BY out_val
-      ORDER BY {sort_by.value} {sort_order.value}, {value_column}
-    """
-    df = self._query_df(query)
+
+      query = f"""
+        WITH tuples AS (
+          SELECT {outer_select} AS out_val, {inner_select} AS in_val
+          FROM {SAMPLE_VIEW_NAME if sample_rate else 't'}
+          {where_query}
+        ),
+        tuple_counts AS (
+          SELECT out_val, in_val, count() AS c FROM tuples
+          GROUP BY out_val, in_val
+        )
+        SELECT
+          out_val AS {value_column},
+          SUM(c) AS {count_column},
+          list({{'{value_column}': in_val, '{count_column}': c}} ORDER BY c DESC) AS {inner_column}
+        FROM tuple_counts
+        GROUP BY out_val
+        ORDER BY {sort_by.value} {sort_order.value}, {value_column}
+      """
+      df = self._query_df(query)
     outer_groups: list[PivotResultOuterGroup] = []
     for out_val, count, inner_structs in df.itertuples(index=False, name=None):
       inner: list[tuple[Optional[str], int]] = [
         (struct[value_column], struct[count_column]) for struct in inner_structs
       ]
       outer_groups.append(PivotResultOuterGroup(value=out_val, count=count, inner=inner))
-    result = PivotResult(outer_groups=outer_groups)
+    if sample_rate:
+      result = _estimate_pivot(outer_groups, sample_rate)
+    else:
+      result = PivotResult(outer_groups=outer_groups)
     if use_cache:
       self._pivot_cache[pivot_key] = result
     return result
@@ -2171,6 +3497,8 @@ class DatasetDuckDB(Dataset):
     return sort_results
 
   @override
+  @DATASET_QUERY_SECONDS.time(operation='select_rows')
+  @profile_phase('compile')
   def select_rows(
     self,
     columns: Optional[Sequence[ColumnId]] = None,
@@ -2185,7 +3513,423 @@ class DatasetDuckDB(Dataset):
     include_deleted: bool = False,
     exclude_signals: bool = False,
     user: Optional[UserInfo] = None,
+    cursor: Optional[str] = None,
   ) -> SelectRowsResult:
+    with self._pin_rowid_tables(), self._cursor() as con:
+      plan = self._plan_select_rows(
+        con,
+        columns=columns,
+        searches=searches,
+        filters=filters,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        offset=offset,
+        resolve_span=resolve_span,
+        combine_columns=combine_columns,
+        include_deleted=include_deleted,
+        exclude_signals=exclude_signals,
+        user=user,
+        cursor=cursor,
+      )
+      total_num_rows = plan.total_num_rows
+      sort_order = plan.sort_order
+      offset = plan.offset
+
+      if limit and (plan.udf_filters or plan.sort_sql_after_udf):
+        df, total_num_rows = self._select_rows_udf_top_k(con, plan, limit)
+        return SelectRowsResult(_finalize_select_rows_df(plan, df), total_num_rows)
+
+      # Fetch the data from DuckDB.
+      result = self._pool.execute(con, plan.query, plan.params)
+      with profile_phase('convert'):
+        df = result.df()
+
+      next_cursor: Optional[str] = None
+      if plan.cursor_columns:
+        if len(df) == limit:
+          last_row = df.iloc[-1]
+          next_cursor = _encode_cursor(
+            total_num_rows, [last_row[col][0] for col in plan.cursor_columns]
+          )
+        df = df.drop(columns=plan.cursor_columns)
+      df = _replace_nan_with_none(df)
+
+      self._compute_select_rows_udfs(plan, df)
+
+      if not df.empty and (plan.udf_filters or plan.sort_sql_after_udf):
+        # Re-upload the udf outputs to duckdb so we can filter/sort on them.
+        rel = con.from_df(df)
+
+        if plan.udf_filters:
+          udf_filter_queries = self._create_where(plan.manifest, plan.udf_filters)
+          if udf_filter_queries:
+            rel = rel.filter(' AND '.join(udf_filter_queries))
+            count = rel.count('*').fetchone()
+            assert count is not None
+            (total_num_rows,) = count
+
+        if plan.sort_sql_after_udf:
+          rel = rel.order(', '.join([f'{s} {sort_order.value}' for s in plan.sort_sql_after_udf]))
+
+        if limit:
+          rel = rel.limit(limit, offset)
+
+        df = _replace_nan_with_none(rel.df())
+
+      df = _finalize_select_rows_df(plan, df)
+    return SelectRowsResult(df, total_num_rows, next_cursor)
+
+  @override
+  @DATASET_QUERY_SECONDS.time(operation='select_rows_arrow')
+  @profile_phase('compile')
+  def select_rows_arrow(
+    self,
+    columns: Optional[Sequence[ColumnId]] = None,
+    searches: Optional[Sequence[Search]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    sort_by: Optional[Sequence[Path]] = None,
+    sort_order: Optional[SortOrder] = SortOrder.DESC,
+    limit: Optional[int] = None,
+    offset: Optional[int] = 0,
+    resolve_span: bool = False,
+    combine_columns: bool = False,
+    include_deleted: bool = False,
+    exclude_signals: bool = False,
+    user: Optional[UserInfo] = None,
+    cursor: Optional[str] = None,
+  ) -> pa.Table:
+    arrow_schema: Optional[pa.Schema] = None
+    if combine_columns:
+      select_schema = self.select_rows_schema(
+        columns,
+        sort_by,
+        sort_order,
+        searches,
+        combine_columns=True,
+        exclude_signals=exclude_signals,
+      )
+      arrow_schema = schema_to_arrow_schema(select_schema.data_schema)
+
+    with self._pin_rowid_tables(), self._cursor() as con:
+      plan = self._plan_select_rows(
+        con,
+        columns=columns,
+        searches=searches,
+        filters=filters,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        offset=offset,
+        resolve_span=resolve_span,
+        combine_columns=combine_columns,
+        include_deleted=include_deleted,
+        exclude_signals=exclude_signals,
+        user=user,
+        cursor=cursor,
+      )
+      total_num_rows = plan.total_num_rows
+      if plan.udf_filters or plan.sort_sql_after_udf:
+        table, total_num_rows = self._select_rows_udf_top_k_table(con, plan, limit)
+      else:
+        table = pa.concat_tables(
+          [pa.Table.from_batches([batch]) for batch in self._select_rows_record_batches(con, plan)],
+          promote_options='permissive',
+        )
+
+    next_cursor = ''
+    if plan.cursor_columns and table.num_rows == limit:
+      # The sort keys are wrapped in a list, see `_plan_select_rows`.
+      last_values = [table.column(col)[-1].as_py()[0] for col in plan.cursor_columns]
+      next_cursor = _encode_cursor(total_num_rows, last_values)
+
+    batches = table.combine_chunks().to_batches()
+    batch = batches[0] if batches else pa.RecordBatch.from_pylist([], schema=table.schema)
+    table = pa.Table.from_batches([_finalize_select_rows_batch(plan, batch, arrow_schema)])
+    return table.replace_schema_metadata(
+      {'total_num_rows': str(total_num_rows), 'next_cursor': next_cursor}
+    )
+
+  def _select_rows_udf_top_k(
+    self, con: duckdb.DuckDBPyConnection, plan: DuckDBSelectRowsPlan, limit: int
+  ) -> tuple[pd.DataFrame, int]:
+    """Filters and sorts by UDF outputs, computing the UDFs in batches.
+
+    Only a batch of rows and the best `limit + offset` rows seen so far are held in memory. Each
+    batch is merged with the best rows in DuckDB, which returns the positions of the new best rows.
+
+    Returns the page of rows, and the number of rows that pass the UDF filters.
+    """
+    k = limit + plan.offset
+    filter_sql = ' AND '.join(self._create_where(plan.manifest, plan.udf_filters))
+    # Ties keep the order of the DuckDB query, as in a stable sort.
+    order_sql = ', '.join(
+      [f'{sql} {plan.sort_order.value}' for sql in plan.sort_sql_after_udf] + [POSITION_COLUMN]
+    )
+    total_num_rows = 0 if filter_sql else plan.total_num_rows
+    top_df: Optional[pd.DataFrame] = None
+
+    result = self._pool.execute(con, plan.query, plan.params)
+    vectors_per_chunk = max(1, SELECT_ROWS_BATCH_SIZE // duckdb.__standard_vector_size__)
+    # The result is streamed from `con`, so the batches are merged on another cursor.
+    with self._pool.cursor() as merge_con:
+      while True:
+        df = result.fetch_df_chunk(vectors_per_chunk)
+        if df.empty:
+          top_df = df if top_df is None else top_df
+          break
+        df = _replace_nan_with_none(df)
+        self._compute_select_rows_udfs(plan, df)
+
+        num_top_rows = 0 if top_df is None else len(top_df)
+        candidates_df = df if top_df is None else pd.concat([top_df, df], ignore_index=True)
+        candidates_df[POSITION_COLUMN] = range(len(candidates_df))
+        rel = merge_con.from_df(candidates_df)
+        if filter_sql:
+          rel = rel.filter(filter_sql)
+          count = rel.filter(f'{POSITION_COLUMN} >= {num_top_rows}').count('*').fetchone()
+          total_num_rows += cast(tuple, count)[0]
+        positions = [
+          row[0] for row in rel.order(order_sql).limit(k).project(POSITION_COLUMN).fetchall()
+        ]
+        top_df = candidates_df.iloc[positions].drop(columns=[POSITION_COLUMN])
+        top_df = top_df.reset_index(drop=True)
+
+    return top_df.iloc[plan.offset :].reset_index(drop=True), total_num_rows
+
+  def _select_rows_record_batches(
+    self,
+    con: duckdb.DuckDBPyConnection,
+    plan: DuckDBSelectRowsPlan,
+    batch_size: int = SELECT_ROWS_BATCH_SIZE,
+  ) -> Iterator[pa.RecordBatch]:
+    """Streams the rows of a `select_rows` query from DuckDB as Arrow batches.
+
+    The UDFs are computed batch by batch. The batches keep the temporary columns of the plan, so
+    they still need to be finalized. An empty result yields a single empty batch with the schema of
+    the query.
+    """
+    reader = self._pool.execute(con, plan.query, plan.params).fetch_record_batch(batch_size)
+    num_batches = 0
+    for batch in reader:
+      num_batches += 1
+      yield self._compute_select_rows_udfs_batch(plan, batch)
+    if not num_batches:
+      yield pa.RecordBatch.from_pylist([], schema=reader.schema)
+    reader.close()
+
+  def _compute_select_rows_udfs_batch(
+    self, plan: DuckDBSelectRowsPlan, batch: pa.RecordBatch
+  ) -> pa.RecordBatch:
+    """Runs the UDFs of a `select_rows` query on an Arrow batch of fetched rows.
+
+    Only the inputs of the UDFs are converted to Python. Their outputs replace the inputs.
+    """
+    if not plan.udf_columns or not batch.num_rows:
+      return batch
+    udf_inputs: dict[str, Column] = {}
+    input_names = [ROWID] if ROWID in batch.schema.names else []
+    for udf_col in plan.udf_columns:
+      for temp_col_name in plan.columns_to_merge[udf_col.alias or _unique_alias(udf_col)]:
+        udf_inputs[temp_col_name] = udf_col
+        input_names.append(temp_col_name)
+        if temp_col_name in plan.temp_column_to_offset_column:
+          input_names.append(plan.temp_column_to_offset_column[temp_col_name][0])
+    df = pd.DataFrame({name: batch.column(name).to_pylist() for name in input_names})
+    self._compute_select_rows_udfs(plan, df)
+
+    columns: dict[str, pa.Array] = dict(zip(batch.schema.names, batch.columns))
+    for temp_col_name, udf_col in udf_inputs.items():
+      columns[temp_col_name] = _udf_arrow_array(udf_col, df[temp_col_name].tolist())
+    return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns.keys()))
+
+  def _select_rows_udf_top_k_table(
+    self, con: duckdb.DuckDBPyConnection, plan: DuckDBSelectRowsPlan, limit: Optional[int]
+  ) -> tuple[pa.Table, int]:
+    """Filters and sorts by UDF outputs, like `_select_rows_udf_top_k`, on Arrow batches.
+
+    With a limit, only a batch of rows and the best `limit + offset` rows seen so far are held in
+    memory.
+
+    Returns the rows with the temporary columns of the plan, and the number of rows that pass the
+    UDF filters.
+    """
+    k = limit + plan.offset if limit else None
+    filter_sql = ' AND '.join(self._create_where(plan.manifest, plan.udf_filters))
+    # Ties keep the order of the DuckDB query, as in a stable sort.
+    order_sql = ', '.join(
+      [f'{sql} {plan.sort_order.value}' for sql in plan.sort_sql_after_udf] + [POSITION_COLUMN]
+    )
+    total_num_rows = 0 if filter_sql else plan.total_num_rows
+    tables: list[pa.Table] = []
+
+    # The result is streamed from `con`, so the batches are merged on another cursor.
+    with self._pool.cursor() as merge_con:
+
+      def top_rows() -> pa.Table:
+        candidates = pa.concat_tables(tables, promote_options='permissive')
+        if not candidates.num_rows:
+          return candidates
+        positions = pa.array(range(candidates.num_rows), type=pa.int64())
+        rel = merge_con.from_arrow(candidates.append_column(POSITION_COLUMN, positions))
+        if filter_sql:
+          rel = rel.filter(filter_sql)
+        rel = rel.order(order_sql)
+        if k:
+          rel = rel.limit(k)
+        return rel.arrow().drop([POSITION_COLUMN])
+
+      for batch in self._select_rows_record_batches(con, plan):
+        table = pa.Table.from_batches([batch])
+        if filter_sql and table.num_rows:
+          count = merge_con.from_arrow(table).filter(filter_sql).count('*').fetchone()
+          total_num_rows += cast(tuple, count)[0]
+        tables.append(table)
+        if k:
+          tables = [top_rows()]
+      result = top_rows()
+
+    if k:
+      result = result.slice(plan.offset)
+    return result, total_num_rows
+
+  @override
+  def select_rows_batches(
+    self,
+    columns: Optional[Sequence[ColumnId]] = None,
+    searches: Optional[Sequence[Search]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    sort_by: Optional[Sequence[Path]] = None,
+    sort_order: Optional[SortOrder] = SortOrder.DESC,
+    limit: Optional[int] = None,
+    offset: Optional[int] = 0,
+    resolve_span: bool = False,
+    include_deleted: bool = False,
+    exclude_signals: bool = False,
+    user: Optional[UserInfo] = None,
+    batch_size: int = SELECT_ROWS_BATCH_SIZE,
+  ) -> Iterator[pa.RecordBatch]:
+    select_schema = self.select_rows_schema(
+      columns, sort_by, sort_order, searches, combine_columns=True, exclude_signals=exclude_signals
+    )
+    arrow_schema = schema_to_arrow_schema(select_schema.data_schema)
+    with self._pin_rowid_tables(), self._cursor() as con:
+      plan = self._plan_select_rows(
+        con,
+        columns=columns,
+        searches=searches,
+        filters=filters,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        offset=offset,
+        resolve_span=resolve_span,
+        combine_columns=True,
+        include_deleted=include_deleted,
+        exclude_signals=exclude_signals,
+        user=user,
+      )
+      batches: Iterable[pa.RecordBatch]
+      if plan.udf_filters or plan.sort_sql_after_udf:
+        # Filtering or sorting by a UDF requires the UDF outputs of all rows before the first batch.
+        table, _ = self._select_rows_udf_top_k_table(con, plan, limit)
+        batches = table.to_batches(max_chunksize=batch_size)
+      else:
+        batches = self._select_rows_record_batches(con, plan, batch_size)
+      for batch in batches:
+        if batch.num_rows:
+          yield _finalize_select_rows_batch(plan, batch, arrow_schema)
+
+  def _select_rows_chunks(
+    self,
+    columns: Optional[Sequence[ColumnId]] = None,
+    searches: Optional[Sequence[Search]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    sort_by: Optional[Sequence[Path]] = None,
+    sort_order: Optional[SortOrder] = SortOrder.DESC,
+    limit: Optional[int] = None,
+    offset: Optional[int] = 0,
+    resolve_span: bool = False,
+    combine_columns: bool = False,
+    include_deleted: bool = False,
+    exclude_signals: bool = False,
+    user: Optional[UserInfo] = None,
+    batch_size: int = SELECT_ROWS_BATCH_SIZE,
+  ) -> Iterator[pd.DataFrame]:
+    """Yields the results of `select_rows` as data frames of at most `batch_size` rows.
+
+    The rows are streamed from DuckDB, so only one batch is held in memory at a time. Filtering or
+    sorting by a UDF requires all the UDF outputs, so those queries are computed at once and then
+    split into batches.
+    """
+    with self._pin_rowid_tables(), self._cursor() as con:
+      plan = self._plan_select_rows(
+        con,
+        columns=columns,
+        searches=searches,
+        filters=filters,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit,
+        offset=offset,
+        resolve_span=resolve_span,
+        combine_columns=combine_columns,
+        include_deleted=include_deleted,
+        exclude_signals=exclude_signals,
+        user=user,
+      )
+      if not plan.udf_filters and not plan.sort_sql_after_udf:
+        result = self._pool.execute(con, plan.query, plan.params)
+        # DuckDB fetches data frames in vectors of 2048 rows.
+        vectors_per_chunk = max(1, batch_size // duckdb.__standard_vector_size__)
+        while True:
+          df = result.fetch_df_chunk(vectors_per_chunk)
+          if df.empty:
+            break
+          if plan.cursor_columns:
+            df = df.drop(columns=plan.cursor_columns)
+          df = _replace_nan_with_none(df)
+          for i in range(0, len(df), batch_size):
+            batch_df = df.iloc[i : i + batch_size].reset_index(drop=True)
+            self._compute_select_rows_udfs(plan, batch_df)
+            yield _finalize_select_rows_df(plan, batch_df)
+        return
+
+    df = self.select_rows(
+      columns,
+      searches,
+      filters,
+      sort_by,
+      sort_order,
+      limit,
+      offset,
+      resolve_span,
+      combine_columns,
+      include_deleted,
+      exclude_signals,
+      user,
+    ).df()
+    for i in range(0, len(df), batch_size):
+      yield df.iloc[i : i + batch_size].reset_index(drop=True)
+
+  def _plan_select_rows(
+    self,
+    con: duckdb.DuckDBPyConnection,
+    columns: Optional[Sequence[ColumnId]] = None,
+    searches: Optional[Sequence[Search]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    sort_by: Optional[Sequence[Path]] = None,
+    sort_order: Optional[SortOrder] = SortOrder.DESC,
+    limit: Optional[int] = None,
+    offset: Optional[int] = 0,
+    resolve_span: bool = False,
+    combine_columns: bool = False,
+    include_deleted: bool = False,
+    exclude_signals: bool = False,
+    user: Optional[UserInfo] = None,
+    cursor: Optional[str] = None,
+  ) -> DuckDBSelectRowsPlan:
+    """Compiles the arguments of `select_rows` to a DuckDB query, and counts the matching rows."""
     manifest = self.manifest()
     cols = self._normalize_columns(columns, manifest.data_schema, combine_columns)
     offset = offset or 0
@@ -2220,7 +3964,8 @@ class DatasetDuckDB(Dataset):
       if col.path == (ROWID,):
         temp_rowid_selected = False
         break
-      if isinstance(col.signal_udf, VectorSignal):
+      # Vector signals look up embeddings by rowid, and cached UDF outputs are keyed by rowid.
+      if isinstance(col.signal_udf, (VectorSignal, *CACHED_UDF_SIGNALS)):
         temp_rowid_selected = True
     if temp_rowid_selected:
       cols.append(Column(ROWID))
@@ -2240,6 +3985,19 @@ class DatasetDuckDB(Dataset):
     # provide any sort_by, we default to UUID, ascending.
     sort_order = sort_results[0].order if sort_results else SortOrder.ASC
 
+    # Without another sort, rank the rows of a keyword search over a keyword index by BM25.
+    from_query = 't'
+    keyword_ranked = False
+    if not sort_results:
+      for search in searches:
+        keyword_index_search = self._keyword_index_search(search)
+        if keyword_index_search:
+          score_sql = _keyword_score_sql(*keyword_index_search)
+          from_query = f't JOIN ({score_sql}) USING ({ROWID})'
+          keyword_ranked = True
+          sort_order = SortOrder.DESC
+          break
+
     col_aliases: dict[str, PathTuple] = {col.alias: col.path for col in cols if col.alias}
     udf_aliases: dict[str, PathTuple] = {
       col.alias: col.path for col in cols if col.signal_udf and col.alias
@@ -2264,30 +4022,26 @@ class DatasetDuckDB(Dataset):
       where_query = f"WHERE {' AND '.join(filter_queries)}"
 
     total_num_rows = manifest.num_items
-    con = self.con.cursor()
 
     topk_udf_col = self._topk_udf_to_sort_by(udf_columns, filters, sort_by, limit, sort_order)
     if topk_udf_col:
       rowids: Optional[list[str]] = None
       if where_query:
         # If there are filters, we need to send rowids to the top k query.
-        df = con.execute(f'SELECT {ROWID} FROM t {where_query}').df()
+        from_table = self._joint_view(filters=filters)
+        df = self._pool.execute(con, f'SELECT {ROWID} FROM {from_table} {where_query}').df()
         total_num_rows = len(df)
         rowids = [rowid for rowid in df[ROWID]]
 
       if rowids is not None and len(rowids) == 0:
         where_query = 'WHERE false'
       else:
-        topk_signal = cast(VectorSignal, topk_udf_col.signal_udf)
-        # The input is an embedding.
-        vector_index = self._get_vector_db_index(topk_signal.embedding, topk_udf_col.path)
-        k = (limit or 0) + offset
-        path_id = f'{self.namespace}/{self.dataset_name}:{topk_udf_col.path}'
-        with DebugTimer(
-          f'Computing topk on {path_id} with embedding "{topk_signal.embedding}" '
-          f'and vector store "{vector_index._vector_store.name}"'
-        ):
-          topk = topk_signal.vector_compute_topk(k, vector_index, rowids)
+        with warm_signal(cast(VectorSignal, topk_udf_col.signal_udf)) as topk_signal:
+          # The input is an embedding.
+          vector_index = self._get_vector_db_index(topk_signal.embedding, topk_udf_col.path)
+          k = (limit or 0) + offset
+          with VECTOR_TOPK_SECONDS.time(vector_store=vector_index._vector_store.name):
+            topk = topk_signal.vector_compute_topk(k, vector_index, rowids)
         topk_rowids = list(dict.fromkeys([cast(str, rowid) for (rowid, *_), _ in topk]))
         # Update the offset to account for the number of unique rowids.
         offset = len(dict.fromkeys([cast(str, rowid) for (rowid, *_), _ in topk[:offset]]))
@@ -2301,6 +4055,8 @@ class DatasetDuckDB(Dataset):
     columns_to_merge: dict[str, dict[str, Column]] = {}
     temp_column_to_offset_column: dict[str, tuple[str, Field]] = {}
     select_queries: list[str] = []
+    # UDF columns that are computed in DuckDB instead of in Python.
+    sql_udf_columns: list[Column] = []
 
     row_id_selected = False
     for column in cols:
@@ -2329,6 +4085,17 @@ class DatasetDuckDB(Dataset):
           empty=empty,
           span_from=span_from,
         )
+        if (
+          isinstance(column.signal_udf, SubstringSignal)
+          and len(duckdb_paths) == 1
+          and not span_from
+          and PATH_WILDCARD not in path
+          and schema.get_field(path).dtype == STRING
+        ):
+          spans_sql = _substring_spans_sql(sql, column.signal_udf)
+          if spans_sql:
+            sql = spans_sql
+            sql_udf_columns.append(column)
         temp_column_name = (
           final_col_name if len(duckdb_paths) == 1 else f'{final_col_name}/{parquet_id}'
         )
@@ -2355,14 +4122,13 @@ class DatasetDuckDB(Dataset):
       if select_sqls:
         select_queries.append(', '.join(select_sqls))
 
-    sort_sql_before_udf: list[str] = []
+    sort_sql_before_udf: list[str] = [KEYWORD_SCORE_COLUMN] if keyword_ranked else []
     sort_sql_after_udf: list[str] = []
 
     for path in sort_by:
       # We only allow sorting by nodes with a value.
       first_subpath = str(path[0])
       rest_of_path = path[1:]
-      signal_alias = '.'.join(map(str, path))
 
       udf_path = _path_to_udf_duckdb_path(path, path_to_udf_col_name)
       if not udf_path:
@@ -2407,133 +4173,165 @@ class DatasetDuckDB(Dataset):
       else:
         limit_query = f'LIMIT {limit} OFFSET {offset}'
 
-    if not topk_udf_col and where_query:
-      total_num_rows = cast(tuple, con.execute(f'SELECT COUNT(*) FROM t {where_query}').fetchone())[
-        0
-      ]
-
-    # Fetch the data from DuckDB.
-    df = con.execute(
-      f"""
-      SELECT {', '.join(select_queries)} FROM t
-      {where_query}
-      {order_query}
-      {limit_query}
-    """
-    ).df()
-    df = _replace_nan_with_none(df)
-
-    # Run UDFs on the transformed columns.
-    for udf_col in udf_columns:
-      signal = cast(Signal, udf_col.signal_udf)
-      signal_alias = udf_col.alias or _unique_alias(udf_col)
-      temp_signal_cols = columns_to_merge[signal_alias]
-      if len(temp_signal_cols) != 1:
+    # Keyset pagination seeks past the sort key of the last row of the previous page. This requires
+    # the final order to be decided in DuckDB.
+    supports_cursor = not topk_udf_col and not sort_sql_after_udf and not udf_filters
+    seek_params: list[Any] = []
+    if cursor:
+      if not supports_cursor:
         raise ValueError(
-          f'Unable to compute signal {signal.name}. Signal UDFs only operate on leafs, but got '
-          f'{len(temp_signal_cols)} underlying columns that contain data related to {udf_col.path}.'
+          'Cursors are not supported when sorting by, or filtering on, a signal UDF, or when '
+          'sorting by semantic similarity.'
         )
-      signal_column = list(temp_signal_cols.keys())[0]
-      input = df[signal_column]
+      cursor_total_num_rows, sort_values = _decode_cursor(cursor, len(sort_sql_before_udf))
+      total_num_rows = cursor_total_num_rows
+      seek_query, seek_params = _cursor_seek_query(sort_sql_before_udf, sort_order, sort_values)
+      where_query = f'{where_query} AND {seek_query}' if where_query else f'WHERE {seek_query}'
+    elif not topk_udf_col and where_query:
+      from_table = self._joint_view(filters=filters)
+      total_num_rows = cast(
+        tuple,
+        self._pool.execute(con, f'SELECT COUNT(*) FROM {from_table} {where_query}').fetchone(),
+      )[0]
+
+    cursor_columns: list[str] = []
+    if limit and supports_cursor:
+      cursor_columns = [f'{CURSOR_COLUMN_PREFIX}{i}' for i in range(len(sort_sql_before_udf))]
+      # Wrap the sort keys in a list so pandas doesn't convert a NULL into a NaN.
+      select_queries.extend(
+        f'[{sql}] AS {escape_col_name(col)}'
+        for sql, col in zip(sort_sql_before_udf, cursor_columns)
+      )
 
-      path_id = f'{self.namespace}/{self.dataset_name}:{udf_col.path}'
-      with DebugTimer(f'Computing signal "{signal.name}" on {path_id}'):
-        signal.setup()
+    return DuckDBSelectRowsPlan(
+      query=f"""
+        SELECT {', '.join(select_queries)} FROM {from_query}
+        {where_query}
+        {order_query}
+        {limit_query}
+      """,
+      params=seek_params,
+      total_num_rows=total_num_rows,
+      manifest=manifest,
+      udf_columns=[col for col in udf_columns if col not in sql_udf_columns],
+      columns_to_merge=columns_to_merge,
+      temp_column_to_offset_column=temp_column_to_offset_column,
+      temp_rowid_selected=temp_rowid_selected,
+      combine_columns=combine_columns,
+      udf_filters=udf_filters,
+      sort_sql_after_udf=sort_sql_after_udf,
+      sort_order=sort_order,
+      offset=offset,
+      cursor_columns=cursor_columns,
+    )
 
-        if isinstance(signal, VectorSignal):
-          embedding_signal = signal
-          self._assert_embedding_exists(udf_col.path, embedding_signal.embedding)
+  @profile_phase('udf')
+  def _compute_select_rows_udfs(self, plan: 'DuckDBSelectRowsPlan', df: pd.DataFrame) -> None:
+    """Runs the UDFs of a `select_rows` query on the fetched rows, in place.
 
-          vector_store = self._get_vector_db_index(embedding_signal.embedding, udf_col.path)
-          flat_keys = flatten_keys(df[ROWID], input)
-          signal_out = sparse_to_dense_compute(
-            flat_keys, lambda keys: embedding_signal.vector_compute(vector_store.get(keys))
-          )
-          df[signal_column] = list(unflatten_iter(signal_out, input))
-        else:
-          num_rich_data = count_leafs(input)
-          flat_input = cast(Iterator[Optional[RichData]], flatten_iter(input))
-          signal_out = sparse_to_dense_compute(
-            flat_input, lambda x: signal.compute(cast(Iterable[RichData], x))
+    Independent UDF columns are computed concurrently on a thread pool.
+    """
+    if len(plan.udf_columns) <= 1:
+      outputs = [self._compute_select_rows_udf(plan, df, udf_col) for udf_col in plan.udf_columns]
+    else:
+      with ThreadPoolExecutor(max_workers=len(plan.udf_columns)) as executor:
+        # Each UDF runs in a copy of the context so it sees the cancellation token of the query.
+        futures = [
+          executor.submit(
+            contextvars.copy_context().run, self._compute_select_rows_udf, plan, df, udf_col
           )
-          signal_out_list = list(signal_out)
-          if signal_column in temp_column_to_offset_column:
-            offset_column_name, field = temp_column_to_offset_column[signal_column]
-            nested_spans: Iterable[Item] = df[offset_column_name]
-            flat_spans = flatten_iter(nested_spans)
-            for text_span, item in zip(flat_spans, signal_out_list):
-              _offset_any_span(cast(int, text_span[SPAN_KEY][TEXT_SPAN_START_FEATURE]), item, field)
-
-          if len(signal_out_list) != num_rich_data:
-            raise ValueError(
-              f'The signal generated {len(signal_out_list)} values but the input data had '
-              f"{num_rich_data} values. This means the signal either didn't generate a "
-              '"None" for a sparse output, or generated too many items.'
-            )
-
-          df[signal_column] = list(unflatten_iter(signal_out_list, input))
-
-        signal.teardown()
-
-    if not df.empty and (udf_filters or sort_sql_after_udf):
-      # Re-upload the udf outputs to duckdb so we can filter/sort on them.
-      rel = con.from_df(df)
-
-      if udf_filters:
-        udf_filter_queries = self._create_where(manifest, udf_filters)
-        if udf_filter_queries:
-          rel = rel.filter(' AND '.join(udf_filter_queries))
-          count = rel.count('*').fetchone()
-          assert count is not None
-          (total_num_rows,) = count
-
-      if sort_sql_after_udf:
-        rel = rel.order(', '.join([f'{s} {sort_order.value}' for s in sort_sql_after_udf]))
-
-      if limit:
-        rel = rel.limit(limit, offset)
-
-      df = _replace_nan_with_none(rel.df())
-
-    if temp_rowid_selected:
-      del df[ROWID]
-      del columns_to_merge[ROWID]
-
-    if combine_columns:
-      all_columns: dict[str, Column] = {}
-      for col_dict in columns_to_merge.values():
-        all_columns.update(col_dict)
-      columns_to_merge = {'*': all_columns}
-
-    for offset_column, _ in temp_column_to_offset_column.values():
-      del df[offset_column]
-
-    for final_col_name, temp_columns in columns_to_merge.items():
-      for temp_col_name, column in temp_columns.items():
-        if combine_columns:
-          dest_path = _col_destination_path(column)
-          spec = _split_path_into_subpaths_of_lists(dest_path)
-          df[temp_col_name] = list(wrap_in_dicts(df[temp_col_name], spec))
-
-        # If the temp col name is the same as the final name, we can skip merging. This happens when
-        # we select a source leaf column.
-        if temp_col_name == final_col_name:
-          continue
-
-        if final_col_name not in df:
-          df[final_col_name] = df[temp_col_name]
-        else:
-          df[final_col_name] = merge_series(df[final_col_name], df[temp_col_name])
-        del df[temp_col_name]
+          for udf_col in plan.udf_columns
+        ]
+        outputs = [future.result() for future in futures]
+    # Write the outputs in this thread since pandas is not thread-safe for concurrent writes.
+    for signal_column, values in outputs:
+      df[signal_column] = values
+
+  def _compute_select_rows_udf(
+    self, plan: 'DuckDBSelectRowsPlan', df: pd.DataFrame, udf_col: Column
+  ) -> tuple[str, list[Any]]:
+    """Computes a UDF column of a `select_rows` query. Returns the column name and its values."""
+    raise_if_cancelled()
+    # The signal is checked out until its values are computed, so it is not torn down meanwhile.
+    with warm_signal(cast(Signal, udf_col.signal_udf)) as signal:
+      return self._compute_warm_select_rows_udf(plan, df, udf_col, signal)
+
+  def _compute_warm_select_rows_udf(
+    self, plan: 'DuckDBSelectRowsPlan', df: pd.DataFrame, udf_col: Column, signal: Signal
+  ) -> tuple[str, list[Any]]:
+    signal_alias = udf_col.alias or _unique_alias(udf_col)
+    temp_signal_cols = plan.columns_to_merge[signal_alias]
+    if len(temp_signal_cols) != 1:
+      raise ValueError(
+        f'Unable to compute signal {signal.name}. Signal UDFs only operate on leafs, but got '
+        f'{len(temp_signal_cols)} underlying columns that contain data related to {udf_col.path}.'
+      )
+    signal_column = list(temp_signal_cols.keys())[0]
+
+    udf_cache = self._udf_cache
+    if not udf_cache or not isinstance(signal, CACHED_UDF_SIGNALS) or ROWID not in df:
+      return signal_column, self._compute_udf_values(plan, df, udf_col, signal, signal_column)
+
+    group = orjson.dumps([signal.model_dump(exclude={'version'}), udf_col.path]).decode()
+    version = f'{_udf_signal_version(signal)}-{self._data_generation}'
+    rowids = cast(list[str], df[ROWID].tolist())
+    values = udf_cache.get_many(group, version, rowids)
+    missing_rows = [i for i, rowid in enumerate(rowids) if rowid not in values]
+    record_cache_lookups('udf', hits=len(rowids) - len(missing_rows), misses=len(missing_rows))
+    if missing_rows:
+      computed_values = self._compute_udf_values(
+        plan, df.iloc[missing_rows], udf_col, signal, signal_column
+      )
+      computed = dict(zip([rowids[i] for i in missing_rows], computed_values))
+      udf_cache.put_many(group, version, computed.items())
+      values.update(computed)
+    return signal_column, [values[rowid] for rowid in rowids]
 
-    con.close()
+  def _compute_udf_values(
+    self,
+    plan: 'DuckDBSelectRowsPlan',
+    df: pd.DataFrame,
+    udf_col: Column,
+    signal: Signal,
+    signal_column: str,
+  ) -> list[Any]:
+    """Computes the values of a UDF column for the rows of the dataframe."""
+    input = df[signal_column]
+    UDF_ROWS.inc(len(df), signal=signal.name)
+    with UDF_COMPUTE_SECONDS.time(signal=signal.name):
+      if isinstance(signal, VectorSignal):
+        embedding_signal = signal
+        self._assert_embedding_exists(udf_col.path, embedding_signal.embedding)
+
+        vector_store = self._get_vector_db_index(embedding_signal.embedding, udf_col.path)
+        flat_keys = flatten_keys(df[ROWID], input)
+        signal_out = sparse_to_dense_compute(
+          cancellable_iter(flat_keys),
+          lambda keys: embedding_signal.vector_compute(vector_store.get(keys)),
+        )
+        return list(unflatten_iter(signal_out, input))
 
-    if combine_columns:
-      # Since we aliased every column to `*`, the object will have only '*' as the key. We need to
-      # elevate the all the columns under '*'.
-      df = pd.DataFrame.from_records(df['*'])
+      num_rich_data = count_leafs(input)
+      flat_input = cast(Iterator[Optional[RichData]], flatten_iter(input))
+      signal_out = sparse_to_dense_compute(
+        cancellable_iter(flat_input), lambda x: signal.compute(cast(Iterable[RichData], x))
+      )
+      signal_out_list = list(signal_out)
+      if signal_column in plan.temp_column_to_offset_column:
+        offset_column_name, field = plan.temp_column_to_offset_column[signal_column]
+        nested_spans: Iterable[Item] = df[offset_column_name]
+        flat_spans = flatten_iter(nested_spans)
+        for text_span, item in zip(flat_spans, signal_out_list):
+          _offset_any_span(cast(int, text_span[SPAN_KEY][TEXT_SPAN_START_FEATURE]), item, field)
+
+      if len(signal_out_list) != num_rich_data:
+        raise ValueError(
+          f'The signal generated {len(signal_out_list)} values but the input data had '
+          f"{num_rich_data} values. This means the signal either didn't generate a "
+          '"None" for a sparse output, or generated too many items.'
+        )
 
-    return SelectRowsResult(df, total_num_rows)
+      return list(unflatten_iter(signal_out_list, input))
 
   @override
   def select_rows_schema(
@@ -2604,6 +4402,18 @@ class DatasetDuckDB(Dataset):
       data_schema=new_schema, udfs=udfs, search_results=search_results, sorts=sort_results or None
     )
 
+  def _labels_filepath(self, name: str) -> str:
+    """Returns the file of a label. New labels are stored in the `LILAC_LABELS_BACKEND` format."""
+    parquet_filepath = get_labels_parquet_filename(self.dataset_path, name)
+    sqlite_filepath = get_labels_sqlite_filename(self.dataset_path, name)
+    if os.path.exists(parquet_filepath):
+      return parquet_filepath
+    if os.path.exists(sqlite_filepath):
+      return sqlite_filepath
+    if env('LILAC_LABELS_BACKEND', 'sqlite') == 'parquet':
+      return parquet_filepath
+    return sqlite_filepath
+
   @override
   def add_labels(
     self,
@@ -2624,9 +4434,8 @@ class DatasetDuckDB(Dataset):
       filters = list(filters) if filters else []
       filters.append(Filter(path=(ROWID,), op='in', value=list(row_ids)))
 
-    insert_row_ids = (
-      row[ROWID]
-      for row in self.select_rows(
+    insert_row_ids: list[str] = (
+      self.select_rows(
         columns=[ROWID],
         searches=searches,
         filters=filters,
@@ -2636,43 +4445,53 @@ class DatasetDuckDB(Dataset):
         offset=offset,
         include_deleted=include_deleted,
       )
+      .df()[ROWID]
+      .tolist()
     )
-
-    labels_filepath = get_labels_sqlite_filename(self.dataset_path, name)
-
+    num_labels = len(insert_row_ids)
+
+    labels = pa.table(
+      {
+        ROWID: pa.array(insert_row_ids, type=pa.string()),
+        SQLITE_LABEL_COLNAME: pa.array([value] * num_labels, type=pa.string()),
+        SQLITE_CREATED_COLNAME: pa.array([created] * num_labels, type=pa.timestamp('us')),
+      }
+    )
+    labels_filepath = self._labels_filepath(name)
     with self._label_file_lock[labels_filepath]:
-      # We don't cache sqlite connections as they cannot be shared across threads.
-      sqlite_con = sqlite3.connect(labels_filepath)
-      sqlite_cur = sqlite_con.cursor()
-
-      # Create the table if it doesn't exist.
-      sqlite_cur.execute(
-        f"""
-        CREATE TABLE IF NOT EXISTS "{name}" (
-          {ROWID} VARCHAR NOT NULL PRIMARY KEY,
-          label VARCHAR NOT NULL,
-          created DATETIME)
-      """
-      )
-
-      num_labels = 0
-      for row_id in insert_row_ids:
-        # We use ON CONFLICT to resolve the same row UUID being labeled again. In this case, we
-        # overwrite the existing label with the new label.
-        sqlite_cur.execute(
-          f"""
-            INSERT INTO "{name}" VALUES (?, ?, ?)
-            ON CONFLICT({ROWID}) DO UPDATE SET label=excluded.label;
-          """,
-          (row_id, value, created.isoformat()),
+      if labels_filepath.endswith(LABELS_PARQUET_SUFFIX):
+        _write_parquet_labels(
+          labels_filepath, _upsert_labels(_read_parquet_labels(labels_filepath), labels)
         )
-        num_labels += 1
-      sqlite_con.commit()
-      sqlite_con.close()
+      else:
+        # We don't cache sqlite connections as they cannot be shared across threads.
+        with closing(sqlite3.connect(labels_filepath)) as sqlite_con:
+          # Create the table if it doesn't exist.
+          sqlite_con.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS "{name}" (
+              {ROWID} VARCHAR NOT NULL PRIMARY KEY,
+              label VARCHAR NOT NULL,
+              created DATETIME)
+          """
+          )
+          created_str = created.isoformat()
+          for row_ids_batch in chunks(insert_row_ids, LABELS_SQLITE_BATCH_SIZE):
+            # We use ON CONFLICT to resolve the same row UUID being labeled again. In this case, we
+            # overwrite the existing label with the new label.
+            sqlite_con.executemany(
+              f"""
+                INSERT INTO "{name}" VALUES (?, ?, ?)
+                ON CONFLICT({ROWID}) DO UPDATE SET label=excluded.label;
+              """,
+              [(row_id, value, created_str) for row_id in row_ids_batch],
+            )
+          sqlite_con.commit()
+      self._update_label_table(name, labels_filepath, upsert=labels)
 
     # Any deleted rows will cause statistics to be out of date.
     if num_labels > 0 and name == DELETED_LABEL_NAME:
-      self.stats.cache_clear()
+      self._stats_cache.clear()
       self._pivot_cache.clear()
 
     return num_labels
@@ -2696,7 +4515,7 @@ class DatasetDuckDB(Dataset):
     include_deleted: bool = False,
   ) -> int:
     # Check if the label file exists.
-    labels_filepath = get_labels_sqlite_filename(self.dataset_path, name)
+    labels_filepath = self._labels_filepath(name)
 
     if not os.path.exists(labels_filepath):
       raise ValueError(f'Label with name "{name}" does not exist.')
@@ -2706,9 +4525,8 @@ class DatasetDuckDB(Dataset):
       filters = list(filters) if filters else []
       filters.append(Filter(path=(ROWID,), op='in', value=list(row_ids)))
 
-    remove_row_ids = [
-      row[ROWID]
-      for row in self.select_rows(
+    remove_row_ids: list[str] = (
+      self.select_rows(
         columns=[ROWID],
         searches=searches,
         filters=filters,
@@ -2718,25 +4536,40 @@ class DatasetDuckDB(Dataset):
         offset=offset,
         include_deleted=include_deleted,
       )
-    ]
+      .df()[ROWID]
+      .tolist()
+    )
 
     with self._label_file_lock[labels_filepath]:
-      with closing(sqlite3.connect(labels_filepath)) as conn:
-        conn.executemany(
-          f"""
-            DELETE FROM "{name}"
-            WHERE {ROWID} = ?
-          """,
-          [(x,) for x in remove_row_ids],
+      if labels_filepath.endswith(LABELS_PARQUET_SUFFIX):
+        labels = _read_parquet_labels(labels_filepath)
+        labels = labels.filter(
+          pc.invert(pc.is_in(labels[ROWID], value_set=pa.array(remove_row_ids, type=pa.string())))
         )
-        conn.commit()
-        if name != DELETED_LABEL_NAME:
-          count = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
-          if count == 0:
-            delete_file(labels_filepath)
+        if labels.num_rows == 0 and name != DELETED_LABEL_NAME:
+          delete_file(labels_filepath)
+        else:
+          _write_parquet_labels(labels_filepath, labels)
+      else:
+        with closing(sqlite3.connect(labels_filepath)) as conn:
+          for row_ids_batch in chunks(remove_row_ids, LABELS_SQLITE_BATCH_SIZE):
+            conn.executemany(
+              f"""
+                DELETE FROM "{name}"
+                WHERE {ROWID} = ?
+              """,
+              [(x,) for x in row_ids_batch],
+            )
+          conn.commit()
+          if name != DELETED_LABEL_NAME:
+            count = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+            if count == 0:
+              delete_file(labels_filepath)
+      if os.path.exists(labels_filepath):
+        self._update_label_table(name, labels_filepath, remove=remove_row_ids)
 
     if remove_row_ids and name == DELETED_LABEL_NAME:
-      self.stats.cache_clear()
+      self._stats_cache.clear()
       self._pivot_cache.clear()
 
     return len(remove_row_ids)
@@ -2965,6 +4798,10 @@ class DatasetDuckDB(Dataset):
       if f.op in RAW_SQL_OPS:
         sql_filter_queries.append(f.path[0])
         continue
+      label_probe_sql = self._label_probe_sql(f)
+      if label_probe_sql:
+        sql_filter_queries.append(label_probe_sql)
+        continue
       duckdb_path = self._leaf_path_to_duckdb_path(f.path, manifest.data_schema)
       select_str = self._select_sql(
         duckdb_path,
@@ -3036,12 +4873,24 @@ class DatasetDuckDB(Dataset):
           filter_list_val = cast(FeatureListValue, f.value)
           if not isinstance(filter_list_val, list):
             raise ValueError('filter with array value can only use the IN comparison')
-          filter_list_val = [escape_string_literal(val) for val in filter_list_val]
+          rowid_table_threshold = int(
+            env('LILAC_ROWID_TABLE_THRESHOLD', DEFAULT_ROWID_TABLE_THRESHOLD)
+          )
           if len(filter_list_val) == 1:
-            filter_query = f'{select_str} = {filter_list_val[0]}'
+            filter_query = f'{select_str} = {escape_string_literal(filter_list_val[0])}'
           else:
-            filter_val = f'({", ".join(filter_list_val)})'
-            filter_query = f'{select_str} IN {filter_val}'
+            if (
+              f.path == (ROWID,)
+              and len(filter_list_val) > rowid_table_threshold
+              and self._rowid_table_pins() is not None
+            ):
+              # Large lists of rowids, e.g. from top-k results or labeling, are semi-joined against
+              # a table instead of being inlined in the SQL.
+              rowid_table = self._rowid_table(cast(list[str], filter_list_val))
+              filter_query = f'{select_str} IN (SELECT {ROWID} FROM {rowid_table})'
+            else:
+              filter_val = f'({", ".join(escape_string_literal(v) for v in filter_list_val)})'
+              filter_query = f'{select_str} IN {filter_val}'
 
             # Optimization for "rowid IN (...)" queries - there is an index on rowid, but
             # duckdb does a full index scan when the IN clause is present, instead of the hash join.
@@ -3049,7 +4898,8 @@ class DatasetDuckDB(Dataset):
             # works well because nearly all of our queries are sorted by rowid, meaning that min/max
             # will narrow down the index scan to a small range.
             if env('LILAC_USE_TABLE_INDEX', default=False) and ROWID in select_str:
-              min_row, max_row = min(filter_list_val), max(filter_list_val)
+              min_row = escape_string_literal(min(filter_list_val))
+              max_row = escape_string_literal(max(filter_list_val))
               filter_query += f' AND {ROWID} BETWEEN {min_row} AND {max_row}'
               # wrap in parens to isolate from other filters, just in case?
               filter_query = f'({filter_query})'
@@ -3060,32 +4910,163 @@ class DatasetDuckDB(Dataset):
       sql_filter_queries.append(filter_query)
     return sql_filter_queries
 
-  def _execute(self, query: str) -> duckdb.DuckDBPyConnection:
+  def _label_probe_sql(self, f: Filter) -> Optional[str]:
+    """Returns a probe of the label table for whether rows have a label, e.g. are deleted.
+
+    The rowids are probed in the label table, so the filter doesn't read the joined label column.
+    Returns None for filters that don't test for a label.
+    """
+    if f.op not in ('exists', 'not_exists'):
+      return None
+    # A label exists when its struct exists, which is when its `label` field is set.
+    if not f.path or f.path[1:] not in ((), (SQLITE_LABEL_COLNAME,)):
+      return None
+    label_name = str(f.path[0])
+    if label_name not in self._label_schemas:
+      return None
+    label_table = escape_col_name(f'{LABEL_TABLE_PREFIX}{label_name}')
+    negate_sql = 'NOT ' if f.op == 'not_exists' else ''
+    return (
+      f'{ROWID} {negate_sql}IN '
+      f'(SELECT {ROWID} FROM {label_table} WHERE {SQLITE_LABEL_COLNAME} IS NOT NULL)'
+    )
+
+  def _not_deleted_sql(self) -> str:
+    """Returns the filter of the rows that are not deleted."""
+    return cast(str, self._label_probe_sql(Filter(path=(DELETED_LABEL_NAME,), op='not_exists')))
+
+  def _joint_view(
+    self,
+    paths: Iterable[PathTuple] = (),
+    filters: Iterable[Filter] = (),
+    from_sample: bool = False,
+  ) -> str:
+    """Returns the view to query for reading `paths` and filtering by `filters`.
+
+    The view without the labels is returned when no label column is read, so the query skips the
+    label joins.
+    """
+    reads_labels = any(str(path[0]) in self._label_schemas for path in paths) or any(
+      f.op in RAW_SQL_OPS
+      or (str(f.path[0]) in self._label_schemas and self._label_probe_sql(f) is None)
+      for f in filters
+    )
+    if from_sample:
+      return SAMPLE_VIEW_NAME if reads_labels else SAMPLE_TABLE_NAME
+    return 't' if reads_labels else DATA_VIEW_NAME
+
+  @contextlib.contextmanager
+  def _pin_rowid_tables(self) -> Iterator[None]:
+    """Keeps the rowid tables of the queries compiled in this context until the context exits.
+
+    Wrap both compiling and running a query, since the query refers to its rowid tables by name.
+    Rowid filters that are compiled outside of this context are inlined in the SQL.
+    """
+    # Every context pins its own tables. A generator that is suspended in this context leaves it
+    # set for its caller, so an enclosing context must not collect the pins of other queries.
+    pinned: list[str] = []
+    outer = _pinned_rowid_tables.get()
+    _pinned_rowid_tables.set((self, pinned))
+    try:
+      yield
+    finally:
+      # Set instead of reset, since generators can be closed from another context.
+      _pinned_rowid_tables.set(outer)
+      with self._rowid_tables_lock:
+        self._rowid_table_users.subtract(pinned)
+      self._drop_unused_rowid_tables()
+
+  def _rowid_table_pins(self) -> Optional[list[str]]:
+    """Returns the tables pinned by the current `_pin_rowid_tables` context of this dataset."""
+    context = _pinned_rowid_tables.get()
+    if context is None or context[0] is not self:
+      return None
+    return context[1]
+
+  def _rowid_table(self, rowids: list[str]) -> str:
+    """Returns the name of a table with the rowids, creating it when it doesn't exist yet.
+
+    Tables are named by a hash of the rowids, so repeated queries with the same rowids share a
+    table. The table is pinned until the enclosing `_pin_rowid_tables` context exits. The least
+    recently used tables that are not pinned are dropped when there are more than
+    `MAX_ROWID_TABLES`.
+    """
+    pinned = self._rowid_table_pins()
+    assert pinned is not None, 'Rowid tables must be created in a `_pin_rowid_tables` context.'
+    rowids_hash = hashlib.sha256('\n'.join(rowids).encode()).hexdigest()[:32]
+    table_name = f'{ROWID_TABLE_PREFIX}{rowids_hash}'
+    with self._rowid_tables_lock:
+      if self._rowid_tables.get(table_name) == self._pool.connection_id:
+        self._pin_rowid_table(table_name, pinned)
+        return table_name
+
+    # Tables are created and dropped under the write lock, so no query is bound against a table
+    # that is being dropped. The cursor is checked out before the rowid lock is taken, since a
+    # checkout can wait for a reconnect, which waits for the threads that wait for the rowid lock.
+    with self._pool.write() as con, self._rowid_tables_lock:
+      if self._rowid_tables.get(table_name) != self._pool.connection_id:
+        rowids_table = pa.table({ROWID: pa.array(rowids, type=pa.string())})
+        con.register('rowids_arrow', rowids_table)
+        con.execute(f'CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM rowids_arrow')
+        con.unregister('rowids_arrow')
+        self._rowid_tables[table_name] = self._pool.connection_id
+      self._pin_rowid_table(table_name, pinned)
+    self._drop_unused_rowid_tables()
+    return table_name
+
+  def _pin_rowid_table(self, table_name: str, pinned: list[str]) -> None:
+    """Pins a rowid table for the current query. The caller must hold the rowid lock."""
+    self._rowid_tables.move_to_end(table_name)
+    self._rowid_table_users[table_name] += 1
+    pinned.append(table_name)
+
+  def _unused_rowid_tables(self) -> list[str]:
+    """Returns the rowid tables to drop. The caller must hold the rowid lock."""
+    num_droppable = len(self._rowid_tables) - MAX_ROWID_TABLES
+    if num_droppable <= 0:
+      return []
+    unused_tables = [
+      table_name for table_name in self._rowid_tables if self._rowid_table_users[table_name] <= 0
+    ]
+    return unused_tables[:num_droppable]
+
+  def _drop_unused_rowid_tables(self) -> None:
+    """Drops the least recently used rowid tables that no query uses."""
+    with self._rowid_tables_lock:
+      if not self._unused_rowid_tables():
+        return
+    with self._pool.write() as con, self._rowid_tables_lock:
+      for table_name in self._unused_rowid_tables():
+        connection_id = self._rowid_tables.pop(table_name)
+        del self._rowid_table_users[table_name]
+        # The tables of a closed connection are already gone.
+        if connection_id == self._pool.connection_id:
+          con.execute(f'DROP TABLE IF EXISTS {table_name}')
+
+  def _execute(self, con: duckdb.DuckDBPyConnection, query: str) -> duckdb.DuckDBPyConnection:
     """Execute a query in duckdb."""
-    # FastAPI is multi-threaded so we have to create a thread-specific connection cursor to allow
-    # these queries to be thread-safe.
-    local_con = self.con.cursor()
+    # FastAPI is multi-threaded so every query runs on a cursor checked out from the pool.
     if not env('DEBUG', False):
-      return local_con.execute(query)
+      return self._pool.execute(con, query)
 
     # Debug mode.
     log('Executing:')
     log(query)
     with DebugTimer('Query'):
-      return local_con.execute(query)
+      return self._pool.execute(con, query)
 
   def _query(self, query: str) -> list[tuple]:
-    result = self._execute(query)
-    rows = result.fetchall()
-    result.close()
-    return rows
+    with self._cursor() as con:
+      result = self._execute(con, query)
+      with profile_phase('convert'):
+        return result.fetchall()
 
   def _query_df(self, query: str) -> pd.DataFrame:
     """Execute a query that returns a data frame."""
-    result = self._execute(query)
-    df = _replace_nan_with_none(result.df())
-    result.close()
-    return df
+    with self._cursor() as con:
+      result = self._execute(con, query)
+      with profile_phase('convert'):
+        return _replace_nan_with_none(result.df())
 
   def _path_to_col(self, path: Path, quote_each_part: bool = True) -> str:
     """Convert a path to a column name."""
@@ -3283,7 +5264,7 @@ class DatasetDuckDB(Dataset):
       is_tmp_output=is_tmp_output,
     )
 
-    result = DuckDBMapOutput(con=self.con, query=json_query, output_path=output_path)
+    result = DuckDBMapOutput(pool=self._pool, query=json_query, output_path=output_path)
 
     if is_tmp_output:
       return result
@@ -3315,8 +5296,10 @@ class DatasetDuckDB(Dataset):
       parquet_id=get_map_parquet_id(output_path),
       py_version=metadata.version('lilac'),
     )
-    with open_file(map_manifest_filepath, 'w') as f:
-      f.write(map_manifest.model_dump_json(exclude_none=True, indent=2))
+    _write_manifest(
+      map_manifest_filepath, map_manifest.model_dump_json(exclude_none=True, indent=2)
+    )
+    self._write_sketches(output_path, map_manifest_filepath, [parquet_filepath])
 
     log(f'Wrote map output to {parquet_filename}')
 
@@ -3357,31 +5340,108 @@ class DatasetDuckDB(Dataset):
       skip_noisy_assignment=skip_noisy_assignment,
     )
 
-  @override
-  def to_huggingface(
+  def _export_filters(
     self,
-    columns: Optional[Sequence[ColumnId]] = None,
     filters: Optional[Sequence[FilterLike]] = None,
     include_labels: Optional[Sequence[str]] = None,
     exclude_labels: Optional[Sequence[str]] = None,
-    include_deleted: bool = False,
-    include_signals: bool = False,
-  ) -> HuggingFaceDataset:
+  ) -> list[Filter]:
     filters, _ = self._normalize_filters(
       filter_likes=filters, col_aliases={}, udf_aliases={}, manifest=self.manifest()
     )
     filters.extend(self._compile_include_exclude_filters(include_labels, exclude_labels))
-    rows = self.select_rows(
+    return filters
+
+  def _export_rows(
+    self,
+    columns: Optional[Sequence[ColumnId]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    include_labels: Optional[Sequence[str]] = None,
+    exclude_labels: Optional[Sequence[str]] = None,
+    include_deleted: bool = False,
+    include_signals: bool = False,
+  ) -> Iterator[Item]:
+    """Streams the rows of an export in batches, so the dataset is never fully in memory."""
+    for df in self._select_rows_chunks(
       columns,
-      filters=filters,
+      filters=self._export_filters(filters, include_labels, exclude_labels),
       combine_columns=True,
       include_deleted=include_deleted,
       exclude_signals=not include_signals,
+    ):
+      yield from SelectRowsResult(df, len(df))
+
+  def _export_with_copy(
+    self,
+    filepath: str,
+    copy_options: str,
+    supported_dtypes: Optional[set[str]],
+    columns: Optional[Sequence[ColumnId]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    include_labels: Optional[Sequence[str]] = None,
+    exclude_labels: Optional[Sequence[str]] = None,
+    include_deleted: bool = False,
+    include_signals: bool = False,
+    only_leaf_columns: bool = False,
+  ) -> bool:
+    """Exports the rows with a single DuckDB `COPY ... TO` query, without going through Python.
+
+    The fast path is taken when every exported column can be built in SQL: no signal is computed
+    on the fly, and no two selections need to be merged into the same column. Returns False when
+    the caller has to fall back to exporting the rows in Python.
+    """
+    if filepath.startswith(GCS_PROTOCOL):
+      return False
+    select_schema = self.select_rows_schema(
+      columns, combine_columns=True, exclude_signals=not include_signals
     )
+    if only_leaf_columns and any(
+      field.fields or field.repeated_field for field in select_schema.data_schema.fields.values()
+    ):
+      return False
+    leaf_dtypes = {
+      leaf.dtype.type for leaf in select_schema.data_schema.leafs.values() if leaf.dtype
+    }
+    if supported_dtypes is not None and not leaf_dtypes.issubset(supported_dtypes):
+      return False
+
+    with self._pin_rowid_tables(), self._cursor() as con:
+      plan = self._plan_select_rows(
+        con,
+        columns=columns,
+        filters=self._export_filters(filters, include_labels, exclude_labels),
+        limit=None,
+        combine_columns=True,
+        include_deleted=include_deleted,
+        exclude_signals=not include_signals,
+      )
+      select_sqls = _copy_export_select_sqls(plan)
+      if select_sqls is None:
+        return False
+      os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+      with DebugTimer(f'Exporting {plan.total_num_rows:,} rows to "{filepath}" with COPY'):
+        self._pool.execute(
+          con,
+          f"""COPY (SELECT {', '.join(select_sqls)} FROM ({plan.query}))
+            TO {escape_string_literal(filepath)} ({copy_options})""",
+          plan.params,
+        )
+    return True
 
+  @override
+  def to_huggingface(
+    self,
+    columns: Optional[Sequence[ColumnId]] = None,
+    filters: Optional[Sequence[FilterLike]] = None,
+    include_labels: Optional[Sequence[str]] = None,
+    exclude_labels: Optional[Sequence[str]] = None,
+    include_deleted: bool = False,
+    include_signals: bool = False,
+  ) -> HuggingFaceDataset:
     def _gen() -> Iterator[Item]:
-      for row in rows:
-        yield row
+      yield from self._export_rows(
+        columns, filters, include_labels, exclude_labels, include_deleted, include_signals
+      )
 
     return cast(HuggingFaceDataset, HuggingFaceDataset.from_generator(_gen))
 
@@ -3397,25 +5457,38 @@ class DatasetDuckDB(Dataset):
     include_deleted: bool = False,
     include_signals: bool = False,
   ) -> None:
-    filters, _ = self._normalize_filters(
-      filter_likes=filters, col_aliases={}, udf_aliases={}, manifest=self.manifest()
-    )
-    filters.extend(self._compile_include_exclude_filters(include_labels, exclude_labels))
-    rows = self.select_rows(
+    filepath = os.path.expanduser(filepath)
+    copy_options = 'FORMAT JSON' if jsonl else 'FORMAT JSON, ARRAY true'
+    if self._export_with_copy(
+      filepath,
+      copy_options,
+      COPY_JSON_DTYPES,
       columns,
-      filters=filters,
-      combine_columns=True,
-      include_deleted=include_deleted,
-      exclude_signals=not include_signals,
+      filters,
+      include_labels,
+      exclude_labels,
+      include_deleted,
+      include_signals,
+    ):
+      log(f'Dataset exported to {filepath}')
+      return
+
+    rows = self._export_rows(
+      columns, filters, include_labels, exclude_labels, include_deleted, include_signals
     )
-    filepath = os.path.expanduser(filepath)
     with open_file(filepath, 'wb') as file:
       if jsonl:
         for row in rows:
           file.write(orjson.dumps(row))
           file.write('\n'.encode('utf-8'))
       else:
-        file.write(orjson.dumps(list(rows)))
+        # Write the JSON array row by row to avoid holding all the rows in memory.
+        file.write(b'[')
+        for i, row in enumerate(rows):
+          if i > 0:
+            file.write(b',')
+          file.write(orjson.dumps(row))
+        file.write(b']')
     log(f'Dataset exported to {filepath}')
 
   @override
@@ -3428,16 +5501,8 @@ class DatasetDuckDB(Dataset):
     include_deleted: bool = False,
     include_signals: bool = False,
   ) -> pd.DataFrame:
-    filters, _ = self._normalize_filters(
-      filter_likes=filters, col_aliases={}, udf_aliases={}, manifest=self.manifest()
-    )
-    filters.extend(self._compile_include_exclude_filters(include_labels, exclude_labels))
-    rows = self.select_rows(
-      columns,
-      filters=filters,
-      combine_columns=True,
-      include_deleted=include_deleted,
-      exclude_signals=not include_signals,
+    rows = self._export_rows(
+      columns, filters, include_labels, exclude_labels, include_deleted, include_signals
     )
     return pd.DataFrame.from_records(list(rows))
 
@@ -3452,21 +5517,27 @@ class DatasetDuckDB(Dataset):
     include_deleted: bool = False,
     include_signals: bool = False,
   ) -> None:
-    manifest = self.manifest()
-    filters, _ = self._normalize_filters(
-      filter_likes=filters, col_aliases={}, udf_aliases={}, manifest=manifest
-    )
-    filters.extend(self._compile_include_exclude_filters(include_labels, exclude_labels))
-    select_schema = self.select_rows_schema(columns, combine_columns=True)
-    rows = self.select_rows(
+    filepath = os.path.expanduser(filepath)
+    if self._export_with_copy(
+      filepath,
+      'FORMAT CSV, HEADER',
+      COPY_CSV_DTYPES,
       columns,
-      filters=filters,
-      combine_columns=True,
-      include_deleted=include_deleted,
-      exclude_signals=not include_signals,
+      filters,
+      include_labels,
+      exclude_labels,
+      include_deleted,
+      include_signals,
+      only_leaf_columns=True,
+    ):
+      log(f'Dataset exported to {filepath}')
+      return
+
+    select_schema = self.select_rows_schema(columns, combine_columns=True)
+    rows = self._export_rows(
+      columns, filters, include_labels, exclude_labels, include_deleted, include_signals
     )
     fieldnames = list(select_schema.data_schema.fields.keys())
-    filepath = os.path.expanduser(filepath)
     with open_file(filepath, 'w') as file:
       writer = csv.DictWriter(file, fieldnames=fieldnames)
       writer.writeheader()
@@ -3484,26 +5555,35 @@ class DatasetDuckDB(Dataset):
     include_deleted: bool = False,
     include_signals: bool = False,
   ) -> None:
-    filters, _ = self._normalize_filters(
-      filter_likes=filters, col_aliases={}, udf_aliases={}, manifest=self.manifest()
-    )
-    filters.extend(self._compile_include_exclude_filters(include_labels, exclude_labels))
+    filepath = os.path.expanduser(filepath)
+    if self._export_with_copy(
+      filepath,
+      'FORMAT PARQUET',
+      COPY_DTYPES,
+      columns,
+      filters,
+      include_labels,
+      exclude_labels,
+      include_deleted,
+      include_signals,
+    ):
+      log(f'Dataset exported to {filepath}')
+      return
+
     select_schema = self.select_rows_schema(
       columns, combine_columns=True, exclude_signals=not include_signals
     )
-    rows = self.select_rows(
+    batches = self.select_rows_batches(
       columns,
-      filters=filters,
-      combine_columns=True,
+      filters=self._export_filters(filters, include_labels, exclude_labels),
       include_deleted=include_deleted,
       exclude_signals=not include_signals,
     )
-    filepath = os.path.expanduser(filepath)
     with open_file(filepath, 'wb') as f:
       writer = ParquetWriter(select_schema.data_schema)
       writer.open(f)
-      for row in rows:
-        writer.write(row)
+      for batch in batches:
+        writer.write_batch(batch)
       writer.close()
 
   def _assert_embedding_exists(self, path: PathTuple, embedding: str) -> None:
@@ -3520,6 +5600,7 @@ class DatasetDuckDB(Dataset):
     inner_var: Optional[str] = None,
     empty: bool = False,
     span_from: Optional[PathTuple] = None,
+    map_key: bool = False,
   ) -> str:
     """Recursively generate the inner select statement for a list of sub paths."""
     current_sub_path = sub_paths[0]
@@ -3528,8 +5609,16 @@ class DatasetDuckDB(Dataset):
       lambda_var = 'x'
       inner_var = escape_col_name(current_sub_path[0])
       current_sub_path = current_sub_path[1:]
-    # Select the path inside structs. E.g. x['a']['b']['c'] given current_sub_path = [a, b, c].
-    path_key = inner_var + ''.join([f'[{escape_string_literal(p)}]' for p in current_sub_path])
+    # Select the path inside structs. E.g. struct_extract(struct_extract(x, 'a'), 'b') given
+    # current_sub_path = [a, b]. Unlike x['a']['b'], struct_extract is pushed down into parquet
+    # scans, which lets selective filters skip row groups by their statistics.
+    path_key = inner_var
+    for i, sub_path in enumerate(current_sub_path):
+      is_map_key = len(sub_paths) == 1 and i == len(current_sub_path) - 1 and map_key
+      if is_map_key:
+        path_key = f'{path_key}[{escape_string_literal(sub_path)}]'
+      else:
+        path_key = f'struct_extract({path_key}, {escape_string_literal(sub_path)})'
     if len(sub_paths) == 1:
       if span_from:
         duckdb_path = self._leaf_path_to_duckdb_path(span_from, schema)
@@ -3543,7 +5632,7 @@ class DatasetDuckDB(Dataset):
       return 'NULL' if empty else path_key
     return (
       f'list_transform({path_key}, {lambda_var} -> '
-      f'{self._inner_select(sub_paths[1:], path, schema, lambda_var, empty, span_from)})'
+      f'{self._inner_select(sub_paths[1:], path, schema, lambda_var, empty, span_from, map_key)})'
     )
 
   def _select_sql(
@@ -3569,17 +5658,14 @@ class DatasetDuckDB(Dataset):
         to a substring of the original string.
     """
     sub_paths = _split_path_into_subpaths_of_lists(sql_path)
-    selection = self._inner_select(sub_paths, path, schema, None, empty, span_from)
-    # We only flatten when the result is a deeply nested list to avoid segfault.
-    # The nesting list level is a func of subpaths, e.g. subPaths = [[a, b, c], *, *] is 2 levels.
-    nesting_level = len(sub_paths) - 1
-
-    # If the parent field is a map, accessing a key returns a list, which increases nesting level:
-    # https://duckdb.org/docs/sql/data_types/map.html
+    # Keys of a map are accessed with brackets, fields of a struct with struct_extract.
+    map_key = False
     if len(path) > 1 and schema.has_field(path[:-1]):
       parent_field = schema.get_field(path[:-1])
-      if parent_field.dtype and parent_field.dtype.type == 'map':
-        nesting_level += 1
+      map_key = bool(parent_field.dtype and parent_field.dtype.type == 'map')
+    selection = self._inner_select(sub_paths, path, schema, None, empty, span_from, map_key)
+    # We only flatten when the result is a deeply nested list to avoid segfault.
+    nesting_level = self._select_nesting_level(sql_path, path, schema)
 
     is_result_nested_list = nesting_level >= 2
     if flatten and is_result_nested_list:
@@ -3590,12 +5676,30 @@ class DatasetDuckDB(Dataset):
       selection = f'unnest({selection})'
     return selection
 
+  def _select_nesting_level(self, sql_path: PathTuple, path: PathTuple, schema: Schema) -> int:
+    """Returns the list nesting level of the value selected by `_select_sql`."""
+    # The nesting list level is a func of subpaths, e.g. subPaths = [[a, b, c], *, *] is 2 levels.
+    nesting_level = len(_split_path_into_subpaths_of_lists(sql_path)) - 1
+
+    # If the parent field is a map, accessing a key returns a list, which increases nesting level:
+    # https://duckdb.org/docs/sql/data_types/map.html
+    if len(path) > 1 and schema.has_field(path[:-1]):
+      parent_field = schema.get_field(path[:-1])
+      if parent_field.dtype and parent_field.dtype.type == 'map':
+        nesting_level += 1
+    return nesting_level
+
   def _add_searches_to_filters(
     self, searches: Sequence[Search], filters: list[Filter]
   ) -> list[Filter]:
     for search in searches:
       search_path = normalize_path(search.path)
       if search.type == 'keyword':
+        keyword_index_search = self._keyword_index_search(search)
+        if keyword_index_search:
+          # The index finds a superset of the matches, so the substring filter only scans those.
+          match_sql = _keyword_match_sql(*keyword_index_search)
+          filters.append(Filter(path=(f'{ROWID} IN ({match_sql})',), op='raw_sql'))
         filters.append(Filter(path=search_path, op='ilike', value=search.query))
       elif search.type == 'semantic' or search.type == 'concept':
         # Semantic search and concepts don't yet filter.
@@ -3615,6 +5719,294 @@ def _escape_like_value(value: str) -> str:
   return f"{value} ESCAPE '\\'"
 
 
+def _copy_export_select_sqls(plan: DuckDBSelectRowsPlan) -> Optional[list[str]]:
+  """Returns the SQL selections that build the combined columns of `plan` for a COPY export.
+
+  Returns None when a column can only be built in Python, e.g. when it merges several selections,
+  or when a signal has to be computed on the fly.
+  """
+  if plan.udf_columns or plan.temp_column_to_offset_column or plan.temp_rowid_selected:
+    return None
+  select_sqls: dict[str, str] = {}
+  for temp_columns in plan.columns_to_merge.values():
+    for temp_col_name, column in temp_columns.items():
+      dest_path = _col_destination_path(column)
+      # A trailing wildcard selects the entire list, so it does not change the destination.
+      while dest_path and dest_path[-1] == PATH_WILDCARD:
+        dest_path = dest_path[:-1]
+      if not dest_path or PATH_WILDCARD in dest_path or dest_path[0] in select_sqls:
+        return None
+      sql = escape_col_name(temp_col_name)
+      for path_part in reversed(dest_path[1:]):
+        sql = f'struct_pack({escape_col_name(str(path_part))} := {sql})'
+      select_sqls[str(dest_path[0])] = f'{sql} AS {escape_col_name(str(dest_path[0]))}'
+  return list(select_sqls.values())
+
+
+@profile_phase('convert')
+def _finalize_select_rows_df(plan: DuckDBSelectRowsPlan, df: pd.DataFrame) -> pd.DataFrame:
+  """Merges the temporary columns of `select_rows` into the final columns."""
+  columns_to_merge = dict(plan.columns_to_merge)
+  if plan.temp_rowid_selected:
+    del df[ROWID]
+    del columns_to_merge[ROWID]
+
+  if plan.combine_columns:
+    all_columns: dict[str, Column] = {}
+    for col_dict in columns_to_merge.values():
+      all_columns.update(col_dict)
+    columns_to_merge = {'*': all_columns}
+
+  for offset_column, _ in plan.temp_column_to_offset_column.values():
+    del df[offset_column]
+
+  for final_col_name, temp_columns in columns_to_merge.items():
+    for temp_col_name, column in temp_columns.items():
+      if plan.combine_columns:
+        dest_path = _col_destination_path(column)
+        spec = _split_path_into_subpaths_of_lists(dest_path)
+        df[temp_col_name] = list(wrap_in_dicts(df[temp_col_name], spec))
+
+      # If the temp col name is the same as the final name, we can skip merging. This happens when
+      # we select a source leaf column.
+      if temp_col_name == final_col_name:
+        continue
+
+      if final_col_name not in df:
+        df[final_col_name] = df[temp_col_name]
+      else:
+        df[final_col_name] = merge_series(df[final_col_name], df[temp_col_name])
+      del df[temp_col_name]
+
+  if plan.combine_columns:
+    # Since we aliased every column to `*`, the object will have only '*' as the key. We need to
+    # elevate the all the columns under '*'.
+    df = pd.DataFrame.from_records(df['*'])
+  return df
+
+
+@profile_phase('convert')
+def _finalize_select_rows_batch(
+  plan: DuckDBSelectRowsPlan, batch: pa.RecordBatch, arrow_schema: Optional[pa.Schema] = None
+) -> pa.RecordBatch:
+  """Merges the temporary columns of `select_rows` into the final columns of an Arrow batch.
+
+  This is the Arrow counterpart of `_finalize_select_rows_df`. When `arrow_schema` is given, the
+  final columns are cast to it.
+  """
+  columns: dict[str, pa.Array] = dict(zip(batch.schema.names, batch.columns))
+  columns_to_merge = dict(plan.columns_to_merge)
+  if plan.temp_rowid_selected:
+    del columns[ROWID]
+    del columns_to_merge[ROWID]
+  for col in plan.cursor_columns:
+    del columns[col]
+  for offset_column, _ in plan.temp_column_to_offset_column.values():
+    del columns[offset_column]
+
+  if plan.combine_columns:
+    all_columns: dict[str, Column] = {}
+    for col_dict in columns_to_merge.values():
+      all_columns.update(col_dict)
+    columns_to_merge = {'*': all_columns}
+
+  for final_col_name, temp_columns in columns_to_merge.items():
+    for temp_col_name, column in temp_columns.items():
+      if temp_col_name not in columns:
+        continue
+      if plan.combine_columns:
+        dest_path = _col_destination_path(column)
+        spec = _split_path_into_subpaths_of_lists(dest_path)
+        columns[temp_col_name] = _wrap_arrow_in_structs(columns[temp_col_name], spec)
+      if temp_col_name == final_col_name:
+        continue
+      if final_col_name not in columns:
+        columns[final_col_name] = columns[temp_col_name]
+      else:
+        columns[final_col_name] = _merge_arrow_arrays(
+          columns[final_col_name], columns[temp_col_name]
+        )
+      del columns[temp_col_name]
+
+  if plan.combine_columns:
+    # Every column is merged into `*`, so its fields are elevated to the final columns.
+    combined = columns.get('*')
+    if combined is None or not pa.types.is_struct(combined.type):
+      columns = {}
+    else:
+      columns = _arrow_struct_children(combined)
+
+  if arrow_schema is not None:
+    columns = {
+      field.name: _conform_arrow_array(
+        columns.get(field.name, pa.nulls(batch.num_rows, field.type)), field.type
+      )
+      for field in arrow_schema
+    }
+  if not columns:
+    return pa.RecordBatch.from_pylist([{}] * batch.num_rows)
+  return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns.keys()))
+
+
+def _udf_arrow_array(udf_col: Column, values: list[Any]) -> pa.Array:
+  """Converts the outputs of a UDF column to Arrow, with the type of the fields of the signal."""
+  field = cast(Signal, udf_col.signal_udf).fields()
+  for path_part in udf_col.path:
+    if path_part == PATH_WILDCARD:
+      field = Field(repeated_field=field)
+  arrow_type = schema_to_arrow_schema(Schema(fields={'udf': field})).field('udf').type
+  try:
+    return pa.array(values, type=arrow_type, from_pandas=True)
+  except (pa.ArrowInvalid, pa.ArrowTypeError):
+    # The signal outputs values that don't match its fields, so their type is inferred.
+    return pa.array(values, from_pandas=True)
+
+
+def _arrow_struct_children(array: pa.Array) -> dict[str, pa.Array]:
+  """Returns the children of an Arrow struct array by name, or the array as a `__value__`."""
+  if not pa.types.is_struct(array.type):
+    return {VALUE_KEY: array}
+  # Flattening applies the nulls of the struct to its children.
+  return {field.name: child for field, child in zip(array.type, array.flatten())}
+
+
+def _arrow_list_parts(array: pa.Array) -> tuple[pa.Array, pa.Array]:
+  """Returns the offsets and the values of an Arrow list array, starting at offset 0."""
+  lengths = pc.fill_null(pc.list_value_length(array), 0).to_numpy(zero_copy_only=False)
+  offsets = pa.array(np.concatenate([[0], np.cumsum(lengths)]), type=pa.int32())
+  return offsets, pc.list_flatten(array)
+
+
+def _wrap_arrow_in_structs(array: pa.Array, spec: list[PathTuple]) -> pa.Array:
+  """Wraps the values of an Arrow array in structs according to the spec, like `wrap_in_dicts`."""
+  if len(spec) > 1 and not pa.types.is_null(array.type):
+    offsets, values = _arrow_list_parts(array)
+    values = _wrap_arrow_in_structs(values, spec[1:])
+    array = pa.ListArray.from_arrays(offsets, values, mask=array.is_null())
+  for prop in reversed(spec[0] if spec else ()):
+    array = pa.StructArray.from_arrays([array], names=[str(prop)])
+  return array
+
+
+def _merge_arrow_arrays(destination: pa.Array, source: pa.Array) -> pa.Array:
+  """Merges two Arrow arrays recursively, like `merge_series`."""
+  if pa.types.is_null(source.type):
+    return destination
+  if pa.types.is_null(destination.type):
+    return source
+  both_null = pc.and_(destination.is_null(), source.is_null())
+
+  if pa.types.is_list(destination.type) or pa.types.is_list(source.type):
+    if not pa.types.is_list(destination.type) or not pa.types.is_list(source.type):
+      raise pa.ArrowInvalid(
+        'Failed to merge cells. Only one of the destination and the source is a list: '
+        f'{destination.type} and {source.type}.'
+      )
+    dest_offsets, dest_values = _arrow_list_parts(destination)
+    source_offsets, source_values = _arrow_list_parts(source)
+    if not dest_offsets.equals(source_offsets):
+      # The lists of a row have different lengths, so they are merged item by item in Python.
+      return pa.array(_merge_cells(destination.to_pylist(), source.to_pylist()))
+    values = _merge_arrow_arrays(dest_values, source_values)
+    return pa.ListArray.from_arrays(dest_offsets, values, mask=both_null)
+
+  if pa.types.is_struct(destination.type) or pa.types.is_struct(source.type):
+    children = _arrow_struct_children(destination)
+    for name, child in _arrow_struct_children(source).items():
+      children[name] = _merge_arrow_arrays(children[name], child) if name in children else child
+    return pa.StructArray.from_arrays(
+      list(children.values()), names=list(children.keys()), mask=both_null
+    )
+
+  # Primitives can be merged together if they are equal. This happens when a user selects a column
+  # that is the child of another.
+  return pc.coalesce(destination, source.cast(destination.type))
+
+
+def _conform_arrow_array(array: pa.Array, arrow_type: pa.DataType) -> pa.Array:
+  """Casts an Arrow array to a type, filling the struct fields that the array does not have."""
+  if pa.types.is_null(array.type) or array.type == arrow_type:
+    return array.cast(arrow_type)
+  if pa.types.is_struct(arrow_type) and pa.types.is_struct(array.type):
+    children = _arrow_struct_children(array)
+    return pa.StructArray.from_arrays(
+      [
+        _conform_arrow_array(children.get(field.name, pa.nulls(len(array))), field.type)
+        for field in arrow_type
+      ],
+      fields=list(arrow_type),
+      mask=array.is_null(),
+    )
+  if pa.types.is_list(arrow_type) and pa.types.is_list(array.type):
+    offsets, values = _arrow_list_parts(array)
+    return pa.ListArray.from_arrays(
+      offsets,
+      _conform_arrow_array(values, arrow_type.value_type),
+      type=arrow_type,
+      mask=array.is_null(),
+    )
+  return array.cast(arrow_type)
+
+
+def _encode_cursor(total_num_rows: int, sort_values: list[Any]) -> str:
+  """Encodes the total number of rows and the sort key of the last row of a page as a cursor."""
+  json_values: list[Any] = []
+  for value in sort_values:
+    if value is None or value is pd.NaT:
+      json_values.append(None)
+    elif isinstance(value, datetime):
+      json_values.append({'datetime': value.isoformat()})
+    elif isinstance(value, np.generic):
+      json_values.append(value.item())
+    else:
+      json_values.append(value)
+  cursor = json.dumps({'total_num_rows': int(total_num_rows), 'sort_values': json_values})
+  return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str, num_sort_values: int) -> tuple[int, list[Any]]:
+  """Decodes a cursor into the total number of rows and the sort key of the last row of a page."""
+  try:
+    decoded = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    total_num_rows = int(decoded['total_num_rows'])
+    json_values = list(decoded['sort_values'])
+  except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError) as e:
+    raise ValueError(f'Invalid cursor: "{cursor}".') from e
+
+  if len(json_values) != num_sort_values:
+    raise ValueError('The cursor does not match the sort order of the query.')
+  sort_values = [
+    datetime.fromisoformat(value['datetime']) if isinstance(value, dict) else value
+    for value in json_values
+  ]
+  return total_num_rows, sort_values
+
+
+def _cursor_seek_query(
+  sort_sqls: list[str], sort_order: SortOrder, sort_values: list[Any]
+) -> tuple[str, list[Any]]:
+  """Returns a predicate, and its parameters, that selects the rows sorted after the sort values.
+
+  This expands the row comparison `(sort_sqls) > (sort_values)` so it follows the `ORDER BY` of
+  `select_rows`, where NULLs are sorted last for both sort orders.
+  """
+  op = '>' if sort_order == SortOrder.ASC else '<'
+  disjuncts: list[str] = []
+  params: list[Any] = []
+  for i, value in enumerate(sort_values):
+    if value is None:
+      # Nothing is sorted after NULL for this sort key.
+      continue
+    conjuncts = [f'{sql} IS NOT DISTINCT FROM ?' for sql in sort_sqls[:i]]
+    conjuncts.append(f'({sort_sqls[i]} {op} ? OR {sort_sqls[i]} IS NULL)')
+    disjuncts.append(f"({' AND '.join(conjuncts)})")
+    params.extend(sort_values[:i])
+    params.append(value)
+  if not disjuncts:
+    return 'false', []
+  return f"({' OR '.join(disjuncts)})", params
+
+
 def _split_path_into_subpaths_of_lists(leaf_path: PathTuple) -> list[PathTuple]:
   """Split a path into a subpath of lists.
 
@@ -3693,6 +6085,18 @@ def _get_parquet_filepath(
   return os.path.join(dataset_path, parquet_rel_filepath)
 
 
+def get_udf_cache_spill_dir(project_dir: Union[str, pathlib.Path]) -> str:
+  """Returns the directory where the datasets spill the UDF outputs that are evicted from memory."""
+  return os.path.join(get_lilac_cache_dir(project_dir), UDF_CACHE_SPILL_DIR)
+
+
+def clear_udf_cache_spill(project_dir: Union[str, pathlib.Path]) -> None:
+  """Deletes the UDF outputs spilled by previous processes. Called when the server starts."""
+  spill_dir = get_udf_cache_spill_dir(project_dir)
+  if os.path.exists(spill_dir):
+    shutil.rmtree(spill_dir, ignore_errors=True)
+
+
 def _jsonl_cache_filepath(
   namespace: str,
   dataset_name: str,
@@ -3871,6 +6275,7 @@ def _make_schema_from_path(path: PathTuple, field: Field) -> Schema:
   return Schema(fields=field.fields)
 
 
+@profile_phase('convert')
 def _replace_nan_with_none(df: pd.DataFrame) -> pd.DataFrame:
   """DuckDB returns np.nan for missing field in string column, replace with None for correctness."""
   # TODO(https://github.com/duckdb/duckdb/issues/4066): Remove this once duckdb fixes upstream.
@@ -3935,6 +6340,17 @@ def _remove_signals_from_field(field: Field) -> Optional[Field]:
   return field
 
 
+def _hashable(value: Any) -> Any:
+  """Converts the arguments of a query to a hashable key."""
+  if isinstance(value, BaseModel):
+    return value.model_dump_json()
+  if isinstance(value, dict):
+    return tuple((k, _hashable(v)) for k, v in sorted(value.items()))
+  if isinstance(value, (list, tuple)):
+    return tuple(_hashable(v) for v in value)
+  return value
+
+
 def _normalize_bins(bins: Optional[Union[Sequence[Bin], Sequence[float]]]) -> Optional[list[Bin]]:
   if bins is None:
     return None
@@ -3948,6 +6364,198 @@ def _normalize_bins(bins: Optional[Union[Sequence[Bin], Sequence[float]]]) -> Op
   return named_bins
 
 
+def _is_auto_binned(leaf: Field) -> bool:
+  """Whether the groups of a leaf are numeric bins, rather than distinct values."""
+  dtype = cast(DataType, leaf.dtype)
+  return not leaf.categorical and (is_float(dtype) or is_integer(dtype))
+
+
+def _select_groups_from_sketch(
+  sketch: LeafSketch, sort_by: GroupsSortBy, sort_order: SortOrder, limit: Optional[int]
+) -> Optional[SelectGroupsResult]:
+  """Answers `select_groups` from a sketch. Returns None when the sketch can't answer it."""
+  if not sketch.bins and sketch.stats.approx_count_distinct >= dataset.TOO_MANY_DISTINCT:
+    return None
+
+  counts = sketch.group_counts
+  if not sketch.group_counts_complete:
+    # Only the most frequent groups are known.
+    is_top_groups = sort_by == GroupsSortBy.COUNT and sort_order == SortOrder.DESC
+    if not is_top_groups or not limit or limit > len(counts):
+      return None
+  else:
+    # Mirror `ORDER BY <sort_by> <sort_order>, value` in DuckDB, where NULLs are sorted last.
+    reverse = sort_order == SortOrder.DESC
+    non_null_counts = [c for c in counts if c[0] is not None]
+    null_counts = [c for c in counts if c[0] is None]
+    if sort_by == GroupsSortBy.VALUE:
+      counts = sorted(non_null_counts, key=lambda c: c[0], reverse=reverse) + null_counts
+    else:
+      by_value = sorted(non_null_counts, key=lambda c: c[0]) + null_counts
+      # Python sorts are stable, so ties stay sorted by value.
+      counts = sorted(by_value, key=lambda c: c[1], reverse=reverse)
+
+  if limit:
+    counts = counts[:limit]
+  return SelectGroupsResult(too_many_distinct=False, counts=counts, bins=sketch.bins)
+
+
+def _substring_spans_sql(value_sql: str, signal: SubstringSignal) -> Optional[str]:
+  """Returns a DuckDB expression that computes the spans of `SubstringSignal` over a string.
+
+  Returns None when the signal can only be computed in Python.
+  """
+  if not signal.query:
+    return None
+
+  lowered_sql = f'lower({value_sql})'
+  query = signal.query.lower()
+  # Splitting the text by the query finds the same non-overlapping matches as `str.find`. The
+  # start of the i-th match is the length of the parts before it, plus i - 1 queries.
+  all_spans_sql = f"""list_transform(
+    [list_transform(
+      string_split({lowered_sql}, {escape_string_literal(query)}), __part -> length(__part)
+    )],
+    __lens -> list_transform(range(1, len(__lens)), __i -> {{
+      '{SPAN_KEY}': {{
+        '{TEXT_SPAN_START_FEATURE}': (list_sum(__lens[1:__i]) + (__i - 1) * {len(query)})::INTEGER,
+        '{TEXT_SPAN_END_FEATURE}': (list_sum(__lens[1:__i]) + __i * {len(query)})::INTEGER
+      }}
+    }})
+  )[1]"""
+  return f'CASE WHEN {value_sql} IS NULL THEN NULL ELSE {all_spans_sql} END'
+
+
+def _keyword_index_path(path: PathTuple) -> PathTuple:
+  """Returns the path that keys the keyword index of a field, without repeated wildcards."""
+  return tuple(p for p in path if p != PATH_WILDCARD)
+
+
+def _keyword_index_view(path: PathTuple, kind: Literal['postings', 'docs']) -> str:
+  return f'keyword_index/{".".join(str(p) for p in path)}/{kind}'
+
+
+def _keyword_term_conditions(query: str) -> list[str]:
+  """Returns a condition on the terms of a keyword index for each word of a keyword query.
+
+  A text that contains the query has a term that ends with the first word of the query, the words
+  in between as terms, and a term that starts with the last word. The first and last words are only
+  partial when the query starts or ends in the middle of a word.
+  """
+  query = query.lower()
+  conditions: list[str] = []
+  for match in _KEYWORD_WORD_REGEX.finditer(query):
+    word_sql = escape_string_literal(match.group())
+    partial_start = match.start() == 0
+    partial_end = match.end() == len(query)
+    if partial_start and partial_end:
+      conditions.append(f'contains(term, {word_sql})')
+    elif partial_start:
+      conditions.append(f'ends_with(term, {word_sql})')
+    elif partial_end:
+      conditions.append(f'starts_with(term, {word_sql})')
+    else:
+      conditions.append(f'term = {word_sql}')
+  return list(dict.fromkeys(conditions))
+
+
+def _keyword_match_sql(index_manifest: KeywordIndexManifest, term_conditions: list[str]) -> str:
+  """Returns a query of the rowids that have a term for every condition."""
+  postings = escape_col_name(_keyword_index_view(index_manifest.path, 'postings'))
+  return f"""
+    SELECT {ROWID} FROM {postings} WHERE {' OR '.join(term_conditions)}
+    GROUP BY {ROWID} HAVING {' AND '.join(f'bool_or({c})' for c in term_conditions)}
+  """
+
+
+def _keyword_score_sql(index_manifest: KeywordIndexManifest, term_conditions: list[str]) -> str:
+  """Returns a query of the BM25 score of the rowids that have a term for every condition."""
+  postings = escape_col_name(_keyword_index_view(index_manifest.path, 'postings'))
+  docs = escape_col_name(_keyword_index_view(index_manifest.path, 'docs'))
+  match_sql = ' OR '.join(term_conditions)
+  num_docs = index_manifest.num_docs
+  avg_doc_length = index_manifest.avg_doc_length or 1
+  return f"""
+    SELECT {ROWID}, sum(
+      ln(1 + ({num_docs} - df + 0.5) / (df + 0.5)) * tf * ({BM25_K1} + 1)
+      / (tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * length / {avg_doc_length}))
+    ) AS {KEYWORD_SCORE_COLUMN}
+    FROM {postings}
+    JOIN {docs} USING ({ROWID})
+    JOIN (SELECT term, count(*) AS df FROM {postings} WHERE {match_sql} GROUP BY term) USING (term)
+    WHERE {match_sql}
+    GROUP BY {ROWID} HAVING {' AND '.join(f'bool_or({c})' for c in term_conditions)}
+  """
+
+
+def _sketches_filepath(manifest_filepath: str) -> str:
+  manifest_prefix, _ = os.path.splitext(manifest_filepath)
+  return f'{manifest_prefix}.{SKETCHES_SUFFIX}'
+
+
+def _files_fingerprint(filepaths: Iterable[str]) -> dict[str, tuple[int, int]]:
+  """Returns the size and modification time of files, keyed by their filename."""
+  fingerprint: dict[str, tuple[int, int]] = {}
+  for filepath in filepaths:
+    file_stat = os.stat(filepath)
+    fingerprint[os.path.basename(filepath)] = (file_stat.st_size, file_stat.st_mtime_ns)
+  return fingerprint
+
+
+def _read_sketches_file(sketches_filepath: str) -> dict[PathTuple, LeafSketch]:
+  """Reads a sketches file. Returns no sketches when the data files changed since it was written."""
+  with open_file(sketches_filepath, 'rb') as f:
+    try:
+      sketches_file = pickle.load(f)
+    except BaseException:
+      # Pickle serialization failed. We fallback to scanning the data.
+      return {}
+  sketches_dir = os.path.dirname(sketches_filepath)
+  try:
+    fingerprint = _files_fingerprint(os.path.join(sketches_dir, f) for f in sketches_file['files'])
+  except OSError:
+    return {}
+  if fingerprint != sketches_file['files']:
+    return {}
+  return sketches_file['sketches']
+
+
+def _estimate_count(count: int, rate: float) -> tuple[int, tuple[int, int]]:
+  """Estimates a count from its count in a Bernoulli row sample, with a 95% confidence interval."""
+  estimate = count / rate
+  # The count in the sample is binomial, with a variance of about `count * (1 - rate)`.
+  margin = APPROXIMATE_COUNT_Z * math.sqrt(count * (1 - rate)) / rate
+  # The rows in the sample are a lower bound of the count.
+  return round(estimate), (max(count, math.floor(estimate - margin)), math.ceil(estimate + margin))
+
+
+def _estimate_pivot(sample_groups: list[PivotResultOuterGroup], rate: float) -> PivotResult:
+  """Estimates a pivot from the pivot of a Bernoulli row sample."""
+  inner_values = set(value for group in sample_groups for value, _ in group.inner)
+  if (
+    len(sample_groups) >= dataset.TOO_MANY_DISTINCT
+    or len(inner_values) >= dataset.TOO_MANY_DISTINCT
+  ):
+    return PivotResult(too_many_distinct=True, outer_groups=[], approximate=True)
+
+  outer_groups: list[PivotResultOuterGroup] = []
+  for group in sample_groups:
+    count, count_interval = _estimate_count(group.count, rate)
+    inner_estimates = [_estimate_count(inner_count, rate) for _, inner_count in group.inner]
+    outer_groups.append(
+      PivotResultOuterGroup(
+        value=group.value,
+        count=count,
+        inner=[
+          (value, estimate) for (value, _), (estimate, _) in zip(group.inner, inner_estimates)
+        ],
+        count_interval=count_interval,
+        inner_intervals=[interval for _, interval in inner_estimates],
+      )
+    )
+  return PivotResult(outer_groups=outer_groups, approximate=True)
+
+
 def _auto_bins(stats: StatsResult) -> list[Bin]:
   if stats.min_val is None or stats.max_val is None:
     return [('0', None, None)]
@@ -3987,3 +6595,113 @@ def _auto_bins(stats: StatsResult) -> list[Bin]:
 def get_labels_sqlite_filename(dataset_output_dir: str, label_name: str) -> str:
   """Get the filepath to the labels file."""
   return os.path.join(dataset_output_dir, f'{label_name}{LABELS_SQLITE_SUFFIX}')
+
+
+def get_labels_parquet_filename(dataset_output_dir: str, label_name: str) -> str:
+  """Get the filepath to the labels file of the parquet label backend."""
+  return os.path.join(dataset_output_dir, f'{label_name}{LABELS_PARQUET_SUFFIX}')
+
+
+def _read_parquet_labels(labels_filepath: str) -> pa.Table:
+  """Reads a parquet labels file. Returns an empty table when the file doesn't exist."""
+  if not os.path.exists(labels_filepath):
+    return pa.table(
+      {
+        ROWID: pa.array([], type=pa.string()),
+        SQLITE_LABEL_COLNAME: pa.array([], type=pa.string()),
+        SQLITE_CREATED_COLNAME: pa.array([], type=pa.timestamp('us')),
+      }
+    )
+  return pq.read_table(labels_filepath)
+
+
+def _parquet_copy_options() -> str:
+  """Returns the options to `COPY` signal and map outputs to a parquet file."""
+  row_group_size = int(env('LILAC_PARQUET_ROW_GROUP_SIZE', DEFAULT_PARQUET_ROW_GROUP_SIZE))
+  options = f'FORMAT PARQUET, ROW_GROUP_SIZE {row_group_size}, COMPRESSION ZSTD'
+  compression_level = env('LILAC_PARQUET_ZSTD_LEVEL')
+  if compression_level:
+    # Requires DuckDB >= 1.0.
+    options += f', COMPRESSION_LEVEL {int(compression_level)}'
+  return options
+
+
+def _cluster_key_sql(schema: Schema) -> Optional[str]:
+  """Returns the leaf to sort an output file by, when the output has a single primitive leaf."""
+  leafs = [(path, field) for path, field in schema.leafs.items() if path != (ROWID,)]
+  if len(leafs) != 1:
+    return None
+  path, field = leafs[0]
+  if PATH_WILDCARD in path or not field.dtype:
+    return None
+  if not (is_ordinal(field.dtype) or field.dtype in (STRING, BOOLEAN)):
+    return None
+  return '.'.join(escape_col_name(subpath) for subpath in path)
+
+
+def _label_name(labels_filename: str) -> str:
+  """Returns the name of a label from the filename of its labels file."""
+  for suffix in (LABELS_SQLITE_SUFFIX, LABELS_PARQUET_SUFFIX):
+    if labels_filename.endswith(suffix):
+      return labels_filename[0 : -len(suffix)]
+  raise ValueError(f'"{labels_filename}" is not a labels file.')
+
+
+def _upsert_labels(existing_labels: pa.Table, labels: pa.Table) -> pa.Table:
+  """Adds labels to a labels table. Rows that are labeled again keep their created time."""
+  # The index of the new label of each existing row, or null when the row is not labeled again.
+  new_label_index = pc.index_in(existing_labels[ROWID], value_set=labels[ROWID])
+  existing_labels = existing_labels.set_column(
+    existing_labels.schema.get_field_index(SQLITE_LABEL_COLNAME),
+    SQLITE_LABEL_COLNAME,
+    pc.coalesce(
+      pc.take(labels[SQLITE_LABEL_COLNAME], new_label_index),
+      existing_labels[SQLITE_LABEL_COLNAME],
+    ),
+  )
+  new_labels = labels.filter(pc.invert(pc.is_in(labels[ROWID], value_set=existing_labels[ROWID])))
+  return pa.concat_tables([existing_labels, new_labels])
+
+
+def _read_sqlite_labels(labels_filepath: str, label_name: str) -> pa.Table:
+  """Reads a sqlite labels file into Arrow, without the DuckDB sqlite scanner."""
+  with closing(sqlite3.connect(labels_filepath)) as sqlite_con:
+    rows = sqlite_con.execute(
+      f'SELECT {ROWID}, {SQLITE_LABEL_COLNAME}, {SQLITE_CREATED_COLNAME} FROM "{label_name}"'
+    ).fetchall()
+  rowids, label_values, created = zip(*rows) if rows else ((), (), ())
+  return pa.table(
+    {
+      ROWID: pa.array(rowids, type=pa.string()),
+      SQLITE_LABEL_COLNAME: pa.array(label_values, type=pa.string()),
+      SQLITE_CREATED_COLNAME: pc.cast(pa.array(created, type=pa.string()), pa.timestamp('us')),
+    }
+  )
+
+
+def _udf_signal_version(signal: Signal) -> Optional[int]:
+  """Returns the version of the concept that the cached outputs of a UDF signal depend on.
+
+  The version is read from the concept DB, which also checks access for the user, since the warm
+  signal is shared by concurrent queries and is only set up when it is checked out fresh.
+  """
+  if isinstance(signal, (ConceptSignal, ConceptLabelsSignal)):
+    return signal.concept_version()
+  return None
+
+
+def _write_manifest(manifest_filepath: str, manifest_json: str) -> None:
+  """Atomically replaces a manifest file, so `manifest()` never reads a partially written file."""
+  tmp_filepath = f'{manifest_filepath}.tmp'
+  with open_file(tmp_filepath, 'w') as f:
+    f.write(manifest_json)
+  os.replace(tmp_filepath, manifest_filepath)
+
+
+def _write_parquet_labels(labels_filepath: str, labels: pa.Table) -> None:
+  """Atomically replaces a parquet labels file, so queries never read a partially written file."""
+  # The temporary file is hidden so it is not picked up as a dataset file.
+  dirname, filename = os.path.split(labels_filepath)
+  tmp_filepath = os.path.join(dirname, f'.{filename}.tmp')
+  pq.write_table(labels.sort_by(ROWID), tmp_filepath)
+  os.replace(tmp_filepath, labels_filepath)
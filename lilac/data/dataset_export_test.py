@@ -8,13 +8,14 @@ from typing import ClassVar, Iterable, Iterator, Optional
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 import pytest
 from freezegun import freeze_time
 from typing_extensions import override
 
-from ..schema import ROWID, VALUE_KEY, Field, Item, RichData, field
+from ..schema import PATH_WILDCARD, ROWID, VALUE_KEY, Field, Item, RichData, field
 from ..signal import TextSignal, clear_signal_registry, register_signal
-from .dataset import DELETED_LABEL_NAME
+from .dataset import DELETED_LABEL_NAME, Column, SortOrder
 from .dataset_test_utils import TestDataMaker
 
 
@@ -199,6 +200,46 @@ def test_export_to_jsonl(make_test_data: TestDataMaker, tmp_path: pathlib.Path)
   assert parsed_items == [{'text': {VALUE_KEY: 'hello', 'test_signal': {'flen': 5.0, 'len': 5}}}]
 
 
+def test_export_nested_and_temporal_columns(
+  make_test_data: TestDataMaker, tmp_path: pathlib.Path
+) -> None:
+  dataset = make_test_data(
+    [
+      {'text': 'a', 'age': 1, 'meta': {'score': 1.5, 'tags': ['x']}, 'time': TEST_TIME},
+      {'text': 'b', 'age': 2, 'meta': {'score': 2.5, 'tags': []}, 'time': TEST_TIME},
+      {'text': 'c', 'meta': {'tags': ['y', 'z']}, 'time': TEST_TIME},
+    ]
+  )
+
+  filepath = tmp_path / 'dataset.json'
+  dataset.to_json(
+    filepath, jsonl=False, columns=['text', 'age', 'meta'], filters=[('age', 'less', 2)]
+  )
+  with open(filepath, 'r') as f:
+    assert json.load(f) == [{'text': 'a', 'age': 1, 'meta': {'score': 1.5, 'tags': ['x']}}]
+
+  dataset.to_json(filepath, columns=['text', 'meta.tags'])
+  with open(filepath, 'r') as f:
+    assert [json.loads(line) for line in f.readlines()] == [
+      {'text': 'a', 'meta': {'tags': ['x']}},
+      {'text': 'b', 'meta': {'tags': []}},
+      {'text': 'c', 'meta': {'tags': ['y', 'z']}},
+    ]
+
+  filepath = tmp_path / 'dataset.csv'
+  dataset.to_csv(filepath, columns=['text', 'age'])
+  with open(filepath, 'r') as f:
+    assert list(csv.reader(f)) == [['text', 'age'], ['a', '1'], ['b', '2'], ['c', '']]
+
+  filepath = tmp_path / 'dataset.parquet'
+  dataset.to_parquet(filepath, columns=['text', 'meta.score', 'time'])
+  assert pd.read_parquet(filepath).to_dict('records') == [
+    {'text': 'a', 'meta': {'score': 1.5}, 'time': TEST_TIME},
+    {'text': 'b', 'meta': {'score': 2.5}, 'time': TEST_TIME},
+    {'text': 'c', 'meta': {'score': None}, 'time': TEST_TIME},
+  ]
+
+
 def test_export_to_csv(make_test_data: TestDataMaker, tmp_path: pathlib.Path) -> None:
   dataset = make_test_data([{'text': 'hello'}, {'text': 'everybody'}])
   dataset.compute_signal(TestSignal(), 'text')
@@ -330,6 +371,76 @@ def test_export_to_parquet_include_signals(
   pd.testing.assert_frame_equal(df, expected_df)
 
 
+def test_select_rows_batches(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'text': 'hello'}, {'text': 'everybody'}, {'text': 'hi'}])
+  dataset.compute_signal(TestSignal(), 'text')
+
+  batches = list(dataset.select_rows_batches(['text'], exclude_signals=True, batch_size=2))
+  assert [batch.num_rows for batch in batches] == [2, 1]
+  assert pa.Table.from_batches(batches).to_pylist() == [
+    {'text': 'hello'},
+    {'text': 'everybody'},
+    {'text': 'hi'},
+  ]
+
+  batches = list(
+    dataset.select_rows_batches(
+      ['text'], filters=[('text.test_signal.len', 'greater', 2)], sort_by=['text.test_signal.len']
+    )
+  )
+  assert pa.Table.from_batches(batches).to_pylist() == [
+    {'text': {VALUE_KEY: 'everybody', 'test_signal': {'len': 9, 'flen': 9.0}}},
+    {'text': {VALUE_KEY: 'hello', 'test_signal': {'len': 5, 'flen': 5.0}}},
+  ]
+
+
+@freeze_time(datetime(2024, 1, 1))
+def test_select_rows_batches_computes_udfs_per_batch(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(
+    [
+      {'text': 'hello', 'tags': ['a', 'bc']},
+      {'text': 'everybody', 'tags': ['d']},
+      {'text': 'hi', 'tags': []},
+    ]
+  )
+  dataset.add_labels('good', row_ids=['00001'])
+  columns = [
+    PATH_WILDCARD,
+    Column(('tags', PATH_WILDCARD), signal_udf=TestSignal()),
+    Column('text', signal_udf=TestSignal(), alias='text_len'),
+  ]
+
+  batches = list(dataset.select_rows_batches(columns, batch_size=2))
+  assert [batch.num_rows for batch in batches] == [2, 1]
+  # The batches have the same rows as `select_rows`, which merges the columns in pandas.
+  assert pa.Table.from_batches(batches).to_pylist() == list(
+    dataset.select_rows(columns, combine_columns=True)
+  )
+  assert pa.Table.from_batches(batches).to_pylist()[0] == {
+    'text': {VALUE_KEY: 'hello', 'test_signal': {'len': 5, 'flen': 5.0}},
+    'tags': [
+      {VALUE_KEY: 'a', 'test_signal': {'len': 1, 'flen': 1.0}},
+      {VALUE_KEY: 'bc', 'test_signal': {'len': 2, 'flen': 2.0}},
+    ],
+    'good': {'label': 'true', 'created': datetime(2024, 1, 1)},
+  }
+
+  # Sorting by a UDF computes the UDF on every batch before the first one is yielded.
+  batches = list(
+    dataset.select_rows_batches(
+      ['text', columns[2]],
+      sort_by=['text_len.len'],
+      sort_order=SortOrder.DESC,
+      limit=2,
+      batch_size=1,
+    )
+  )
+  assert pa.Table.from_batches(batches).to_pylist() == [
+    {'text': {VALUE_KEY: 'everybody', 'test_signal': {'len': 9, 'flen': 9.0}}},
+    {'text': {VALUE_KEY: 'hello', 'test_signal': {'len': 5, 'flen': 5.0}}},
+  ]
+
+
 def test_export_to_pandas(make_test_data: TestDataMaker) -> None:
   dataset = make_test_data([{'text': 'hello'}, {'text': 'everybody'}])
   dataset.compute_signal(TestSignal(), 'text')
@@ -10,7 +10,9 @@ from pytest_mock import MockerFixture
 
 from ..schema import PATH_WILDCARD, ROWID, Item, field, schema
 from ..source import clear_source_registry, register_source
+from . import dataset_duckdb
 from .dataset import DELETED_LABEL_NAME, DatasetManifest, SelectGroupsResult, SortOrder
+from .dataset_duckdb import DatasetDuckDB
 from .dataset_test_utils import TestDataMaker, TestSource
 
 TEST_ITEMS: list[Item] = [{'str': 'a', 'int': 1}, {'str': 'b', 'int': 2}, {'str': 'c', 'int': 3}]
@@ -466,3 +468,92 @@ def test_labels_select_groups(make_test_data: TestDataMaker, mocker: MockerFixtu
   )
 
   assert dataset.get_label_names() == ['test_label']
+
+
+@freeze_time(TEST_TIME)
+def test_parquet_labels_backend(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  monkeypatch.setenv('LILAC_LABELS_BACKEND', 'parquet')
+  dataset = make_test_data(TEST_ITEMS)
+
+  assert dataset.add_labels('test_label', value='yes') == 3
+  # Labeling a row again overwrites its label.
+  assert dataset.add_labels('test_label', value='no', row_ids=['00001']) == 1
+  assert dataset.manifest().data_schema.get_field(('test_label',)) == field(
+    fields={'label': 'string', 'created': 'timestamp'}, label='test_label'
+  )
+  assert list(dataset.select_rows([PATH_WILDCARD])) == [
+    {'str': 'a', 'int': 1, 'test_label.label': 'no', 'test_label.created': TEST_TIME},
+    {'str': 'b', 'int': 2, 'test_label.label': 'yes', 'test_label.created': TEST_TIME},
+    {'str': 'c', 'int': 3, 'test_label.label': 'yes', 'test_label.created': TEST_TIME},
+  ]
+  assert dataset.count(filters=[('test_label.label', 'equals', 'yes')]) == 2
+
+  assert dataset.remove_labels('test_label', filters=[('int', 'greater_equal', 2)]) == 2
+  assert list(dataset.select_rows([PATH_WILDCARD])) == [
+    {'str': 'a', 'int': 1, 'test_label.label': 'no', 'test_label.created': TEST_TIME},
+    {'str': 'b', 'int': 2, 'test_label.label': None, 'test_label.created': None},
+    {'str': 'c', 'int': 3, 'test_label.label': None, 'test_label.created': None},
+  ]
+
+  # Removing the last label removes the label.
+  assert dataset.remove_labels('test_label') == 3
+  assert dataset.get_label_names() == []
+
+  # Deleted rows use the same backend.
+  assert dataset.delete_rows(row_ids=['00002']) == 1
+  assert list(dataset.select_rows(['str'])) == [{'str': 'a'}, {'str': 'c'}]
+
+
+@freeze_time(TEST_TIME)
+def test_label_tables_in_sync(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  dataset = make_test_data(TEST_ITEMS)
+  dataset.add_labels('test_label', row_ids=['00001'])
+  assert dataset.count(filters=[('test_label.label', 'exists')]) == 1
+  read_labels_spy = mocker.spy(dataset_duckdb, '_read_sqlite_labels')
+
+  # Writes of the dataset update its label table in place.
+  dataset.add_labels('test_label', value='no', row_ids=['00001', '00002'])
+  dataset.remove_labels('test_label', row_ids=['00003'])
+  assert list(dataset.select_rows(['test_label.label'])) == [
+    {'test_label.label': 'no'},
+    {'test_label.label': 'no'},
+    {'test_label.label': None},
+  ]
+  assert read_labels_spy.call_count == 0
+
+  # Writes of another instance of the dataset are picked up from the label file.
+  other_dataset = DatasetDuckDB(
+    dataset.namespace, dataset.dataset_name, project_dir=dataset.project_dir
+  )
+  other_dataset.add_labels('test_label', value='yes', row_ids=['00003'])
+  assert dataset.count(filters=[('test_label.label', 'exists')]) == 3
+  assert read_labels_spy.call_count > 0
+
+
+@freeze_time(TEST_TIME)
+def test_label_filters_probe_label_tables(
+  make_test_data: TestDataMaker, mocker: MockerFixture
+) -> None:
+  dataset = make_test_data(TEST_ITEMS)
+  dataset.add_labels('test_label', row_ids=['00001', '00002'])
+  dataset.delete_rows(['00002'])
+  execute_spy = mocker.spy(dataset._pool, 'execute')
+
+  # Label filters and deleted rows are resolved by probing the label tables, without joining the
+  # label columns into the queried view.
+  assert dataset.count(filters=[('test_label.label', 'exists')]) == 1
+  assert dataset.count(filters=[('test_label.label', 'not_exists')]) == 1
+  assert dataset.count(filters=[('test_label.label', 'exists')], include_deleted=True) == 2
+  assert dataset.count() == 2
+  queries = [
+    call.args[1].lower() for call in execute_spy.call_args_list if 'COUNT(*)' in call.args[1]
+  ]
+  assert len(queries) == 4
+  assert all(f'from {dataset_duckdb.DATA_VIEW_NAME} ' in query for query in queries)
+
+  # Selecting a label column still reads it from the labeled view.
+  assert list(dataset.select_rows(['str', 'test_label.label'], filters=[('int', 'less', 3)])) == [
+    {'str': 'a', 'test_label.label': 'true'}
+  ]
@@ -1,13 +1,17 @@
 """Tests for dataset.select_groups()."""
 
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pytest
 from pytest_mock import MockerFixture
 
-from ..schema import Field, Item, MapType, field, schema
+from ..schema import ROWID, Field, Item, MapType, field, schema
 from . import dataset as dataset_module
+from .cancellation import CancellationToken, QueryCancelledError, cancellable
 from .dataset import GroupsSortBy, SelectGroupsResult, SortOrder
 from .dataset_test_utils import TestDataMaker
 
@@ -336,3 +340,210 @@ def test_map_dtype(make_test_data: TestDataMaker) -> None:
   )
   with pytest.raises(ValueError, match='Cannot compute groups on a map field'):
     dataset.select_groups('column')
+
+
+def test_groups_from_sketches(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  items: list[Item] = [{'text': text} for text in ['a', 'bb', 'bb', 'ccc', 'dddd', 'dddd']]
+  dataset = make_test_data(items)
+  dataset.map(lambda item: item['text'].upper(), output_path='upper')
+  dataset.map(lambda item: len(item['text']), output_path='length')
+
+  select_groups_spy = mocker.spy(dataset, '_select_groups')
+  assert dataset.select_groups('upper').counts == [('BB', 2), ('DDDD', 2), ('A', 1), ('CCC', 1)]
+  assert dataset.select_groups('upper', sort_by=GroupsSortBy.VALUE, limit=2).counts == [
+    ('DDDD', 2),
+    ('CCC', 1),
+  ]
+  result = dataset.select_groups('upper', sort_order=SortOrder.ASC)
+  assert result.counts == [('A', 1), ('CCC', 1), ('BB', 2), ('DDDD', 2)]
+
+  # The auto bins of the sketch match the bins of a scan.
+  result = dataset.select_groups('length')
+  assert result.bins
+  assert select_groups_spy.call_count == 0
+  assert dataset.select_groups('length', bins=result.bins) == result
+
+  # Filters are applied by scanning the data.
+  select_groups_spy.reset_mock()
+  result = dataset.select_groups('upper', filters=[('length', 'greater', 2)])
+  assert result.counts == [('DDDD', 2), ('CCC', 1)]
+  assert select_groups_spy.call_count == 1
+
+
+def test_concurrent_select_groups_are_coalesced(
+  make_test_data: TestDataMaker, mocker: MockerFixture
+) -> None:
+  dataset = make_test_data([{'name': 'a'}, {'name': 'b'}, {'name': 'b'}])
+
+  select_groups = dataset._select_groups  # type: ignore
+  started = threading.Event()
+  release = threading.Event()
+
+  def slow_select_groups(*args, **kwargs):  # type: ignore
+    started.set()
+    release.wait()
+    return select_groups(*args, **kwargs)
+
+  spy = mocker.patch.object(dataset, '_select_groups', side_effect=slow_select_groups)
+  with ThreadPoolExecutor(max_workers=4) as executor:
+    leader = executor.submit(dataset.select_groups, 'name')
+    started.wait()
+    followers = [executor.submit(dataset.select_groups, 'name') for _ in range(2)]
+    # A query with different arguments is not coalesced.
+    other = executor.submit(dataset.select_groups, 'name', filters=[('name', 'equals', 'a')])
+    time.sleep(0.2)
+    release.set()
+
+    expected = [('b', 2), ('a', 1)]
+    assert leader.result().counts == expected
+    assert [f.result().counts for f in followers] == [expected, expected]
+    assert other.result().counts == [('a', 1)]
+  assert spy.call_count == 2
+
+
+def test_cancelled_follower_stops_waiting(
+  make_test_data: TestDataMaker, mocker: MockerFixture
+) -> None:
+  dataset = make_test_data([{'name': 'a'}, {'name': 'b'}, {'name': 'b'}])
+
+  select_groups = dataset._select_groups  # type: ignore
+  started = threading.Event()
+  release = threading.Event()
+
+  def slow_select_groups(*args, **kwargs):  # type: ignore
+    started.set()
+    release.wait(timeout=10)
+    return select_groups(*args, **kwargs)
+
+  def timed_out_select_groups() -> SelectGroupsResult:
+    with cancellable(CancellationToken(timeout_sec=0.2)):
+      return dataset.select_groups('name')
+
+  mocker.patch.object(dataset, '_select_groups', side_effect=slow_select_groups)
+  with ThreadPoolExecutor(max_workers=2) as executor:
+    leader = executor.submit(dataset.select_groups, 'name')
+    started.wait()
+    follower = executor.submit(timed_out_select_groups)
+    # The follower stops waiting when it times out, while the leader is still running.
+    with pytest.raises(QueryCancelledError, match='timed out'):
+      follower.result(timeout=5)
+    assert not leader.done()
+    release.set()
+    assert leader.result().counts == [('b', 2), ('a', 1)]
+
+
+def test_approximate_groups(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture
+) -> None:
+  monkeypatch.setenv('LILAC_APPROXIMATE_SAMPLE_SIZE', '400')
+  items: list[Item] = [{'name': 'a'}] * 1500 + [{'name': 'b'}] * 500
+  dataset = make_test_data(items)
+  stats_spy = mocker.spy(dataset, 'stats')
+
+  result = dataset.select_groups(leaf_path='name', approximate=True)
+  assert result.approximate
+  # The distinct values are counted in the sample, instead of computing the stats of the field.
+  assert stats_spy.call_count == 0
+  assert [value for value, _ in result.counts] == ['a', 'b']
+  assert result.count_intervals
+  for (_, count), (low, high), expected in zip(result.counts, result.count_intervals, [1500, 500]):
+    assert low <= count <= high
+    assert low <= expected <= high
+
+  # Labels are joined to the sample, so label edits are reflected without sampling again.
+  dataset.add_labels('good', filters=[('name', 'equals', 'b')])
+  result = dataset.select_groups(leaf_path='good.label', approximate=True)
+  assert result.approximate
+  assert result.counts[0][0] is None
+  assert result.counts[1][0] == 'true'
+
+  # The exact counts.
+  result = dataset.select_groups(leaf_path='name')
+  assert not result.approximate
+  assert result.counts == [('a', 1500), ('b', 500)]
+
+
+def test_approximate_groups_too_many_distinct(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture
+) -> None:
+  monkeypatch.setenv('LILAC_APPROXIMATE_SAMPLE_SIZE', '400')
+  mocker.patch(f'{dataset_module.__name__}.TOO_MANY_DISTINCT', 20)
+  dataset = make_test_data([{'name': str(i % 100), 'letter': 'ab'[i % 2]} for i in range(2000)])
+  stats_spy = mocker.spy(dataset, 'stats')
+
+  result = dataset.select_groups(leaf_path='name', approximate=True)
+  assert result == SelectGroupsResult(too_many_distinct=True, counts=[], approximate=True)
+
+  # The limit is applied after the distinct values are counted.
+  result = dataset.select_groups(leaf_path='letter', limit=1, approximate=True)
+  assert result.approximate
+  assert len(result.counts) == 1
+  assert result.count_intervals and len(result.count_intervals) == 1
+  assert stats_spy.call_count == 0
+
+
+def test_approximate_groups_with_auto_bins(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture
+) -> None:
+  monkeypatch.setenv('LILAC_APPROXIMATE_SAMPLE_SIZE', '400')
+  dataset = make_test_data([{'score': float(i % 10)} for i in range(2000)])
+  stats_spy = mocker.spy(dataset, 'stats')
+
+  result = dataset.select_groups(leaf_path='score', approximate=True)
+  # The bins are computed from the stats of the sample.
+  assert stats_spy.call_count == 0
+  assert result.approximate
+  assert result.bins
+  assert result.count_intervals
+  for (_, count), (low, high) in zip(result.counts, result.count_intervals):
+    assert low <= count <= high
+
+
+def test_approximate_groups_of_fixed_rowids_are_exact(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  monkeypatch.setenv('LILAC_APPROXIMATE_SAMPLE_SIZE', '400')
+  dataset = make_test_data([{'name': 'ab'[i % 2]} for i in range(2000)])
+  rowids = [row[ROWID] for row in dataset.select_rows([ROWID], limit=10)]
+
+  result = dataset.select_groups(
+    leaf_path='name', filters=[(ROWID, 'in', rowids)], approximate=True
+  )
+  assert result == SelectGroupsResult(too_many_distinct=False, counts=[('a', 5), ('b', 5)])
+
+
+def test_approximate_groups_of_small_dataset_are_exact(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'name': 'a'}, {'name': 'b'}, {'name': 'b'}])
+
+  result = dataset.select_groups(leaf_path='name', approximate=True)
+  assert result == SelectGroupsResult(too_many_distinct=False, counts=[('b', 2), ('a', 1)])
+
+
+def test_approximate_pivot(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture
+) -> None:
+  monkeypatch.setenv('LILAC_APPROXIMATE_SAMPLE_SIZE', '400')
+  items: list[Item] = [{'split': 'train', 'source': 'wiki'}] * 1200 + [
+    {'split': 'test', 'source': 'cc'}
+  ] * 800
+  dataset = make_test_data(items)
+  stats_spy = mocker.spy(dataset, 'stats')
+
+  result = dataset.pivot('split', 'source', approximate=True)
+  assert result.approximate
+  # The distinct values are counted in the sample, instead of computing the stats of the fields.
+  assert stats_spy.call_count == 0
+  assert [group.value for group in result.outer_groups] == ['train', 'test']
+  for group, expected in zip(result.outer_groups, [1200, 800]):
+    assert group.count_interval
+    low, high = group.count_interval
+    assert low <= expected <= high
+    assert group.inner == [(group.inner[0][0], group.count)]
+    assert group.inner_intervals == [group.count_interval]
+
+  result = dataset.pivot('split', 'source')
+  assert not result.approximate
+  assert [(group.value, group.count) for group in result.outer_groups] == [
+    ('train', 1200),
+    ('test', 800),
+  ]
@@ -1,10 +1,15 @@
 """Tests for dataset.select_rows(filters=[...])."""
 
-from typing import ClassVar, Iterable, Iterator, Optional
+import threading
+from typing import ClassVar, Iterable, Iterator, Optional, cast
+
+import pytest
 
 from ..schema import ROWID, Field, Item, MapType, RichData, field, schema
 from ..signal import TextSignal
+from . import dataset_duckdb as dataset_duckdb_module
 from .dataset import BinaryFilterTuple, ListFilterTuple, StringFilterTuple, UnaryFilterTuple
+from .dataset_duckdb import ROWID_TABLE_PREFIX, DatasetDuckDB
 from .dataset_test_utils import TestDataMaker
 
 TEST_DATA: list[Item] = [
@@ -186,6 +191,91 @@ def test_filter_by_list_of_ids(make_test_data: TestDataMaker) -> None:
   ]
 
 
+def test_filter_by_large_list_of_ids(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  monkeypatch.setenv('LILAC_ROWID_TABLE_THRESHOLD', '2')
+  dataset = make_test_data(TEST_DATA)
+
+  # More rowids than the threshold are semi-joined against a table.
+  filter: ListFilterTuple = (ROWID, 'in', ['00001', '00003', '00004', 'missing'])
+  result = dataset.select_rows([ROWID, 'str'], filters=[filter])
+  assert list(result) == [
+    {ROWID: '00001', 'str': 'a'},
+    {ROWID: '00003', 'str': 'b'},
+    {ROWID: '00004', 'str': None},
+  ]
+  assert dataset.count(filters=[filter]) == 3
+
+
+def _rowid_tables(dataset: DatasetDuckDB) -> list[str]:
+  rows = dataset._query('SELECT table_name FROM duckdb_tables() ORDER BY table_name')
+  return [table_name for (table_name,) in rows if table_name.startswith(ROWID_TABLE_PREFIX)]
+
+
+def test_rowid_table_is_kept_while_in_use(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  monkeypatch.setenv('LILAC_ROWID_TABLE_THRESHOLD', '2')
+  monkeypatch.setattr(dataset_duckdb_module, 'MAX_ROWID_TABLES', 1)
+  dataset = cast(DatasetDuckDB, make_test_data(TEST_DATA))
+
+  with dataset._pin_rowid_tables():
+    rowid_table = dataset._rowid_table(['00001', '00002', '00003'])
+
+    def count_other_rowids() -> None:
+      # Each query creates another table, so the least recently used tables are dropped.
+      assert dataset.count(filters=[(ROWID, 'in', ['00001', '00002', '00004'])]) == 3
+      assert dataset.count(filters=[(ROWID, 'in', ['00002', '00003', '00004'])]) == 3
+
+    # The queries of another thread don't share the pins of this thread.
+    thread = threading.Thread(target=count_other_rowids)
+    thread.start()
+    thread.join()
+
+    # The tables of the other thread were dropped, but not the pinned table.
+    assert _rowid_tables(dataset) == [rowid_table]
+    assert dataset._query(f'SELECT count(*) FROM {rowid_table}') == [(3,)]
+
+  # Once the table is no longer used, it can be dropped.
+  assert dataset.count(filters=[(ROWID, 'in', ['00001', '00003', '00004'])]) == 3
+  assert rowid_table not in _rowid_tables(dataset)
+  assert len(_rowid_tables(dataset)) == 1
+
+
+def test_suspended_batches_do_not_pin_other_rowid_tables(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  monkeypatch.setenv('LILAC_ROWID_TABLE_THRESHOLD', '2')
+  monkeypatch.setattr(dataset_duckdb_module, 'MAX_ROWID_TABLES', 1)
+  dataset = cast(DatasetDuckDB, make_test_data(TEST_DATA))
+
+  # The generator is suspended while it streams the rows, in the context of this test.
+  batches = dataset.select_rows_batches(batch_size=1)
+  next(batches)
+
+  assert dataset.count(filters=[(ROWID, 'in', ['00001', '00002', '00004'])]) == 3
+  assert dataset.count(filters=[(ROWID, 'in', ['00002', '00003', '00004'])]) == 3
+  assert len(_rowid_tables(dataset)) == 1
+  batches.close()
+
+
+def test_stale_rowid_tables_are_dropped_on_connect(
+  make_test_data: TestDataMaker, monkeypatch: pytest.MonkeyPatch
+) -> None:
+  monkeypatch.setenv('LILAC_USE_TABLE_INDEX', 'True')
+  monkeypatch.setenv('LILAC_ROWID_TABLE_THRESHOLD', '2')
+  dataset = cast(DatasetDuckDB, make_test_data(TEST_DATA))
+
+  assert dataset.count(filters=[(ROWID, 'in', ['00001', '00002', '00004'])]) == 3
+  assert len(_rowid_tables(dataset)) == 1
+
+  # The database file keeps the tables, so reconnecting drops them.
+  dataset.close()
+  assert _rowid_tables(dataset) == []
+  assert dataset.count(filters=[(ROWID, 'in', ['00001', '00002', '00004'])]) == 3
+
+
 def test_filter_by_exists(make_test_data: TestDataMaker) -> None:
   items: list[Item] = [
     {'name': 'A', 'info': {'lang': 'en'}, 'ages': []},
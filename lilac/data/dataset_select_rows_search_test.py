@@ -16,7 +16,7 @@ from ..signal import TextEmbeddingSignal, clear_signal_registry, register_signal
 from ..signals.concept_scorer import ConceptSignal
 from ..signals.semantic_similarity import SemanticSimilaritySignal
 from ..signals.substring_search import SubstringSignal
-from .dataset import ConceptSearch, Filter, KeywordSearch, SemanticSearch, SortOrder
+from .dataset import Column, ConceptSearch, Filter, KeywordSearch, SemanticSearch, SortOrder
 from .dataset_duckdb import DatasetDuckDB
 from .dataset_test_utils import TestDataMaker, enriched_item
 
@@ -160,6 +160,104 @@ def test_search_keyword_with_filters(make_test_data: TestDataMaker) -> None:
   ]
 
 
+def test_keyword_spans_computed_in_duckdb(
+  make_test_data: TestDataMaker, mocker: MockerFixture
+) -> None:
+  texts = ['abab ab', 'xABcab ab_x', 'no match', '', 'Ünïcode ab', 'ab, ba? AB']
+  dataset = make_test_data([{'text': text, 'id': i} for i, text in enumerate(texts)] + [{'id': 6}])
+  compute_spy = mocker.spy(SubstringSignal, 'compute')
+
+  for query in ['ab', 'AB BA', "ab, 'x"]:
+    signal = SubstringSignal(query=query)
+    result = dataset.select_rows(['text', Column('text', signal_udf=signal, alias='spans')])
+    expected = list(signal.compute(texts)) + [None]
+    assert [row['spans'] for row in result] == expected
+  # The calls above are the expected values. The spans of `select_rows` come from DuckDB.
+  assert compute_spy.call_count == 3
+
+
+def test_search_keyword_with_keyword_index(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(
+    [
+      {'text': 'the cat sat on the mat'},
+      {'text': 'a cat and another cat chased the dog'},
+      {'text': 'Cats and dogs'},
+      {'text': 'the dog sat'},
+    ]
+  )
+  dataset.compute_keyword_index('text')
+
+  # Substrings match, ranked by BM25.
+  query = 'cat'
+  result = dataset.select_rows(
+    searches=[KeywordSearch(path='text', query=query)], combine_columns=True
+  )
+  assert result.total_num_rows == 3
+  expected_signal_udf = SubstringSignal(query=query)
+  assert list(result) == [
+    {'text': enriched_item('Cats and dogs', {expected_signal_udf.key(): [span(0, 3)]})},
+    {
+      'text': enriched_item(
+        'a cat and another cat chased the dog',
+        {expected_signal_udf.key(): [span(2, 5), span(18, 21)]},
+      )
+    },
+    {'text': enriched_item('the cat sat on the mat', {expected_signal_udf.key(): [span(4, 7)]})},
+  ]
+
+  # The query matches across words.
+  query = 'CAT s'
+  result = dataset.select_rows(
+    searches=[KeywordSearch(path='text', query=query)], combine_columns=True
+  )
+  expected_signal_udf = SubstringSignal(query=query)
+  assert list(result) == [
+    {'text': enriched_item('the cat sat on the mat', {expected_signal_udf.key(): [span(4, 9)]})}
+  ]
+
+  # Sorting by another column replaces the ranking.
+  result = dataset.select_rows(
+    ['text'],
+    searches=[KeywordSearch(path='text', query='dog')],
+    sort_by=[ROWID],
+    sort_order=SortOrder.ASC,
+  )
+  assert [row['text'] for row in result] == [
+    'a cat and another cat chased the dog',
+    'Cats and dogs',
+    'the dog sat',
+  ]
+
+  groups = dataset.select_groups('text', searches=[KeywordSearch(path='text', query='sat')])
+  assert groups.counts == [('the cat sat on the mat', 1), ('the dog sat', 1)]
+
+
+def test_keyword_index_finds_the_same_rows(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(
+    [
+      {'text': 'the cat sat on the mat'},
+      {'text': 'a cat and another cat chased the dog'},
+      {'text': 'Cats and dogs, concatenated'},
+      {'text': 'the dog sat'},
+      {'text': 'hot-dog stand'},
+      {'id': 1},
+    ]
+  )
+  queries = ['cat', 'CAT', 'at', 'cat sat', 't s', 'dog, c', 'hot-dog', 'the ', ' ', '%', 'zebra']
+
+  def search(query: str) -> tuple[int, list[Item], list[tuple]]:
+    searches = [KeywordSearch(path='text', query=query)]
+    result = dataset.select_rows(
+      searches=searches, sort_by=[ROWID], sort_order=SortOrder.ASC, combine_columns=True
+    )
+    groups = dataset.select_groups('text', searches=searches)
+    return result.total_num_rows, list(result), groups.counts
+
+  without_index = {query: search(query) for query in queries}
+  dataset.compute_keyword_index('text')
+  assert {query: search(query) for query in queries} == without_index
+
+
 class TestEmbedding(TextEmbeddingSignal):
   """A test embed function."""
 
@@ -1,6 +1,7 @@
 """Tests for dataset.select_rows(sort_by=...)."""
 
-from typing import ClassVar, Iterable, Iterator, Optional, Sequence, cast
+from datetime import datetime
+from typing import Any, ClassVar, Iterable, Iterator, Optional, Sequence, cast
 
 import numpy as np
 import pytest
@@ -26,7 +27,7 @@ from ..signal import (
   clear_signal_registry,
   register_signal,
 )
-from .dataset import Column, SortOrder
+from .dataset import Column, Dataset, SortOrder
 from .dataset_test_utils import TestDataMaker, enriched_item
 
 
@@ -577,3 +578,97 @@ def test_sort_by_topk_udf_with_filter(make_test_data: TestDataMaker) -> None:
       ),
     },
   ]
+
+
+def _select_all_pages(dataset: Dataset, page_size: int, **kwargs: Any) -> list[list[Item]]:
+  pages: list[list[Item]] = []
+  cursor: Optional[str] = None
+  while True:
+    result = dataset.select_rows([ROWID], limit=page_size, cursor=cursor, **kwargs)
+    pages.append(list(result))
+    cursor = result.next_cursor
+    if not cursor:
+      return pages
+
+
+@pytest.mark.parametrize('sort_order', [SortOrder.ASC, SortOrder.DESC])
+def test_sort_with_cursor(make_test_data: TestDataMaker, sort_order: SortOrder) -> None:
+  dataset = make_test_data(
+    [
+      {'score': 3.0, 'date': datetime(2023, 1, 3)},
+      {'date': datetime(2023, 1, 1)},  # Missing "score".
+      {'score': 1.0},  # Missing "date".
+      {'score': 3.0, 'date': datetime(2023, 1, 2)},
+      {'date': datetime(2023, 1, 5)},
+      {'score': 2.0, 'date': datetime(2023, 1, 4)},
+      {'score': 3.0},
+    ]
+  )
+  for sort_by in [[], ['score'], ['date'], ['score', 'date']]:
+    expected = list(dataset.select_rows([ROWID], sort_by=sort_by, sort_order=sort_order))
+    pages = _select_all_pages(dataset, page_size=2, sort_by=sort_by, sort_order=sort_order)
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert [row for page in pages for row in page] == expected
+
+
+def test_sort_with_cursor_and_filters(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'score': i % 4, 'active': i % 2 == 0} for i in range(10)])
+
+  first_page = dataset.select_rows(
+    [ROWID], filters=[('active', 'equals', True)], sort_by=['score'], limit=3
+  )
+  assert first_page.total_num_rows == 5
+  assert first_page.next_cursor
+
+  # The total number of rows is reused from the cursor.
+  second_page = dataset.select_rows(
+    [ROWID],
+    filters=[('active', 'equals', True)],
+    sort_by=['score'],
+    limit=3,
+    cursor=first_page.next_cursor,
+  )
+  assert second_page.total_num_rows == 5
+  assert second_page.next_cursor is None
+  assert list(first_page) + list(second_page) == list(
+    dataset.select_rows([ROWID], filters=[('active', 'equals', True)], sort_by=['score'])
+  )
+
+  # The offset is relative to the cursor.
+  offset_page = dataset.select_rows(
+    [ROWID],
+    filters=[('active', 'equals', True)],
+    sort_by=['score'],
+    limit=3,
+    offset=1,
+    cursor=first_page.next_cursor,
+  )
+  assert list(offset_page) == list(second_page)[1:]
+
+
+def test_sort_with_invalid_cursor(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'score': 1}, {'score': 2}, {'score': 3}])
+  result = dataset.select_rows([ROWID], sort_by=['score'], limit=1)
+  assert result.next_cursor
+
+  with pytest.raises(ValueError, match='Invalid cursor'):
+    dataset.select_rows([ROWID], sort_by=['score'], limit=1, cursor='not-a-cursor')
+
+  with pytest.raises(ValueError, match='The cursor does not match the sort order of the query'):
+    dataset.select_rows([ROWID], limit=1, cursor=result.next_cursor)
+
+
+def test_sort_by_udf_with_limit_over_many_batches(make_test_data: TestDataMaker) -> None:
+  # More rows than a DuckDB fetch, so the UDF is computed and merged in several batches.
+  lengths = [(i * 37) % 101 for i in range(5_000)]
+  dataset = make_test_data([{'text': 'x' * length} for length in lengths])
+  text_udf = Column('text', signal_udf=TestSignal(), alias='udf')
+
+  result = dataset.select_rows(
+    [ROWID, text_udf], sort_by=['udf.len'], sort_order=SortOrder.DESC, limit=3, offset=2
+  )
+  # Ties are sorted by rowid, in the same order.
+  expected = sorted(range(len(lengths)), key=lambda i: (-lengths[i], -i))[2:5]
+  assert [(row[ROWID], row['udf']['len']) for row in result] == [
+    (f'{i + 1:05d}', lengths[i]) for i in expected
+  ]
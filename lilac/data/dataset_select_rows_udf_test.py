@@ -1,10 +1,13 @@
 """Tests for dataset.select_rows(udf_col)."""
 
+import threading
+import time
 from typing import ClassVar, Iterable, Iterator, Optional, cast
 
 import numpy as np
 import pytest
 from pytest import approx
+from pytest_mock import MockerFixture
 from typing_extensions import override
 
 from ..concepts.concept import ExampleIn
@@ -12,6 +15,7 @@ from ..concepts.db_concept import ConceptUpdate, DiskConceptDB
 from ..schema import (
   ROWID,
   SPAN_KEY,
+  VALUE_KEY,
   Field,
   Item,
   RichData,
@@ -26,11 +30,15 @@ from ..signal import (
   TextSignal,
   VectorSignal,
   clear_signal_registry,
+  clear_warm_signals,
   register_signal,
 )
+from ..signals.concept_labels import ConceptLabelsSignal
 from ..signals.concept_scorer import ConceptSignal
+from .cancellation import CancellationToken, QueryCancelledError, cancellable
 from .dataset import BinaryFilterTuple, Column, SortOrder
 from .dataset_test_utils import TestDataMaker, enriched_item
+from .profiling import profile_queries
 
 EMBEDDINGS: list[tuple[str, list[float]]] = [
   ('hello.', [1.0, 0.0, 0.0]),
@@ -118,6 +126,44 @@ class ComputedKeySignal(TextSignal):
     return f'key_{is_computed_signal}'
 
 
+class SlowLengthSignal(TextSignal):
+  name: ClassVar[str] = 'slow_length'
+
+  _call_count: int = 0
+
+  def fields(self) -> Field:
+    return field('int32')
+
+  def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
+    for text_content in data:
+      self._call_count += 1
+      time.sleep(0.001)
+      yield len(text_content)
+
+
+# Both `BarrierSignal` UDFs of a query need to reach the barrier, so they only finish when they are
+# computed concurrently.
+_udf_barrier = threading.Barrier(2, timeout=5)
+
+
+class BarrierSignal(TextSignal):
+  name: ClassVar[str] = 'barrier_signal'
+
+  offset: int
+  setup_count: ClassVar[int] = 0
+
+  def fields(self) -> Field:
+    return field('int32')
+
+  def setup(self) -> None:
+    BarrierSignal.setup_count += 1
+
+  def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
+    _udf_barrier.wait()
+    for text_content in data:
+      yield len(text_content) + self.offset
+
+
 @pytest.fixture(scope='module', autouse=True)
 def setup_teardown() -> Iterable[None]:
   # Setup.
@@ -127,6 +173,8 @@ def setup_teardown() -> Iterable[None]:
   register_signal(TestSignal)
   register_signal(TestEmbeddingSumSignal)
   register_signal(ComputedKeySignal)
+  register_signal(SlowLengthSignal)
+  register_signal(BarrierSignal)
 
   # Unit test runs.
   yield
@@ -361,3 +409,216 @@ def test_sparse_embedding_index_with_asc_sort(make_test_data: TestDataMaker) ->
       'udf': [{SPAN_KEY: {'start': 0, 'end': 12}, 'score': approx(0.958, abs=1e-3)}],
     },
   ]
+
+
+def test_udf_cancelled(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'text': 'hello'}, {'text': 'everybody'}])
+
+  token = CancellationToken()
+  token.cancel()
+  with cancellable(token), pytest.raises(QueryCancelledError, match='The query was cancelled.'):
+    dataset.select_rows(['text', Column('text', signal_udf=LengthSignal())])
+
+  # The token only applies within the block.
+  assert dataset.count() == 2
+
+
+def test_udf_timeout_stops_compute(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'text': f'text {i}'} for i in range(2_000)])
+
+  signal = SlowLengthSignal()
+  token = CancellationToken(timeout_sec=0.05)
+  with cancellable(token), pytest.raises(QueryCancelledError, match='timed out'):
+    dataset.select_rows(['text', Column('text', signal_udf=signal)])
+  token.close()
+
+  # The signal stopped shortly after the timeout, instead of computing every row.
+  assert signal._call_count < 2_000
+
+
+def test_udf_profiled(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'text': 'hello'}, {'text': 'everybody'}])
+
+  with profile_queries() as profile:
+    dataset.select_rows(
+      ['text', Column('text', signal_udf=LengthSignal())], filters=[('text', 'exists')]
+    )
+
+  assert set(profile.phase_times_sec.keys()) == {
+    'manifest',
+    'compile',
+    'execute',
+    'explain',
+    'udf',
+    'convert',
+  }
+  assert all(secs >= 0 for secs in profile.phase_times_sec.values())
+  # The count of the filtered rows, and the query of the rows.
+  assert len(profile.queries) == 2
+  assert all(query.sql.strip().startswith('SELECT') for query in profile.queries)
+  assert all(
+    'Query Profiling Information' in (query.explain_analyze or '') for query in profile.queries
+  )
+
+  # Queries outside the block are not profiled.
+  dataset.count()
+  assert len(profile.queries) == 2
+
+  # Without `EXPLAIN ANALYZE`, the queries run once.
+  with profile_queries(explain_analyze=False) as profile:
+    dataset.select_rows(['text'])
+  assert 'explain' not in profile.phase_times_sec
+  assert [query.explain_analyze for query in profile.queries] == [None]
+
+
+def test_udfs_computed_concurrently_with_warm_signals(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'text': 'hello'}, {'text': 'everybody'}])
+
+  for _ in range(2):
+    result = dataset.select_rows(
+      [
+        'text',
+        Column('text', signal_udf=BarrierSignal(offset=0), alias='udf0'),
+        Column('text', signal_udf=BarrierSignal(offset=10), alias='udf10'),
+      ]
+    )
+    assert list(result) == [
+      {'text': 'hello', 'udf0': 5, 'udf10': 15},
+      {'text': 'everybody', 'udf0': 9, 'udf10': 19},
+    ]
+
+  # Each signal is set up once, and stays warm for the next query.
+  assert BarrierSignal.setup_count == 2
+
+
+def test_preview_udf_outputs_cached_until_concept_changes(
+  make_test_data: TestDataMaker, mocker: MockerFixture
+) -> None:
+  dataset = make_test_data([{'text': 'hello world'}, {'text': 'bye'}])
+  concept_db = DiskConceptDB()
+  concept_db.create(namespace='test_namespace', name='test_concept', type=SignalInputType.TEXT)
+  concept_db.edit(
+    'test_namespace', 'test_concept', ConceptUpdate(insert=[ExampleIn(label=True, text='hello')])
+  )
+  compute_spy = mocker.spy(ConceptLabelsSignal, 'compute')
+
+  def select_labels() -> list[Item]:
+    udf = ConceptLabelsSignal(namespace='test_namespace', concept_name='test_concept')
+    return list(dataset.select_rows(['text', Column('text', signal_udf=udf, alias='labels')]))
+
+  expected = [
+    {'text': 'hello world', 'labels': [{SPAN_KEY: {'start': 0, 'end': 5}, 'label': True}]},
+    {'text': 'bye', 'labels': None},
+  ]
+  assert select_labels() == expected
+  assert compute_spy.call_count == 1
+
+  # The second page is served from the cache.
+  assert select_labels() == expected
+  assert compute_spy.call_count == 1
+
+  # Editing the concept changes its version, which invalidates the cached outputs.
+  concept_db.edit(
+    'test_namespace', 'test_concept', ConceptUpdate(insert=[ExampleIn(label=False, text='bye')])
+  )
+  assert select_labels() == [
+    expected[0],
+    {'text': 'bye', 'labels': [{SPAN_KEY: {'start': 0, 'end': 3}, 'label': False}]},
+  ]
+  assert compute_spy.call_count == 2
+
+
+def test_warm_udf_set_up_once_across_pages(
+  make_test_data: TestDataMaker, mocker: MockerFixture
+) -> None:
+  dataset = make_test_data([{'text': 'hello world'}, {'text': 'bye'}])
+  concept_db = DiskConceptDB()
+  concept_db.create(namespace='test_namespace', name='test_concept', type=SignalInputType.TEXT)
+  concept_db.edit(
+    'test_namespace', 'test_concept', ConceptUpdate(insert=[ExampleIn(label=True, text='hello')])
+  )
+  clear_warm_signals()
+  setup_spy = mocker.spy(ConceptLabelsSignal, 'setup')
+
+  def select_page(offset: int) -> list[Item]:
+    udf = ConceptLabelsSignal(namespace='test_namespace', concept_name='test_concept')
+    return list(
+      dataset.select_rows(
+        ['text', Column('text', signal_udf=udf, alias='labels')],
+        sort_by=['text'],
+        sort_order=SortOrder.ASC,
+        limit=1,
+        offset=offset,
+      )
+    )
+
+  assert select_page(0) == [{'text': 'bye', 'labels': None}]
+  assert select_page(1) == [
+    {'text': 'hello world', 'labels': [{SPAN_KEY: {'start': 0, 'end': 5}, 'label': True}]}
+  ]
+  # The warm signal is set up when it is checked out fresh, not on every page.
+  assert setup_spy.call_count == 1
+
+
+def test_select_rows_arrow(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(
+    [{'text': 'hello.'}, {'text': 'hello world.'}, {'text': 'hello2.'}, {'text': ''}]
+  )
+  dataset.compute_signal(TestEmbedding(), 'text')
+  concept_db = DiskConceptDB()
+  concept_db.create(namespace='test_namespace', name='test_concept', type=SignalInputType.TEXT)
+  concept_db.edit(
+    'test_namespace',
+    'test_concept',
+    ConceptUpdate(
+      insert=[ExampleIn(label=False, text='hello.'), ExampleIn(label=True, text='hello world.')]
+    ),
+  )
+  length_col = Column('text', signal_udf=LengthSignal(), alias='length')
+  concept_col = Column(
+    'text',
+    signal_udf=ConceptSignal(
+      namespace='test_namespace', concept_name='test_concept', embedding='test_embedding'
+    ),
+    alias='concept',
+  )
+
+  # The Arrow table has the rows of `select_rows`, including when sorting by UDFs.
+  queries: list[dict] = [
+    {'columns': ['text', length_col]},
+    {'columns': ['text', length_col], 'sort_by': ['length'], 'limit': 2, 'offset': 1},
+  ]
+  for query in queries:
+    result = dataset.select_rows(**query)
+    table = dataset.select_rows_arrow(**query)
+    assert table.to_pylist() == list(result), query
+    assert table.schema.metadata[b'total_num_rows'] == str(result.total_num_rows).encode()
+
+  # The concept scores have the float32 type of the signal fields.
+  result = dataset.select_rows(['text', concept_col], sort_by=['concept'], limit=2)
+  table = dataset.select_rows_arrow(['text', concept_col], sort_by=['concept'], limit=2)
+  rows = table.to_pylist()
+  assert [row['text'] for row in rows] == [row['text'] for row in result]
+  assert [row['concept'][0]['score'] for row in rows] == [
+    approx(row['concept'][0]['score'], abs=1e-6) for row in result
+  ]
+
+  # Combined columns have the fields of `select_rows_schema`, so the embedding is a null field.
+  table = dataset.select_rows_arrow(['text', length_col], combine_columns=True, limit=1)
+  assert table.to_pylist() == [
+    {'text': {VALUE_KEY: 'hello.', 'length_signal': 6, 'test_embedding': None}}
+  ]
+
+  # Pages are seeked with the cursor in the schema metadata.
+  table = dataset.select_rows_arrow(['text'], sort_by=['text'], sort_order=SortOrder.ASC, limit=3)
+  assert table.to_pylist() == [
+    {'text': ''},
+    {'text': 'hello world.'},
+    {'text': 'hello.'},
+  ]
+  cursor = table.schema.metadata[b'next_cursor'].decode()
+  table = dataset.select_rows_arrow(
+    ['text'], sort_by=['text'], sort_order=SortOrder.ASC, limit=3, cursor=cursor
+  )
+  assert table.to_pylist() == [{'text': 'hello2.'}]
+  assert table.schema.metadata[b'next_cursor'] == b''
@@ -8,6 +8,7 @@ from pytest_mock import MockerFixture
 
 from ..schema import Field, Item, MapType, field, schema
 from . import dataset as dataset_module
+from . import dataset_duckdb as dataset_duckdb_module
 from .dataset import StatsResult
 from .dataset_test_utils import TestDataMaker
 
@@ -156,3 +157,168 @@ def test_datetime(make_test_data: TestDataMaker) -> None:
     min_val=datetime(2023, 1, 1),
     max_val=datetime(2023, 3, 1),
   )
+
+
+def test_stats_many(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(SIMPLE_ITEMS)
+
+  results = dataset.stats_many(['str', 'float', 'bool', 'int'])
+  assert results == [
+    StatsResult(path=('str',), total_count=3, approx_count_distinct=2, avg_text_length=1),
+    StatsResult(path=('float',), total_count=4, approx_count_distinct=4, min_val=1.0, max_val=3.0),
+    StatsResult(path=('bool',), total_count=3, approx_count_distinct=2),
+    StatsResult(path=('int',), total_count=3, approx_count_distinct=2, min_val=1, max_val=2),
+  ]
+  assert results == [dataset.stats(path) for path in ['str', 'float', 'bool', 'int']]
+
+
+def test_stats_many_nested_and_map(make_test_data: TestDataMaker) -> None:
+  items: list[Item] = [
+    {'name': 'Name1', 'addresses': [{'zips': [5, 8]}], 'column': {'a': 1.0, 'b': 2.0}},
+    {'name': 'Name2', 'addresses': [{'zips': [3]}, {'zips': [11, 8]}], 'column': {'b': 2.5}},
+    {'name': 'Name2', 'addresses': [], 'column': {'a': 3.0, 'c': 3.5}},
+    {'name': 'Name2', 'addresses': [{'zips': []}]},
+  ]
+  data_schema = schema(
+    {
+      'name': 'string',
+      'addresses': [{'zips': ['int32']}],
+      'column': Field(dtype=MapType(key_type='string', value_field=field('float32'))),
+    }
+  )
+  dataset = make_test_data(items, schema=data_schema)
+
+  leaf_paths = ['name', 'addresses.*.zips.*', 'column.a', 'column.c']
+  assert dataset.stats_many(leaf_paths) == [
+    StatsResult(path=('name',), total_count=4, approx_count_distinct=2, avg_text_length=5),
+    StatsResult(
+      path=('addresses', '*', 'zips', '*'),
+      total_count=5,
+      approx_count_distinct=4,
+      min_val=3,
+      max_val=11,
+    ),
+    StatsResult(
+      path=('column', 'a'), total_count=2, approx_count_distinct=2, min_val=1.0, max_val=3.0
+    ),
+    StatsResult(
+      path=('column', 'c'), total_count=1, approx_count_distinct=1, min_val=3.5, max_val=3.5
+    ),
+  ]
+
+  with pytest.raises(ValueError, match='Cannot compute stats on a map field'):
+    dataset.stats_many(['name', 'column'])
+
+
+def test_stats_many_value_samples(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'int': i} for i in range(1000)])
+
+  [result] = dataset.stats_many(['int'])
+  assert 0 < len(result.value_samples) <= 100
+  assert all(0 < v < 1000 for v in result.value_samples)
+
+
+def test_stats_many_sparse_leaf(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  sample_size = 2000
+  mocker.patch(f'{dataset_duckdb_module.__name__}.TOO_MANY_DISTINCT', sample_size)
+  # Each row unnests to 5 rows for the tags, so the ids are in a fifth of the unnested rows.
+  items: list[Item] = [{'id': i, 'tags': ['a', 'b', 'c', 'd', 'e']} for i in range(sample_size)]
+  dataset = make_test_data(items)
+
+  [id_stats, tags_stats] = dataset.stats_many(['id', 'tags.*'])
+  expected = dataset.stats('id')
+  assert id_stats.total_count == expected.total_count == sample_size
+  assert id_stats.approx_count_distinct == pytest.approx(expected.approx_count_distinct, rel=0.2)
+  assert len(id_stats.value_samples) == 100
+  assert id_stats.approximate and not expected.approximate
+  # The tags are in every sampled row, so they are sampled as much as by `stats()`.
+  assert not tags_stats.approximate
+
+  # The sketches are computed together for the leafs of a map, so stats from them are approximate.
+  dataset.map(lambda item: item, output_path='copy')
+  assert dataset.stats('copy.id').approximate
+  assert not dataset.stats('copy.tags.*').approximate
+
+
+def test_stats_many_cache_file(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  dataset = make_test_data(SIMPLE_ITEMS)
+  expected = [
+    StatsResult(path=('int',), total_count=3, approx_count_distinct=2, min_val=1, max_val=2)
+  ]
+  assert dataset.stats_many(['int']) == expected
+
+  # A fresh instance reads the stats from the sidecar file instead of querying the data.
+  new_dataset = dataset.__class__(
+    dataset.namespace, dataset.dataset_name, project_dir=dataset.project_dir
+  )
+  compute_spy = mocker.spy(new_dataset, '_compute_stats_many')
+  assert new_dataset.stats_many(['int']) == expected
+  assert compute_spy.call_count == 0
+
+  # Stats for new leafs are computed.
+  assert new_dataset.stats_many(['int', 'str'])[1] == StatsResult(
+    path=('str',), total_count=3, approx_count_distinct=2, avg_text_length=1
+  )
+  assert compute_spy.call_count == 1
+
+
+def test_stats_many_with_deletions(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(SIMPLE_ITEMS)
+
+  assert dataset.stats_many(['float']) == [
+    StatsResult(path=('float',), total_count=4, approx_count_distinct=4, min_val=1.0, max_val=3.0)
+  ]
+
+  dataset.delete_rows(filters=[('float', 'equals', 3.0)])
+
+  assert dataset.stats_many(['float']) == [
+    StatsResult(path=('float',), total_count=3, approx_count_distinct=3, min_val=1.0, max_val=2.0)
+  ]
+  assert dataset.stats_many(['float'], include_deleted=True) == [
+    StatsResult(path=('float',), total_count=4, approx_count_distinct=4, min_val=1.0, max_val=3.0)
+  ]
+
+
+def test_stats_from_sketches(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  dataset = make_test_data([{'text': text} for text in ['a', 'bb', 'bb', 'ccc']])
+  dataset.map(lambda item: len(item['text']), output_path='length')
+
+  # A fresh instance reads the sketches written by `map` instead of querying the data.
+  new_dataset = dataset.__class__(
+    dataset.namespace, dataset.dataset_name, project_dir=dataset.project_dir
+  )
+  # Build the views, which is deferred to the first use of the dataset.
+  new_dataset.manifest()
+  query_spy = mocker.spy(new_dataset, '_query')
+  expected = StatsResult(
+    path=('length',), total_count=4, approx_count_distinct=3, min_val=1, max_val=3
+  )
+  assert new_dataset.stats('length') == expected
+  assert new_dataset.stats_many(['length']) == [expected]
+  assert query_spy.call_count == 0
+
+  # Stats of columns without sketches are computed.
+  assert new_dataset.stats('text') == StatsResult(
+    path=('text',), total_count=4, approx_count_distinct=3, avg_text_length=2
+  )
+  assert query_spy.call_count > 0
+
+
+def test_stats_cache(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  dataset = cast(dataset_duckdb_module.DatasetDuckDB, make_test_data(SIMPLE_ITEMS))
+  sketch_spy = mocker.spy(dataset, '_get_leaf_sketch')
+
+  # The cache is keyed by the normalized path and by whether deleted rows are included.
+  assert dataset.stats('int').total_count == 3
+  assert dataset.stats(('int',)).total_count == 3
+  assert sketch_spy.call_count == 1
+  dataset.stats('int', include_deleted=True)
+  assert sketch_spy.call_count == 2
+
+  # A reconnect and deleted rows clear the cache.
+  dataset.close()
+  assert dataset.stats('int').total_count == 3
+  assert sketch_spy.call_count == 3
+  dataset.delete_rows(['00001'])
+  assert dataset.stats('int').total_count == 2
+  assert sketch_spy.call_count == 4
@@ -1,9 +1,14 @@
 """Implementation-agnostic tests of the Dataset DB API."""
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import ClassVar, Iterable, Iterator, Optional, cast
 
+import duckdb
 import numpy as np
 import pytest
+from pytest_mock import MockerFixture
 from typing_extensions import override
 
 from ..config import (
@@ -22,6 +27,7 @@ from ..schema import (
   Item,
   MapType,
   RichData,
+  Schema,
   chunk_embedding,
   field,
   schema,
@@ -30,6 +36,7 @@ from ..schema import (
 from ..signal import TextEmbeddingSignal, TextSignal, clear_signal_registry, register_signal
 from ..source import clear_source_registry, register_source
 from .dataset import Column, DatasetManifest, config_from_dataset
+from .dataset_duckdb import DatasetDuckDB, DuckDBConnectionPool
 from .dataset_test_utils import (
   TEST_DATASET_NAME,
   TEST_NAMESPACE,
@@ -693,6 +700,97 @@ def test_map_dtype(make_test_data: TestDataMaker) -> None:
   ]
 
 
+def test_map_keys_are_cached(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  items = [{'column': {'a': 1.0, 'b': 2.0}}, {'column': {'c': 3.0}}]
+  map_dtype = MapType(key_type='string', value_field=field('float32'))
+  dataset = make_test_data(items, schema=schema({'column': Field(dtype=map_dtype)}))
+  keys_field = Field(
+    dtype=map_dtype, fields={'a': field('float32'), 'b': field('float32'), 'c': field('float32')}
+  )
+  assert dataset.manifest().data_schema.fields['column'] == keys_field
+
+  query_spy = mocker.spy(DatasetDuckDB, '_query_df')
+  # Adding a label recomputes the manifest, and the map keys are read from the cache.
+  dataset.add_labels('test_label')
+  assert dataset.manifest().data_schema.fields['column'] == keys_field
+
+  # The cache is persisted for other instances of the dataset.
+  other_dataset = DatasetDuckDB(
+    dataset.namespace, dataset.dataset_name, project_dir=dataset.project_dir
+  )
+  assert other_dataset.manifest().data_schema.fields['column'] == keys_field
+  assert query_spy.call_count == 0
+
+
+def test_construction_is_lazy(make_test_data: TestDataMaker, mocker: MockerFixture) -> None:
+  dataset = make_test_data(SIMPLE_ITEMS)
+  create_views_spy = mocker.spy(DatasetDuckDB, '_create_joint_views')
+
+  new_dataset = DatasetDuckDB(
+    dataset.namespace, dataset.dataset_name, project_dir=dataset.project_dir
+  )
+  assert create_views_spy.call_count == 0
+
+  # The views are built on first use.
+  assert new_dataset.count() == 3
+  assert create_views_spy.call_count == 1
+
+
+def test_close_and_reopen(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data(SIMPLE_ITEMS)
+  dataset.add_labels('good', filters=[('str', 'equals', 'b')])
+  assert dataset.count(filters=[('good', 'exists')]) == 2
+
+  dataset.close()
+  # The connection and the views are reopened on first use.
+  assert dataset.count(filters=[('good', 'exists')]) == 2
+  dataset.add_labels('good', filters=[('str', 'equals', 'a')])
+  assert dataset.count(filters=[('good', 'exists')]) == 3
+
+
+def test_query_after_close_rebuilds_views(make_test_data: TestDataMaker) -> None:
+  dataset = cast(DatasetDuckDB, make_test_data(SIMPLE_ITEMS))
+  dataset.add_labels('good', filters=[('str', 'equals', 'b')])
+  dataset.manifest()
+
+  # The connection is closed after the manifest was computed, before the query checks out a cursor.
+  dataset.close()
+  assert dataset._query('SELECT count(*) FROM t') == [(3,)]
+
+  # The label tables are tied to the connection, so they are rebuilt on the new connection too.
+  dataset._pool.reconnect()
+  assert dataset.count(filters=[('good', 'exists')]) == 2
+
+
+def test_close_waits_for_running_queries(make_test_data: TestDataMaker) -> None:
+  dataset = cast(DatasetDuckDB, make_test_data(SIMPLE_ITEMS))
+  assert dataset.count() == 3
+  events: list[str] = []
+  checked_out = threading.Event()
+
+  def query() -> None:
+    with dataset._pool.cursor():
+      checked_out.set()
+      # Give the close time to wait for this cursor.
+      time.sleep(0.2)
+      events.append('query')
+
+  def close() -> None:
+    dataset.close()
+    events.append('close')
+
+  querier = threading.Thread(target=query, daemon=True)
+  querier.start()
+  checked_out.wait(timeout=5)
+  closer = threading.Thread(target=close, daemon=True)
+  closer.start()
+  querier.join(timeout=10)
+  closer.join(timeout=10)
+  assert not querier.is_alive() and not closer.is_alive()
+  assert events == ['query', 'close']
+  assert dataset.count() == 3
+
+
 def test_get_embeddings(make_test_data: TestDataMaker) -> None:
   dataset = make_test_data([{'text': 'hello.'}, {'text': 'hello world.'}])
   dataset.compute_embedding('test_embedding', 'text')
@@ -712,3 +810,189 @@ def test_get_embeddings(make_test_data: TestDataMaker) -> None:
   np.testing.assert_array_equal(
     chunk_embeddings[0][EMBEDDING_KEY], np.array([1.0, 1.0, 1.0], dtype=np.float32)
   )
+
+
+def test_reconnect_waits_for_checked_out_cursors() -> None:
+  pool = DuckDBConnectionPool(duckdb.connect)
+  checked_out = threading.Event()
+  reconnect_started = threading.Event()
+  events: list[str] = []
+
+  def read() -> None:
+    with pool.cursor() as cursor:
+      checked_out.set()
+      reconnect_started.wait(timeout=5)
+      # Give the reconnect time to wait for this cursor.
+      time.sleep(0.1)
+      # The pending reconnect does not hold the read lock, so the query runs.
+      assert pool.execute(cursor, 'SELECT 1').fetchall() == [(1,)]
+      events.append('read')
+
+  def reconnect() -> None:
+    reconnect_started.set()
+    pool.reconnect(lambda: events.append('reconnect'))
+
+  reader = threading.Thread(target=read, daemon=True)
+  reader.start()
+  checked_out.wait(timeout=5)
+  connection_id = pool.connection_id
+  reconnecter = threading.Thread(target=reconnect, daemon=True)
+  reconnecter.start()
+  reader.join(timeout=10)
+  reconnecter.join(timeout=10)
+  assert not reader.is_alive() and not reconnecter.is_alive()
+  assert events == ['read', 'reconnect']
+  assert pool.connection_id == connection_id + 1
+
+
+def test_reconnect_from_thread_holding_cursor() -> None:
+  pool = DuckDBConnectionPool(duckdb.connect)
+  reconnected = threading.Event()
+  with pool.cursor() as cursor:
+    connection_id = pool.connection_id
+    # The connection is replaced once this thread returns its cursors, instead of waiting for them.
+    pool.reconnect(reconnected.set)
+    assert not reconnected.is_set()
+    assert pool.execute(cursor, 'SELECT 1').fetchall() == [(1,)]
+    with pool.cursor() as nested_cursor:
+      assert pool.execute(nested_cursor, 'SELECT 2').fetchall() == [(2,)]
+    assert not reconnected.is_set()
+  assert reconnected.is_set()
+  assert pool.connection_id == connection_id + 1
+  with pool.cursor() as cursor:
+    assert pool.execute(cursor, 'SELECT 3').fetchall() == [(3,)]
+
+
+def test_concurrent_reads_during_signal_computation(make_test_data: TestDataMaker) -> None:
+  dataset = make_test_data([{'text': 'hello'}, {'text': 'everybody'}, {'text': 'hi'}])
+
+  def read(_: int) -> list[Item]:
+    assert dataset.count() == 3
+    return list(dataset.select_rows(['text'], sort_by=['text'], exclude_signals=True))
+
+  # Computing a signal rebuilds the views while the reads are in flight.
+  with ThreadPoolExecutor(max_workers=4) as executor:
+    reads = executor.map(read, range(50))
+    dataset.compute_signal(TestSignal(), 'text')
+    for rows in reads:
+      assert rows == [{'text': 'hi'}, {'text': 'hello'}, {'text': 'everybody'}]
+
+  assert dataset.manifest().data_schema.has_field(('text', 'test_signal'))
+
+
+@pytest.mark.parametrize('use_table_index', [False, True])
+def test_reads_during_view_rebuild(
+  make_test_data: TestDataMaker,
+  mocker: MockerFixture,
+  monkeypatch: pytest.MonkeyPatch,
+  use_table_index: bool,
+) -> None:
+  if use_table_index:
+    monkeypatch.setenv('LILAC_USE_TABLE_INDEX', 'True')
+  dataset = cast(
+    DatasetDuckDB, make_test_data([{'text': 'hello'}, {'text': 'everybody'}, {'text': 'hi'}])
+  )
+  expected_rows = [{'text': 'hi'}, {'text': 'hello'}, {'text': 'everybody'}]
+  assert list(dataset.select_rows(['text'], sort_by=['text'])) == expected_rows
+
+  events: list[str] = []
+  streaming = threading.Event()
+  rebuilding = threading.Event()
+  release_rebuild = threading.Event()
+  rebuilt = threading.Event()
+  create_joint_views = dataset._create_joint_views
+
+  def blocking_create_joint_views(*args: object) -> Schema:
+    # The write lock is held until the rebuild is released. With a table index, the checkpoint
+    # already ran while the stream was in flight.
+    merged_schema = create_joint_views(*args)
+    rebuilding.set()
+    release_rebuild.wait(timeout=5)
+    events.append('rebuild')
+    return merged_schema
+
+  mocker.patch.object(dataset, '_create_joint_views', side_effect=blocking_create_joint_views)
+
+  def stream() -> list[Item]:
+    batches = dataset.select_rows_batches(
+      ['text'], sort_by=['text'], exclude_signals=True, batch_size=1
+    )
+    rows = next(batches).to_pylist()
+    streaming.set()
+    # The rest of the result is fetched after the views were rebuilt under it.
+    rebuilt.wait(timeout=5)
+    return rows + [row for batch in batches for row in batch.to_pylist()]
+
+  def read() -> list[Item]:
+    rows = list(dataset.select_rows(['text'], sort_by=['text'], exclude_signals=True))
+    events.append('read')
+    return rows
+
+  with ThreadPoolExecutor(max_workers=3) as executor:
+    streamed = executor.submit(stream)
+    assert streaming.wait(timeout=5)
+    computed = executor.submit(dataset.compute_signal, TestSignal(), 'text')
+    assert rebuilding.wait(timeout=5)
+    read_during_rebuild = executor.submit(read)
+    # Give the read time to wait for the rebuild.
+    time.sleep(0.2)
+    release_rebuild.set()
+    computed.result(timeout=10)
+    rebuilt.set()
+    assert streamed.result(timeout=10) == expected_rows
+    assert read_during_rebuild.result(timeout=10) == expected_rows
+
+  assert events.index('rebuild') < events.index('read')
+  assert dataset.manifest().data_schema.has_field(('text', 'test_signal'))
+
+
+def test_reads_during_reconnect(make_test_data: TestDataMaker) -> None:
+  dataset = cast(
+    DatasetDuckDB, make_test_data([{'text': 'hello'}, {'text': 'everybody'}, {'text': 'hi'}])
+  )
+  expected_rows = [{'text': 'hi'}, {'text': 'hello'}, {'text': 'everybody'}]
+  assert list(dataset.select_rows(['text'], sort_by=['text'])) == expected_rows
+  connection_id = dataset._pool.connection_id
+
+  events: list[str] = []
+  streaming = threading.Event()
+  closing = threading.Event()
+
+  def stream() -> list[Item]:
+    batches = dataset.select_rows_batches(['text'], sort_by=['text'], batch_size=1)
+    rows = next(batches).to_pylist()
+    streaming.set()
+    closing.wait(timeout=5)
+    # Give the close time to wait for the cursor of this stream.
+    time.sleep(0.2)
+    rows += [row for batch in batches for row in batch.to_pylist()]
+    events.append('stream')
+    return rows
+
+  def close() -> None:
+    closing.set()
+    dataset.close()
+    events.append('close')
+
+  def read() -> list[Item]:
+    rows = list(dataset.select_rows(['text'], sort_by=['text']))
+    events.append('read')
+    return rows
+
+  with ThreadPoolExecutor(max_workers=3) as executor:
+    streamed = executor.submit(stream)
+    assert streaming.wait(timeout=5)
+    closed = executor.submit(close)
+    assert closing.wait(timeout=5)
+    # Give the close time to wait for the stream, so the read waits for the pending reconnect.
+    time.sleep(0.1)
+    read_during_reconnect = executor.submit(read)
+    assert streamed.result(timeout=10) == expected_rows
+    closed.result(timeout=10)
+    assert read_during_reconnect.result(timeout=10) == expected_rows
+
+  # The stream finishes on the old connection, and the read runs on the new one.
+  assert events[0] == 'stream'
+  assert sorted(events[1:]) == ['close', 'read']
+  assert dataset._pool.connection_id == connection_id + 1
+  assert dataset._views_connection_id == dataset._pool.connection_id
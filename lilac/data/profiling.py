@@ -0,0 +1,164 @@
+"""Profiling of dataset queries: the generated SQL, the DuckDB plans and the time of each phase."""
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Iterator, Literal, Optional
+
+import duckdb
+from pydantic import BaseModel, PrivateAttr
+
+from ..utils import log
+
+# The phases of a dataset query:
+#   manifest: checking the dataset files for changes, and rebuilding the views when they changed.
+#   compile: compiling the query to SQL, and the rest of the Python work outside the other phases.
+#   execute: executing the SQL in DuckDB.
+#   udf: computing the signal UDFs of `select_rows` on the fetched rows.
+#   convert: converting the DuckDB results to data frames and rows.
+#   explain: running `EXPLAIN ANALYZE` on the SQL. This is profiling overhead, which the query does
+#     not have when it is not profiled.
+QueryPhase = Literal['manifest', 'compile', 'execute', 'udf', 'convert', 'explain']
+
+
+class ProfiledQuery(BaseModel):
+  """A SQL statement that ran in DuckDB while profiling."""
+
+  sql: str
+  wall_time_sec: float
+  # The plan of the statement, annotated with the time and cardinality of each operator.
+  explain_analyze: Optional[str] = None
+
+
+class QueryProfile(BaseModel):
+  """The profile of the dataset queries that ran in a `profile_queries` block."""
+
+  # The wall time of each phase. A phase does not include the time of the phases nested in it on
+  # the same thread.
+  phase_times_sec: dict[str, float] = {}
+  queries: list[ProfiledQuery] = []
+
+  _explain_analyze: bool = PrivateAttr(default=True)
+  _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+  def add_phase_time(self, phase: QueryPhase, wall_time_sec: float) -> None:
+    """Adds wall time to a phase."""
+    with self._lock:
+      self.phase_times_sec[phase] = self.phase_times_sec.get(phase, 0.0) + wall_time_sec
+
+  def execute(
+    self, cursor: duckdb.DuckDBPyConnection, sql: str, params: Optional[list[Any]] = None
+  ) -> duckdb.DuckDBPyConnection:
+    """Executes a statement on a cursor, and records its SQL, plan and wall time."""
+    explain_analyze: Optional[str] = None
+    # EXPLAIN ANALYZE runs the statement, and does not support parameters.
+    is_select = sql.lstrip().upper().startswith(('SELECT', 'WITH', 'FROM'))
+    if self._explain_analyze and is_select and not params:
+      with profile_phase('explain'):
+        explain_analyze = cursor.execute(f'EXPLAIN ANALYZE {sql}').fetchall()[0][1]
+
+    with profile_phase('execute'):
+      start = time.perf_counter()
+      result = cursor.execute(sql, params)
+      wall_time_sec = time.perf_counter() - start
+    with self._lock:
+      self.queries.append(
+        ProfiledQuery(sql=sql, wall_time_sec=wall_time_sec, explain_analyze=explain_analyze)
+      )
+    return result
+
+  def __str__(self) -> str:
+    lines = ['Phases:']
+    lines.extend(f'  {phase}: {secs:.3f}s' for phase, secs in self.phase_times_sec.items())
+    for i, query in enumerate(self.queries):
+      lines.append(f'Query {i + 1} took {query.wall_time_sec:.3f}s:')
+      lines.append(query.sql.strip())
+      if query.explain_analyze:
+        lines.append(query.explain_analyze)
+    return '\n'.join(lines)
+
+
+class _ActivePhase:
+  """A phase that is running on a thread."""
+
+  def __init__(self, phase: QueryPhase) -> None:
+    self.phase = phase
+    self.thread_id = threading.get_ident()
+    self.start = time.perf_counter()
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar(
+  'lilac_query_profile', default=None
+)
+_active_phase: ContextVar[Optional[_ActivePhase]] = ContextVar(
+  'lilac_query_profile_phase', default=None
+)
+
+
+@contextlib.contextmanager
+def profile_queries(
+  explain_analyze: bool = True, log_profile: bool = False
+) -> Iterator[QueryProfile]:
+  """Profiles the dataset queries in the block.
+
+  ```py
+    with profile_queries() as profile:
+      dataset.select_rows(...)
+    print(profile)
+  ```
+
+  Results that are served from a cache run no queries, e.g. a repeated `stats` call, or the stats
+  and groups that are read from the sketches computed when the data was written. Profile the first
+  call, or call `dataset.close()` before profiling to clear the in-memory caches.
+
+  Args:
+    explain_analyze: Whether to capture the `EXPLAIN ANALYZE` output of each SELECT statement. This
+      runs each statement twice. The time of the extra run is recorded in the `explain` phase.
+    log_profile: Whether to log the profile when the block exits.
+  """
+  profile = QueryProfile()
+  profile._explain_analyze = explain_analyze
+  reset_profile = _current_profile.set(profile)
+  reset_phase = _active_phase.set(None)
+  try:
+    yield profile
+  finally:
+    _active_phase.reset(reset_phase)
+    _current_profile.reset(reset_profile)
+    if log_profile:
+      log(profile)
+
+
+def current_query_profile() -> Optional[QueryProfile]:
+  """Returns the profile of the running query, if it is profiled."""
+  return _current_profile.get()
+
+
+@contextlib.contextmanager
+def profile_phase(phase: QueryPhase) -> Iterator[None]:
+  """Attributes the wall time of the block to a phase of the profiled query.
+
+  Can be used as a decorator. The time of a nested phase is subtracted from the enclosing phase of
+  the same thread. This is a no-op when the query is not profiled.
+  """
+  profile = _current_profile.get()
+  if not profile:
+    yield
+    return
+
+  outer = _active_phase.get()
+  if outer and outer.thread_id != threading.get_ident():
+    # Phases of other threads overlap in time, so they are not paused.
+    outer = None
+  active = _ActivePhase(phase)
+  if outer:
+    profile.add_phase_time(outer.phase, active.start - outer.start)
+  reset_phase = _active_phase.set(active)
+  try:
+    yield
+  finally:
+    _active_phase.reset(reset_phase)
+    end = time.perf_counter()
+    profile.add_phase_time(phase, end - active.start)
+    if outer:
+      outer.start = end
@@ -0,0 +1,154 @@
+"""A cache for the outputs of signal UDFs, keyed by rowid."""
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Iterable, Optional, Sequence
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# The number of evicted values that are written to a single spill file.
+SPILL_BATCH_SIZE = 1024
+# The spill files of a group are merged into a single file once there are more than this many, so
+# reads don't open an ever growing number of files.
+MAX_SPILL_FILES = 16
+
+_ROWID_COLUMN = 'rowid'
+_VALUE_COLUMN = 'value'
+
+
+class UDFCache:
+  """An LRU cache of UDF outputs by rowid, with an optional parquet spill on disk.
+
+  Values are grouped by a `group`, which identifies the signal and the input path, and a `version`,
+  which identifies the state the values were computed with, e.g. the concept version and the
+  version of the data. Putting values with a new version for a group drops the values of the
+  previous version.
+
+  When `spill_dir` is set, the values that are evicted from memory are written to parquet files in
+  the directory, and read back when they are missing from memory.
+  """
+
+  def __init__(self, max_items: int, spill_dir: Optional[str] = None) -> None:
+    self._max_items = max_items
+    self._spill_dir = spill_dir
+    self._lock = threading.Lock()
+    # Values are stored serialized so callers can't mutate the cached values.
+    self._items: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+    self._group_versions: dict[str, str] = {}
+    self._spill_buffers: dict[str, dict[str, bytes]] = defaultdict(dict)
+
+  def get_many(self, group: str, version: str, rowids: Sequence[str]) -> dict[str, Any]:
+    """Returns the cached values of the rowids. Rowids without a cached value are left out."""
+    serialized: dict[str, bytes] = {}
+    with self._lock:
+      if self._group_versions.get(group) != version:
+        return {}
+      spill_buffer = self._spill_buffers.get(group, {})
+      for rowid in rowids:
+        key = (group, rowid)
+        if key in self._items:
+          self._items.move_to_end(key)
+          serialized[rowid] = self._items[key]
+        elif rowid in spill_buffer:
+          serialized[rowid] = spill_buffer[rowid]
+
+    missing = [rowid for rowid in rowids if rowid not in serialized]
+    if missing:
+      spilled = self._read_spilled(group, version, missing)
+      if spilled:
+        serialized.update(spilled)
+        self._put_serialized(group, version, spilled.items())
+
+    return {rowid: orjson.loads(value) for rowid, value in serialized.items()}
+
+  def put_many(self, group: str, version: str, values: Iterable[tuple[str, Any]]) -> None:
+    """Caches the values of the rowids."""
+    self._put_serialized(
+      group,
+      version,
+      ((rowid, orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)) for rowid, value in values),
+    )
+
+  def clear(self) -> None:
+    """Drops all the cached values."""
+    with self._lock:
+      self._items.clear()
+      self._group_versions.clear()
+      self._spill_buffers.clear()
+      if self._spill_dir and os.path.exists(self._spill_dir):
+        shutil.rmtree(self._spill_dir)
+
+  def _put_serialized(self, group: str, version: str, values: Iterable[tuple[str, bytes]]) -> None:
+    with self._lock:
+      if self._group_versions.get(group) != version:
+        self._drop_group(group)
+        self._group_versions[group] = version
+      for rowid, value in values:
+        self._items[(group, rowid)] = value
+        self._items.move_to_end((group, rowid))
+      while len(self._items) > self._max_items:
+        (evicted_group, evicted_rowid), evicted_value = self._items.popitem(last=False)
+        if self._spill_dir:
+          self._spill_buffers[evicted_group][evicted_rowid] = evicted_value
+      for spill_group, spill_buffer in self._spill_buffers.items():
+        if len(spill_buffer) >= SPILL_BATCH_SIZE:
+          self._write_spill_file(spill_group, spill_buffer)
+          spill_buffer.clear()
+
+  def _drop_group(self, group: str) -> None:
+    """Drops the values of a group. The caller must hold the lock."""
+    for key in [key for key in self._items if key[0] == group]:
+      del self._items[key]
+    self._spill_buffers.pop(group, None)
+    group_dir = self._group_spill_dir(group)
+    if group_dir and os.path.exists(group_dir):
+      shutil.rmtree(group_dir)
+
+  def _group_spill_dir(self, group: str) -> Optional[str]:
+    if not self._spill_dir:
+      return None
+    return os.path.join(self._spill_dir, uuid.uuid5(uuid.NAMESPACE_OID, group).hex)
+
+  def _write_spill_file(self, group: str, values: dict[str, bytes]) -> None:
+    """Writes the values to a new spill file of the group. The caller must hold the lock."""
+    group_dir = self._group_spill_dir(group)
+    assert group_dir
+    os.makedirs(group_dir, exist_ok=True)
+    _write_spill_table(group_dir, values)
+
+    spill_files = [
+      os.path.join(group_dir, filename)
+      for filename in os.listdir(group_dir)
+      if filename.endswith('.parquet')
+    ]
+    if len(spill_files) > MAX_SPILL_FILES:
+      # Merge the spill files. A value that was spilled more than once is only kept once.
+      table = pq.read_table(spill_files)
+      merged = dict(zip(table[_ROWID_COLUMN].to_pylist(), table[_VALUE_COLUMN].to_pylist()))
+      _write_spill_table(group_dir, merged)
+      for spill_file in spill_files:
+        os.remove(spill_file)
+
+  def _read_spilled(self, group: str, version: str, rowids: list[str]) -> dict[str, bytes]:
+    group_dir = self._group_spill_dir(group)
+    with self._lock:
+      if self._group_versions.get(group) != version:
+        return {}
+      if not group_dir or not os.path.exists(group_dir):
+        return {}
+      table = pq.read_table(group_dir, filters=[(_ROWID_COLUMN, 'in', rowids)])
+    return dict(zip(table[_ROWID_COLUMN].to_pylist(), table[_VALUE_COLUMN].to_pylist()))
+
+
+def _write_spill_table(group_dir: str, values: dict[str, bytes]) -> None:
+  table = pa.table(
+    {
+      _ROWID_COLUMN: pa.array(list(values.keys()), type=pa.string()),
+      _VALUE_COLUMN: pa.array(list(values.values()), type=pa.binary()),
+    }
+  )
+  pq.write_table(table, os.path.join(group_dir, f'{uuid.uuid4().hex}.parquet'))
@@ -0,0 +1,74 @@
+"""Tests for the UDF output cache."""
+
+import os
+import pathlib
+
+from .udf_cache import MAX_SPILL_FILES, SPILL_BATCH_SIZE, UDFCache
+
+
+def test_get_and_put() -> None:
+  cache = UDFCache(max_items=10)
+  assert cache.get_many('group', 'v1', ['1', '2']) == {}
+
+  cache.put_many('group', 'v1', [('1', {'score': 0.5}), ('2', None)])
+  assert cache.get_many('group', 'v1', ['1', '2', '3']) == {'1': {'score': 0.5}, '2': None}
+  assert cache.get_many('other_group', 'v1', ['1']) == {}
+
+
+def test_cached_values_are_copies() -> None:
+  cache = UDFCache(max_items=10)
+  cache.put_many('group', 'v1', [('1', [{'score': 0.5}])])
+
+  cache.get_many('group', 'v1', ['1'])['1'].append({'score': 1.0})
+  assert cache.get_many('group', 'v1', ['1']) == {'1': [{'score': 0.5}]}
+
+
+def test_new_version_drops_old_values() -> None:
+  cache = UDFCache(max_items=10)
+  cache.put_many('group', 'v1', [('1', 1), ('2', 2)])
+
+  cache.put_many('group', 'v2', [('1', 10)])
+  assert cache.get_many('group', 'v1', ['1', '2']) == {}
+  assert cache.get_many('group', 'v2', ['1', '2']) == {'1': 10}
+
+
+def test_lru_eviction() -> None:
+  cache = UDFCache(max_items=2)
+  cache.put_many('group', 'v1', [('1', 1), ('2', 2)])
+  # Reading '1' makes '2' the least recently used value.
+  cache.get_many('group', 'v1', ['1'])
+  cache.put_many('group', 'v1', [('3', 3)])
+
+  assert cache.get_many('group', 'v1', ['1', '2', '3']) == {'1': 1, '3': 3}
+
+
+def test_spill_to_disk(tmp_path: pathlib.Path) -> None:
+  spill_dir = str(tmp_path / 'spill')
+  cache = UDFCache(max_items=10, spill_dir=spill_dir)
+  num_items = SPILL_BATCH_SIZE + 20
+  cache.put_many('group', 'v1', [(str(i), {'value': i}) for i in range(num_items)])
+  assert os.path.exists(spill_dir)
+
+  # Every value is found, from memory, the spill buffer or the spill files.
+  rowids = [str(i) for i in range(num_items)]
+  assert cache.get_many('group', 'v1', rowids) == {str(i): {'value': i} for i in range(num_items)}
+
+  # A new version drops the spilled values.
+  cache.put_many('group', 'v2', [('0', {'value': -1})])
+  assert cache.get_many('group', 'v2', rowids) == {'0': {'value': -1}}
+
+  cache.clear()
+  assert not os.path.exists(spill_dir)
+
+
+def test_spill_files_are_merged(tmp_path: pathlib.Path) -> None:
+  spill_dir = str(tmp_path / 'spill')
+  cache = UDFCache(max_items=10, spill_dir=spill_dir)
+  num_items = (MAX_SPILL_FILES + 2) * SPILL_BATCH_SIZE
+  for i in range(num_items):
+    cache.put_many('group', 'v1', [(str(i), i)])
+
+  (group_dir,) = os.listdir(spill_dir)
+  assert len(os.listdir(os.path.join(spill_dir, group_dir))) <= MAX_SPILL_FILES
+  rowids = [str(i) for i in range(num_items)]
+  assert cache.get_many('group', 'v1', rowids) == {str(i): i for i in range(num_items)}
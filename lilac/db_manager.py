@@ -2,20 +2,30 @@
 import os
 import pathlib
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Type, Union
 
+import psutil
 from pydantic import BaseModel
 
 from .config import get_dataset_config
 from .data.dataset import Dataset
-from .env import get_project_dir
+from .env import env, get_project_dir
 from .project import read_project_config
 from .schema import MANIFEST_FILENAME
-from .utils import get_datasets_dir
+from .utils import DebugTimer, get_datasets_dir, log
+
+# The default maximum number of datasets that are kept open.
+DEFAULT_MAX_OPEN_DATASETS = 32
+
+# The default number of datasets that are warmed up in parallel.
+DEFAULT_WARM_UP_WORKERS = 4
 
 _DEFAULT_DATASET_CLS: Type[Dataset]
 
-_CACHED_DATASETS: dict[str, Dataset] = {}
+# The open datasets, in least recently used order.
+_CACHED_DATASETS: OrderedDict[str, Dataset] = OrderedDict()
 
 _db_lock = threading.Lock()
 
@@ -44,7 +54,48 @@ def get_dataset(
       _CACHED_DATASETS[cache_key] = _DEFAULT_DATASET_CLS(
         namespace=namespace, dataset_name=dataset_name, project_dir=project_dir
       )
-    return _CACHED_DATASETS[cache_key]
+    _CACHED_DATASETS.move_to_end(cache_key)
+    dataset = _CACHED_DATASETS[cache_key]
+    evicted_datasets = _evict_datasets()
+
+  if evicted_datasets:
+    # Closing waits for the running queries of the evicted datasets, so it runs in the background.
+    threading.Thread(target=_close_datasets, args=(evicted_datasets,), daemon=True).start()
+  return dataset
+
+
+def _evict_datasets() -> list[Dataset]:
+  """Evicts the least recently used datasets when too many are open, or memory is over budget.
+
+  The most recently used dataset is never evicted. Must be called while holding `_db_lock`.
+  """
+  max_open_datasets = _max_open_datasets()
+  evicted_datasets: list[Dataset] = []
+  while len(_CACHED_DATASETS) > max_open_datasets:
+    _, dataset = _CACHED_DATASETS.popitem(last=False)
+    evicted_datasets.append(dataset)
+
+  memory_budget_mb = env('LILAC_DATASETS_MEMORY_BUDGET_MB')
+  if memory_budget_mb and len(_CACHED_DATASETS) > 1:
+    memory_mb = psutil.Process().memory_info().rss / 1024 / 1024
+    if memory_mb > float(memory_budget_mb):
+      # Memory is only released once the evicted datasets are closed, so a single dataset is
+      # evicted per access instead of all of them at once.
+      _, dataset = _CACHED_DATASETS.popitem(last=False)
+      evicted_datasets.append(dataset)
+  return evicted_datasets
+
+
+def _max_open_datasets() -> int:
+  return max(1, int(env('LILAC_MAX_OPEN_DATASETS', DEFAULT_MAX_OPEN_DATASETS)))
+
+
+def _close_datasets(datasets: list[Dataset]) -> None:
+  for dataset in datasets:
+    try:
+      dataset.close()
+    except Exception as e:
+      log(f'Failed to close the dataset "{dataset.namespace}/{dataset.dataset_name}": {e}')
 
 
 def has_dataset(
@@ -127,6 +178,89 @@ def list_datasets(project_dir: Optional[Union[str, pathlib.Path]] = None) -> lis
   return dataset_infos
 
 
+class WarmUpStatus(BaseModel):
+  """The progress of warming up the datasets of the project."""
+
+  # False while the datasets are warming up.
+  ready: bool = True
+  total_datasets: int = 0
+  warm_datasets: int = 0
+  # The datasets that failed to warm up, as "namespace/name".
+  failed_datasets: list[str] = []
+
+
+_warm_up_status = WarmUpStatus()
+_warm_up_lock = threading.Lock()
+
+
+def get_warm_up_status() -> WarmUpStatus:
+  """Returns the progress of warming up the datasets of the project."""
+  with _warm_up_lock:
+    return _warm_up_status.model_copy(deep=True)
+
+
+def start_warm_up() -> None:
+  """Marks the datasets as not ready, until `finish_warm_up` is called."""
+  with _warm_up_lock:
+    _warm_up_status.ready = False
+
+
+def finish_warm_up() -> None:
+  """Marks the datasets as ready, whether or not warming them up succeeded."""
+  with _warm_up_lock:
+    _warm_up_status.ready = True
+
+
+def warm_up_datasets(
+  project_dir: Optional[Union[str, pathlib.Path]] = None, max_workers: Optional[int] = None
+) -> None:
+  """Warms up the datasets of the project config in parallel. See `Dataset.warm_up`.
+
+  Datasets that are not on disk are skipped, and at most `LILAC_MAX_OPEN_DATASETS` datasets are
+  warmed up, so warming up does not close the datasets it opened.
+
+  Args:
+    project_dir: The project directory. Defaults to the project directory of the environment.
+    max_workers: The number of datasets to warm up in parallel. Defaults to
+      `LILAC_WARM_UP_WORKERS`.
+  """
+  project_dir = project_dir or get_project_dir()
+  datasets_dir = get_datasets_dir(project_dir)
+  max_workers = max_workers or int(env('LILAC_WARM_UP_WORKERS', DEFAULT_WARM_UP_WORKERS))
+
+  def _warm_up(namespace: str, dataset_name: str) -> None:
+    try:
+      get_dataset(namespace, dataset_name, project_dir).warm_up()
+      with _warm_up_lock:
+        _warm_up_status.warm_datasets += 1
+    except Exception as e:
+      log(f'Failed to warm up the dataset "{namespace}/{dataset_name}": {e}')
+      with _warm_up_lock:
+        _warm_up_status.failed_datasets.append(f'{namespace}/{dataset_name}')
+
+  start_warm_up()
+  try:
+    # The config is read in the try, so the datasets are marked ready even if it can't be read.
+    dataset_ids = [
+      (config.namespace, config.name)
+      for config in read_project_config(project_dir).datasets
+      if os.path.exists(
+        os.path.join(datasets_dir, config.namespace, config.name, MANIFEST_FILENAME)
+      )
+    ][: _max_open_datasets()]
+    with _warm_up_lock:
+      _warm_up_status.total_datasets = len(dataset_ids)
+      _warm_up_status.warm_datasets = 0
+      _warm_up_status.failed_datasets = []
+
+    with DebugTimer(f'Warming up {len(dataset_ids)} datasets'):
+      with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for namespace, dataset_name in dataset_ids:
+          executor.submit(_warm_up, namespace, dataset_name)
+  finally:
+    finish_warm_up()
+
+
 # TODO(nsthorat): Make this a registry once we have multiple dataset implementations. This breaks a
 # circular dependency.
 def set_default_dataset_cls(dataset_cls: Type[Dataset]) -> None:
@@ -0,0 +1,175 @@
+"""Tests for the db manager."""
+
+import pathlib
+import time
+from typing import ClassVar, Generator, Iterable, Iterator
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from pytest_mock import MockerFixture
+from typing_extensions import override
+
+from .config import DatasetSettings, DatasetUISettings
+from .data.dataset import SemanticSearch
+from .data.dataset_duckdb import DatasetDuckDB
+from .db_manager import (
+  get_dataset,
+  get_warm_up_status,
+  remove_dataset_from_cache,
+  set_default_dataset_cls,
+  start_warm_up,
+  warm_up_datasets,
+)
+from .embeddings.vector_store import VectorDBIndex
+from .load_dataset import from_dicts
+from .schema import Item, RichData, chunk_embedding
+from .signal import TextEmbeddingSignal, clear_signal_registry, register_signal
+
+DATASET_NAMES = ['a', 'b', 'c']
+
+
+class TestEmbedding(TextEmbeddingSignal):
+  """A test embed function."""
+
+  name: ClassVar[str] = 'test_embedding'
+
+  @override
+  def compute(self, data: Iterable[RichData]) -> Iterator[Item]:
+    """Call the embedding function."""
+    for example in data:
+      yield [chunk_embedding(0, len(example), np.array([1.0, len(example), 0.0]))]
+
+
+@pytest.fixture(autouse=True)
+def setup_datasets(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> Generator:
+  monkeypatch.setenv('LILAC_PROJECT_DIR', str(tmp_path))
+  set_default_dataset_cls(DatasetDuckDB)
+  for name in DATASET_NAMES:
+    from_dicts('local', name, [{'text': 'hello'}])
+    remove_dataset_from_cache('local', name)
+  yield
+  for name in DATASET_NAMES:
+    remove_dataset_from_cache('local', name)
+
+
+def _enable_dataset_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+  # Datasets are not cached inside tests.
+  monkeypatch.delenv('PYTEST_CURRENT_TEST')
+
+
+def _wait_for_calls(spy: MagicMock, call_count: int) -> None:
+  # Evicted datasets are closed in the background.
+  deadline = time.time() + 5
+  while spy.call_count < call_count and time.time() < deadline:
+    time.sleep(0.01)
+
+
+def test_least_recently_used_dataset_is_closed(
+  monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture
+) -> None:
+  _enable_dataset_cache(monkeypatch)
+  monkeypatch.setenv('LILAC_MAX_OPEN_DATASETS', '2')
+  close_spy = mocker.spy(DatasetDuckDB, 'close')
+
+  dataset_a = get_dataset('local', 'a')
+  dataset_b = get_dataset('local', 'b')
+  assert get_dataset('local', 'a') is dataset_a
+  # Opening a third dataset evicts "b", the least recently used dataset.
+  get_dataset('local', 'c')
+  _wait_for_calls(close_spy, 1)
+  assert close_spy.call_count == 1
+  assert close_spy.call_args.args[0] is dataset_b
+
+  assert get_dataset('local', 'a') is dataset_a
+  assert get_dataset('local', 'b') is not dataset_b
+  # A closed dataset is reopened on its next use.
+  assert dataset_b.count() == 1
+
+
+def test_memory_budget(monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture) -> None:
+  _enable_dataset_cache(monkeypatch)
+  # The process uses more memory than the budget.
+  monkeypatch.setenv('LILAC_DATASETS_MEMORY_BUDGET_MB', '1')
+  close_spy = mocker.spy(DatasetDuckDB, 'close')
+
+  dataset_a = get_dataset('local', 'a')
+  # The most recently used dataset is kept open.
+  assert close_spy.call_count == 0
+  get_dataset('local', 'b')
+  _wait_for_calls(close_spy, 1)
+  assert close_spy.call_count == 1
+  assert close_spy.call_args.args[0] is dataset_a
+
+
+def test_warm_up_datasets(monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture) -> None:
+  _enable_dataset_cache(monkeypatch)
+  warm_up_spy = mocker.spy(DatasetDuckDB, 'warm_up')
+
+  warm_up_datasets()
+
+  assert warm_up_spy.call_count == len(DATASET_NAMES)
+  assert get_warm_up_status().model_dump() == {
+    'ready': True,
+    'total_datasets': 3,
+    'warm_datasets': 3,
+    'failed_datasets': [],
+  }
+  # The warm datasets stay open.
+  warm_datasets = {call.args[0] for call in warm_up_spy.call_args_list}
+  assert {get_dataset('local', name) for name in DATASET_NAMES} == warm_datasets
+
+
+def test_warm_up_loads_vector_index(monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture) -> None:
+  _enable_dataset_cache(monkeypatch)
+  register_signal(TestEmbedding)
+  try:
+    dataset = get_dataset('local', 'a')
+    dataset.compute_signal(TestEmbedding(), 'text')
+    dataset.update_settings(
+      DatasetSettings(
+        ui=DatasetUISettings(media_paths=[('text',)]), preferred_embedding='test_embedding'
+      )
+    )
+    dataset.close()
+    load_spy = mocker.spy(VectorDBIndex, 'load')
+
+    warm_up_datasets()
+    assert load_spy.call_count == 1
+
+    # Search uses the vector index that was loaded by the warm-up.
+    get_dataset('local', 'a').select_rows(
+      searches=[SemanticSearch(path='text', query='hello', embedding='test_embedding')]
+    )
+    assert load_spy.call_count == 1
+  finally:
+    clear_signal_registry()
+
+
+def test_warm_up_datasets_failure(monkeypatch: pytest.MonkeyPatch, mocker: MockerFixture) -> None:
+  _enable_dataset_cache(monkeypatch)
+
+  def _warm_up(dataset: DatasetDuckDB) -> None:
+    if dataset.dataset_name == 'b':
+      raise ValueError('Failed to open.')
+
+  mocker.patch.object(DatasetDuckDB, 'warm_up', autospec=True, side_effect=_warm_up)
+
+  warm_up_datasets(max_workers=1)
+
+  status = get_warm_up_status()
+  assert status.ready
+  assert status.warm_datasets == 2
+  assert status.failed_datasets == ['local/b']
+
+
+def test_warm_up_datasets_unreadable_config(mocker: MockerFixture) -> None:
+  mocker.patch(
+    'lilac.db_manager.read_project_config', side_effect=ValueError('Failed to read config.')
+  )
+  start_warm_up()
+
+  with pytest.raises(ValueError, match='Failed to read config.'):
+    warm_up_datasets()
+
+  assert get_warm_up_status().ready
@@ -35,6 +35,7 @@ def deploy_project(
   skip_ts_build: bool = False,
   create_space: Optional[bool] = False,
   load_on_space: Optional[bool] = False,
+  warm_up_on_space: Optional[bool] = False,
   hf_space_storage: Optional[Union[Literal['small'], Literal['medium'], Literal['large']]] = None,
   hf_token: Optional[str] = None,
 ) -> str:
@@ -54,6 +55,8 @@ def deploy_project(
     load_on_space: When True, loads the datasets from your project in the space and does not upload
       data. NOTE: This could be expensive if your project config locally has embeddings as they will
       be recomputed in HuggingFace.
+    warm_up_on_space: When True, the space opens the datasets when it starts, so its first visitors
+      do not wait for them.
     hf_space_storage: If defined, sets the HuggingFace space persistent storage type. NOTE: This
       only actually sets the space storage type when creating the space. For more details, see
       https://huggingface.co/docs/hub/spaces-storage
@@ -87,6 +90,7 @@ def deploy_project(
     skip_ts_build=skip_ts_build,
     create_space=create_space,
     load_on_space=load_on_space,
+    warm_up_on_space=warm_up_on_space,
     hf_space_storage=hf_space_storage,
   )
 
@@ -114,6 +118,7 @@ def deploy_project_operations(
   skip_ts_build: bool = False,
   create_space: Optional[bool] = False,
   load_on_space: Optional[bool] = False,
+  warm_up_on_space: Optional[bool] = False,
   hf_space_storage: Optional[Union[Literal['small'], Literal['medium'], Literal['large']]] = None,
 ) -> list:
   """The commit operations for a project deployment."""
@@ -247,6 +252,11 @@ def deploy_project_operations(
   else:
     hf_api.delete_space_variable(hf_space, 'LILAC_LOAD_ON_START_SERVER')
 
+  if warm_up_on_space:
+    hf_api.add_space_variable(hf_space, 'LILAC_WARM_UP_ON_START_SERVER', 'true')
+  else:
+    hf_api.delete_space_variable(hf_space, 'LILAC_WARM_UP_ON_START_SERVER')
+
   if hf_api.token:
     hf_api.add_space_secret(hf_space, 'HF_ACCESS_TOKEN', hf_api.token)
 
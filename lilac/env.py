@@ -44,6 +44,11 @@ class LilacEnvironment(BaseModel):
   LILAC_USE_TABLE_INDEX: str = PydanticField(
     description='Use persistent tables with rowid indexes.'
   )
+  LILAC_LABELS_BACKEND: str = PydanticField(
+    description='The file format of new labels: `sqlite` (default) or `parquet`. Parquet labels '
+    'are joined natively by DuckDB, without the sqlite scanner extension. Existing labels keep '
+    'their format.'
+  )
   LILAC_DISABLE_ERROR_NOTIFICATIONS: str = PydanticField(
     description='Set lilac in production mode. This will disable error messages in the UI.'
   )
@@ -63,6 +68,48 @@ class LilacEnvironment(BaseModel):
     'private dataset. This is also required if the HuggingFace space is private.'
   )
 
+  LILAC_QUERY_TIMEOUT_SEC: str = PydanticField(
+    description='The number of seconds after which a query from the UI, like `select_rows`, '
+    '`select_groups` or `stats`, is cancelled. Defaults to no timeout.'
+  )
+
+  LILAC_UDF_CACHE_SIZE: str = PydanticField(
+    description='The number of preview signal outputs, like concept scores, that are cached in '
+    'memory per dataset so paging and re-sorting `select_rows` reuses them. Defaults to 100,000. '
+    'Set to 0 to disable the cache.'
+  )
+  LILAC_UDF_CACHE_SPILL: str = PydanticField(
+    description='Set to true to write the preview signal outputs that are evicted from memory to '
+    'parquet files in the lilac cache directory, instead of dropping them. The spilled outputs are '
+    'deleted when the server starts.'
+  )
+
+  LILAC_ROWID_TABLE_THRESHOLD: str = PydanticField(
+    description='Rowid filters with more rowids than this, like top-k results or labeling by '
+    'rowids, are semi-joined against a table of the rowids instead of being inlined in the SQL. '
+    'Defaults to 1,000.'
+  )
+  LILAC_PARQUET_ROW_GROUP_SIZE: str = PydanticField(
+    description='The number of rows in a parquet row group of signal and map outputs. Smaller row '
+    'groups let selective filters skip more of the file. Defaults to 32,768.'
+  )
+  LILAC_PARQUET_ZSTD_LEVEL: str = PydanticField(
+    description='The zstd compression level of the parquet files of signal and map outputs. '
+    'Requires DuckDB 1.0 or later. Defaults to the DuckDB default.'
+  )
+  LILAC_MAX_OPEN_DATASETS: str = PydanticField(
+    description='The maximum number of datasets the server keeps open. The least recently used '
+    'dataset is closed when more are opened, and is reopened on its next use. Defaults to 32.'
+  )
+  LILAC_DATASETS_MEMORY_BUDGET_MB: str = PydanticField(
+    description='When set, the least recently used open dataset is closed on each dataset access '
+    'while the memory of the process exceeds this many megabytes.'
+  )
+  LILAC_APPROXIMATE_SAMPLE_SIZE: str = PydanticField(
+    description='The number of rows in the persistent row sample of a dataset that approximate '
+    '`select_groups` and `pivot` queries scan. Defaults to 100,000.'
+  )
+
   # Authentication.
   LILAC_AUTH_ENABLED: str = PydanticField(
     description='Set to true to enable read-only mode, disabling the ability to add datasets & '
@@ -103,6 +150,15 @@ class LilacEnvironment(BaseModel):
   LILAC_LOAD_ON_START_SERVER: str = PydanticField(
     description='When true, will load from lilac.yml upon startup.'
   )
+  LILAC_WARM_UP_ON_START_SERVER: str = PydanticField(
+    description='When true, opens the datasets in lilac.yml in parallel upon startup, after '
+    'loading them when LILAC_LOAD_ON_START_SERVER is set. Builds their views, computes the stats '
+    'of their media fields and loads the vector indices of the preferred embedding. `/status` '
+    'reports `ready: false` until it finishes.'
+  )
+  LILAC_WARM_UP_WORKERS: str = PydanticField(
+    description='The number of datasets that are warmed up in parallel. Defaults to 4.'
+  )
 
   GCS_REGION: str = PydanticField(description='The GCS region for GCS operations.')
   GCS_ACCESS_KEY: str = PydanticField(description='The GCS access key for GCS operations.')
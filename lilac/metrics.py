@@ -0,0 +1,318 @@
+"""A registry of the metrics of hot paths, exposed in the Prometheus text format.
+
+```py
+  QUERY_SECONDS = histogram('lilac_query_seconds', 'The latency of queries.', ['operation'])
+
+  with QUERY_SECONDS.time(operation='select_rows'):
+    ...
+```
+"""
+import contextlib
+import math
+import threading
+import time
+from typing import Callable, ClassVar, Iterator, Optional, Sequence, cast
+
+from typing_extensions import override
+
+# The default buckets of latency histograms, in seconds.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# The content type of the Prometheus text format.
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelValues = tuple[str, ...]
+
+
+class Metric:
+  """A metric with a value per combination of label values."""
+
+  type: ClassVar[str]
+
+  def __init__(self, name: str, description: str, label_names: Sequence[str] = ()) -> None:
+    self.name = name
+    self.description = description
+    self.label_names = tuple(label_names)
+    self._lock = threading.Lock()
+
+  def _label_values(self, labels: dict[str, str]) -> LabelValues:
+    if set(labels.keys()) != set(self.label_names):
+      raise ValueError(
+        f'Metric "{self.name}" has labels {list(self.label_names)}, but got {list(labels.keys())}.'
+      )
+    return tuple(str(labels[name]) for name in self.label_names)
+
+  def _format_labels(
+    self, label_values: LabelValues, extra: Optional[tuple[str, str]] = None
+  ) -> str:
+    pairs = list(zip(self.label_names, label_values))
+    if extra:
+      pairs.append(extra)
+    if not pairs:
+      return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+  def samples(self) -> list[str]:
+    """Returns the samples of the metric in the Prometheus text format."""
+    raise NotImplementedError
+
+  def reset(self) -> None:
+    """Resets the values of the metric."""
+    raise NotImplementedError
+
+  def render(self) -> str:
+    """Renders the metric in the Prometheus text format."""
+    lines = [
+      f'# HELP {self.name} {_escape_help(self.description)}',
+      f'# TYPE {self.name} {self.type}',
+    ]
+    return '\n'.join(lines + self.samples())
+
+
+class Counter(Metric):
+  """A value that only goes up, like the number of requests."""
+
+  type: ClassVar[str] = 'counter'
+
+  def __init__(self, name: str, description: str, label_names: Sequence[str] = ()) -> None:
+    super().__init__(name, description, label_names)
+    self._values: dict[LabelValues, float] = {}
+
+  def inc(self, amount: float = 1.0, **labels: str) -> None:
+    """Increments the counter."""
+    if amount < 0:
+      raise ValueError(f'Counter "{self.name}" can only be incremented, but got {amount}.')
+    label_values = self._label_values(labels)
+    with self._lock:
+      self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+  def value(self, **labels: str) -> float:
+    """Returns the value of the counter."""
+    label_values = self._label_values(labels)
+    with self._lock:
+      return self._values.get(label_values, 0.0)
+
+  @override
+  def samples(self) -> list[str]:
+    with self._lock:
+      values = sorted(self._values.items())
+    return [f'{self.name}{self._format_labels(lv)} {_format_value(v)}' for lv, v in values]
+
+  @override
+  def reset(self) -> None:
+    with self._lock:
+      self._values.clear()
+
+
+class Gauge(Metric):
+  """A value that goes up and down, like the depth of a queue."""
+
+  type: ClassVar[str] = 'gauge'
+
+  def __init__(self, name: str, description: str, label_names: Sequence[str] = ()) -> None:
+    super().__init__(name, description, label_names)
+    self._values: dict[LabelValues, float] = {}
+    self._function: Optional[Callable[[], float]] = None
+
+  def set(self, value: float, **labels: str) -> None:
+    """Sets the value of the gauge."""
+    label_values = self._label_values(labels)
+    with self._lock:
+      self._values[label_values] = value
+
+  def set_function(self, fn: Callable[[], float]) -> None:
+    """Reads the value of the gauge from `fn` when the metrics are rendered."""
+    if self.label_names:
+      raise ValueError(f'Gauge "{self.name}" has labels, so it can not be read from a function.')
+    self._function = fn
+
+  def value(self, **labels: str) -> float:
+    """Returns the value of the gauge."""
+    if self._function:
+      return self._function()
+    label_values = self._label_values(labels)
+    with self._lock:
+      return self._values.get(label_values, 0.0)
+
+  @override
+  def samples(self) -> list[str]:
+    if self._function:
+      return [f'{self.name} {_format_value(self._function())}']
+    with self._lock:
+      values = sorted(self._values.items())
+    return [f'{self.name}{self._format_labels(lv)} {_format_value(v)}' for lv, v in values]
+
+  @override
+  def reset(self) -> None:
+    with self._lock:
+      self._values.clear()
+
+
+class Histogram(Metric):
+  """The distribution of observed values, like latencies, in cumulative buckets."""
+
+  type: ClassVar[str] = 'histogram'
+
+  def __init__(
+    self,
+    name: str,
+    description: str,
+    label_names: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+  ) -> None:
+    super().__init__(name, description, label_names)
+    self.buckets = tuple(sorted(buckets))
+    # The number of observations in each bucket, with the last bucket for +Inf.
+    self._bucket_counts: dict[LabelValues, list[int]] = {}
+    self._sums: dict[LabelValues, float] = {}
+
+  def observe(self, value: float, **labels: str) -> None:
+    """Observes a value."""
+    label_values = self._label_values(labels)
+    bucket_index = len(self.buckets)
+    for i, bound in enumerate(self.buckets):
+      if value <= bound:
+        bucket_index = i
+        break
+    with self._lock:
+      if label_values not in self._bucket_counts:
+        self._bucket_counts[label_values] = [0] * (len(self.buckets) + 1)
+        self._sums[label_values] = 0.0
+      self._bucket_counts[label_values][bucket_index] += 1
+      self._sums[label_values] += value
+
+  @contextlib.contextmanager
+  def time(self, **labels: str) -> Iterator[None]:
+    """Observes the wall time of the block, in seconds. Can be used as a decorator."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - start, **labels)
+
+  def count(self, **labels: str) -> int:
+    """Returns the number of observations."""
+    label_values = self._label_values(labels)
+    with self._lock:
+      return sum(self._bucket_counts.get(label_values, []))
+
+  def sum(self, **labels: str) -> float:
+    """Returns the sum of the observations."""
+    label_values = self._label_values(labels)
+    with self._lock:
+      return self._sums.get(label_values, 0.0)
+
+  @override
+  def samples(self) -> list[str]:
+    with self._lock:
+      values = sorted(
+        (lv, list(counts), self._sums[lv]) for lv, counts in self._bucket_counts.items()
+      )
+    lines: list[str] = []
+    for label_values, counts, total in values:
+      cumulative = 0
+      for bound, count in zip([*self.buckets, math.inf], counts):
+        cumulative += count
+        labels = self._format_labels(label_values, ('le', _format_value(bound)))
+        lines.append(f'{self.name}_bucket{labels} {cumulative}')
+      labels = self._format_labels(label_values)
+      lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+      lines.append(f'{self.name}_count{labels} {cumulative}')
+    return lines
+
+  @override
+  def reset(self) -> None:
+    with self._lock:
+      self._bucket_counts.clear()
+      self._sums.clear()
+
+
+class MetricsRegistry:
+  """A registry of metrics by name."""
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._metrics: dict[str, Metric] = {}
+
+  def register(self, metric: Metric) -> Metric:
+    """Registers a metric. Returns the registered metric when one with the same name exists."""
+    with self._lock:
+      existing = self._metrics.get(metric.name)
+      if existing:
+        if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+          raise ValueError(f'Metric "{metric.name}" is already registered with another type.')
+        return existing
+      self._metrics[metric.name] = metric
+      return metric
+
+  def render(self) -> str:
+    """Renders all the metrics in the Prometheus text format."""
+    with self._lock:
+      metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+    return ''.join(metric.render() + '\n' for metric in metrics)
+
+  def reset(self) -> None:
+    """Resets the values of all the metrics."""
+    with self._lock:
+      metrics = list(self._metrics.values())
+    for metric in metrics:
+      metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+  """Creates a counter in the default registry."""
+  return cast(Counter, REGISTRY.register(Counter(name, description, label_names)))
+
+
+def gauge(name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+  """Creates a gauge in the default registry."""
+  return cast(Gauge, REGISTRY.register(Gauge(name, description, label_names)))
+
+
+def histogram(
+  name: str,
+  description: str,
+  label_names: Sequence[str] = (),
+  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+) -> Histogram:
+  """Creates a histogram in the default registry."""
+  return cast(Histogram, REGISTRY.register(Histogram(name, description, label_names, buckets)))
+
+
+def render_metrics() -> str:
+  """Renders the metrics of the default registry in the Prometheus text format."""
+  return REGISTRY.render()
+
+
+CACHE_LOOKUPS = counter(
+  'lilac_cache_lookups_total', 'The number of lookups in a cache.', ['cache', 'result']
+)
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int) -> None:
+  """Records the hits and misses of lookups in a cache, to compute its hit rate."""
+  if hits:
+    CACHE_LOOKUPS.inc(hits, cache=cache, result='hit')
+  if misses:
+    CACHE_LOOKUPS.inc(misses, cache=cache, result='miss')
+
+
+def _format_value(value: float) -> str:
+  if value == math.inf:
+    return '+Inf'
+  if value == -math.inf:
+    return '-Inf'
+  if math.isnan(value):
+    return 'NaN'
+  return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help(description: str) -> str:
+  return description.replace('\\', '\\\\').replace('\n', '\\n')
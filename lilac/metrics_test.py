@@ -0,0 +1,83 @@
+"""Tests for the metrics registry."""
+
+import pytest
+
+from .metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_counter() -> None:
+  registry = MetricsRegistry()
+  requests = registry.register(Counter('requests_total', 'The requests.', ['route']))
+  assert isinstance(requests, Counter)
+  requests.inc(route='/a')
+  requests.inc(2, route='/b')
+  requests.inc(route='/a')
+
+  assert requests.value(route='/a') == 2
+  assert registry.render() == (
+    '# HELP requests_total The requests.\n'
+    '# TYPE requests_total counter\n'
+    'requests_total{route="/a"} 2.0\n'
+    'requests_total{route="/b"} 2.0\n'
+  )
+
+  with pytest.raises(ValueError, match='can only be incremented'):
+    requests.inc(-1, route='/a')
+  with pytest.raises(ValueError, match=r"has labels \['route'\]"):
+    requests.inc(path='/a')
+
+
+def test_gauge_from_function() -> None:
+  registry = MetricsRegistry()
+  depth = registry.register(Gauge('queue_depth', 'The depth of the queue.'))
+  assert isinstance(depth, Gauge)
+  queue = [1, 2, 3]
+  depth.set_function(lambda: len(queue))
+
+  assert registry.render() == (
+    '# HELP queue_depth The depth of the queue.\n# TYPE queue_depth gauge\nqueue_depth 3.0\n'
+  )
+
+
+def test_histogram() -> None:
+  registry = MetricsRegistry()
+  latency = registry.register(
+    Histogram('latency_seconds', 'The latency.', ['op'], buckets=[0.1, 1.0])
+  )
+  assert isinstance(latency, Histogram)
+  latency.observe(0.05, op='read')
+  latency.observe(0.5, op='read')
+  latency.observe(5, op='read')
+  with latency.time(op='write'):
+    pass
+
+  assert latency.count(op='read') == 3
+  assert latency.sum(op='read') == 5.55
+  assert latency.count(op='write') == 1
+  assert registry.render().splitlines()[:7] == [
+    '# HELP latency_seconds The latency.',
+    '# TYPE latency_seconds histogram',
+    'latency_seconds_bucket{op="read",le="0.1"} 1',
+    'latency_seconds_bucket{op="read",le="1.0"} 2',
+    'latency_seconds_bucket{op="read",le="+Inf"} 3',
+    'latency_seconds_sum{op="read"} 5.55',
+    'latency_seconds_count{op="read"} 3',
+  ]
+
+
+def test_register_existing_metric() -> None:
+  registry = MetricsRegistry()
+  counter = registry.register(Counter('requests_total', 'The requests.'))
+  assert registry.register(Counter('requests_total', 'The requests.')) is counter
+
+  with pytest.raises(ValueError, match='already registered with another type'):
+    registry.register(Gauge('requests_total', 'The requests.'))
+
+
+def test_escape_label_values() -> None:
+  registry = MetricsRegistry()
+  requests = registry.register(Counter('requests_total', 'The requests.', ['path']))
+  assert isinstance(requests, Counter)
+  requests.inc(path='a"b\\c\nd')
+
+  assert 'requests_total{path="a\\"b\\\\c\\nd"} 1.0' in registry.render()
@@ -42,6 +42,17 @@ class ParquetWriter:
     for i, n in enumerate(self._schema.names):
       self._buffer[i].append(record.get(n))
 
+  def write_batch(self, batch: pa.RecordBatch) -> None:
+    """Write a record batch, with the schema of the writer, to the destination file."""
+    if len(self._buffer[0]) > 0:
+      self._flush_buffer()
+
+    if self._record_batches_byte_size >= self._row_group_buffer_size:
+      self._write_batches()
+
+    self._record_batches.append(batch)
+    self._record_batches_byte_size += batch.nbytes
+
   def close(self) -> None:
     """Flushes the write buffer and closes the destination file."""
     if len(self._buffer[0]) > 0:
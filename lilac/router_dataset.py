@@ -1,15 +1,19 @@
 """Router for the dataset database."""
 import os
 from copy import copy
+from datetime import date, datetime, time
 from typing import Annotated, Any, Literal, Optional, Sequence, Union, cast
 
-from fastapi import APIRouter, HTTPException, Response
+import orjson
+import pyarrow as pa
+from fastapi import APIRouter, Header, HTTPException, Response
 from fastapi.params import Depends
 from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel, Field
 
 from .auth import UserInfo, get_session_user, get_user_access
 from .config import DatasetSettings
+from .data.cancellation import CancellationToken, cancellable
 from .data.dataset import (
   BinaryOp,
   DatasetManifest,
@@ -28,9 +32,10 @@ from .data.dataset import (
 )
 from .data.dataset import Column as DBColumn
 from .data.dataset import Filter as PyFilter
+from .data.profiling import QueryProfile, profile_phase, profile_queries
 from .db_manager import DatasetInfo, get_dataset, list_datasets
 from .env import get_project_dir
-from .router_utils import RouteErrorHandler
+from .router_utils import RouteErrorHandler, query_cancellation
 from .schema import Bin, Path, normalize_path
 from .signal import Signal, TextEmbeddingSignal, TextSignal
 from .signals.concept_labels import ConceptLabelsSignal
@@ -41,6 +46,10 @@ from .utils import to_yaml
 
 router = APIRouter(route_class=RouteErrorHandler)
 
+# The media type of an Arrow IPC stream. Clients that send it in the `Accept` header of
+# `select_rows` get the rows as Arrow record batches instead of JSON.
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
 
 @router.get('/', response_model_exclude_none=True)
 def get_datasets() -> list[DatasetInfo]:
@@ -82,10 +91,35 @@ class GetStatsOptions(BaseModel):
 
 
 @router.post('/{namespace}/{dataset_name}/stats')
-def get_stats(namespace: str, dataset_name: str, options: GetStatsOptions) -> StatsResult:
+def get_stats(
+  namespace: str,
+  dataset_name: str,
+  options: GetStatsOptions,
+  token: Annotated[CancellationToken, Depends(query_cancellation)],
+) -> StatsResult:
   """Get the stats for the dataset."""
   dataset = get_dataset(namespace, dataset_name)
-  return dataset.stats(options.leaf_path)
+  with cancellable(token):
+    return dataset.stats(options.leaf_path)
+
+
+class GetStatsManyOptions(BaseModel):
+  """The request for the get stats many endpoint."""
+
+  leaf_paths: list[Path]
+
+
+@router.post('/{namespace}/{dataset_name}/stats_many')
+def get_stats_many(
+  namespace: str,
+  dataset_name: str,
+  options: GetStatsManyOptions,
+  token: Annotated[CancellationToken, Depends(query_cancellation)],
+) -> list[StatsResult]:
+  """Get the stats for many leafs of the dataset, computed together."""
+  dataset = get_dataset(namespace, dataset_name)
+  with cancellable(token):
+    return dataset.stats_many(options.leaf_paths)
 
 
 class BinaryFilter(BaseModel):
@@ -156,6 +190,8 @@ class SelectRowsOptions(BaseModel):
   combine_columns: Optional[bool] = None
   include_deleted: bool = False
   exclude_signals: bool = False
+  # The `next_cursor` of the previous page, for keyset pagination.
+  cursor: Optional[str] = None
 
 
 class SelectRowsSchemaOptions(BaseModel):
@@ -173,6 +209,7 @@ class SelectRowsResponse(BaseModel):
 
   rows: list[dict]
   total_num_rows: int
+  next_cursor: Optional[str] = None
 
 
 def _exclude_none(obj: Any) -> Any:
@@ -183,21 +220,53 @@ def _exclude_none(obj: Any) -> Any:
   return copy(obj)
 
 
-@router.post('/{namespace}/{dataset_name}/select_rows')
+def _orjson_default(obj: Any) -> Any:
+  # orjson does not serialize subclasses of datetime, like pandas timestamps.
+  if isinstance(obj, (datetime, date, time)):
+    return obj.isoformat()
+  if isinstance(obj, bytes):
+    return obj.decode('utf-8', errors='replace')
+  raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+
+class RowsJSONResponse(ORJSONResponse):
+  """Serializes rows of `select_rows` with orjson, bypassing pydantic validation."""
+
+  def render(self, content: Any) -> bytes:
+    """Render the content to JSON."""
+    return orjson.dumps(
+      content,
+      default=_orjson_default,
+      option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+@router.post(
+  '/{namespace}/{dataset_name}/select_rows',
+  response_model=SelectRowsResponse,
+  response_model_exclude_none=True,
+  responses={200: {'content': {ARROW_STREAM_MEDIA_TYPE: {}}}},
+)
 def select_rows(
   namespace: str,
   dataset_name: str,
   options: SelectRowsOptions,
   user: Annotated[Optional[UserInfo], Depends(get_session_user)],
-) -> SelectRowsResponse:
-  """Select rows from the dataset database."""
+  token: Annotated[CancellationToken, Depends(query_cancellation)],
+  accept: Annotated[Optional[str], Header()] = None,
+) -> Response:
+  """Select rows from the dataset database.
+
+  The rows are returned as JSON. When the `Accept` header asks for an Arrow IPC stream, the rows
+  are returned as an Arrow table, with `total_num_rows` and `next_cursor` in the schema metadata.
+  When the rows don't fit Arrow types, the response is a 406 instead.
+  """
   dataset = get_dataset(namespace, dataset_name)
 
   sanitized_filters = [
     PyFilter(path=normalize_path(f.path), op=f.op, value=f.value) for f in (options.filters or [])
   ]
-
-  res = dataset.select_rows(
+  select_rows_kwargs: dict[str, Any] = dict(
     columns=options.columns,
     searches=options.searches or [],
     filters=sanitized_filters,
@@ -209,10 +278,32 @@ def select_rows(
     include_deleted=options.include_deleted,
     exclude_signals=options.exclude_signals,
     user=user,
+    cursor=options.cursor,
   )
 
-  rows = [_exclude_none(row) for row in res]
-  return SelectRowsResponse(rows=rows, total_num_rows=res.total_num_rows)
+  if accept and ARROW_STREAM_MEDIA_TYPE in accept:
+    with cancellable(token):
+      try:
+        table = dataset.select_rows_arrow(**select_rows_kwargs)
+      except pa.ArrowException as e:
+        raise HTTPException(
+          406, f'The rows can not be returned as {ARROW_STREAM_MEDIA_TYPE}: {e}'
+        ) from e
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+      writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+  with cancellable(token):
+    res = dataset.select_rows(**select_rows_kwargs)
+
+  content: dict[str, Any] = {
+    'rows': [_exclude_none(row) for row in res],
+    'total_num_rows': res.total_num_rows,
+  }
+  if res.next_cursor:
+    content['next_cursor'] = res.next_cursor
+  return RowsJSONResponse(content)
 
 
 @router.post('/{namespace}/{dataset_name}/select_rows_schema', response_model_exclude_none=True)
@@ -240,26 +331,33 @@ class SelectGroupsOptions(BaseModel):
   sort_order: Optional[SortOrder] = SortOrder.DESC
   limit: Optional[int] = 100
   bins: Optional[list[Bin]] = None
+  # Whether to estimate the counts from a sample of the rows, see `Dataset.select_groups`.
+  approximate: bool = False
 
 
 @router.post('/{namespace}/{dataset_name}/select_groups')
 def select_groups(
-  namespace: str, dataset_name: str, options: SelectGroupsOptions
+  namespace: str,
+  dataset_name: str,
+  options: SelectGroupsOptions,
+  token: Annotated[CancellationToken, Depends(query_cancellation)],
 ) -> SelectGroupsResult:
   """Select groups from the dataset database."""
   dataset = get_dataset(namespace, dataset_name)
   sanitized_filters = [
     PyFilter(path=normalize_path(f.path), op=f.op, value=f.value) for f in (options.filters or [])
   ]
-  return dataset.select_groups(
-    options.leaf_path,
-    sanitized_filters,
-    options.sort_by,
-    options.sort_order,
-    options.limit,
-    options.bins,
-    searches=options.searches,
-  )
+  with cancellable(token):
+    return dataset.select_groups(
+      options.leaf_path,
+      sanitized_filters,
+      options.sort_by,
+      options.sort_order,
+      options.limit,
+      options.bins,
+      searches=options.searches,
+      approximate=options.approximate,
+    )
 
 
 class PivotOptions(BaseModel):
@@ -269,21 +367,76 @@ class PivotOptions(BaseModel):
   outer_path: Path
   filters: Sequence[Filter] = []
   searches: Sequence[SearchPy] = []
+  # Whether to estimate the counts from a sample of the rows, see `Dataset.pivot`.
+  approximate: bool = False
 
 
 @router.post('/{namespace}/{dataset_name}/pivot')
-def pivot(namespace: str, dataset_name: str, options: PivotOptions) -> PivotResult:
+def pivot(
+  namespace: str,
+  dataset_name: str,
+  options: PivotOptions,
+  token: Annotated[CancellationToken, Depends(query_cancellation)],
+) -> PivotResult:
   """REST endpoint for dataset.pivot."""
   dataset = get_dataset(namespace, dataset_name)
   sanitized_filters = [
     PyFilter(path=normalize_path(f.path), op=f.op, value=f.value) for f in (options.filters or [])
   ]
-  return dataset.pivot(
-    options.outer_path,
-    options.inner_path,
-    filters=sanitized_filters,
-    searches=options.searches,
-  )
+  with cancellable(token):
+    return dataset.pivot(
+      options.outer_path,
+      options.inner_path,
+      filters=sanitized_filters,
+      searches=options.searches,
+      approximate=options.approximate,
+    )
+
+
+class ProfileQueryOptions(BaseModel):
+  """The request for the profile endpoint. Exactly one of the queries must be set."""
+
+  select_rows: Optional[SelectRowsOptions] = None
+  select_groups: Optional[SelectGroupsOptions] = None
+  stats: Optional[GetStatsOptions] = None
+  pivot: Optional[PivotOptions] = None
+  # Whether to capture the `EXPLAIN ANALYZE` output of each SELECT statement. This runs each
+  # statement twice. The time of the extra run is recorded in the `explain` phase.
+  explain_analyze: bool = True
+
+
+@router.post('/{namespace}/{dataset_name}/profile')
+def profile_query(
+  namespace: str,
+  dataset_name: str,
+  options: ProfileQueryOptions,
+  user: Annotated[Optional[UserInfo], Depends(get_session_user)],
+  token: Annotated[CancellationToken, Depends(query_cancellation)],
+) -> QueryProfile:
+  """Run a query, and return its generated SQL, DuckDB plans and the wall time of each phase.
+
+  Results that are served from a cache, like a repeated `stats` query, run no SQL.
+  """
+  if not get_user_access(user).is_admin:
+    raise HTTPException(401, 'User does not have access to profile queries.')
+  queries = [options.select_rows, options.select_groups, options.stats, options.pivot]
+  if sum(query is not None for query in queries) != 1:
+    raise ValueError(
+      'Exactly one of `select_rows`, `select_groups`, `stats` or `pivot` must be set.'
+    )
+
+  with cancellable(token), profile_queries(options.explain_analyze) as profile:
+    # Serializing the response is part of the conversion of the results.
+    with profile_phase('convert'):
+      if options.select_rows:
+        select_rows(namespace, dataset_name, options.select_rows, user, token)
+      elif options.select_groups:
+        select_groups(namespace, dataset_name, options.select_groups, token)
+      elif options.stats:
+        get_stats(namespace, dataset_name, options.stats, token)
+      elif options.pivot:
+        pivot(namespace, dataset_name, options.pivot, token)
+  return profile
 
 
 @router.get('/{namespace}/{dataset_name}/media')
@@ -1,13 +1,17 @@
 """Utils for routers."""
 
+import secrets
+import threading
 import traceback
-from typing import Callable, Iterable, Optional
+from typing import Annotated, Callable, Iterable, Iterator, Optional
 
-from fastapi import HTTPException, Request, Response
+from fastapi import Header, HTTPException, Request, Response
 from fastapi.routing import APIRoute
 
 from .auth import UserInfo
 from .concepts.db_concept import DISK_CONCEPT_DB, DISK_CONCEPT_MODEL_DB
+from .data.cancellation import CancellationToken, QueryCancelledError
+from .env import env
 from .schema import Item, RichData
 from .signals.concept_scorer import ConceptSignal
 from .utils import log
@@ -26,6 +30,9 @@ class RouteErrorHandler(APIRoute):
       except Exception as ex:
         if isinstance(ex, HTTPException):
           raise ex
+        if isinstance(ex, QueryCancelledError):
+          # 499 is the de-facto status code for a request that the client no longer waits for.
+          raise HTTPException(status_code=499, detail=str(ex)) from ex
 
         log('Route error:', request.url)
         log(traceback.format_exc())
@@ -37,6 +44,56 @@ class RouteErrorHandler(APIRoute):
     return custom_route_handler
 
 
+# The session key of the random id that tells client sessions apart.
+QUERY_SESSION_ID_KEY = 'query_session_id'
+
+# The in-flight queries, keyed by the client session and the `X-Lilac-Query-Key` header.
+_inflight_queries: dict[tuple[str, str], CancellationToken] = {}
+_inflight_queries_lock = threading.Lock()
+
+
+def _query_session_id(request: Request) -> Optional[str]:
+  """Returns the random id of the client session, stored in the session cookie."""
+  if 'session' not in request.scope:
+    return None
+  session_id = request.session.get(QUERY_SESSION_ID_KEY)
+  if not session_id:
+    session_id = secrets.token_hex(16)
+    request.session[QUERY_SESSION_ID_KEY] = session_id
+  return session_id
+
+
+def query_cancellation(
+  request: Request, x_lilac_query_key: Annotated[Optional[str], Header()] = None
+) -> Iterator[CancellationToken]:
+  """A dependency that creates a cancellation token for the query of a request.
+
+  The token times out after `LILAC_QUERY_TIMEOUT_SEC` seconds, when set. When the request has an
+  `X-Lilac-Query-Key` header, a newer request from the same client session with the same key
+  cancels this one, so a UI that re-queries on every change only runs its latest query. Client
+  sessions are told apart by a random id in the session cookie, and the UI prefixes its keys with
+  a random id per browser tab. Requests without a session are never superseded.
+  """
+  timeout_sec = env('LILAC_QUERY_TIMEOUT_SEC')
+  token = CancellationToken(timeout_sec=float(timeout_sec) if timeout_sec else None)
+  session_id = _query_session_id(request) if x_lilac_query_key else None
+  key = (session_id, x_lilac_query_key) if session_id and x_lilac_query_key else None
+  if key:
+    with _inflight_queries_lock:
+      superseded = _inflight_queries.get(key)
+      _inflight_queries[key] = token
+    if superseded:
+      superseded.cancel('The query was superseded by a newer query.')
+  try:
+    yield token
+  finally:
+    token.close()
+    if key:
+      with _inflight_queries_lock:
+        if _inflight_queries.get(key) is token:
+          del _inflight_queries[key]
+
+
 def server_compute_concept(
   signal: ConceptSignal, examples: Iterable[RichData], user: Optional[UserInfo]
 ) -> list[Optional[Item]]:
@@ -44,8 +44,17 @@ from .auth import (
   get_session_user,
   get_user_access,
 )
+from .data.dataset_duckdb import clear_udf_cache_spill
+from .db_manager import (
+  WarmUpStatus,
+  finish_warm_up,
+  get_warm_up_status,
+  start_warm_up,
+  warm_up_datasets,
+)
 from .env import env, get_project_dir
 from .load import load
+from .metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
 from .project import create_project_and_set_env
 from .router_utils import RouteErrorHandler
 from .source import registered_sources
@@ -68,10 +77,26 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
   """Context manager for the lifespan of the application."""
-  if env('LILAC_LOAD_ON_START_SERVER', False):
+  # No dataset is open yet, so the UDF outputs spilled by a previous server are stale.
+  clear_udf_cache_spill(get_project_dir())
+  load_on_start = env('LILAC_LOAD_ON_START_SERVER', False)
+  warm_up_on_start = env('LILAC_WARM_UP_ON_START_SERVER', False)
+  if warm_up_on_start:
+    # Mark the server as not ready before it serves `/status`.
+    start_warm_up()
+
+  if load_on_start or warm_up_on_start:
 
     def run() -> None:
-      load(project_dir=get_project_dir(), overwrite=False)
+      try:
+        if load_on_start:
+          load(project_dir=get_project_dir(), overwrite=False)
+        if warm_up_on_start:
+          warm_up_datasets(project_dir=get_project_dir())
+      finally:
+        # Mark the server as ready even if loading or warming up failed, so it serves requests.
+        if warm_up_on_start:
+          finish_warm_up()
 
     thread = Thread(target=run)
     thread.start()
@@ -95,6 +120,11 @@ class HttpUrlRedirectMiddleware:
 
   async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
     """Redirect trailing slashes to non-trailing slashes."""
+    # Lifespan scopes have no path.
+    if scope['type'] != 'http':
+      await self.app(scope, receive, send)
+      return
+
     url = URL(scope=scope).path
 
     root_path = scope.get('root_path') or ''
@@ -105,7 +135,7 @@ class HttpUrlRedirectMiddleware:
       and not url.startswith(root_path + '/api')
     )
 
-    if scope['type'] == 'http' and ends_with_slash:
+    if ends_with_slash:
       new_url = url.rstrip('/')
       response = RedirectResponse(url=new_url, status_code=307)
       await response(scope, receive, send)
@@ -169,18 +199,30 @@ class ServerStatus(BaseModel):
   version: str
   google_analytics_enabled: bool
   disable_error_notifications: bool
+  # False while the datasets are warming up on start.
+  ready: bool
+  warm_up: WarmUpStatus
 
 
 @app.get('/status')
 def status() -> ServerStatus:
   """Returns server status information."""
+  warm_up = get_warm_up_status()
   return ServerStatus(
     version=metadata.version('lilac'),
     google_analytics_enabled=env('GOOGLE_ANALYTICS_ENABLED', False),
     disable_error_notifications=env('LILAC_DISABLE_ERROR_NOTIFICATIONS', False),
+    ready=warm_up.ready,
+    warm_up=warm_up,
   )
 
 
+@app.get('/metrics', include_in_schema=False)
+def metrics() -> Response:
+  """Returns the metrics of the server in the Prometheus text format."""
+  return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.post('/load_config')
 def load_config(background_tasks: BackgroundTasks) -> dict:
   """Loads from the lilac.yml."""
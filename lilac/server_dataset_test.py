@@ -2,13 +2,22 @@
 import os
 from typing import ClassVar, Iterable, Iterator, Optional, Type
 
+import pyarrow as pa
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
 from pytest_mock import MockerFixture
 
 from .auth import UserInfo, get_session_user
 from .config import DatasetSettings
-from .data.dataset import Dataset, DatasetManifest, SelectRowsSchemaResult, SelectRowsSchemaUDF
+from .data.cancellation import CancellationToken
+from .data.dataset import (
+  Dataset,
+  DatasetManifest,
+  SelectRowsSchemaResult,
+  SelectRowsSchemaUDF,
+  StatsResult,
+)
 from .data.dataset_duckdb import DatasetDuckDB
 from .data.dataset_test_utils import (
   TEST_DATASET_NAME,
@@ -17,14 +26,21 @@ from .data.dataset_test_utils import (
   enriched_item,
   make_dataset,
 )
+from .data.profiling import QueryProfile
 from .router_dataset import (
+  ARROW_STREAM_MEDIA_TYPE,
   AddLabelsOptions,
   Column,
+  GetStatsManyOptions,
+  GetStatsOptions,
+  PivotOptions,
+  ProfileQueryOptions,
   SelectRowsOptions,
   SelectRowsResponse,
   SelectRowsSchemaOptions,
   WebManifest,
 )
+from .router_utils import query_cancellation
 from .schema import Field, Item, RichData, field, schema
 from .server import app
 from .signal import TextSignal, clear_signal_registry, register_signal
@@ -147,7 +163,8 @@ def test_select_rows_with_cols_and_limit() -> None:
   )
   response = client.post(url, json=options.model_dump())
   assert response.status_code == 200
-  assert SelectRowsResponse.model_validate(response.json()) == SelectRowsResponse(
+  select_rows_response = SelectRowsResponse.model_validate(response.json())
+  assert select_rows_response == SelectRowsResponse(
     rows=[
       {
         'people.*.zipcode': [1, 2],
@@ -155,7 +172,26 @@ def test_select_rows_with_cols_and_limit() -> None:
       }
     ],
     total_num_rows=3,
+    next_cursor=select_rows_response.next_cursor,
+  )
+  assert select_rows_response.next_cursor
+
+
+def test_select_rows_with_cursor() -> None:
+  url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/select_rows'
+  options = SelectRowsOptions(columns=['erased'], sort_by=['erased'], limit=2)
+  response = client.post(url, json=options.model_dump())
+  assert response.status_code == 200
+  first_page = SelectRowsResponse.model_validate(response.json())
+  assert first_page.rows == [{'erased': True}, {'erased': True}]
+  assert first_page.next_cursor
+
+  options = SelectRowsOptions(
+    columns=['erased'], sort_by=['erased'], limit=2, cursor=first_page.next_cursor
   )
+  response = client.post(url, json=options.model_dump())
+  assert response.status_code == 200
+  assert response.json() == {'rows': [{'erased': False}], 'total_num_rows': 3}
 
 
 def test_select_rows_with_cols_and_combine() -> None:
@@ -181,6 +217,58 @@ def test_select_rows_with_cols_and_combine() -> None:
   )
 
 
+def test_select_rows_arrow_stream(mocker: MockerFixture) -> None:
+  url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/select_rows'
+  options = SelectRowsOptions(
+    columns=[('people', '*', 'zipcode'), 'erased'], combine_columns=True, limit=2
+  )
+  select_rows_spy = mocker.spy(DatasetDuckDB, 'select_rows')
+  response = client.post(
+    url, json=options.model_dump(), headers={'Accept': ARROW_STREAM_MEDIA_TYPE}
+  )
+  assert response.status_code == 200
+  # The table is built from the DuckDB record batches, not from the rows of `select_rows`.
+  assert select_rows_spy.call_count == 0
+  assert response.headers['content-type'] == ARROW_STREAM_MEDIA_TYPE
+
+  table = pa.ipc.open_stream(response.content).read_all()
+  assert table.to_pylist() == [
+    {'people': [{'zipcode': 0}], 'erased': False},
+    {'people': [{'zipcode': 1}, {'zipcode': 2}], 'erased': True},
+  ]
+  assert table.schema.metadata[b'total_num_rows'] == b'3'
+  next_cursor = table.schema.metadata[b'next_cursor'].decode()
+
+  # Without the Arrow media type, the response is JSON.
+  response = client.post(url, json=options.model_dump())
+  assert response.headers['content-type'] == 'application/json'
+  assert response.json() == {
+    'rows': [
+      {'people': [{'zipcode': 0}], 'erased': False},
+      {'people': [{'zipcode': 1}, {'zipcode': 2}], 'erased': True},
+    ],
+    'total_num_rows': 3,
+    'next_cursor': next_cursor,
+  }
+
+
+def test_select_rows_arrow_stream_not_acceptable(mocker: MockerFixture) -> None:
+  url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/select_rows'
+  options = SelectRowsOptions(columns=['erased'], limit=2)
+  select_rows_spy = mocker.spy(DatasetDuckDB, 'select_rows')
+  mocker.patch.object(
+    DatasetDuckDB, 'select_rows_arrow', side_effect=pa.ArrowInvalid('Incompatible types')
+  )
+
+  response = client.post(
+    url, json=options.model_dump(), headers={'Accept': ARROW_STREAM_MEDIA_TYPE}
+  )
+  assert response.status_code == 406
+  assert 'Incompatible types' in response.json()['detail']
+  # The rows are not returned as JSON instead.
+  assert select_rows_spy.call_count == 0
+
+
 class LengthSignal(TextSignal):
   name: ClassVar[str] = 'length_signal'
 
@@ -286,6 +374,108 @@ def test_select_rows_schema_no_cols() -> None:
   )
 
 
+def test_stats_many() -> None:
+  url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/stats_many'
+  options = GetStatsManyOptions(leaf_paths=[('erased',), ('people', '*', 'zipcode')])
+  response = client.post(url, json=options.model_dump())
+  assert response.status_code == 200
+  assert [StatsResult.model_validate(res) for res in response.json()] == [
+    StatsResult(path=('erased',), total_count=3, approx_count_distinct=2),
+    StatsResult(
+      path=('people', '*', 'zipcode'), total_count=3, approx_count_distinct=3, min_val=0, max_val=2
+    ),
+  ]
+
+
+def test_profile_query() -> None:
+  url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/profile'
+  options = ProfileQueryOptions(select_rows=SelectRowsOptions(columns=['erased'], limit=2))
+  response = client.post(url, json=options.model_dump())
+  assert response.status_code == 200
+  profile = QueryProfile.model_validate(response.json())
+  assert {'compile', 'execute', 'convert'} <= set(profile.phase_times_sec.keys())
+  [rows_query] = [query for query in profile.queries if 'erased' in query.sql]
+  assert rows_query.explain_analyze
+
+  # Exactly one query can be profiled.
+  options = ProfileQueryOptions(
+    select_rows=SelectRowsOptions(), stats=GetStatsOptions(leaf_path=('erased',))
+  )
+  response = client.post(url, json=options.model_dump())
+  assert response.status_code == 500
+  assert 'Exactly one of' in response.text
+
+
+def test_metrics() -> None:
+  url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/select_rows'
+  response = client.post(url, json=SelectRowsOptions(columns=['erased']).model_dump())
+  assert response.status_code == 200
+
+  response = client.get('/metrics')
+  assert response.status_code == 200
+  assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+  assert '# TYPE lilac_dataset_query_seconds histogram' in response.text
+  assert 'lilac_dataset_query_seconds_count{operation="select_rows"}' in response.text
+  assert 'lilac_tasks_pending ' in response.text
+
+
+def test_select_rows_cancelled() -> None:
+  def cancelled_token() -> CancellationToken:
+    token = CancellationToken()
+    token.cancel('The query was superseded by a newer query.')
+    return token
+
+  app.dependency_overrides[query_cancellation] = cancelled_token
+  try:
+    url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/select_rows'
+    response = client.post(url, json=SelectRowsOptions().model_dump())
+  finally:
+    del app.dependency_overrides[query_cancellation]
+  assert response.status_code == 499
+  assert response.json() == {'detail': 'The query was superseded by a newer query.'}
+
+
+def test_pivot_cancelled() -> None:
+  def cancelled_token() -> CancellationToken:
+    token = CancellationToken()
+    token.cancel('The query was superseded by a newer query.')
+    return token
+
+  app.dependency_overrides[query_cancellation] = cancelled_token
+  try:
+    url = f'/api/v1/datasets/{TEST_NAMESPACE}/{TEST_DATASET_NAME}/pivot'
+    options = PivotOptions(outer_path=['erased'], inner_path=['people', '*', 'name'])
+    response = client.post(url, json=options.model_dump())
+  finally:
+    del app.dependency_overrides[query_cancellation]
+  assert response.status_code == 499
+  assert response.json() == {'detail': 'The query was superseded by a newer query.'}
+
+
+def _session_request(session: dict) -> Request:
+  return Request({'type': 'http', 'headers': [], 'session': session})
+
+
+def test_query_cancellation_supersedes_same_key() -> None:
+  session: dict = {}
+  first = query_cancellation(_session_request(session), x_lilac_query_key='tab1:rows')
+  first_token = next(first)
+  other = query_cancellation(_session_request(session), x_lilac_query_key='tab1:groups')
+  other_token = next(other)
+  # Another client session with the same key.
+  other_session = query_cancellation(_session_request({}), x_lilac_query_key='tab1:rows')
+  other_session_token = next(other_session)
+  second = query_cancellation(_session_request(session), x_lilac_query_key='tab1:rows')
+  second_token = next(second)
+
+  assert first_token.cancelled
+  assert not other_token.cancelled
+  assert not other_session_token.cancelled
+  assert not second_token.cancelled
+  for gen in [first, other, other_session, second]:
+    gen.close()
+
+
 def test_update_settings_auth(mocker: MockerFixture) -> None:
   mocker.patch.dict(os.environ, {'LILAC_AUTH_ENABLED': 'True'})
 
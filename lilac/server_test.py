@@ -1,6 +1,9 @@
 """Test our public REST API."""
 import os
+import pathlib
+import time
 
+import pytest
 from fastapi.testclient import TestClient
 from pytest_mock import MockerFixture
 
@@ -12,6 +15,8 @@ from .auth import (
   UserInfo,
   get_session_user,
 )
+from .data.dataset_duckdb import get_udf_cache_spill_dir
+from .db_manager import WarmUpStatus, get_warm_up_status
 from .server import app
 
 client = TestClient(app)
@@ -185,3 +190,44 @@ def test_slash_redirect() -> None:
   # Allow redirects to follow through.
   response = client.get('/auth_info/', allow_redirects=True)
   assert response.status_code == 200
+
+
+def test_status_reports_warm_up(mocker: MockerFixture) -> None:
+  mocker.patch('lilac.server.get_warm_up_status', return_value=WarmUpStatus(ready=False))
+
+  response = client.get('/status')
+  assert response.status_code == 200
+  assert response.json()['ready'] is False
+  assert response.json()['warm_up']['ready'] is False
+
+
+def test_startup_clears_udf_cache_spill(tmp_path: pathlib.Path, mocker: MockerFixture) -> None:
+  mocker.patch.dict(os.environ, {'LILAC_PROJECT_DIR': str(tmp_path)})
+  spill_dir = get_udf_cache_spill_dir(tmp_path)
+  os.makedirs(os.path.join(spill_dir, 'namespace', 'dataset'))
+
+  with TestClient(app):
+    assert not os.path.exists(spill_dir)
+
+
+# The exception of the startup thread is reported by pytest.
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_startup_is_ready_when_load_fails(tmp_path: pathlib.Path, mocker: MockerFixture) -> None:
+  mocker.patch.dict(
+    os.environ,
+    {
+      'LILAC_PROJECT_DIR': str(tmp_path),
+      'LILAC_LOAD_ON_START_SERVER': 'True',
+      'LILAC_WARM_UP_ON_START_SERVER': 'True',
+    },
+  )
+  mocker.patch('lilac.server.load', side_effect=ValueError('Failed to load.'))
+  warm_up_mock = mocker.patch('lilac.server.warm_up_datasets')
+
+  with TestClient(app):
+    deadline = time.time() + 10
+    while not get_warm_up_status().ready and time.time() < deadline:
+      time.sleep(0.01)
+    assert get_warm_up_status().ready
+
+  warm_up_mock.assert_not_called()
@@ -1,7 +1,10 @@
 """Interface for implementing a signal."""
 
 import abc
+import contextlib
 import copy
+import threading
+from collections import OrderedDict
 from typing import (
   Any,
   Callable,
@@ -14,6 +17,7 @@ from typing import (
   Type,
   TypeVar,
   Union,
+  cast,
 )
 
 from pydantic import BaseModel, ConfigDict, model_serializer
@@ -21,6 +25,7 @@ from pydantic import Field as PydanticField
 from typing_extensions import override
 
 from .embeddings.vector_store import VectorDBIndex
+from .metrics import record_cache_lookups
 from .schema import (
   EMBEDDING_KEY,
   EmbeddingInputType,
@@ -370,3 +375,100 @@ def resolve_signal(signal: Union[dict, Signal]) -> Signal:
 def clear_signal_registry() -> None:
   """Clear the signal registry."""
   SIGNAL_REGISTRY.clear()
+  clear_warm_signals()
+
+
+# The number of set up signals that are kept warm for UDFs, across queries.
+WARM_SIGNALS_CACHE_SIZE = 32
+
+
+class _WarmSignal:
+  """A set up signal that is shared across queries, and the number of queries that use it."""
+
+  def __init__(self, signal: Signal) -> None:
+    self.signal = signal
+    self.num_users = 0
+    # Whether the signal was removed from the warm signals. It is torn down once it is unused.
+    self.evicted = False
+
+
+_WARM_SIGNALS: OrderedDict[tuple[Type[Signal], str, Optional[str]], _WarmSignal] = OrderedDict()
+_WARM_SIGNALS_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def warm_signal(signal: Tsignal) -> Iterator[Tsignal]:
+  """Checks out a set up instance of the signal that is shared across queries.
+
+  Signals with the same class and arguments share an instance, so `setup()` is only called the first
+  time the signal is used. The least recently used signals are evicted when there are more than
+  `WARM_SIGNALS_CACHE_SIZE` warm signals, and are torn down once no block uses them anymore. Signals
+  that don't override `setup()` are returned as is.
+
+  ```py
+    with warm_signal(signal) as signal:
+      signal.compute(...)
+  ```
+  """
+  if type(signal).setup is Signal.setup:
+    # The signal has no setup, so there is nothing to keep warm.
+    yield signal
+    return
+
+  warm = _checkout_warm_signal(signal)
+  try:
+    yield cast(Tsignal, warm.signal)
+  finally:
+    with _WARM_SIGNALS_LOCK:
+      warm.num_users -= 1
+      unused = warm.evicted and warm.num_users == 0
+    if unused:
+      warm.signal.teardown()
+
+
+def _checkout_warm_signal(signal: Signal) -> _WarmSignal:
+  # Access controlled signals hold the user, which is not part of the serialized arguments.
+  user = getattr(signal, '_user', None)
+  key = (type(signal), signal.model_dump_json(exclude_none=True), user.id if user else None)
+  with _WARM_SIGNALS_LOCK:
+    warm = _WARM_SIGNALS.get(key)
+    if warm:
+      _WARM_SIGNALS.move_to_end(key)
+      warm.num_users += 1
+      record_cache_lookups('warm_signal', hits=1, misses=0)
+      return warm
+
+  record_cache_lookups('warm_signal', hits=0, misses=1)
+  # Set up the signal outside the lock since it can be slow, e.g. to load a model.
+  signal.setup()
+  unused_signals: list[Signal] = []
+  with _WARM_SIGNALS_LOCK:
+    warm = _WARM_SIGNALS.get(key)
+    if warm:
+      # Another query set up the same signal concurrently, so this instance is not used.
+      if warm.signal is not signal:
+        unused_signals.append(signal)
+      _WARM_SIGNALS.move_to_end(key)
+    else:
+      warm = _WARM_SIGNALS[key] = _WarmSignal(signal)
+      while len(_WARM_SIGNALS) > WARM_SIGNALS_CACHE_SIZE:
+        _, evicted = _WARM_SIGNALS.popitem(last=False)
+        evicted.evicted = True
+        if evicted.num_users == 0:
+          unused_signals.append(evicted.signal)
+    warm.num_users += 1
+  for unused_signal in unused_signals:
+    unused_signal.teardown()
+  return warm
+
+
+def clear_warm_signals() -> None:
+  """Tears down the warm signals, once no block uses them anymore."""
+  with _WARM_SIGNALS_LOCK:
+    warm_signals = list(_WARM_SIGNALS.values())
+    _WARM_SIGNALS.clear()
+    for warm in warm_signals:
+      warm.evicted = True
+    unused_signals = [warm.signal for warm in warm_signals if warm.num_users == 0]
+  for signal in unused_signals:
+    signal.teardown()
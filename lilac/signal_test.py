@@ -2,6 +2,7 @@
 from typing import ClassVar, Iterable, Iterator, Optional
 
 import pytest
+from pytest_mock import MockerFixture
 from typing_extensions import override
 
 from .schema import Field, Item, RichData, SignalInputType, field
@@ -9,11 +10,13 @@ from .signal import (
   Signal,
   TextEmbeddingSignal,
   clear_signal_registry,
+  clear_warm_signals,
   get_signal_by_type,
   get_signal_cls,
   get_signals_by_type,
   register_signal,
   resolve_signal,
+  warm_signal,
 )
 
 
@@ -111,3 +114,33 @@ class TestSignalDisplayName(Signal):
 def test_signal_title_schema() -> None:
   assert TestSignalNoDisplayName.model_json_schema()['title'] == TestSignalNoDisplayName.__name__
   assert TestSignalDisplayName.model_json_schema()['title'] == 'test display name'
+
+
+class SetupSignal(TestSignal):
+  """A test signal with a setup, which is kept warm."""
+
+  @override
+  def setup(self) -> None:
+    pass
+
+
+def test_warm_signal_is_torn_down_when_unused(mocker: MockerFixture) -> None:
+  mocker.patch(f'{warm_signal.__module__}.WARM_SIGNALS_CACHE_SIZE', 1)
+  teardown_spy = mocker.spy(SetupSignal, 'teardown')
+
+  with warm_signal(SetupSignal(query='a')) as signal_a:
+    with warm_signal(SetupSignal(query='a')) as same_signal:
+      assert same_signal is signal_a
+    # Checking out another signal evicts "a", which is torn down once it is no longer used.
+    with warm_signal(SetupSignal(query='b')) as signal_b:
+      assert teardown_spy.call_count == 0
+  assert teardown_spy.call_count == 1
+  assert teardown_spy.call_args.args[0] is signal_a
+
+  # Clearing the warm signals waits for the signals in use.
+  with warm_signal(SetupSignal(query='b')) as same_signal:
+    assert same_signal is signal_b
+    clear_warm_signals()
+    assert teardown_spy.call_count == 1
+  assert teardown_spy.call_count == 2
+  assert teardown_spy.call_args.args[0] is signal_b
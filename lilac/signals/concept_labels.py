@@ -37,6 +37,11 @@ class ConceptLabelsSignal(TextSignal):
     if concept:
       self.version = concept.version
 
+  def concept_version(self) -> Optional[int]:
+    """Returns the latest version of the concept, without setting up the signal."""
+    concept = self._concept_db.get(self.namespace, self.concept_name, self._user)
+    return concept.version if concept else None
+
   @override
   def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
     concept = self._concept_db.get(self.namespace, self.concept_name, self._user)
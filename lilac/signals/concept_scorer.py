@@ -82,6 +82,10 @@ class ConceptSignal(VectorSignal):
     concept_model = self._get_concept_model()
     self.version = concept_model.version
 
+  def concept_version(self) -> int:
+    """Returns the latest version of the concept, without setting up the signal."""
+    return self._concept_model_db.concept_version(self.namespace, self.concept_name, self._user)
+
   @override
   def compute(self, examples: Iterable[RichData]) -> Iterator[Optional[Item]]:
     """Get the scores for the provided examples."""
@@ -81,6 +81,10 @@ class SemanticSimilaritySignal(VectorSignal):
     scores = batch_matrix.dot(self._get_search_embedding()).reshape(-1).tolist()
     return [span(start, end, {'score': score}) for score, (start, end) in zip(scores, spans)]
 
+  @override
+  def setup(self) -> None:
+    self._get_search_embedding()
+
   @override
   def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
     span_vectors = self._document_embed_fn(data)
@@ -22,6 +22,7 @@ from pydantic import BaseModel
 from tqdm import tqdm
 
 from .env import env
+from .metrics import gauge
 from .utils import log, pretty_timedelta
 
 TaskId = str
@@ -108,6 +109,10 @@ class TaskManager:
       progress=sum(tasks_with_progress) / len(tasks_with_progress) if tasks_with_progress else None,
     )
 
+  def num_pending(self) -> int:
+    """The number of tasks that are still running."""
+    return sum(task.status == TaskStatus.PENDING for task in list(self._task_info.values()))
+
   def task_id(
     self,
     name: str,
@@ -199,6 +204,10 @@ def get_task_manager() -> TaskManager:
   return TaskManager()
 
 
+TASKS_PENDING = gauge('lilac_tasks_pending', 'The number of tasks that are still running.')
+TASKS_PENDING.set_function(lambda: get_task_manager().num_pending())
+
+
 TProgress = TypeVar('TProgress')
 
 
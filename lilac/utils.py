@@ -12,6 +12,7 @@ import time
 import uuid
 from asyncio import AbstractEventLoop
 from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import timedelta
 from functools import partial, wraps
 from typing import (
@@ -20,6 +21,8 @@ from typing import (
   Any,
   Awaitable,
   Callable,
+  Generic,
+  Hashable,
   Iterable,
   Iterator,
   Optional,
@@ -287,6 +290,123 @@ class DebugTimer:
     log(f'{self.name} took {(time.perf_counter() - self.start):.3f}s.')
 
 
+class ReadWriteLock:
+  """A readers-writer lock. Readers share the lock, while a writer holds it exclusively.
+
+  Readers only wait for an active writer, not for a waiting one, so a thread that already holds the
+  read lock can take it again. The thread holding the write lock can also take the read lock.
+
+  ```py
+    lock = ReadWriteLock()
+    with lock.read():
+      ...
+    with lock.write():
+      ...
+  ```
+  """
+
+  def __init__(self) -> None:
+    self._cond = threading.Condition()
+    self._num_readers = 0
+    self._writer: Optional[int] = None
+
+  @contextmanager
+  def read(self) -> Iterator[None]:
+    """Hold the lock for reading."""
+    thread_id = threading.get_ident()
+    with self._cond:
+      self._cond.wait_for(lambda: self._writer is None or self._writer == thread_id)
+      self._num_readers += 1
+    try:
+      yield
+    finally:
+      with self._cond:
+        self._num_readers -= 1
+        self._cond.notify_all()
+
+  @contextmanager
+  def write(self) -> Iterator[None]:
+    """Hold the lock for writing. Waits until there are no readers."""
+    with self._cond:
+      self._cond.wait_for(lambda: self._writer is None and self._num_readers == 0)
+      self._writer = threading.get_ident()
+    try:
+      yield
+    finally:
+      with self._cond:
+        self._writer = None
+        self._cond.notify_all()
+
+
+# How often the callers that wait in `SingleFlight.do` run their check, in seconds.
+SINGLE_FLIGHT_CHECK_INTERVAL_SEC = 0.1
+
+
+class _Flight:
+  """A call of `SingleFlight.do` that is in flight."""
+
+  def __init__(self) -> None:
+    self.done = threading.Event()
+    self.result: Any = None
+    self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[Tout]):
+  """Coalesces concurrent calls with the same key into one call.
+
+  The first caller for a key runs the function, while concurrent callers with the same key wait for
+  it and share its result, or its exception. Once the call returns, the next call runs again, so
+  results are never cached.
+
+  ```py
+    flights = SingleFlight[StatsResult]()
+    flights.do(('stats', leaf_path, generation), lambda: compute_stats(leaf_path))
+  ```
+  """
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._flights: dict[Hashable, _Flight] = {}
+
+  def do(
+    self, key: Hashable, fn: Callable[[], Tout], check: Optional[Callable[[], None]] = None
+  ) -> Tout:
+    """Run `fn`, or wait for the call with the same key that is in flight.
+
+    Args:
+      key: The key of the call.
+      fn: The function to run.
+      check: Called every `SINGLE_FLIGHT_CHECK_INTERVAL_SEC` seconds while waiting for the call in
+        flight. It raises to stop waiting, e.g. when the request of the caller is cancelled.
+    """
+    with self._lock:
+      flight = self._flights.get(key)
+      is_leader = flight is None
+      if flight is None:
+        flight = self._flights[key] = _Flight()
+
+    if not is_leader:
+      if check:
+        while not flight.done.wait(SINGLE_FLIGHT_CHECK_INTERVAL_SEC):
+          check()
+      else:
+        flight.done.wait()
+      if flight.error is not None:
+        raise flight.error
+      return flight.result
+
+    try:
+      flight.result = fn()
+      return flight.result
+    except BaseException as e:
+      flight.error = e
+      raise
+    finally:
+      with self._lock:
+        del self._flights[key]
+      flight.done.set()
+
+
 def pretty_timedelta(delta: timedelta) -> str:
   """Pretty-prints a `timedelta`."""
   seconds = delta.total_seconds()
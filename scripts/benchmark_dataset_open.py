@@ -0,0 +1,85 @@
+"""Benchmark the cold open of a dataset with many signals.
+
+Computes signals on a dataset in a temporary project, then times constructing fresh instances of
+the dataset, their first manifest, which builds the views over all the parquet files, and their
+first query.
+
+Usage:
+
+poetry run python -m scripts.benchmark_dataset_open --num_items=100000 --num_signals=30
+"""
+
+import tempfile
+import time
+from typing import ClassVar, Iterable, Iterator, Optional
+
+import click
+from lilac.data.dataset_duckdb import DatasetDuckDB
+from lilac.env import set_project_dir
+from lilac.load_dataset import from_dicts
+from lilac.schema import Field, Item, RichData, field
+from lilac.signal import TextSignal, register_signal
+from typing_extensions import override
+
+
+class LengthSignal(TextSignal):
+  """The length of the text, plus an offset so each signal writes its own output."""
+
+  name: ClassVar[str] = 'benchmark_length'
+
+  offset: int = 0
+
+  @override
+  def fields(self) -> Field:
+    return field('int32')
+
+  @override
+  def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
+    for text in data:
+      yield len(str(text)) + self.offset
+
+
+@click.command()
+@click.option('--num_items', help='The number of items in the dataset.', type=int, default=100_000)
+@click.option('--num_signals', help='The number of signals to compute.', type=int, default=30)
+@click.option('--repeats', help='The number of times to open the dataset.', type=int, default=5)
+def main(num_items: int, num_signals: int, repeats: int) -> None:
+  """Benchmark the cold open of a dataset with many signals."""
+  set_project_dir(tempfile.mkdtemp())
+  register_signal(LengthSignal)
+
+  dataset = from_dicts('local', 'benchmark', ({'text': f'text {i}'} for i in range(num_items)))
+  for offset in range(num_signals):
+    dataset.compute_signal(LengthSignal(offset=offset), 'text')
+
+  construct_times: list[float] = []
+  manifest_times: list[float] = []
+  query_times: list[float] = []
+  for _ in range(repeats):
+    start = time.perf_counter()
+    cold_dataset = DatasetDuckDB(
+      dataset.namespace, dataset.dataset_name, project_dir=dataset.project_dir
+    )
+    construct_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    cold_dataset.manifest()
+    manifest_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    list(cold_dataset.select_rows(['text'], limit=100))
+    query_times.append(time.perf_counter() - start)
+
+  print(f'Opening a dataset with {num_items:,} items and {num_signals} signals:')
+  for name, times in [
+    ('construct', construct_times),
+    ('first manifest', manifest_times),
+    ('first select_rows', query_times),
+  ]:
+    min_ms = min(times) * 1000
+    avg_ms = sum(times) / len(times) * 1000
+    print(f'{name:<20}{min_ms:>10.1f} ms (min){avg_ms:>10.1f} ms (avg)')
+
+
+if __name__ == '__main__':
+  main()
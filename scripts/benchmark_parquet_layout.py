@@ -0,0 +1,124 @@
+"""Benchmark selective filters over the parquet layout of signal outputs.
+
+Computes a score signal and a language signal on a dataset in a temporary project, then times
+selective filters on them with the clustered layout that signal outputs are written with, and
+after rewriting the outputs in the previous layout: rows in rowid order, one default row group
+size and no zstd compression.
+
+Usage:
+
+poetry run python -m scripts.benchmark_parquet_layout --num_items=2000000
+"""
+
+import glob
+import os
+import random
+import tempfile
+import time
+from typing import ClassVar, Iterable, Iterator, Optional
+
+import click
+import duckdb
+from lilac.data.dataset import Dataset, Filter
+from lilac.env import set_project_dir
+from lilac.load_dataset import from_dicts
+from lilac.schema import Field, Item, RichData, field
+from lilac.signal import TextSignal, register_signal
+from typing_extensions import override
+
+LANGS = ['en'] * 2 + ['fr', 'de', 'es', 'it', 'nl', 'pt', 'ja', 'zh', 'ko', 'ru', 'ar', 'hi']
+
+
+class ScoreSignal(TextSignal):
+  """A random score per text."""
+
+  name: ClassVar[str] = 'benchmark_score'
+
+  @override
+  def fields(self) -> Field:
+    return field('float32')
+
+  @override
+  def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
+    for _ in data:
+      yield random.random()
+
+
+class LangSignal(TextSignal):
+  """A random language per text."""
+
+  name: ClassVar[str] = 'benchmark_lang'
+
+  @override
+  def fields(self) -> Field:
+    return field('string')
+
+  @override
+  def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
+    for _ in data:
+      yield random.choice(LANGS)
+
+
+FILTERS: list[tuple[str, Filter]] = [
+  ('score > 0.99', Filter(path=('text', 'benchmark_score'), op='greater', value=0.99)),
+  ('score > 0.9', Filter(path=('text', 'benchmark_score'), op='greater', value=0.9)),
+  ("lang = 'ko'", Filter(path=('text', 'benchmark_lang'), op='equals', value='ko')),
+]
+
+
+def _time_filters(dataset: Dataset, repeats: int) -> dict[str, tuple[float, float]]:
+  times: dict[str, tuple[float, float]] = {}
+  for name, filter in FILTERS:
+    # Warm up the joint views.
+    dataset.count(filters=[filter])
+    start = time.perf_counter()
+    for _ in range(repeats):
+      dataset.count(filters=[filter])
+    count_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+      dataset.select_rows(['text'], filters=[filter], limit=100)
+    select_time = (time.perf_counter() - start) / repeats
+    times[name] = (count_time, select_time)
+  return times
+
+
+def _rewrite_in_previous_layout(dataset_path: str) -> None:
+  for signal_dir in ['benchmark_score', 'benchmark_lang']:
+    for filepath in glob.glob(os.path.join(dataset_path, 'text', signal_dir, '*.parquet')):
+      tmp_filepath = filepath + '.tmp'
+      duckdb.sql(
+        f"""COPY (SELECT * FROM read_parquet('{filepath}') ORDER BY __rowid__)
+          TO '{tmp_filepath}' (FORMAT PARQUET)"""
+      )
+      os.replace(tmp_filepath, filepath)
+
+
+@click.command()
+@click.option(
+  '--num_items', help='The number of items in the dataset.', type=int, default=1_000_000
+)
+@click.option('--repeats', help='The number of times to run each query.', type=int, default=5)
+def main(num_items: int, repeats: int) -> None:
+  """Benchmark selective filters over the parquet layout of signal outputs."""
+  set_project_dir(tempfile.mkdtemp())
+  register_signal(ScoreSignal)
+  register_signal(LangSignal)
+
+  dataset = from_dicts('local', 'benchmark', ({'text': f'text {i}'} for i in range(num_items)))
+  dataset.compute_signal(ScoreSignal(), 'text')
+  dataset.compute_signal(LangSignal(), 'text')
+  clustered = _time_filters(dataset, repeats)
+
+  _rewrite_in_previous_layout(dataset.dataset_path)
+  previous = _time_filters(dataset, repeats)
+
+  print(f'{"filter":<16}{"layout":<12}{"count (ms)":>12}{"select (ms)":>14}')
+  for name, _ in FILTERS:
+    for layout, times in [('previous', previous), ('clustered', clustered)]:
+      count_time, select_time = times[name]
+      print(f'{name:<16}{layout:<12}{count_time * 1000:>12.1f}{select_time * 1000:>14.1f}')
+
+
+if __name__ == '__main__':
+  main()
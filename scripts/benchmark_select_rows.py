@@ -0,0 +1,109 @@
+"""Benchmark the response encodings of the `select_rows` endpoint.
+
+Creates a dataset with nested span signals in a temporary project and compares the time to encode
+a page of rows as JSON through pydantic, as JSON through orjson, and as an Arrow IPC stream.
+
+Usage:
+
+poetry run python -m scripts.benchmark_select_rows --num_items=10000 --page_size=1000
+"""
+
+import tempfile
+import time
+from typing import Callable, ClassVar, Iterable, Iterator, Optional
+
+import click
+import pyarrow as pa
+from lilac.data.dataset import SelectRowsResult
+from lilac.env import set_project_dir
+from lilac.load_dataset import from_dicts
+from lilac.router_dataset import (
+  RowsJSONResponse,
+  SelectRowsOptions,
+  SelectRowsResponse,
+  _exclude_none,
+  _select_rows_arrow_table,
+)
+from lilac.schema import Field, Item, RichData, field, span
+from lilac.signal import TextSignal, register_signal
+from typing_extensions import override
+
+
+class WordsSignal(TextSignal):
+  """Splits the text into words, with a span and a length per word."""
+
+  name: ClassVar[str] = 'benchmark_words'
+
+  @override
+  def fields(self) -> Field:
+    return field(fields=[field('string_span', fields={'len': 'int32', 'score': 'float32'})])
+
+  @override
+  def compute(self, data: Iterable[RichData]) -> Iterator[Optional[Item]]:
+    for text in data:
+      spans: list[Item] = []
+      offset = 0
+      for word in str(text).split(' '):
+        spans.append(span(offset, offset + len(word), {'len': len(word), 'score': 0.5}))
+        offset += len(word) + 1
+      yield spans
+
+
+def _timeit(fn: Callable[[], bytes], repeats: int) -> tuple[float, int]:
+  start = time.perf_counter()
+  for _ in range(repeats):
+    content = fn()
+  return (time.perf_counter() - start) / repeats, len(content)
+
+
+@click.command()
+@click.option('--num_items', help='The number of items in the dataset.', type=int, default=10_000)
+@click.option('--page_size', help='The number of rows in a page.', type=int, default=1_000)
+@click.option('--repeats', help='The number of times to encode each page.', type=int, default=5)
+def main(num_items: int, page_size: int, repeats: int) -> None:
+  """Benchmark the response encodings of the `select_rows` endpoint."""
+  set_project_dir(tempfile.mkdtemp())
+  register_signal(WordsSignal)
+
+  items = [
+    {'text': f'document {i} with a few words in it', 'meta': {'id': i, 'source': 'bench'}}
+    for i in range(num_items)
+  ]
+  dataset = from_dicts('local', 'benchmark', items)
+  dataset.compute_signal(WordsSignal(), 'text')
+
+  options = SelectRowsOptions(combine_columns=True, limit=page_size)
+  start = time.perf_counter()
+  res = dataset.select_rows(combine_columns=True, limit=page_size)
+  select_time = time.perf_counter() - start
+
+  def pydantic_json() -> bytes:
+    rows = [_exclude_none(row) for row in SelectRowsResult(res.df(), res.total_num_rows)]
+    response = SelectRowsResponse(rows=rows, total_num_rows=res.total_num_rows)
+    return response.model_dump_json(exclude_none=True).encode()
+
+  def orjson_json() -> bytes:
+    rows = [_exclude_none(row) for row in SelectRowsResult(res.df(), res.total_num_rows)]
+    return RowsJSONResponse({'rows': rows, 'total_num_rows': res.total_num_rows}).body
+
+  def arrow_ipc() -> bytes:
+    table = _select_rows_arrow_table(dataset, options, res)
+    assert table is not None
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+      writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+  print(f'select_rows of {page_size:,} rows: {select_time * 1000:.1f}ms')
+  print(f'{"encoding":<16}{"time (ms)":>12}{"size (KB)":>12}')
+  for name, fn in [
+    ('pydantic json', pydantic_json),
+    ('orjson', orjson_json),
+    ('arrow ipc', arrow_ipc),
+  ]:
+    encode_time, size = _timeit(fn, repeats)
+    print(f'{name:<16}{encode_time * 1000:>12.1f}{size / 1024:>12.1f}')
+
+
+if __name__ == '__main__':
+  main()
@@ -10,7 +10,9 @@ import {
   type AddLabelsOptions,
   type LilacSchema,
   type Path,
+  type GetStatsOptions,
   type RemoveLabelsOptions,
+  type SelectGroupsOptions,
   type SelectRowsOptions,
   type SelectRowsResponse
 } from '$lilac';
@@ -26,7 +28,12 @@ import {create as createBatcher, windowScheduler, type Batcher} from '@yornaath/
 import type {JSONSchema7} from 'json-schema';
 import {watchTask} from '../stores/taskMonitoringStore';
 import {queryClient} from './queryClient';
-import {apiQueryKey, createApiMutation, createApiQuery} from './queryUtils';
+import {
+  apiQueryKey,
+  createApiMutation,
+  createApiQuery,
+  supersedingQueryKey
+} from './queryUtils';
 import {TASKS_TAG} from './taskQueries';
 
 export const DATASETS_TAG = 'datasets';
@@ -119,7 +126,16 @@ export const restoreRowsMutation = createApiMutation(DatasetsService.restoreRows
     queryClient.invalidateQueries([DATASETS_TAG, 'selectRows']);
   }
 });
-export const queryDatasetStats = createApiQuery(DatasetsService.getStats, DATASETS_TAG);
+function getStats(namespace: string, datasetName: string, options: GetStatsOptions) {
+  return DatasetsService.getStats(
+    namespace,
+    datasetName,
+    options,
+    supersedingQueryKey('stats', namespace, datasetName, options.leaf_path)
+  );
+}
+
+export const queryDatasetStats = createApiQuery(getStats, DATASETS_TAG);
 
 export function queryBatchStats(
   namespace: string,
@@ -129,7 +145,7 @@ export function queryBatchStats(
 ) {
   const queries = (leafs || []).map(leaf => ({
     queryKey: [DATASETS_TAG, 'getStats', namespace, datasetName, leaf],
-    queryFn: () => DatasetsService.getStats(namespace, datasetName, {leaf_path: leaf}),
+    queryFn: () => getStats(namespace, datasetName, {leaf_path: leaf}),
     // Allow the result of the query to contain non-serializable data, such as `LilacField` which
     // has pointers to parents: https://tanstack.com/query/v4/docs/react/reference/useQuery
     structuralSharing: false,
@@ -231,7 +247,17 @@ export const querySelectRowsSchema = createApiQuery(
   }
 );
 
-export const querySelectGroups = createApiQuery(DatasetsService.selectGroups, DATASETS_TAG);
+function selectGroups(namespace: string, datasetName: string, options: SelectGroupsOptions) {
+  // The histogram of a field only shows the groups of its latest filters.
+  return DatasetsService.selectGroups(
+    namespace,
+    datasetName,
+    options,
+    supersedingQueryKey('select_groups', namespace, datasetName, options.leaf_path)
+  );
+}
+
+export const querySelectGroups = createApiQuery(selectGroups, DATASETS_TAG);
 
 export const infiniteQuerySelectRows = (
   namespace: string,
@@ -242,11 +268,17 @@ export const infiniteQuerySelectRows = (
   createInfiniteQuery({
     queryKey: [DATASETS_TAG, 'selectRows', namespace, datasetName, selectRowOptions],
     queryFn: ({pageParam = 0}) =>
-      DatasetsService.selectRows(namespace, datasetName, {
-        ...selectRowOptions,
-        limit: selectRowOptions.limit || DEFAULT_SELECT_ROWS_LIMIT,
-        offset: pageParam * (selectRowOptions.limit || DEFAULT_SELECT_ROWS_LIMIT)
-      }),
+      DatasetsService.selectRows(
+        namespace,
+        datasetName,
+        {
+          ...selectRowOptions,
+          limit: selectRowOptions.limit || DEFAULT_SELECT_ROWS_LIMIT,
+          offset: pageParam * (selectRowOptions.limit || DEFAULT_SELECT_ROWS_LIMIT)
+        },
+        // The rows of the dataset view only show the latest query.
+        supersedingQueryKey('select_rows', namespace, datasetName)
+      ),
     select: data => ({
       ...data,
       pages: data.pages.map(page => ({
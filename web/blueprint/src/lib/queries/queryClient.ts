@@ -4,6 +4,9 @@ import {writable} from 'svelte/store';
 
 export const apiErrors = writable<ApiError[]>([]);
 
+// The status of the queries that the server cancelled.
+const QUERY_CANCELLED_STATUS = 499;
+
 export const queryClient = new QueryClient({
   defaultOptions: {
     queries: {
@@ -13,6 +16,8 @@ export const queryClient = new QueryClient({
       staleTime: Infinity,
       retry: false,
       onError: err => {
+        // Queries that are superseded by a newer query of the same view are cancelled on purpose.
+        if ((err as ApiError).status === QUERY_CANCELLED_STATUS) return;
         console.error((err as ApiError).body?.detail);
         apiErrors.update(errs => [...errs, err as ApiError]);
       }
@@ -10,6 +10,17 @@ import {
   type CreateQueryOptions
 } from '@tanstack/svelte-query';
 
+// A random id of this browser tab, so the queries of other tabs are never superseded.
+const TAB_ID = Math.random().toString(36).slice(2);
+
+/**
+ * Returns the `X-Lilac-Query-Key` header of a query. The server cancels an in-flight query when a
+ * newer query of the same tab has the same key, so a view only runs its latest query.
+ */
+export function supersedingQueryKey(...parts: unknown[]): string {
+  return [TAB_ID, ...parts.map(part => JSON.stringify(part))].join(':');
+}
+
 export const apiQueryKey = (tags: string[], endpoint: string, ...args: unknown[]) => [
   ...tags,
   endpoint,
@@ -47,6 +47,7 @@ export type { ExampleIn } from './models/ExampleIn';
 export type { ExampleOrigin } from './models/ExampleOrigin';
 export type { ExportOptions } from './models/ExportOptions';
 export type { Field } from './models/Field';
+export type { GetStatsManyOptions } from './models/GetStatsManyOptions';
 export type { GetStatsOptions } from './models/GetStatsOptions';
 export type { GroupsSortBy } from './models/GroupsSortBy';
 export type { HTTPValidationError } from './models/HTTPValidationError';
@@ -62,6 +63,9 @@ export type { OverallScore } from './models/OverallScore';
 export type { PivotOptions } from './models/PivotOptions';
 export type { PivotResult } from './models/PivotResult';
 export type { PivotResultOuterGroup } from './models/PivotResultOuterGroup';
+export type { ProfiledQuery } from './models/ProfiledQuery';
+export type { ProfileQueryOptions } from './models/ProfileQueryOptions';
+export type { QueryProfile } from './models/QueryProfile';
 export type { RagGenerationOptions } from './models/RagGenerationOptions';
 export type { RagGenerationResult } from './models/RagGenerationResult';
 export type { RagRetrievalOptions } from './models/RagRetrievalOptions';
@@ -107,6 +111,7 @@ export type { UnaryFilter } from './models/UnaryFilter';
 export type { UserAccess } from './models/UserAccess';
 export type { UserInfo } from './models/UserInfo';
 export type { ValidationError } from './models/ValidationError';
+export type { WarmUpStatus } from './models/WarmUpStatus';
 export type { WebManifest } from './models/WebManifest';
 
 export { ConceptsService } from './services/ConceptsService';
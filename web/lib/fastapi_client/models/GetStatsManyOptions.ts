@@ -0,0 +1,12 @@
+/* generated using openapi-typescript-codegen -- do no edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+/**
+ * The request for the get stats many endpoint.
+ */
+export type GetStatsManyOptions = {
+    leaf_paths: Array<(Array<string> | string)>;
+};
+
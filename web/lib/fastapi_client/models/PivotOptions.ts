@@ -20,5 +20,6 @@ export type PivotOptions = {
     outer_path: (Array<string> | string);
     filters?: Array<(BinaryFilter | StringFilter | UnaryFilter | ListFilter)>;
     searches?: Array<(ConceptSearch | SemanticSearch | KeywordSearch | MetadataSearch)>;
+    approximate?: boolean;
 };
 
@@ -11,5 +11,6 @@ import type { PivotResultOuterGroup } from './PivotResultOuterGroup';
 export type PivotResult = {
     outer_groups: Array<PivotResultOuterGroup>;
     too_many_distinct?: boolean;
+    approximate?: boolean;
 };
 
@@ -10,5 +10,7 @@ export type PivotResultOuterGroup = {
     value: (string | null);
     count: number;
     inner: Array<any[]>;
+    count_interval?: (any[] | null);
+    inner_intervals?: (Array<any[]> | null);
 };
 
@@ -0,0 +1,21 @@
+/* generated using openapi-typescript-codegen -- do no edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+import type { GetStatsOptions } from './GetStatsOptions';
+import type { PivotOptions } from './PivotOptions';
+import type { SelectGroupsOptions } from './SelectGroupsOptions';
+import type { SelectRowsOptions } from './SelectRowsOptions';
+
+/**
+ * The request for the profile endpoint. Exactly one of the queries must be set.
+ */
+export type ProfileQueryOptions = {
+    select_rows?: (SelectRowsOptions | null);
+    select_groups?: (SelectGroupsOptions | null);
+    stats?: (GetStatsOptions | null);
+    pivot?: (PivotOptions | null);
+    explain_analyze?: boolean;
+};
+
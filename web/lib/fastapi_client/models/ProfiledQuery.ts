@@ -0,0 +1,14 @@
+/* generated using openapi-typescript-codegen -- do no edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+/**
+ * A SQL statement that ran in DuckDB while profiling.
+ */
+export type ProfiledQuery = {
+    sql: string;
+    wall_time_sec: number;
+    explain_analyze?: (string | null);
+};
+
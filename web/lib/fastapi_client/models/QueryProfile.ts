@@ -0,0 +1,15 @@
+/* generated using openapi-typescript-codegen -- do no edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+import type { ProfiledQuery } from './ProfiledQuery';
+
+/**
+ * The profile of the dataset queries that ran in a `profile_queries` block.
+ */
+export type QueryProfile = {
+    phase_times_sec?: Record<string, number>;
+    queries?: Array<ProfiledQuery>;
+};
+
@@ -25,5 +25,6 @@ export type SelectGroupsOptions = {
     sort_order?: (SortOrder | null);
     limit?: (number | null);
     bins?: (Array<any[]> | null);
+    approximate?: boolean;
 };
 
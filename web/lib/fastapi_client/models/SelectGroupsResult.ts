@@ -10,5 +10,7 @@ export type SelectGroupsResult = {
     too_many_distinct: boolean;
     counts: Array<any[]>;
     bins?: (Array<any[]> | null);
+    approximate?: boolean;
+    count_intervals?: (Array<any[]> | null);
 };
 
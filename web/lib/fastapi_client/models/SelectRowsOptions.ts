@@ -28,5 +28,6 @@ export type SelectRowsOptions = {
     combine_columns?: (boolean | null);
     include_deleted?: boolean;
     exclude_signals?: boolean;
+    cursor?: (string | null);
 };
 
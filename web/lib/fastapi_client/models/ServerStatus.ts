@@ -3,6 +3,8 @@
 /* tslint:disable */
 /* eslint-disable */
 
+import type { WarmUpStatus } from './WarmUpStatus';
+
 /**
  * Server status information.
  */
@@ -10,5 +12,7 @@ export type ServerStatus = {
     version: string;
     google_analytics_enabled: boolean;
     disable_error_notifications: boolean;
+    ready: boolean;
+    warm_up: WarmUpStatus;
 };
 
@@ -14,5 +14,6 @@ export type StatsResult = {
     max_val?: (number | string | null);
     value_samples?: Array<number>;
     avg_text_length?: (number | null);
+    approximate?: boolean;
 };
 
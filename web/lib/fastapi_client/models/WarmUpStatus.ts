@@ -0,0 +1,15 @@
+/* generated using openapi-typescript-codegen -- do no edit */
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+/**
+ * The progress of warming up the datasets of the project.
+ */
+export type WarmUpStatus = {
+    ready?: boolean;
+    total_datasets?: number;
+    warm_datasets?: number;
+    failed_datasets?: Array<string>;
+};
+
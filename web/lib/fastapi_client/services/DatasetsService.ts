@@ -14,9 +14,12 @@ import type { DeleteRowsOptions } from '../models/DeleteRowsOptions';
 import type { DeleteSignalOptions } from '../models/DeleteSignalOptions';
 import type { DeleteSignalResponse } from '../models/DeleteSignalResponse';
 import type { ExportOptions } from '../models/ExportOptions';
+import type { GetStatsManyOptions } from '../models/GetStatsManyOptions';
 import type { GetStatsOptions } from '../models/GetStatsOptions';
 import type { PivotOptions } from '../models/PivotOptions';
 import type { PivotResult } from '../models/PivotResult';
+import type { ProfileQueryOptions } from '../models/ProfileQueryOptions';
+import type { QueryProfile } from '../models/QueryProfile';
 import type { RemoveLabelsOptions } from '../models/RemoveLabelsOptions';
 import type { RestoreRowsOptions } from '../models/RestoreRowsOptions';
 import type { SelectGroupsOptions } from '../models/SelectGroupsOptions';
@@ -103,6 +106,7 @@ export class DatasetsService {
      * @param namespace
      * @param datasetName
      * @param requestBody
+     * @param xLilacQueryKey
      * @returns StatsResult Successful Response
      * @throws ApiError
      */
@@ -110,6 +114,7 @@ export class DatasetsService {
         namespace: string,
         datasetName: string,
         requestBody: GetStatsOptions,
+        xLilacQueryKey?: (string | null),
     ): CancelablePromise<StatsResult> {
         return __request(OpenAPI, {
             method: 'POST',
@@ -118,6 +123,43 @@ export class DatasetsService {
                 'namespace': namespace,
                 'dataset_name': datasetName,
             },
+            headers: {
+                'x-lilac-query-key': xLilacQueryKey,
+            },
+            body: requestBody,
+            mediaType: 'application/json',
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+
+    /**
+     * Get Stats Many
+     * Get the stats for many leafs of the dataset, computed together.
+     * @param namespace
+     * @param datasetName
+     * @param requestBody
+     * @param xLilacQueryKey
+     * @returns StatsResult Successful Response
+     * @throws ApiError
+     */
+    public static getStatsMany(
+        namespace: string,
+        datasetName: string,
+        requestBody: GetStatsManyOptions,
+        xLilacQueryKey?: (string | null),
+    ): CancelablePromise<Array<StatsResult>> {
+        return __request(OpenAPI, {
+            method: 'POST',
+            url: '/api/v1/datasets/{namespace}/{dataset_name}/stats_many',
+            path: {
+                'namespace': namespace,
+                'dataset_name': datasetName,
+            },
+            headers: {
+                'x-lilac-query-key': xLilacQueryKey,
+            },
             body: requestBody,
             mediaType: 'application/json',
             errors: {
@@ -132,6 +174,7 @@ export class DatasetsService {
      * @param namespace
      * @param datasetName
      * @param requestBody
+     * @param xLilacQueryKey
      * @returns SelectRowsResponse Successful Response
      * @throws ApiError
      */
@@ -139,6 +182,7 @@ export class DatasetsService {
         namespace: string,
         datasetName: string,
         requestBody: SelectRowsOptions,
+        xLilacQueryKey?: (string | null),
     ): CancelablePromise<SelectRowsResponse> {
         return __request(OpenAPI, {
             method: 'POST',
@@ -147,6 +191,9 @@ export class DatasetsService {
                 'namespace': namespace,
                 'dataset_name': datasetName,
             },
+            headers: {
+                'x-lilac-query-key': xLilacQueryKey,
+            },
             body: requestBody,
             mediaType: 'application/json',
             errors: {
@@ -190,6 +237,7 @@ export class DatasetsService {
      * @param namespace
      * @param datasetName
      * @param requestBody
+     * @param xLilacQueryKey
      * @returns SelectGroupsResult Successful Response
      * @throws ApiError
      */
@@ -197,6 +245,7 @@ export class DatasetsService {
         namespace: string,
         datasetName: string,
         requestBody: SelectGroupsOptions,
+        xLilacQueryKey?: (string | null),
     ): CancelablePromise<SelectGroupsResult> {
         return __request(OpenAPI, {
             method: 'POST',
@@ -205,6 +254,9 @@ export class DatasetsService {
                 'namespace': namespace,
                 'dataset_name': datasetName,
             },
+            headers: {
+                'x-lilac-query-key': xLilacQueryKey,
+            },
             body: requestBody,
             mediaType: 'application/json',
             errors: {
@@ -242,6 +294,37 @@ export class DatasetsService {
         });
     }
 
+    /**
+     * Profile Query
+     * Run a query, and return its generated SQL, DuckDB plans and the wall time of each phase.
+     *
+     * Results that are served from a cache, like a repeated `stats` query, run no SQL.
+     * @param namespace
+     * @param datasetName
+     * @param requestBody
+     * @returns QueryProfile Successful Response
+     * @throws ApiError
+     */
+    public static profileQuery(
+        namespace: string,
+        datasetName: string,
+        requestBody: ProfileQueryOptions,
+    ): CancelablePromise<QueryProfile> {
+        return __request(OpenAPI, {
+            method: 'POST',
+            url: '/api/v1/datasets/{namespace}/{dataset_name}/profile',
+            path: {
+                'namespace': namespace,
+                'dataset_name': datasetName,
+            },
+            body: requestBody,
+            mediaType: 'application/json',
+            errors: {
+                422: `Validation Error`,
+            },
+        });
+    }
+
     /**
      * Get Media
      * Get the media for the dataset.